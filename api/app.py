@@ -18,6 +18,11 @@ if project_root not in sys.path:
 # Đảm bảo rằng việc import này không gây lỗi (ví dụ: lỗi load model trong predict.py)
 try:
     from api.routes import predict # Import module predict từ thư mục routes
+    from api.routes import detect # Endpoint phát hiện biển báo trong ảnh cảnh
+    from api.routes import predict_paths # Endpoint dự đoán theo đường dẫn trên máy chủ
+    from api.routes import similar # Endpoint tìm ảnh train gần nhất (chỉ mục embedding)
+    from api.routes import explain # Endpoint Grad-CAM (tính khi được yêu cầu, có cache)
+    from api.routes import stats # Thống kê lịch sử nhận diện (bảng tổng hợp)
     print("Successfully imported predict router.")
 except ImportError as e:
     print(f"ERROR: Could not import predict router. Check imports or errors in api/routes/predict.py")
@@ -46,6 +51,11 @@ app = FastAPI(
 # Thêm tất cả các routes (endpoints) từ module predict vào ứng dụng chính
 # Có thể thêm prefix nếu muốn, ví dụ prefix="/api/v1"
 app.include_router(predict.router)
+app.include_router(detect.router)
+app.include_router(predict_paths.router)
+app.include_router(similar.router)
+app.include_router(explain.router)
+app.include_router(stats.router)
 print("Predict router included in FastAPI app.")
 
 # --- Định nghĩa route gốc (tùy chọn) ---
@@ -0,0 +1,79 @@
+# api/routes/detect.py
+
+import time
+import logging
+import numpy as np
+import cv2
+from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi.responses import JSONResponse
+
+import config
+from api.routes import predict # Dùng chung model và hàm định dạng kết quả
+from api.upload_validation import read_upload_limited
+from utils.sign_detector import propose_regions, crop_regions_batch
+
+logger = logging.getLogger("api.detect")
+
+router = APIRouter()
+
+# --- Endpoint Phát hiện + Phân loại (ảnh cảnh đầy đủ) ---
+@router.post("/detect", response_class=JSONResponse)
+async def detect_signs(file: UploadFile = File(...), top_n: int = 3,
+                       min_confidence: float = config.DETECT_MIN_CONFIDENCE):
+    """
+    Nhận ảnh cảnh đường phố, sinh vùng ứng viên bằng mask màu HSV,
+    phân loại tất cả vùng trong một batch và trả về box + lớp dự đoán.
+    """
+    if predict.model is None:
+        logger.critical("Model is not loaded. API cannot process detections.")
+        raise HTTPException(status_code=503, detail="Model is not loaded. Cannot process predictions.")
+
+    contents = await read_upload_limited(file)
+    if not contents:
+        logger.warning("Received empty file upload.")
+        raise HTTPException(status_code=400, detail="No image file uploaded or file is empty.")
+
+    img_bgr = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+    if img_bgr is None:
+        logger.error(f"Failed to decode image: {file.filename}")
+        raise HTTPException(status_code=400, detail="Could not preprocess image. Check image format or content.")
+
+    # --- Bước 1: Sinh vùng ứng viên ---
+    t_start = time.perf_counter()
+    regions = propose_regions(img_bgr, max_candidates=config.DETECT_MAX_CANDIDATES)
+    proposal_ms = (time.perf_counter() - t_start) * 1000.0
+
+    # --- Bước 2: Phân loại toàn bộ vùng trong một batch ---
+    detections = []
+    classification_ms = 0.0
+    if regions:
+        t_start = time.perf_counter()
+        try:
+            batch = crop_regions_batch(img_bgr, regions, config.IMG_HEIGHT, config.IMG_WIDTH)
+            predictions_prob = predict.model.predict(batch, batch_size=len(regions), verbose=0)
+        except Exception as e:
+            logger.error(f"Error during batch classification for {file.filename}: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Error during model prediction: {e}")
+        classification_ms = (time.perf_counter() - t_start) * 1000.0
+
+        for region, probs in zip(regions, predictions_prob):
+            if float(np.max(probs)) < min_confidence:
+                continue # Nhiều khả năng là nền, không phải biển báo
+            x, y, w, h = region['box']
+            detections.append({
+                "box": {"x": int(x), "y": int(y), "width": int(w), "height": int(h)},
+                "color": region['color'],
+                "top_predictions": predict.format_top_predictions(probs, top_n, source_name=file.filename)
+            })
+
+    logger.info(f"Detection for {file.filename}: {len(regions)} candidates, {len(detections)} kept "
+                f"(proposal {proposal_ms:.1f} ms, classification {classification_ms:.1f} ms)")
+    return JSONResponse(content={
+        "image_size": {"width": int(img_bgr.shape[1]), "height": int(img_bgr.shape[0])},
+        "num_candidates": len(regions),
+        "detections": detections,
+        "timings_ms": {
+            "proposal": round(proposal_ms, 3),
+            "classification": round(classification_ms, 3)
+        }
+    })
@@ -0,0 +1,211 @@
+# api/routes/explain.py
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+
+import config
+from api.routes import predict # Dùng chung model và cache ảnh đã tiền xử lý
+from utils.gradcam import build_gradcam_model, compute_gradcam_batch, render_overlay_png
+
+logger = logging.getLogger("api.explain")
+
+router = APIRouter()
+
+# Tính gradient ngoài event loop (một worker: mỗi lần chỉ một batch chiếm CPU/GPU)
+_gradcam_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gradcam")
+
+_state_lock = threading.Lock()
+_gradcam_model = None
+_gradcam_model_source = None # Model gốc mà _gradcam_model được tạo từ đó
+
+_png_cache_lock = threading.Lock()
+_png_cache = OrderedDict() # (model_version, image_hash, class_id) -> PNG bytes
+
+_counters_lock = threading.Lock() # Endpoint và batcher cập nhật bộ đếm từ nhiều thread / task
+EXPLAIN_COUNTERS = {"memory_hits": 0, "disk_hits": 0, "computed": 0, "batches": 0}
+
+
+def _count(name: str, amount: int = 1):
+    with _counters_lock:
+        EXPLAIN_COUNTERS[name] += amount
+
+
+def get_model_version() -> str:
+    """Phiên bản model dựa trên mtime + kích thước file model; đổi model -> cache cũ tự hết hiệu lực."""
+    try:
+        st = os.stat(predict.MODEL_PATH)
+        return f"{int(st.st_mtime)}-{st.st_size}"
+    except OSError: # Model không được tải từ file (ví dụ khi test)
+        return f"mem-{id(predict.model):x}"
+
+
+def _get_gradcam_model():
+    global _gradcam_model, _gradcam_model_source
+    with _state_lock:
+        if predict.model is not None and _gradcam_model_source is not predict.model:
+            _gradcam_model = build_gradcam_model(predict.model, config.EXPLAIN_LAYER_NAME)
+            _gradcam_model_source = predict.model
+        return _gradcam_model
+
+
+def _cache_key_name(image_hash: str, class_id: Optional[int]) -> str:
+    return f"{image_hash}_{'top' if class_id is None else class_id}.png"
+
+
+def _disk_cache_path(model_version: str, image_hash: str, class_id: Optional[int]) -> str:
+    return os.path.join(config.EXPLAIN_CACHE_DIR, model_version, _cache_key_name(image_hash, class_id))
+
+
+def _memory_cache_get(key):
+    with _png_cache_lock:
+        png = _png_cache.get(key)
+        if png is not None:
+            _png_cache.move_to_end(key)
+        return png
+
+
+def _memory_cache_put(key, png: bytes):
+    with _png_cache_lock:
+        _png_cache[key] = png
+        _png_cache.move_to_end(key)
+        while len(_png_cache) > config.EXPLAIN_PNG_CACHE_ITEMS:
+            _png_cache.popitem(last=False)
+
+
+def _write_disk_cache(path: str, png: bytes):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, path) # Ghi nguyên tử: request khác không bao giờ đọc file dở
+    except OSError as e:
+        logger.warning(f"Could not write Grad-CAM cache file {path}: {e}")
+
+
+def _run_gradcam_batch(jobs):
+    """Chạy trong executor: một lần GradientTape cho toàn bộ job, trả về list PNG bytes theo thứ tự."""
+    gradcam_model = _get_gradcam_model()
+    if gradcam_model is None:
+        raise RuntimeError(f"Layer '{config.EXPLAIN_LAYER_NAME}' not found in model.")
+    images = np.stack([job["image"] for job in jobs])
+    heatmaps, _, _ = compute_gradcam_batch(gradcam_model, images, [job["class_id"] for job in jobs])
+    return [render_overlay_png(job["image"], heatmap, size=config.EXPLAIN_OVERLAY_SIZE)
+            for job, heatmap in zip(jobs, heatmaps)]
+
+
+class _GradCamBatcher:
+    """
+    Gom các request /explain đến gần nhau (trong EXPLAIN_BATCH_WINDOW_MS) thành một batch.
+    Các request trùng khóa trong cùng batch dùng chung một future.
+    """
+    def __init__(self):
+        self._pending = OrderedDict() # key -> {"image", "class_id", "future"}
+        self._flush_handle = None
+
+    async def submit(self, key, image: np.ndarray, class_id: Optional[int]) -> bytes:
+        loop = asyncio.get_running_loop()
+        job = self._pending.get(key)
+        if job is None:
+            job = {"image": image, "class_id": class_id, "future": loop.create_future()}
+            self._pending[key] = job
+            if len(self._pending) >= config.EXPLAIN_MAX_BATCH:
+                self._flush_now(loop)
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(config.EXPLAIN_BATCH_WINDOW_MS / 1000.0, self._flush_now, loop)
+        return await asyncio.shield(job["future"])
+
+    def _flush_now(self, loop):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch = list(self._pending.values())
+        self._pending = OrderedDict()
+        loop.create_task(self._run(loop, batch))
+
+    async def _run(self, loop, batch):
+        t_start = time.perf_counter()
+        try:
+            pngs = await loop.run_in_executor(_gradcam_executor, _run_gradcam_batch, batch)
+        except Exception as e:
+            logger.error(f"Error during Grad-CAM batch of {len(batch)}: {e}", exc_info=True)
+            for job in batch:
+                if not job["future"].done():
+                    job["future"].set_exception(e)
+            return
+        with _counters_lock:
+            EXPLAIN_COUNTERS["batches"] += 1
+            EXPLAIN_COUNTERS["computed"] += len(batch)
+        logger.info(f"Grad-CAM batch of {len(batch)} computed in {(time.perf_counter() - t_start) * 1000.0:.1f} ms")
+        for job, png in zip(batch, pngs):
+            if not job["future"].done():
+                job["future"].set_result(png)
+
+
+_batcher = _GradCamBatcher()
+
+
+# --- Endpoint Grad-CAM theo hash ảnh (trả về từ /predict) ---
+@router.get("/explain/{image_hash}")
+async def explain_image(image_hash: str, class_id: Optional[int] = None):
+    """
+    Trả về PNG overlay Grad-CAM (layer conv3) cho ảnh đã gửi qua /predict.
+    Chỉ tính khi được yêu cầu; kết quả được cache trong RAM và trên đĩa theo (phiên bản model, hash, lớp).
+    """
+    if predict.model is None:
+        raise HTTPException(status_code=503, detail="Model is not loaded. Cannot process predictions.")
+    if class_id is not None and not 0 <= class_id < config.NUM_CLASSES:
+        raise HTTPException(status_code=400, detail=f"class_id must be between 0 and {config.NUM_CLASSES - 1}.")
+    if len(image_hash) != 64 or any(c not in "0123456789abcdef" for c in image_hash):
+        raise HTTPException(status_code=400, detail="image_hash must be a lowercase SHA-256 hex digest.")
+
+    model_version = get_model_version()
+    key = (model_version, image_hash, class_id)
+    headers = {"X-Model-Version": model_version}
+
+    png = _memory_cache_get(key)
+    if png is not None:
+        _count("memory_hits")
+        return Response(content=png, media_type="image/png", headers={**headers, "X-Explain-Cache": "memory"})
+
+    disk_path = _disk_cache_path(model_version, image_hash, class_id)
+    if os.path.exists(disk_path):
+        try:
+            with open(disk_path, 'rb') as f:
+                png = f.read()
+            _memory_cache_put(key, png)
+            _count("disk_hits")
+            return Response(content=png, media_type="image/png", headers={**headers, "X-Explain-Cache": "disk"})
+        except OSError as e:
+            logger.warning(f"Could not read Grad-CAM cache file {disk_path}: {e}")
+
+    image = predict.get_preprocessed_image(image_hash)
+    if image is None:
+        raise HTTPException(status_code=404, detail="Unknown image hash. Submit the image to /predict first.")
+
+    try:
+        png = await _batcher.submit(key, image, class_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing Grad-CAM: {e}")
+    _memory_cache_put(key, png)
+    _write_disk_cache(disk_path, png)
+    return Response(content=png, media_type="image/png", headers={**headers, "X-Explain-Cache": "computed"})
+
+
+@router.get("/stats/explain")
+async def explain_stats():
+    """Số lần trúng cache / số ảnh đã tính Grad-CAM / số batch gradient."""
+    with _counters_lock:
+        return dict(EXPLAIN_COUNTERS)
@@ -0,0 +1,122 @@
+# api/routes/predict_paths.py
+
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+import config
+from api.routes import predict # Dùng chung model, tiền xử lý và định dạng kết quả
+from api.upload_validation import read_file_limited, UploadRejected
+
+logger = logging.getLogger("api.predict_paths")
+
+router = APIRouter()
+
+# Đọc + giải mã ảnh song song (cv2 nhả GIL khi decode)
+_decode_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="path-decode")
+
+
+class PredictPathsRequest(BaseModel):
+    paths: List[str]
+    top_n: int = 3
+
+
+def resolve_allowed_path(path: str, allowed_root: str) -> Optional[str]:
+    """
+    Trả về đường dẫn thật (đã resolve symlink) nếu nó là đường dẫn tuyệt đối
+    nằm dưới allowed_root, ngược lại trả về None.
+    """
+    if not path or not os.path.isabs(path):
+        return None
+    real_root = os.path.realpath(allowed_root)
+    real_path = os.path.realpath(path)
+    try:
+        if os.path.commonpath([real_root, real_path]) != real_root:
+            return None
+    except ValueError: # Khác ổ đĩa trên Windows
+        return None
+    return real_path
+
+
+def _load_preprocessed(real_path: str):
+    """Đọc file từ đĩa và tiền xử lý giống /predict. Trả về (ảnh, lỗi)."""
+    try:
+        contents = read_file_limited(real_path) # Kiểm tra kích thước + header trước khi đọc hết
+    except UploadRejected as rejected:
+        return None, rejected.detail
+    except OSError as e:
+        return None, f"Cannot read file: {e.strerror or e}"
+    if not contents:
+        return None, "File is empty."
+    image = predict.preprocess_single_image(contents, config.IMG_HEIGHT, config.IMG_WIDTH)
+    if image is None:
+        return None, "Could not preprocess image. Check image format or content."
+    return image[0], None
+
+
+# --- Endpoint dự đoán theo danh sách đường dẫn trên máy chủ ---
+@router.post("/predict_paths", response_class=JSONResponse)
+def predict_paths(request: PredictPathsRequest):
+    """
+    Nhận danh sách đường dẫn tuyệt đối (nằm dưới thư mục được cho phép),
+    server tự đọc, giải mã và phân loại theo batch — không cần upload bytes.
+    Kết quả trả về theo đúng thứ tự đầu vào; mỗi phần tử có 'top_predictions' hoặc 'error'.
+    """
+    allowed_root = config.PREDICT_PATHS_ALLOWED_ROOT
+    if not allowed_root:
+        raise HTTPException(status_code=403, detail="Path-based prediction is disabled on this server.")
+    if predict.model is None:
+        logger.critical("Model is not loaded. API cannot process predictions.")
+        raise HTTPException(status_code=503, detail="Model is not loaded. Cannot process predictions.")
+    if not request.paths:
+        raise HTTPException(status_code=400, detail="No paths provided.")
+    if len(request.paths) > config.PREDICT_PATHS_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Too many paths (max {config.PREDICT_PATHS_MAX_FILES}).")
+
+    t_start = time.perf_counter()
+    results = [{"path": p} for p in request.paths]
+
+    # --- Kiểm tra allowlist ---
+    resolved = []
+    for idx, path in enumerate(request.paths):
+        real_path = resolve_allowed_path(path, allowed_root)
+        if real_path is None:
+            results[idx]["error"] = "Path is not absolute or is outside the allowed root."
+        else:
+            resolved.append((idx, real_path))
+
+    # --- Đọc, giải mã và phân loại theo batch ---
+    batch_size = max(1, config.INFERENCE_BATCH_SIZE)
+    num_classified = 0
+    for start in range(0, len(resolved), batch_size):
+        chunk = resolved[start:start + batch_size]
+        loaded = list(_decode_executor.map(lambda item: _load_preprocessed(item[1]), chunk))
+
+        batch_indices, batch_images = [], []
+        for (idx, _), (image, error) in zip(chunk, loaded):
+            if error:
+                results[idx]["error"] = error
+            else:
+                batch_indices.append(idx); batch_images.append(image)
+        if not batch_images:
+            continue
+
+        try:
+            predictions_prob = predict.model.predict(np.stack(batch_images), batch_size=len(batch_images), verbose=0)
+        except Exception as e:
+            logger.error(f"Error during batch prediction: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Error during model prediction: {e}")
+        for idx, probs in zip(batch_indices, predictions_prob):
+            results[idx]["top_predictions"] = predict.format_top_predictions(probs, request.top_n, source_name=request.paths[idx])
+        num_classified += len(batch_images)
+
+    elapsed_ms = (time.perf_counter() - t_start) * 1000.0
+    logger.info(f"Path-based prediction: {num_classified}/{len(request.paths)} images classified in {elapsed_ms:.1f} ms")
+    return JSONResponse(content={"results": results, "elapsed_ms": round(elapsed_ms, 3)})
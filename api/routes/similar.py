@@ -0,0 +1,122 @@
+# api/routes/similar.py
+
+import os
+import time
+import logging
+import threading
+from typing import Optional
+
+import numpy as np
+import cv2
+from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, Response
+
+import config
+from api.routes import predict # Dùng chung model, tiền xử lý và CLASS_NAMES
+from api.upload_validation import read_upload_limited
+from utils.embedding_index import EmbeddingIndex
+from utils.model_utils import build_feature_extractor
+
+logger = logging.getLogger("api.similar")
+
+router = APIRouter()
+
+# --- Chỉ mục và feature extractor được tải lười (lần gọi đầu tiên) ---
+_state_lock = threading.Lock()
+_index: Optional[EmbeddingIndex] = None
+_extractor = None
+
+
+def get_embedding_index() -> Optional[EmbeddingIndex]:
+    """Mở chỉ mục memory-mapped nếu file đã được tạo bởi training/build_embedding_index.py."""
+    global _index
+    with _state_lock:
+        if _index is None and os.path.exists(config.EMBEDDING_MATRIX_PATH) and os.path.exists(config.EMBEDDING_METADATA_PATH):
+            try:
+                _index = EmbeddingIndex(config.EMBEDDING_MATRIX_PATH, config.EMBEDDING_METADATA_PATH,
+                                        config.EMBEDDING_IMAGES_PATH)
+                logger.info(f"Embedding index loaded: {len(_index)} rows, {_index.dimension} dims")
+            except Exception as e:
+                logger.error(f"Failed to open embedding index: {e}", exc_info=True)
+        return _index
+
+
+def get_feature_extractor():
+    """Model con trả về activation của EMBEDDING_LAYER_NAME, dùng chung trọng số với predict.model."""
+    global _extractor
+    with _state_lock:
+        if _extractor is None and predict.model is not None:
+            _extractor = build_feature_extractor(predict.model, config.EMBEDDING_LAYER_NAME)
+        return _extractor
+
+
+# --- Endpoint tìm ảnh train gần nhất ---
+@router.post("/similar", response_class=JSONResponse)
+async def similar_training_images(file: UploadFile = File(...), k: int = 5, class_id: Optional[int] = None):
+    """
+    Trả về k ảnh train gần nhất (cosine similarity trên embedding 'dense1') với ảnh upload.
+    Truyền `class_id` để chỉ tìm trong một lớp (ví dụ lớp mà người vận hành cho là đúng).
+    """
+    if predict.model is None:
+        raise HTTPException(status_code=503, detail="Model is not loaded. Cannot process predictions.")
+    index = get_embedding_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Embedding index is not available. Run training/build_embedding_index.py first.")
+    if not 1 <= k <= config.SIMILAR_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {config.SIMILAR_MAX_K}.")
+    if class_id is not None and not 0 <= class_id < config.NUM_CLASSES:
+        raise HTTPException(status_code=400, detail=f"class_id must be between 0 and {config.NUM_CLASSES - 1}.")
+
+    contents = await read_upload_limited(file)
+    if not contents:
+        raise HTTPException(status_code=400, detail="No image file uploaded or file is empty.")
+    processed_image = predict.preprocess_single_image(contents, config.IMG_HEIGHT, config.IMG_WIDTH)
+    if processed_image is None:
+        raise HTTPException(status_code=400, detail="Could not preprocess image. Check image format or content.")
+
+    extractor = get_feature_extractor()
+    if extractor is None:
+        raise HTTPException(status_code=500, detail=f"Layer '{config.EMBEDDING_LAYER_NAME}' not found in model.")
+
+    t_start = time.perf_counter()
+    try:
+        query = np.asarray(extractor(processed_image, training=False))[0]
+    except Exception as e:
+        logger.error(f"Error extracting embedding for {file.filename}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Error during feature extraction: {e}")
+    embed_ms = (time.perf_counter() - t_start) * 1000.0
+
+    t_start = time.perf_counter()
+    try:
+        neighbours = index.search(query, k=k, class_id=class_id, chunk_rows=config.EMBEDDING_SEARCH_CHUNK_ROWS)
+    except ValueError as e: # Chỉ mục được tạo từ model/layer khác
+        raise HTTPException(status_code=409, detail=str(e))
+    search_ms = (time.perf_counter() - t_start) * 1000.0
+
+    for item in neighbours:
+        item["class_name"] = predict.CLASS_NAMES.get(item["class_id"], f"Unknown Class {item['class_id']}")
+        if index.images is not None:
+            item["image_url"] = f"/similar/images/{item['row']}"
+
+    logger.info(f"Similarity search for {file.filename}: k={k}, class_id={class_id} "
+                f"(embedding {embed_ms:.1f} ms, search {search_ms:.1f} ms)")
+    return JSONResponse(content={
+        "neighbours": neighbours,
+        "timings_ms": {"embedding": round(embed_ms, 3), "search": round(search_ms, 3)}
+    })
+
+
+# --- Trả ảnh train (PNG) theo số hàng trong chỉ mục ---
+@router.get("/similar/images/{row}")
+def similar_training_image(row: int):
+    """Trả ảnh train đã lưu kèm chỉ mục (nếu build với ảnh) dưới dạng PNG."""
+    index = get_embedding_index()
+    if index is None or index.images is None:
+        raise HTTPException(status_code=404, detail="Training images are not stored with the embedding index.")
+    if not 0 <= row < index.images.shape[0]:
+        raise HTTPException(status_code=404, detail="Row out of range.")
+    img_bgr = cv2.cvtColor(np.asarray(index.images[row]), cv2.COLOR_RGB2BGR)
+    ok, encoded = cv2.imencode('.png', img_bgr)
+    if not ok:
+        raise HTTPException(status_code=500, detail="Could not encode image.")
+    return Response(content=encoded.tobytes(), media_type="image/png")
@@ -0,0 +1,53 @@
+# api/routes/stats.py
+
+import logging
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+
+import config
+from database import database_manager
+
+logger = logging.getLogger("api.stats")
+
+router = APIRouter()
+
+
+def _check_range(date_from: Optional[date], date_to: Optional[date]):
+    if date_from is not None and date_to is not None and date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to.")
+
+
+# --- Thống kê lịch sử nhận diện (đọc bảng tổng hợp, không quét bảng history) ---
+# Hàm đồng bộ: FastAPI chạy trong threadpool, mỗi thread dùng kết nối SQLite riêng (connection_manager).
+@router.get("/stats/history/classes")
+def history_class_stats(date_from: Optional[date] = None, date_to: Optional[date] = None):
+    """Số lần nhận diện và độ tin cậy trung bình của từng lớp, trong khoảng ngày [date_from, date_to] nếu có."""
+    _check_range(date_from, date_to)
+    classes = database_manager.get_class_stats(date_from, date_to)
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "total": sum(item["count"] for item in classes),
+        "summary_tables": database_manager.history_stats_ready(),
+        "classes": classes,
+    }
+
+
+@router.get("/stats/history/daily")
+def history_daily_stats(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                        class_id: Optional[int] = None):
+    """Số lần nhận diện theo ngày (của một lớp nếu có class_id), ví dụ số biển 'Dừng lại' mỗi ngày trong tuần."""
+    _check_range(date_from, date_to)
+    if class_id is not None and not 0 <= class_id < config.NUM_CLASSES:
+        raise HTTPException(status_code=400, detail=f"class_id must be between 0 and {config.NUM_CLASSES - 1}.")
+    days = database_manager.get_daily_stats(date_from, date_to, class_id)
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "class_id": class_id,
+        "total": sum(item["count"] for item in days),
+        "summary_tables": database_manager.history_stats_ready(),
+        "days": days,
+    }
@@ -0,0 +1,144 @@
+# api/upload_validation.py
+
+import logging
+import threading
+from typing import Dict, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+import config
+from utils.image_header import read_image_header, HEADER_PROBE_BYTES
+
+logger = logging.getLogger("api.upload_validation")
+
+UPLOAD_READ_CHUNK_BYTES = 64 * 1024
+
+# --- Bộ đếm kết quả kiểm tra upload (đọc qua /stats/uploads) ---
+_counters_lock = threading.Lock()
+UPLOAD_COUNTERS: Dict[str, int] = {
+    "accepted": 0,
+    "rejected_too_large": 0,
+    "rejected_unsupported_format": 0,
+    "rejected_bad_header": 0,
+    "rejected_dimensions": 0,
+}
+
+
+def _count(key: str):
+    with _counters_lock:
+        UPLOAD_COUNTERS[key] = UPLOAD_COUNTERS.get(key, 0) + 1
+
+
+def get_upload_counters() -> Dict[str, int]:
+    """Trả về bản sao các bộ đếm (an toàn khi gọi từ nhiều thread)."""
+    with _counters_lock:
+        return dict(UPLOAD_COUNTERS)
+
+
+class UploadRejected(Exception):
+    """Ảnh bị từ chối trước khi giải mã (quá lớn, sai định dạng, kích thước vượt giới hạn)."""
+    def __init__(self, status_code: int, detail: str, counter_key: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.counter_key = counter_key
+
+
+def check_image_header(header: bytes, complete: bool) -> Tuple[str, Tuple[int, int]]:
+    """
+    Kiểm tra định dạng và số pixel chỉ từ header.
+
+    Args:
+        header (bytes): Phần đầu của file (hoặc toàn bộ file).
+        complete (bool): True nếu `header` đã là toàn bộ file (không còn dữ liệu để đọc thêm).
+
+    Returns:
+        (format, (width, height)) nếu hợp lệ. Trả về (format, None) nếu header
+        chưa đủ dữ liệu và vẫn còn có thể đọc thêm.
+
+    Raises:
+        UploadRejected: nếu định dạng không hỗ trợ, header hỏng hoặc vượt giới hạn.
+    """
+    fmt, size = read_image_header(header)
+    if fmt is None or fmt not in config.ALLOWED_UPLOAD_FORMATS:
+        raise UploadRejected(415, "Unsupported image format.", "rejected_unsupported_format")
+    if size is None:
+        if complete or len(header) >= config.MAX_HEADER_PROBE_BYTES:
+            raise UploadRejected(400, "Could not read image dimensions from header.", "rejected_bad_header")
+        return fmt, None
+    width, height = size
+    if width <= 0 or height <= 0:
+        raise UploadRejected(400, "Invalid image dimensions in header.", "rejected_bad_header")
+    if width > config.MAX_IMAGE_SIDE or height > config.MAX_IMAGE_SIDE or width * height > config.MAX_IMAGE_PIXELS:
+        raise UploadRejected(413, f"Image dimensions {width}x{height} exceed the allowed limit "
+                                  f"({config.MAX_IMAGE_PIXELS} pixels, max side {config.MAX_IMAGE_SIDE}).",
+                             "rejected_dimensions")
+    return fmt, size
+
+
+async def read_upload_limited(file: UploadFile, max_bytes: int = None) -> bytes:
+    """
+    Đọc upload theo từng chunk với giới hạn số byte, kiểm tra header ngay khi
+    có đủ dữ liệu và từ chối trước khi đọc hết / giải mã ảnh.
+
+    Raises:
+        HTTPException: 413 (quá lớn / quá nhiều pixel), 415 (sai định dạng), 400 (header hỏng).
+    """
+    max_bytes = max_bytes or config.MAX_UPLOAD_BYTES
+    try:
+        # Starlette đã biết kích thước file sau khi parse multipart -> từ chối ngay, không đọc
+        if file.size is not None and file.size > max_bytes:
+            raise UploadRejected(413, f"Uploaded file exceeds {max_bytes} bytes.", "rejected_too_large")
+
+        chunks = []
+        total = 0
+        header_checked = False
+        while True:
+            chunk = await file.read(UPLOAD_READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            total += len(chunk)
+            if total > max_bytes:
+                raise UploadRejected(413, f"Uploaded file exceeds {max_bytes} bytes.", "rejected_too_large")
+            chunks.append(chunk)
+            if not header_checked and total >= min(HEADER_PROBE_BYTES, UPLOAD_READ_CHUNK_BYTES):
+                _, size = check_image_header(b"".join(chunks), complete=False)
+                header_checked = size is not None
+
+        contents = b"".join(chunks)
+        if contents and not header_checked:
+            check_image_header(contents, complete=True)
+    except UploadRejected as rejected:
+        _count(rejected.counter_key)
+        logger.warning(f"Rejected upload '{file.filename}': {rejected.detail}")
+        raise HTTPException(status_code=rejected.status_code, detail=rejected.detail)
+
+    if contents:
+        _count("accepted")
+    return contents
+
+
+def read_file_limited(path: str, max_bytes: int = None) -> bytes:
+    """
+    Phiên bản đồng bộ cho file trên đĩa (dùng bởi /predict_paths):
+    kiểm tra kích thước file và header trước khi đọc toàn bộ.
+
+    Raises:
+        UploadRejected, OSError
+    """
+    max_bytes = max_bytes or config.MAX_UPLOAD_BYTES
+    try:
+        with open(path, 'rb') as f:
+            size_on_disk = f.seek(0, 2); f.seek(0)
+            if size_on_disk > max_bytes:
+                raise UploadRejected(413, f"File exceeds {max_bytes} bytes.", "rejected_too_large")
+            header = f.read(config.MAX_HEADER_PROBE_BYTES)
+            if header:
+                check_image_header(header, complete=True)
+            contents = header + f.read()
+    except UploadRejected as rejected:
+        _count(rejected.counter_key)
+        raise
+    if contents:
+        _count("accepted")
+    return contents
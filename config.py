@@ -48,6 +48,83 @@ LR_PATIENCE = 7
 LR_REDUCTION_FACTOR = 0.2
 MIN_LR = 1e-6
 
+# --- Cấu hình Phát hiện Biển báo trong ảnh cảnh (API /detect) ---
+DETECT_MAX_CANDIDATES = 32      # Số vùng ứng viên tối đa được phân loại mỗi request
+DETECT_MIN_CONFIDENCE = 0.5     # Bỏ các vùng có độ tin cậy Top 1 thấp hơn ngưỡng này
+
+# --- Cấu hình Dự đoán theo Đường dẫn (API /predict_paths) ---
+# Chỉ các file nằm dưới thư mục này mới được server đọc trực tiếp (client cùng máy / ổ đĩa chung).
+# Để None để tắt endpoint.
+PREDICT_PATHS_ALLOWED_ROOT = None
+PREDICT_PATHS_MAX_FILES = 256   # Số đường dẫn tối đa trong một request
+INFERENCE_BATCH_SIZE = 64       # Kích thước batch khi phân loại nhiều ảnh cùng lúc
+
+# --- Giới hạn Upload Ảnh (kiểm tra trước khi giải mã) ---
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024       # 10 MB
+MAX_IMAGE_PIXELS = 40_000_000             # ~40 megapixel
+MAX_IMAGE_SIDE = 10000                    # Cạnh dài nhất (pixel)
+MAX_HEADER_PROBE_BYTES = 256 * 1024       # Đọc tối đa bấy nhiêu byte để tìm kích thước trong header
+ALLOWED_UPLOAD_FORMATS = ('png', 'jpeg', 'bmp', 'pnm', 'webp')
+
+# --- Chỉ mục Embedding tập Train (API /similar, tạo bởi training/build_embedding_index.py) ---
+EMBEDDING_INDEX_DIR = os.path.join(MODELS_DIR, 'embedding_index')
+EMBEDDING_MATRIX_PATH = os.path.join(EMBEDDING_INDEX_DIR, 'train_embeddings_f16.npy')   # (N, 512) float16, đã chuẩn hóa L2
+EMBEDDING_METADATA_PATH = os.path.join(EMBEDDING_INDEX_DIR, 'train_embeddings_meta.npz') # labels, source_indices, class_offsets
+EMBEDDING_IMAGES_PATH = os.path.join(EMBEDDING_INDEX_DIR, 'train_images_u8.npy')        # Ảnh train uint8 (tùy chọn)
+EMBEDDING_LAYER_NAME = 'dense1'
+EMBEDDING_SEARCH_CHUNK_ROWS = 32768   # Số hàng nhân vô hướng mỗi lần khi tìm kiếm
+SIMILAR_MAX_K = 50
+
+# --- Giải thích Grad-CAM (API /explain, chỉ tính khi được yêu cầu) ---
+EXPLAIN_LAYER_NAME = 'conv3'
+EXPLAIN_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'gradcam')   # PNG overlay theo <model_version>/<image_hash>
+EXPLAIN_IMAGE_CACHE_ITEMS = 512    # Số ảnh đã tiền xử lý giữ lại sau /predict (LRU)
+EXPLAIN_PNG_CACHE_ITEMS = 256      # Số PNG overlay giữ trong RAM (LRU)
+EXPLAIN_BATCH_WINDOW_MS = 15       # Thời gian gom các request đồng thời vào một lần tính gradient
+EXPLAIN_MAX_BATCH = 32
+EXPLAIN_OVERLAY_SIZE = 96          # Cạnh PNG overlay (pixel)
+
+# --- Cache Thumbnail cho GUI (khóa theo đường dẫn + mtime + kích thước file) ---
+THUMBNAIL_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'thumbnails')
+THUMBNAIL_CACHE_MAX_MB = 256       # Dọn file cũ nhất khi thư mục cache vượt ngưỡng
+THUMBNAIL_WORKERS = 2              # Số thread tạo thumbnail
+HISTORY_THUMBNAIL_SIZE = 40        # Cạnh thumbnail trong bảng lịch sử (pixel)
+
+# --- Ảnh mẫu các lớp (tải sẵn khi khởi động GUI, scale sẵn theo kích thước hiển thị) ---
+CLASS_IMAGE_DISPLAY_SIZES = (180,)  # Cạnh ô ảnh mẫu trong ResultWindow
+CLASS_ATLAS_DIR = os.path.join(BASE_DIR, 'cache', 'class_atlas')  # Atlas PNG + chỉ mục JSON theo từng kích thước
+
+# --- Hàng đợi nhận diện offline (API không kết nối được: lưu lại trong SQLite, gửi lại khi API hoạt động) ---
+OFFLINE_PROBE_INITIAL_SECONDS = 2.0  # Khoảng chờ đầu tiên giữa các lần gọi /health
+OFFLINE_PROBE_MAX_SECONDS = 60.0     # Khoảng chờ tối đa (backoff nhân đôi mỗi lần thất bại)
+OFFLINE_REPLAY_BATCH_SIZE = 32       # Số ảnh gửi lại mỗi lượt (một transaction ghi lịch sử)
+OFFLINE_MAX_ATTEMPTS = 5             # Ảnh lỗi (không phải lỗi kết nối) quá số lần này thì không gửi lại nữa
+
+# --- SQLite (kết nối giữ mở theo từng thread, chế độ WAL, xem database/connection_manager.py) ---
+SQLITE_SYNCHRONOUS = "NORMAL"              # NORMAL an toàn với WAL, nhanh hơn FULL khi ghi nhiều
+SQLITE_CACHE_SIZE_KB = 16384               # Page cache mỗi kết nối (KiB)
+SQLITE_MMAP_SIZE_BYTES = 128 * 1024 * 1024 # Đọc database qua memory-mapped I/O
+SQLITE_BUSY_TIMEOUT_MS = 5000              # Chờ khóa ghi thay vì báo lỗi 'database is locked' ngay
+
+# --- Ghi lịch sử theo lô ở thread nền (database/history_writer.py) ---
+HISTORY_WRITER_FLUSH_ROWS = 256            # Ghi ngay khi lô đủ số dòng này
+HISTORY_WRITER_FLUSH_INTERVAL_MS = 250     # ... hoặc sau khoảng này kể từ dòng đầu tiên của lô
+HISTORY_WRITER_MAX_QUEUE = 10000           # Hàng đợi đầy thì bỏ bản ghi mới (đếm trong stats()['dropped'])
+
+# --- Migration schema (database/migrations.py): điền cột timestamp_ms cho database cũ ở thread nền ---
+HISTORY_BACKFILL_BATCH_ROWS = 5000         # Số dòng mỗi transaction khi điền timestamp_ms
+HISTORY_BACKFILL_PAUSE_MS = 20             # Nghỉ giữa hai lô để các thread khác ghi được
+
+# --- Xuất lịch sử ra CSV / Parquet (database/data_exporter.py, đọc theo từng khối, bộ nhớ không đổi) ---
+EXPORT_CHUNK_ROWS = 20000                  # Số dòng mỗi lần fetchmany (= một row group khi ghi Parquet)
+
+# --- Xóa hàng loạt và lưu giữ lịch sử (database/retention.py) ---
+HISTORY_DELETE_CHUNK_ROWS = 5000           # Số dòng mỗi transaction khi xóa nhiều dòng / chuyển sang archive
+HISTORY_RETENTION_DAYS = 0                 # Chuyển dòng cũ hơn số ngày này sang file archive (0 = giữ tất cả)
+HISTORY_ARCHIVE_PATH = os.path.join(DATABASE_DIR, 'history_archive.db')
+HISTORY_RETENTION_START_DELAY_MS = 30000   # Chạy chính sách lưu giữ ở thread nền sau khi mở cửa sổ chính
+HISTORY_VACUUM_STEP_PAGES = 1000           # Số trang trống trả lại hệ điều hành mỗi bước incremental vacuum
+
 # --- Đảm bảo thư mục Models và Database tồn tại ---
 os.makedirs(MODELS_DIR, exist_ok=True)
 os.makedirs(DATABASE_DIR, exist_ok=True) # <<< Thêm dòng này cho chắc chắn >>>
@@ -0,0 +1,161 @@
+# database/benchmark_database.py
+"""
+So sánh thông lượng ghi/đọc lịch sử giữa cách cũ (mở kết nối mới cho mỗi câu lệnh, rollback journal)
+và kết nối giữ mở theo thread + WAL (connection_manager). Chạy trên database tạm, không đụng history.db:
+
+    python -m database.benchmark_database --rows 20000 --ops 500 --seconds 3
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+# --- Thêm thư mục gốc vào sys.path ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database import database_manager
+from database.connection_manager import get_connection_manager
+from database.migrations import migrate
+
+HISTORY_SCHEMA = """CREATE TABLE history (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        timestamp TEXT NOT NULL,
+                        image_path TEXT NOT NULL,
+                        predicted_class_id INTEGER NOT NULL,
+                        predicted_class_name TEXT NOT NULL,
+                        confidence REAL NOT NULL
+                    )"""
+INSERT_SQL = ''' INSERT INTO history(timestamp, image_path, predicted_class_id, predicted_class_name, confidence)
+                 VALUES(?,?,?,?,?) '''
+
+
+def create_benchmark_db(db_path, rows, upgrade=True):
+    """
+    Tạo database tạm với bảng history và rows bản ghi giả (rollback journal mặc định).
+    upgrade=True: chạy hết migrations (cột timestamp_ms, index, FTS) như database của ứng dụng.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute(HISTORY_SCHEMA)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    conn.executemany(INSERT_SQL, ((now, f"/data/images/{i:06d}.png", i % 43, f"Class {i % 43}", random.random())
+                                  for i in range(rows)))
+    conn.commit()
+    if upgrade:
+        migrate(conn)
+    conn.close()
+
+
+# --- Cách cũ: connect/close cho mỗi thao tác (giống database_manager trước khi có connection_manager) ---
+def legacy_add(db_path, image_path, class_id, class_name, confidence):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(database_manager.HISTORY_INSERT_SQL,
+                     (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), image_path, class_id, class_name, confidence))
+        conn.commit()
+        return True
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+
+def legacy_page(db_path, class_id):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return conn.execute(f"SELECT {database_manager.HISTORY_PAGE_COLUMNS} FROM history WHERE predicted_class_id = ? "
+                            "ORDER BY id DESC LIMIT 200", (class_id,)).fetchall()
+    finally:
+        conn.close()
+
+
+# --- Cách mới: các hàm của database_manager (kết nối theo thread, WAL) ---
+def pooled_add(db_path, image_path, class_id, class_name, confidence):
+    return database_manager.add_prediction_to_history(image_path, class_id, class_name, confidence)
+
+def pooled_page(db_path, class_id):
+    return database_manager.fetch_history_page(limit=200, filters={"class_id": class_id})
+
+
+def run_sequential(add_fn, page_fn, db_path, ops):
+    t_start = time.perf_counter()
+    for i in range(ops):
+        add_fn(db_path, f"/bench/{i}.png", i % 43, f"Class {i % 43}", 0.5)
+    insert_rate = ops / (time.perf_counter() - t_start)
+    t_start = time.perf_counter()
+    for i in range(ops):
+        page_fn(db_path, i % 43)
+    query_rate = ops / (time.perf_counter() - t_start)
+    return insert_rate, query_rate
+
+def run_concurrent(add_fn, page_fn, db_path, seconds, readers=2):
+    """Một thread ghi liên tục và `readers` thread đọc cùng lúc trong `seconds` giây."""
+    stop = threading.Event()
+    counts = {"insert": 0, "query": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            ok = add_fn(db_path, f"/bench/concurrent_{i}.png", i % 43, f"Class {i % 43}", 0.5)
+            with lock: counts["insert" if ok else "errors"] += 1
+            i += 1
+
+    def reader(seed):
+        rng = random.Random(seed)
+        while not stop.is_set():
+            try:
+                page_fn(db_path, rng.randrange(43))
+                with lock: counts["query"] += 1
+            except sqlite3.Error:
+                with lock: counts["errors"] += 1
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    for thread in threads: thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads: thread.join()
+    return counts["insert"] / seconds, counts["query"] / seconds, counts["errors"]
+
+
+def main(rows, ops, seconds):
+    print("--- Benchmarking History Database Access ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        pooled_db = os.path.join(tmp, "pooled.db")
+        print(f"\n[Step 1/3] Creating two databases with {rows} history rows...")
+        create_benchmark_db(legacy_db, rows)
+        create_benchmark_db(pooled_db, rows)
+        database_manager.DATABASE_PATH = pooled_db # Cùng schema (migrations) để chỉ so sánh cách quản lý kết nối
+
+        print(f"\n[Step 2/3] Sequential: {ops} single-row inserts, then {ops} page queries (200 rows, class filter)...")
+        results = {}
+        for label, add_fn, page_fn, db_path in (("per-call connect", legacy_add, legacy_page, legacy_db),
+                                                ("pooled + WAL", pooled_add, pooled_page, pooled_db)):
+            results[label] = run_sequential(add_fn, page_fn, db_path, ops)
+            print(f"  {label:<17}: {results[label][0]:8.0f} inserts/s  {results[label][1]:8.0f} queries/s")
+
+        print(f"\n[Step 3/3] Concurrent: 1 writer + 2 readers for {seconds:.0f}s...")
+        for label, add_fn, page_fn, db_path in (("per-call connect", legacy_add, legacy_page, legacy_db),
+                                                ("pooled + WAL", pooled_add, pooled_page, pooled_db)):
+            insert_rate, query_rate, errors = run_concurrent(add_fn, page_fn, db_path, seconds)
+            print(f"  {label:<17}: {insert_rate:8.0f} inserts/s  {query_rate:8.0f} queries/s  ({errors} errors)")
+
+        get_connection_manager(pooled_db).close_all()
+    print("\n--- Benchmark Finished ---")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark per-call SQLite connections vs pooled WAL connections.")
+    parser.add_argument("--rows", type=int, default=20000, help="History rows to seed each database with.")
+    parser.add_argument("--ops", type=int, default=500, help="Inserts and queries in the sequential run.")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Duration of the concurrent run.")
+    args = parser.parse_args()
+    main(args.rows, args.ops, args.seconds)
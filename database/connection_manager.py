@@ -0,0 +1,133 @@
+# database/connection_manager.py
+
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+
+# --- Cấu hình PRAGMA ---
+try:
+    import config
+    SQLITE_SYNCHRONOUS = config.SQLITE_SYNCHRONOUS
+    SQLITE_CACHE_SIZE_KB = config.SQLITE_CACHE_SIZE_KB
+    SQLITE_MMAP_SIZE_BYTES = config.SQLITE_MMAP_SIZE_BYTES
+    SQLITE_BUSY_TIMEOUT_MS = config.SQLITE_BUSY_TIMEOUT_MS
+except (ImportError, AttributeError):
+    SQLITE_SYNCHRONOUS = "NORMAL"
+    SQLITE_CACHE_SIZE_KB = 16384
+    SQLITE_MMAP_SIZE_BYTES = 128 * 1024 * 1024
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    print("ConnectionManager WARNING: config SQLite settings not found, using defaults.")
+
+
+class ConnectionManager:
+    """
+    Giữ một kết nối SQLite mở lâu dài cho mỗi thread (thay vì connect/close mỗi câu lệnh).
+    Kết nối mới bật WAL (đọc không chặn ghi) và các PRAGMA trong config.
+
+    Mỗi kết nối chỉ được dùng bởi thread đã tạo nó; check_same_thread=False chỉ để
+    close_all() đóng được kết nối của các thread khác khi thoát ứng dụng.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: Dict[int, Tuple[threading.Thread, sqlite3.Connection]] = {}
+        self._wal_enabled = False
+
+    def get_connection(self) -> Optional[sqlite3.Connection]:
+        """Kết nối của thread hiện tại (tạo lần đầu). None nếu file database không tồn tại hoặc lỗi kết nối."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+        if not os.path.exists(self.db_path):
+            print(f"ConnectionManager Error: Database file not found at {self.db_path}")
+            return None
+        try:
+            conn = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000.0, check_same_thread=False)
+            conn.row_factory = sqlite3.Row # Trả về kết quả dạng dictionary-like
+            self._apply_pragmas(conn)
+        except sqlite3.Error as e:
+            print(f"ConnectionManager Error connecting to database: {e}")
+            return None
+        self._local.conn = conn
+        with self._lock:
+            self._close_dead_thread_connections()
+            self._connections[threading.get_ident()] = (threading.current_thread(), conn)
+        return conn
+
+    def _apply_pragmas(self, conn: sqlite3.Connection):
+        if not self._wal_enabled: # journal_mode được lưu trong file database: chỉ cần đặt một lần
+            # Chỉ có tác dụng với file mới (chưa có bảng) và phải đặt trước WAL: trang trống sau khi xóa được
+            # trả lại bằng PRAGMA incremental_vacuum (database/retention.py). Database cũ: không đổi.
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            mode = conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if str(mode).lower() != "wal":
+                print(f"ConnectionManager WARNING: WAL not available, journal_mode={mode}.")
+            self._wal_enabled = True
+        conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}") # NORMAL an toàn với WAL (chỉ có thể mất commit cuối khi mất điện)
+        conn.execute(f"PRAGMA cache_size=-{int(SQLITE_CACHE_SIZE_KB)}") # Số âm: đơn vị KiB
+        conn.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE_BYTES)}")
+        conn.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+
+    def _close_dead_thread_connections(self):
+        """Đóng kết nối của các thread đã kết thúc (vd. thread nền chạy một lần). Gọi khi đang giữ _lock."""
+        for ident, (thread, conn) in list(self._connections.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._connections[ident]
+
+    def close_thread_connection(self):
+        """Đóng kết nối của thread hiện tại (thread nền nên gọi trước khi kết thúc nếu còn chạy lâu sau đó)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            return
+        self._local.conn = None
+        with self._lock:
+            self._connections.pop(threading.get_ident(), None)
+        conn.close()
+
+    def close_all(self):
+        """Đóng mọi kết nối (khi thoát ứng dụng). Thread nào dùng lại sẽ tự mở kết nối mới."""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for _, conn in connections:
+            try: conn.close()
+            except sqlite3.Error as e: print(f"ConnectionManager Error closing connection: {e}")
+        self._local = threading.local()
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return len(self._connections)
+
+
+def release_connection(conn: Optional[sqlite3.Connection]):
+    """
+    Thay cho conn.close() sau mỗi thao tác: kết nối được giữ lại cho lần sau, chỉ rollback
+    transaction còn dở (câu lệnh lỗi trước commit) để không giữ khóa ghi của database.
+    """
+    if conn is not None and conn.in_transaction:
+        try: conn.rollback()
+        except sqlite3.Error as e: print(f"ConnectionManager Error rolling back: {e}")
+
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+def get_connection_manager(db_path: str) -> ConnectionManager:
+    """ConnectionManager dùng chung cho mỗi file database (history.db dùng chung cho lịch sử và người dùng)."""
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = ConnectionManager(key)
+        return manager
+
+def close_all_connections():
+    """Đóng kết nối của mọi database (gọi khi thoát ứng dụng)."""
+    with _managers_lock:
+        managers = list(_managers.values())
+    for manager in managers:
+        manager.close_all()
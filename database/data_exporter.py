@@ -1,9 +1,18 @@
 # database/data_exporter.py
+"""
+Xuất lịch sử nhận diện ra CSV hoặc Parquet theo từng khối (fetchmany trên một cursor), nên bộ nhớ
+dùng không phụ thuộc số dòng. Giá trị được xuất ở dạng thô (confidence là số thực 0..1, có thêm
+predicted_class_id và timestamp_ms), không phải chuỗi phần trăm hiển thị trên GUI.
 
+    python -m database.data_exporter --format parquet --date-from 2024-03-01 --date-to 2024-03-31 --class-id 14
+"""
 import csv
 import os
 import sys
-from datetime import datetime
+import time
+import argparse
+from datetime import datetime, date
+from typing import Callable, Dict, Iterator, List, Optional
 
 # --- Thêm thư mục gốc vào sys.path ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,63 +22,186 @@ if project_root not in sys.path:
 
 # --- Import Trình quản lý Database ---
 try:
-    from database.database_manager import get_all_history, DATABASE_PATH
+    from database.database_manager import create_connection, history_fts_ready, build_history_filter_sql
+    from database.connection_manager import release_connection
+    from database.migrations import TIMESTAMP_MS_SQL
     DATABASE_AVAILABLE = True
 except ImportError as e:
     print(f"DataExporter Error: Could not import database_manager. Error: {e}")
     DATABASE_AVAILABLE = False
 
-# --- Hàm chính để xuất CSV ---
-def export_history_to_csv(output_dir='.', filename=None):
-    """
-    Xuất toàn bộ lịch sử nhận diện từ database ra file CSV.
-
-    Args:
-        output_dir (str): Thư mục để lưu file CSV.
-        filename (str, optional): Tên file CSV. Nếu None, sẽ tạo tên mặc định
-                                  kèm timestamp.
-    """
-    if not DATABASE_AVAILABLE:
-        print("ERROR: Cannot export data, database manager not available.")
-        return False
-
-    print("Fetching history data from database...")
-    history_data = get_all_history() # Lấy dữ liệu dạng list of dict
+# --- Parquet (tùy chọn: pip install pyarrow) ---
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
 
-    if not history_data:
-        print("No history data found to export.")
-        return False
+# --- Cấu hình ---
+try:
+    import config
+    EXPORT_CHUNK_ROWS = config.EXPORT_CHUNK_ROWS
+except (ImportError, AttributeError):
+    EXPORT_CHUNK_ROWS = 20000
+    print("DataExporter WARNING: config.EXPORT_CHUNK_ROWS not found, using default.")
 
-    if filename is None:
-        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"gtsrb_history_export_{timestamp_str}.csv"
+EXPORT_COLUMNS = ["id", "timestamp", "timestamp_ms", "image_path", "predicted_class_id", "predicted_class_name", "confidence"]
 
-    output_filepath = os.path.join(output_dir, filename)
 
-    # Đảm bảo thư mục output tồn tại
-    os.makedirs(output_dir, exist_ok=True)
+# --- Đọc lịch sử theo khối ---
+def iter_history_chunks(filters: Optional[Dict] = None, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[List[tuple]]:
+    """
+    Duyệt các dòng lịch sử khớp bộ lọc (xem database_manager.build_history_filter_sql) theo id tăng dần,
+    mỗi lần trả về tối đa chunk_rows tuple theo thứ tự EXPORT_COLUMNS. Cả lượt đọc là một câu SELECT
+    nên thấy cùng một snapshot (WAL: không chặn các thread đang ghi).
+    """
+    conn = create_connection()
+    if conn is None:
+        raise RuntimeError("Cannot connect to database to export history.")
+    try:
+        clauses, params = build_history_filter_sql(filters, "id", use_fts=history_fts_ready(conn))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        # timestamp_ms có thể còn NULL khi database cũ đang được migration nền điền dần
+        cursor = conn.execute(f"""SELECT id, timestamp, COALESCE(timestamp_ms, {TIMESTAMP_MS_SQL.format('timestamp')}),
+                                         image_path, predicted_class_id, predicted_class_name, confidence
+                                  FROM history {where} ORDER BY id""", params)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield [tuple(row) for row in rows]
+        finally:
+            cursor.close()
+    finally:
+        release_connection(conn)
+
+
+# --- Ghi theo định dạng ---
+class _CsvSink:
+    def __init__(self, path: str):
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(EXPORT_COLUMNS)
+
+    def write(self, rows: List[tuple]):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetSink:
+    """Mỗi khối là một record batch / row group, không giữ các khối trước trong bộ nhớ."""
+    def __init__(self, path: str):
+        self._schema = pa.schema([("id", pa.int64()), ("timestamp", pa.string()), ("timestamp_ms", pa.int64()),
+                                  ("image_path", pa.string()), ("predicted_class_id", pa.int32()),
+                                  ("predicted_class_name", pa.string()), ("confidence", pa.float64())])
+        self._writer = pq.ParquetWriter(path, self._schema, compression="zstd")
+
+    def write(self, rows: List[tuple]):
+        columns = list(zip(*rows))
+        self._writer.write_batch(pa.record_batch([pa.array(values, type=field.type)
+                                                  for values, field in zip(columns, self._schema)], schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+EXPORT_FORMATS = {"csv": _CsvSink, "parquet": _ParquetSink}
+
+def export_history(output_path: str, fmt: str = "csv", filters: Optional[Dict] = None,
+                   chunk_rows: int = EXPORT_CHUNK_ROWS,
+                   progress_callback: Optional[Callable[[int, float], None]] = None) -> Optional[Dict]:
+    """
+    Xuất lịch sử khớp bộ lọc ra output_path. File được ghi vào file tạm rồi đổi tên, nên lỗi giữa chừng
+    không để lại file dở.
 
-    print(f"Exporting {len(history_data)} records to: {output_filepath}")
+    Args:
+        fmt: 'csv' hoặc 'parquet' (cần pyarrow).
+        filters: Bộ lọc (xem build_history_filter_sql), ví dụ {"date_from": date, "date_to": date, "class_ids": [14]}.
+        chunk_rows: Số dòng mỗi khối đọc/ghi.
+        progress_callback: Gọi sau mỗi khối với (số dòng đã ghi, số dòng/giây).
 
+    Returns:
+        Optional[Dict]: {path, rows, seconds, rows_per_second}; None nếu lỗi hoặc không có dòng nào.
+    """
+    if not DATABASE_AVAILABLE:
+        print("ERROR: Cannot export data, database manager not available.")
+        return None
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt == "parquet" and not PYARROW_AVAILABLE:
+        print("ERROR: Parquet export requires pyarrow (pip install pyarrow).")
+        return None
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = output_path + ".part"
+    written = 0
+    t_start = time.perf_counter()
     try:
-        # Lấy header từ keys của dictionary đầu tiên
-        headers = history_data[0].keys()
-
-        with open(output_filepath, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=headers)
-            writer.writeheader() # Ghi dòng header
-            writer.writerows(history_data) # Ghi tất cả các dòng dữ liệu
+        sink = EXPORT_FORMATS[fmt](tmp_path)
+        try:
+            for rows in iter_history_chunks(filters, chunk_rows):
+                sink.write(rows)
+                written += len(rows)
+                if progress_callback:
+                    progress_callback(written, written / max(time.perf_counter() - t_start, 1e-9))
+        finally:
+            sink.close()
+        if written == 0:
+            os.remove(tmp_path)
+            print("No history data found to export.")
+            return None
+        os.replace(tmp_path, output_path)
+    except Exception as e:
+        print(f"ERROR: Failed to export data to {fmt}. Reason: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+    seconds = time.perf_counter() - t_start
+    result = {"path": output_path, "rows": written, "seconds": seconds, "rows_per_second": written / max(seconds, 1e-9)}
+    print(f"Exported {written} records to {output_path} in {seconds:.2f} s ({result['rows_per_second']:.0f} rows/s).")
+    return result
+
+def _default_filename(fmt: str) -> str:
+    timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"gtsrb_history_export_{timestamp_str}.{fmt}"
+
+def export_history_to_csv(output_dir='.', filename=None, filters: Optional[Dict] = None,
+                          chunk_rows: int = EXPORT_CHUNK_ROWS) -> Optional[Dict]:
+    """
+    Xuất lịch sử nhận diện (khớp bộ lọc nếu có) ra file CSV.
 
-        print("Export successful!")
-        return True
+    Args:
+        output_dir (str): Thư mục để lưu file CSV.
+        filename (str, optional): Tên file CSV. Nếu None, sẽ tạo tên mặc định
+                                  kèm timestamp.
+    """
+    return export_history(os.path.join(output_dir, filename or _default_filename("csv")), "csv", filters, chunk_rows)
 
-    except Exception as e:
-        print(f"ERROR: Failed to export data to CSV. Reason: {e}")
-        return False
+def export_history_to_parquet(output_dir='.', filename=None, filters: Optional[Dict] = None,
+                              chunk_rows: int = EXPORT_CHUNK_ROWS) -> Optional[Dict]:
+    """Như export_history_to_csv nhưng ghi Parquet (cần pyarrow), mỗi khối một row group."""
+    return export_history(os.path.join(output_dir, filename or _default_filename("parquet")), "parquet", filters, chunk_rows)
 
 # --- Chạy trực tiếp ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export recognition history to CSV or Parquet in constant memory.")
+    parser.add_argument("--format", choices=sorted(EXPORT_FORMATS), default="csv", help="Output format.")
+    parser.add_argument("--output-dir", default=project_root, help="Directory for the exported file.")
+    parser.add_argument("--filename", default=None, help="Output file name (default: timestamped).")
+    parser.add_argument("--date-from", type=date.fromisoformat, default=None, help="First day to export (YYYY-MM-DD).")
+    parser.add_argument("--date-to", type=date.fromisoformat, default=None, help="Last day to export, inclusive (YYYY-MM-DD).")
+    parser.add_argument("--class-id", type=int, action="append", dest="class_ids", help="Only export this class (repeatable).")
+    parser.add_argument("--chunk-rows", type=int, default=EXPORT_CHUNK_ROWS, help="Rows per fetch / Parquet row group.")
+    args = parser.parse_args()
+
     print("--- Running Database History Exporter ---")
-    # Xuất ra thư mục gốc của dự án làm ví dụ
-    export_history_to_csv(output_dir=project_root)
-    print("--- Exporter Finished ---")
\ No newline at end of file
+    filters = {"date_from": args.date_from, "date_to": args.date_to, "class_ids": args.class_ids}
+    export_history(os.path.join(args.output_dir, args.filename or _default_filename(args.format)), args.format,
+                   filters, args.chunk_rows,
+                   progress_callback=lambda rows, rate: print(f"  {rows} rows ({rate:.0f} rows/s)", end="\r"))
+    print("--- Exporter Finished ---")
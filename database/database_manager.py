@@ -2,9 +2,13 @@
 
 import sqlite3
 import os
-from datetime import datetime
+from datetime import datetime, timedelta, date
 # <<< Đã import List, Tuple, Dict, Optional từ typing >>>
-from typing import List, Tuple, Dict, Optional
+from typing import List, Tuple, Dict, Optional, NamedTuple, Iterable
+
+from database.connection_manager import get_connection_manager, release_connection
+from database.migrations import (ensure_schema, schema_version, TIMESTAMP_MS_SQL, HISTORY_FTS_SCHEMA_VERSION,
+                                 HISTORY_STATS_SCHEMA_VERSION)
 
 # --- Lấy đường dẫn database ---
 try:
@@ -22,21 +26,28 @@ except (ImportError, AttributeError):
 
 print(f"DBManager using Database: {DATABASE_PATH}")
 
+try:
+    import config
+    HISTORY_DELETE_CHUNK_ROWS = config.HISTORY_DELETE_CHUNK_ROWS
+except (ImportError, AttributeError):
+    HISTORY_DELETE_CHUNK_ROWS = 5000 # Số id mỗi transaction khi xóa nhiều dòng (delete_history_ids)
+
 
 def create_connection():
-    """ Tạo kết nối đến database """
-    conn = None
-    if not os.path.exists(DATABASE_PATH):
-        print(f"DBManager Error: Database file not found at {DATABASE_PATH}")
-        return None
-    try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        conn.row_factory = sqlite3.Row # Trả về kết quả dạng dictionary-like
-        return conn
-    except sqlite3.Error as e:
-        print(f"DBManager Error connecting to database: {e}")
+    """
+    Kết nối tới database của thread hiện tại (giữ mở lâu dài, WAL, xem connection_manager).
+    Lần đầu với mỗi database sẽ nâng cấp schema (xem migrations.ensure_schema).
+    Sau khi dùng gọi release_connection(conn) thay vì conn.close().
+    """
+    conn = get_connection_manager(DATABASE_PATH).get_connection()
+    if conn is not None:
+        ensure_schema(conn, DATABASE_PATH)
     return conn
 
+# timestamp_ms (epoch mili-giây) được tính từ timestamp ngay trong câu lệnh, giống backfill của migrations
+HISTORY_INSERT_SQL = f''' INSERT INTO history(timestamp, image_path, predicted_class_id, predicted_class_name, confidence, timestamp_ms)
+                          VALUES(?1,?2,?3,?4,?5,{TIMESTAMP_MS_SQL.format('?1')}) '''
+
 def add_prediction_to_history(image_path: str, predicted_class_id: int, predicted_class_name: str, confidence: float) -> bool:
     """ Thêm một bản ghi dự đoán mới vào bảng history """
     conn = create_connection()
@@ -44,11 +55,9 @@ def add_prediction_to_history(image_path: str, predicted_class_id: int, predicte
         print("DBManager: Cannot connect to database to add history.")
         return False
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    sql = ''' INSERT INTO history(timestamp, image_path, predicted_class_id, predicted_class_name, confidence)
-              VALUES(?,?,?,?,?) '''
     cur = conn.cursor()
     try:
-        cur.execute(sql, (now, image_path, predicted_class_id, predicted_class_name, confidence))
+        cur.execute(HISTORY_INSERT_SQL, (now, image_path, predicted_class_id, predicted_class_name, confidence))
         conn.commit()
         # print(f"DBManager: Prediction added to history: {os.path.basename(image_path)} -> {predicted_class_name}")
         return True
@@ -57,11 +66,56 @@ def add_prediction_to_history(image_path: str, predicted_class_id: int, predicte
         return False
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+
+def add_predictions_to_history_bulk(records: List[Tuple[str, int, str, float]]) -> int:
+    """
+    Thêm nhiều bản ghi dự đoán trong một transaction (executemany) thay vì mở kết nối cho từng ảnh.
+
+    Args:
+        records: Danh sách tuple (image_path, predicted_class_id, predicted_class_name, confidence).
+
+    Returns:
+        int: Số bản ghi đã thêm (0 nếu lỗi).
+    """
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return add_history_rows([(now, path, class_id, class_name, confidence)
+                             for path, class_id, class_name, confidence in records])
+
+def add_history_rows(rows: List[Tuple[str, str, int, str, float]]) -> int:
+    """
+    Ghi các dòng lịch sử đã có sẵn thời điểm nhận diện trong một transaction (dùng bởi history_writer).
+
+    Args:
+        rows: Danh sách tuple (timestamp 'YYYY-MM-DD HH:MM:SS', image_path, predicted_class_id,
+              predicted_class_name, confidence).
+
+    Returns:
+        int: Số bản ghi đã thêm (0 nếu lỗi, khi đó không dòng nào được ghi).
+    """
+    if not rows:
+        return 0
+    conn = create_connection()
+    if conn is None:
+        print("DBManager: Cannot connect to database to add history.")
+        return 0
+    try:
+        with conn: # Commit một lần cho cả batch, rollback nếu lỗi
+            conn.executemany(HISTORY_INSERT_SQL, rows)
+        return len(rows)
+    except sqlite3.Error as e:
+        print(f"DBManager Error adding predictions to history (bulk): {e}")
+        return 0
+    finally:
+        if conn:
+            release_connection(conn)
 
 # <<< Đã sửa Type Hint -> List[Dict] >>>
 def get_all_history() -> List[Dict]:
-    """ Lấy tất cả các bản ghi từ bảng history, sắp xếp theo thời gian mới nhất trước """
+    """
+    Lấy tất cả các bản ghi từ bảng history, sắp xếp theo thời gian mới nhất trước.
+    Giữ toàn bộ bảng trong bộ nhớ và định dạng sẵn confidence; code mới nên dùng get_history_page.
+    """
     conn = create_connection()
     if conn is None:
         print("DBManager: Cannot connect to database to get history.")
@@ -89,11 +143,282 @@ def get_all_history() -> List[Dict]:
         return []
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+
+# --- Tìm kiếm đường dẫn bằng FTS5 ---
+# Index và bảng history_fts chỉ được định nghĩa trong migrations (HISTORY_INDEX_STATEMENTS / HISTORY_FTS_TABLE_STATEMENTS),
+# module này chỉ kiểm tra chúng đã sẵn sàng chưa.
+FTS_MIN_QUERY_LENGTH = 3 # Tokenizer trigram cần ít nhất 3 ký tự; chuỗi ngắn hơn dùng LIKE
+_history_fts_available: Dict[str, bool] = {} # Đường dẫn database -> có history_fts (chỉ lưu khi migration FTS đã xong)
+
+def history_fts_ready(conn: sqlite3.Connection) -> bool:
+    """
+    Trả về True nếu tìm đường dẫn bằng FTS5 dùng được trên database hiện tại (DATABASE_PATH, conn là kết nối tới nó).
+    Trước khi migration nền tạo xong history_fts (database cũ đang được nâng cấp) trả về False và bộ lọc dùng LIKE.
+    """
+    key = os.path.abspath(DATABASE_PATH)
+    available = _history_fts_available.get(key)
+    if available is not None:
+        return available
+    if (schema_version(DATABASE_PATH) or 0) < HISTORY_FTS_SCHEMA_VERSION:
+        return False
+    available = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='history_fts'").fetchone() is not None
+    _history_fts_available[key] = available
+    return available
+
+def build_history_filter_sql(filters: Optional[Dict], sort_column: Optional[str] = None,
+                             use_fts: bool = False) -> Tuple[List[str], list]:
+    """
+    Chuyển bộ lọc thành các điều kiện WHERE có tham số (không ghép giá trị vào chuỗi SQL).
+
+    Các khóa hỗ trợ (đều tùy chọn, None = bỏ qua):
+        class_id (int), class_ids (danh sách lớp), date_from / date_to (datetime.date, date_to tính cả ngày đó),
+        min_confidence / max_confidence (0..1), path_query (chuỗi con của image_path).
+
+    sort_column: cột đang sắp xếp. Khoảng tin cậy thường rộng, nên khi sắp xếp theo cột khác
+    điều kiện được viết '+confidence' để SQLite duyệt index của cột sắp xếp và dừng sau LIMIT dòng,
+    thay vì lấy mọi dòng trong khoảng rồi sắp xếp lại.
+
+    use_fts: tìm path_query qua history_fts (kết quả history_fts_ready của database đang truy vấn), ngược lại dùng LIKE.
+    """
+    clauses: List[str] = []
+    params: list = []
+    if not filters:
+        return clauses, params
+    if filters.get("class_id") is not None:
+        clauses.append("predicted_class_id = ?"); params.append(int(filters["class_id"]))
+    if filters.get("class_ids"):
+        class_ids = [int(class_id) for class_id in filters["class_ids"]]
+        clauses.append(f"predicted_class_id IN ({', '.join('?' * len(class_ids))})"); params.extend(class_ids)
+    if filters.get("date_from") is not None:
+        clauses.append("timestamp >= ?"); params.append(filters["date_from"].strftime("%Y-%m-%d"))
+    if filters.get("date_to") is not None: # timestamp dạng 'YYYY-MM-DD HH:MM:SS' nên so sánh chuỗi đúng thứ tự
+        clauses.append("timestamp < ?"); params.append((filters["date_to"] + timedelta(days=1)).strftime("%Y-%m-%d"))
+    confidence_expr = "confidence" if sort_column in (None, "confidence") else "+confidence"
+    if filters.get("min_confidence") is not None:
+        clauses.append(f"{confidence_expr} >= ?"); params.append(float(filters["min_confidence"]))
+    if filters.get("max_confidence") is not None:
+        clauses.append(f"{confidence_expr} <= ?"); params.append(float(filters["max_confidence"]))
+    path_query = (filters.get("path_query") or "").strip()
+    if path_query:
+        if use_fts and len(path_query) >= FTS_MIN_QUERY_LENGTH:
+            # Cụm từ trong dấu nháy kép: trigram khớp chuỗi con, không hiểu cú pháp truy vấn FTS của người dùng
+            clauses.append("id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)")
+            params.append('"' + path_query.replace('"', '""') + '"')
+        else:
+            escaped = path_query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            clauses.append("image_path LIKE ? ESCAPE '\\'"); params.append(f"%{escaped}%")
+    return clauses, params
+
+# --- Đọc lịch sử theo trang (keyset pagination, dùng cho bảng ảo trong GUI và khi xuất dữ liệu) ---
+# Chỉ các cột trong danh sách này mới được dùng trong ORDER BY (không nhận tên cột tùy ý từ GUI).
+# Mỗi cột đều có index (migrations) trừ image_path; index kết thúc ngầm bằng id nên khớp keyset (cột, id).
+HISTORY_SORTABLE_COLUMNS = ("id", "timestamp", "image_path", "predicted_class_name", "confidence")
+HISTORY_PAGE_COLUMNS = "id, timestamp, image_path, predicted_class_id, predicted_class_name, confidence"
+HISTORY_PAGE_MAX_LIMIT = 10000 # Giới hạn số dòng mỗi trang: người gọi không bao giờ giữ nhiều hơn một trang
+
+class HistoryPage(NamedTuple):
+    rows: List[sqlite3.Row]       # id, timestamp, image_path, predicted_class_id, predicted_class_name, confidence (float)
+    next_cursor: Optional[Tuple]  # Truyền vào after_cursor để lấy trang kế tiếp; None nếu đã hết
+
+def parse_history_order(order: str) -> Tuple[str, bool]:
+    """'cột' (tăng dần) hoặc '-cột' (giảm dần) -> (cột, descending). ValueError nếu cột không được hỗ trợ."""
+    descending = order.startswith("-")
+    column = order[1:] if descending else order
+    if column not in HISTORY_SORTABLE_COLUMNS:
+        raise ValueError(f"Unsupported sort column: {column}")
+    return column, descending
+
+def get_history_page(after_cursor: Optional[Tuple] = None, limit: int = 200,
+                     filters: Optional[Dict] = None, order: str = "-id") -> HistoryPage:
+    """
+    Lấy một trang lịch sử theo keyset (cột sắp xếp, id) thay vì OFFSET, nên thời gian lấy trang
+    không tăng theo độ sâu đã đọc.
+
+    Args:
+        after_cursor: next_cursor của trang trước (cùng filters và order); None cho trang đầu.
+        limit: Số dòng tối đa (1..HISTORY_PAGE_MAX_LIMIT).
+        filters: Bộ lọc (xem build_history_filter_sql).
+        order: Cột sắp xếp trong HISTORY_SORTABLE_COLUMNS, thêm tiền tố '-' để giảm dần (mặc định: mới nhất trước).
+
+    Returns:
+        HistoryPage: Các dòng thô (confidence là số thực, chưa định dạng) và con trỏ trang kế tiếp.
+    """
+    sort_column, descending = parse_history_order(order)
+    limit = int(limit)
+    if not 1 <= limit <= HISTORY_PAGE_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {HISTORY_PAGE_MAX_LIMIT}")
+    conn = create_connection()
+    if conn is None:
+        print("DBManager: Cannot connect to database to get history page.")
+        return HistoryPage([], None)
+    direction = "DESC" if descending else "ASC"
+    comparison = "<" if descending else ">"
+    clauses, params = build_history_filter_sql(filters, sort_column, use_fts=history_fts_ready(conn))
+    if sort_column == "id":
+        order_by = f"id {direction}"
+        if after_cursor is not None:
+            clauses.append(f"id {comparison} ?"); params.append(after_cursor[-1])
+    else:
+        order_by = f"{sort_column} {direction}, id {direction}"
+        if after_cursor is not None:
+            clauses.append(f"({sort_column}, id) {comparison} (?, ?)"); params.extend(after_cursor)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    params.append(limit + 1) # Thêm một dòng để biết còn trang sau hay không
+    try:
+        rows = conn.execute(f"SELECT {HISTORY_PAGE_COLUMNS} FROM history {where} ORDER BY {order_by} LIMIT ?",
+                            params).fetchall()
+    except sqlite3.Error as e:
+        print(f"DBManager Error fetching history page: {e}")
+        return HistoryPage([], None)
+    finally:
+        release_connection(conn)
+    if len(rows) <= limit:
+        return HistoryPage(rows, None)
+    rows = rows[:limit]
+    return HistoryPage(rows, (rows[-1][sort_column], rows[-1]["id"]))
+
+def fetch_history_page(sort_column: str = "id", descending: bool = True,
+                       after_key: Optional[Tuple] = None, limit: int = 200,
+                       filters: Optional[Dict] = None) -> List[sqlite3.Row]:
+    """Như get_history_page nhưng chỉ trả về các dòng (after_key là (giá trị sort_column, id) của dòng cuối trang trước)."""
+    return get_history_page(after_key, limit, filters, ("-" if descending else "") + sort_column).rows
+
+def count_history(filters: Optional[Dict] = None) -> int:
+    """Đếm số bản ghi lịch sử khớp bộ lọc (0 nếu lỗi)."""
+    conn = create_connection()
+    if conn is None:
+        return 0
+    clauses, params = build_history_filter_sql(filters, use_fts=history_fts_ready(conn))
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    try:
+        return int(conn.execute(f"SELECT COUNT(*) FROM history {where}", params).fetchone()[0])
+    except sqlite3.Error as e:
+        print(f"DBManager Error counting history: {e}")
+        return 0
+    finally:
+        release_connection(conn)
+
+# --- Thống kê lịch sử (bảng history_class_daily / history_class_totals do trigger cập nhật) ---
+def history_stats_ready() -> bool:
+    """True nếu bảng thống kê đã có đủ dữ liệu (migration nền đã cộng xong các dòng có sẵn)."""
+    conn = create_connection()
+    if conn is None:
+        return False
+    release_connection(conn)
+    return (schema_version(DATABASE_PATH) or 0) >= HISTORY_STATS_SCHEMA_VERSION
+
+def _day_range_sql(column: str, date_from: Optional[date], date_to: Optional[date]) -> Tuple[List[str], list]:
+    """Điều kiện theo ngày 'YYYY-MM-DD' (date_to tính cả ngày đó) trên cột ngày của bảng thống kê."""
+    clauses, params = [], []
+    if date_from is not None:
+        clauses.append(f"{column} >= ?"); params.append(date_from.strftime("%Y-%m-%d"))
+    if date_to is not None:
+        clauses.append(f"{column} <= ?"); params.append(date_to.strftime("%Y-%m-%d"))
+    return clauses, params
+
+def _fetch_stats(sql: str, params: list, error_label: str) -> List[Dict]:
+    conn = create_connection()
+    if conn is None:
+        print(f"DBManager: Cannot connect to database to get {error_label}.")
+        return []
+    try:
+        return [{**{key: row[key] for key in row.keys() if key != "confidence_sum"},
+                 "avg_confidence": row["confidence_sum"] / row["count"] if row["count"] else 0.0}
+                for row in conn.execute(sql, params).fetchall()]
+    except sqlite3.Error as e:
+        print(f"DBManager Error fetching {error_label}: {e}")
+        return []
+    finally:
+        release_connection(conn)
+
+def get_class_stats(date_from: Optional[date] = None, date_to: Optional[date] = None) -> List[Dict]:
+    """
+    Số lần nhận diện và độ tin cậy trung bình của từng lớp (nhiều nhất trước), trong khoảng ngày nếu có.
+    Đọc từ bảng thống kê (không phụ thuộc số dòng history); khi database cũ còn đang được nâng cấp thì
+    tính trực tiếp trên history.
+
+    Returns:
+        List[Dict]: {class_id, class_name, count, avg_confidence}.
+    """
+    if not history_stats_ready():
+        clauses, params = build_history_filter_sql({"date_from": date_from, "date_to": date_to})
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"""SELECT predicted_class_id AS class_id, MAX(predicted_class_name) AS class_name,
+                         COUNT(*) AS count, SUM(confidence) AS confidence_sum
+                  FROM history {where} GROUP BY predicted_class_id ORDER BY count DESC, class_id"""
+    elif date_from is None and date_to is None:
+        sql = """SELECT predicted_class_id AS class_id, predicted_class_name AS class_name, count, confidence_sum
+                 FROM history_class_totals WHERE count > 0 ORDER BY count DESC, class_id"""
+        params = []
+    else:
+        clauses, params = _day_range_sql("day", date_from, date_to)
+        sql = f"""SELECT predicted_class_id AS class_id, MAX(predicted_class_name) AS class_name,
+                         SUM(count) AS count, SUM(confidence_sum) AS confidence_sum
+                  FROM history_class_daily WHERE {' AND '.join(clauses)}
+                  GROUP BY predicted_class_id HAVING SUM(count) > 0 ORDER BY count DESC, class_id"""
+    return _fetch_stats(sql, params, "class stats")
+
+def get_daily_stats(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                    class_id: Optional[int] = None) -> List[Dict]:
+    """
+    Số lần nhận diện và độ tin cậy trung bình theo ngày (cũ nhất trước), của một lớp nếu có class_id.
+
+    Returns:
+        List[Dict]: {day ('YYYY-MM-DD'), count, avg_confidence}.
+    """
+    if not history_stats_ready():
+        clauses, params = build_history_filter_sql({"date_from": date_from, "date_to": date_to, "class_id": class_id})
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"""SELECT substr(timestamp, 1, 10) AS day, COUNT(*) AS count, SUM(confidence) AS confidence_sum
+                  FROM history {where} GROUP BY day ORDER BY day"""
+    else:
+        clauses, params = _day_range_sql("day", date_from, date_to)
+        if class_id is not None:
+            clauses.append("predicted_class_id = ?"); params.append(int(class_id))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"""SELECT day, SUM(count) AS count, SUM(confidence_sum) AS confidence_sum
+                  FROM history_class_daily {where} GROUP BY day HAVING SUM(count) > 0 ORDER BY day"""
+    return _fetch_stats(sql, params, "daily stats")
+
+def delete_history_ids(conn: sqlite3.Connection, record_ids: Iterable[int],
+                       chunk_rows: int = HISTORY_DELETE_CHUNK_ROWS) -> int:
+    """
+    Xóa các dòng history theo id: nạp id vào bảng tạm (không giới hạn số biến của SQLite như IN (?,?,...)),
+    rồi xóa theo từng khoảng chunk_rows id, mỗi khoảng một transaction ngắn để các thread khác vẫn ghi được.
+    Lỗi giữa chừng giữ nguyên các khối đã xóa và ném lại sqlite3.Error.
+
+    Returns:
+        int: Số dòng đã xóa (id không tồn tại được bỏ qua).
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS history_delete_ids (id INTEGER PRIMARY KEY)")
+    deleted = 0
+    try:
+        with conn: # Bảng tạm thuộc kết nối này: không khóa file database
+            conn.execute("DELETE FROM temp.history_delete_ids")
+            conn.executemany("INSERT OR IGNORE INTO temp.history_delete_ids(id) VALUES (?)", ((int(i),) for i in record_ids))
+        last_id = -(2 ** 63)
+        while True:
+            row = conn.execute("SELECT id FROM temp.history_delete_ids WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?",
+                               (last_id, max(1, int(chunk_rows)) - 1)).fetchone()
+            upper = row[0] if row else conn.execute("SELECT MAX(id) FROM temp.history_delete_ids").fetchone()[0]
+            if upper is None or upper <= last_id:
+                break
+            with conn:
+                deleted += conn.execute("DELETE FROM history WHERE id IN "
+                                        "(SELECT id FROM temp.history_delete_ids WHERE id > ? AND id <= ?)",
+                                        (last_id, upper)).rowcount
+            last_id = upper
+            if row is None:
+                break
+    finally:
+        with conn:
+            conn.execute("DELETE FROM temp.history_delete_ids")
+    return deleted
 
 # <<< Đã sửa Type Hints -> List[int] và Tuple[bool, str] >>>
 def delete_history_records(record_ids: List[int]) -> Tuple[bool, str]:
-    """Xóa các bản ghi lịch sử dựa trên danh sách ID."""
+    """Xóa các bản ghi lịch sử dựa trên danh sách ID (theo lô, xem delete_history_ids)."""
     if not record_ids:
         return False, "Không có ID nào được cung cấp để xóa."
 
@@ -102,16 +427,8 @@ def delete_history_records(record_ids: List[int]) -> Tuple[bool, str]:
         return False, "Không thể kết nối database để xóa lịch sử."
 
     try:
-        cur = conn.cursor()
-        # Tạo chuỗi placeholders (?, ?, ...) tương ứng với số lượng ID
-        placeholders = ', '.join('?' * len(record_ids))
-        sql = f"DELETE FROM history WHERE id IN ({placeholders})"
-
-        print(f"DBManager Executing SQL: {sql} with IDs: {record_ids}")
-        cur.execute(sql, record_ids)
-        conn.commit()
-
-        deleted_count = cur.rowcount
+        print(f"DBManager: Deleting {len(record_ids)} history record(s)...")
+        deleted_count = delete_history_ids(conn, record_ids)
         print(f"DBManager: Successfully deleted {deleted_count} record(s).")
         if deleted_count == len(record_ids):
              return True, f"Đã xóa thành công {deleted_count} mục."
@@ -126,7 +443,92 @@ def delete_history_records(record_ids: List[int]) -> Tuple[bool, str]:
         return False, f"Lỗi database khi xóa lịch sử: {e}"
     finally:
         if conn:
-            conn.close()
+            release_connection(conn)
+
+# --- Hàng đợi nhận diện offline ---
+# Ảnh chưa nhận diện được vì API không kết nối được; gui/offline_queue.py gửi lại khi API hoạt động.
+def enqueue_pending_recognition(image_path: str, upload_max_edge: int = 0, error: str = "") -> bool:
+    """Đưa ảnh vào hàng đợi offline (ảnh đã có trong hàng đợi thì bỏ qua). Trả về True nếu ảnh nằm trong hàng đợi."""
+    conn = create_connection()
+    if conn is None:
+        print("DBManager: Cannot connect to database to queue recognition.")
+        return False
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        with conn:
+            conn.execute("""INSERT INTO pending_recognitions(image_path, queued_at, upload_max_edge, last_error)
+                            VALUES(?,?,?,?)
+                            ON CONFLICT(image_path) DO UPDATE SET attempts = 0, last_error = excluded.last_error""",
+                         (image_path, now, int(upload_max_edge), error))
+        return True
+    except sqlite3.Error as e:
+        print(f"DBManager Error queueing recognition: {e}")
+        return False
+    finally:
+        release_connection(conn)
+
+def fetch_pending_recognitions(limit: int, max_attempts: int) -> List[Dict]:
+    """Các ảnh đang chờ gửi lại (cũ nhất trước), bỏ qua ảnh đã lỗi quá max_attempts lần."""
+    conn = create_connection()
+    if conn is None:
+        return []
+    try:
+        rows = conn.execute("""SELECT id, image_path, queued_at, upload_max_edge, attempts, last_error
+                               FROM pending_recognitions WHERE attempts < ? ORDER BY id LIMIT ?""",
+                            (max_attempts, limit)).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.Error as e:
+        print(f"DBManager Error fetching pending recognitions: {e}")
+        return []
+    finally:
+        release_connection(conn)
+
+def count_pending_recognitions(max_attempts: Optional[int] = None) -> int:
+    """Số ảnh trong hàng đợi offline (chỉ tính ảnh còn được gửi lại nếu có max_attempts)."""
+    conn = create_connection()
+    if conn is None:
+        return 0
+    try:
+        if max_attempts is None:
+            return int(conn.execute("SELECT COUNT(*) FROM pending_recognitions").fetchone()[0])
+        return int(conn.execute("SELECT COUNT(*) FROM pending_recognitions WHERE attempts < ?", (max_attempts,)).fetchone()[0])
+    except sqlite3.Error as e:
+        print(f"DBManager Error counting pending recognitions: {e}")
+        return 0
+    finally:
+        release_connection(conn)
+
+def complete_pending_recognitions(results: List[Tuple[int, str, int, str, float, str]],
+                                  failures: List[Tuple[int, str]]) -> bool:
+    """
+    Ghi kết quả một lượt gửi lại trong một transaction: thêm vào history và xóa khỏi hàng đợi
+    các ảnh đã nhận diện xong; tăng số lần thử của các ảnh bị lỗi.
+
+    Args:
+        results: (pending_id, image_path, predicted_class_id, predicted_class_name, confidence, queued_at).
+            queued_at (lúc người dùng gửi ảnh, cột pending_recognitions.queued_at) là timestamp của dòng lịch sử,
+            không phải lúc gửi lại: bộ lọc ngày và thống kê theo ngày tính đúng ngày nhận diện.
+        failures: (pending_id, thông báo lỗi).
+    """
+    if not results and not failures:
+        return True
+    conn = create_connection()
+    if conn is None:
+        print("DBManager: Cannot connect to database to store replayed recognitions.")
+        return False
+    try:
+        with conn: # Commit một lần: lịch sử và hàng đợi luôn khớp nhau
+            conn.executemany(HISTORY_INSERT_SQL, [(queued_at, path, class_id, class_name, confidence)
+                                                  for _, path, class_id, class_name, confidence, queued_at in results])
+            conn.executemany("DELETE FROM pending_recognitions WHERE id = ?", [(pending_id,) for pending_id, *_ in results])
+            conn.executemany("UPDATE pending_recognitions SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                             [(error, pending_id) for pending_id, error in failures])
+        return True
+    except sqlite3.Error as e:
+        print(f"DBManager Error storing replayed recognitions: {e}")
+        return False
+    finally:
+        release_connection(conn)
 
 # --- Ví dụ sử dụng (chỉ chạy khi thực thi file này trực tiếp) ---
 if __name__ == '__main__':
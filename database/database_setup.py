@@ -1,6 +1,7 @@
 # database/database_setup.py
 import sqlite3
 import os
+import sys
 from datetime import datetime
 # <<< KHÔNG import auth_manager >>>
 
@@ -13,11 +14,22 @@ DATABASE_PATH = os.path.join(DATABASE_DIR, 'history.db') # Tên file database
 # Đảm bảo thư mục database tồn tại
 os.makedirs(DATABASE_DIR, exist_ok=True)
 
+# --- Thêm thư mục gốc vào sys.path (để import database.migrations khi chạy trực tiếp file này) ---
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+try:
+    from database.migrations import migrate, get_schema_version, LATEST_SCHEMA_VERSION
+    MIGRATIONS_AVAILABLE = True
+except ImportError as e:
+    print(f"Database setup WARNING: Could not import database.migrations ({e}). Schema upgrades will run when the app connects.")
+    MIGRATIONS_AVAILABLE = False
+
 def create_connection(db_file):
     """ Tạo kết nối đến file SQLite database """
     conn = None
     try:
         conn = sqlite3.connect(db_file)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL") # Chỉ có tác dụng khi file chưa có bảng (xem database/retention.py)
         print(f"SQLite connection established to {db_file} (Version: {sqlite3.sqlite_version})")
         return conn
     except sqlite3.Error as e:
@@ -113,6 +125,13 @@ def setup_database():
         except sqlite3.Error as e:
             print(f"\nERROR checking users table count: {e}")
 
+        # --- Nâng cấp schema lên phiên bản mới nhất (PRAGMA user_version, xem database/migrations.py) ---
+        # Các bảng thêm sau này (pending_recognitions, index, FTS, thống kê) chỉ được định nghĩa trong migrations.
+        if MIGRATIONS_AVAILABLE:
+            print(f"\nApplying schema migrations (current v{get_schema_version(conn)}, latest v{LATEST_SCHEMA_VERSION})...")
+            version = migrate(conn)
+            print(f"Schema is at v{version}.")
+
         # Đóng kết nối
         conn.close()
         print("\nDatabase connection closed.")
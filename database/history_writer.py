@@ -0,0 +1,191 @@
+# database/history_writer.py
+
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+from typing import Optional, List, Tuple, Dict
+
+from database.database_manager import add_history_rows
+
+# --- Cấu hình ---
+try:
+    import config
+    HISTORY_WRITER_FLUSH_ROWS = config.HISTORY_WRITER_FLUSH_ROWS
+    HISTORY_WRITER_FLUSH_INTERVAL_MS = config.HISTORY_WRITER_FLUSH_INTERVAL_MS
+    HISTORY_WRITER_MAX_QUEUE = config.HISTORY_WRITER_MAX_QUEUE
+except (ImportError, AttributeError):
+    HISTORY_WRITER_FLUSH_ROWS = 256
+    HISTORY_WRITER_FLUSH_INTERVAL_MS = 250
+    HISTORY_WRITER_MAX_QUEUE = 10000
+    print("HistoryWriter WARNING: config history writer settings not found, using defaults.")
+
+HISTORY_WRITER_MAX_RETRIES = 3 # Lô ghi lỗi (vd. database đang bị khóa) được thử lại ở các lần ghi sau
+
+_STOP = object()
+
+
+class HistoryWriter:
+    """
+    Ghi lịch sử nhận diện ở thread nền: submit() chỉ đưa bản ghi vào hàng đợi trong bộ nhớ,
+    thread ghi gom lại và ghi bằng executemany trong một transaction mỗi flush_rows dòng
+    hoặc sau flush_interval_ms kể từ dòng đầu tiên của lô (tùy điều kiện nào đến trước).
+    """
+    def __init__(self, flush_rows: int = HISTORY_WRITER_FLUSH_ROWS,
+                 flush_interval_ms: float = HISTORY_WRITER_FLUSH_INTERVAL_MS,
+                 max_queue: int = HISTORY_WRITER_MAX_QUEUE):
+        self.flush_rows = max(1, int(flush_rows))
+        self.flush_interval = max(0.0, flush_interval_ms / 1000.0)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopped = False
+        self._batch_rows = 0 # Số dòng đã lấy khỏi hàng đợi nhưng chưa ghi
+        self._written = self._dropped = self._failed = self._flushes = 0
+        self._flush_ms_total = self._last_flush_ms = self._max_flush_ms = 0.0
+        self._last_flush_rows = 0
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopped = False
+                self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, image_path: str, predicted_class_id: int, predicted_class_name: str, confidence: float,
+               timestamp: Optional[str] = None) -> bool:
+        """
+        Đưa một kết quả vào hàng đợi ghi (không chặn). Thời điểm được lấy lúc gọi, không phải lúc ghi.
+        Trả về False nếu writer đã dừng hoặc hàng đợi đầy (bản ghi bị bỏ và được đếm trong 'dropped').
+        """
+        if self._stopped:
+            return False
+        self.start()
+        row = (timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"), image_path,
+               int(predicted_class_id), predicted_class_name, float(confidence))
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._stats_lock: self._dropped += 1
+            return False
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Ghi ngay các bản ghi đã submit trước lời gọi này. timeout=0: chỉ yêu cầu ghi, không chờ.
+        Trả về True nếu đã ghi xong trong thời gian chờ.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return self._queue.empty()
+        done = threading.Event()
+        try: self._queue.put(done, timeout=timeout)
+        except queue.Full: return False
+        return done.wait(timeout) if timeout != 0 else False
+
+    def stop(self, timeout: Optional[float] = 10.0) -> bool:
+        """Hook khi tắt ứng dụng: ghi hết hàng đợi rồi dừng thread. Trả về True nếu ghi xong trong thời gian chờ."""
+        self._stopped = True
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def stats(self) -> Dict:
+        """Bộ đếm: độ sâu hàng đợi, số dòng đã ghi / bị bỏ / ghi lỗi, số lần ghi và độ trễ ghi (ms)."""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize() + self._batch_rows,
+                "written": self._written,
+                "dropped": self._dropped,
+                "failed": self._failed,
+                "flushes": self._flushes,
+                "last_flush_rows": self._last_flush_rows,
+                "last_flush_ms": self._last_flush_ms,
+                "avg_flush_ms": self._flush_ms_total / self._flushes if self._flushes else 0.0,
+                "max_flush_ms": self._max_flush_ms,
+            }
+
+    # --- Thread ghi ---
+    def _run(self):
+        batch: List[Tuple] = []
+        retry: List[Tuple[int, List[Tuple]]] = [] # (số lần đã thử, lô) của các lô ghi lỗi
+        waiters: List[threading.Event] = []
+        batch_started = 0.0
+        stopping = False
+        while not stopping:
+            timeout = None if not batch and not retry else max(0.0, batch_started + self.flush_interval - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    if not batch: batch_started = time.monotonic()
+                    batch.append(item)
+                if stopping or waiters or len(batch) >= self.flush_rows:
+                    break
+                try: item = self._queue.get_nowait() # Gom các dòng đang chờ sẵn vào cùng lô
+                except queue.Empty: item = None
+            with self._stats_lock: self._batch_rows = len(batch) + sum(len(rows) for _, rows in retry)
+            if (stopping or waiters or len(batch) >= self.flush_rows
+                    or ((batch or retry) and time.monotonic() - batch_started >= self.flush_interval)):
+                retry = self._write(batch, retry, final=stopping)
+                batch = []
+                batch_started = time.monotonic()
+                for waiter in waiters: waiter.set()
+                waiters = []
+
+    def _write(self, batch: List[Tuple], retry: List[Tuple[int, List[Tuple]]], final: bool) -> List[Tuple[int, List[Tuple]]]:
+        """Ghi các lô lỗi trước đó rồi lô hiện tại (mỗi lô một transaction). Trả về các lô cần thử lại."""
+        still_failed = []
+        for attempts, rows in retry + ([(0, batch)] if batch else []):
+            t_start = time.perf_counter()
+            written = add_history_rows(rows)
+            flush_ms = (time.perf_counter() - t_start) * 1000.0
+            with self._stats_lock:
+                if written:
+                    self._written += written
+                    self._flushes += 1
+                    self._last_flush_rows, self._last_flush_ms = written, flush_ms
+                    self._flush_ms_total += flush_ms
+                    self._max_flush_ms = max(self._max_flush_ms, flush_ms)
+                elif final or attempts + 1 >= HISTORY_WRITER_MAX_RETRIES:
+                    self._failed += len(rows)
+                    print(f"HistoryWriter Error: dropped {len(rows)} history rows after {attempts + 1} failed writes.")
+                else:
+                    still_failed.append((attempts + 1, rows))
+        with self._stats_lock: self._batch_rows = sum(len(rows) for _, rows in still_failed)
+        return still_failed
+
+
+_shared_writer: Optional[HistoryWriter] = None
+_shared_writer_lock = threading.Lock()
+
+def get_history_writer() -> HistoryWriter:
+    """HistoryWriter dùng chung cho toàn tiến trình (tự ghi hết hàng đợi khi thoát, xem shutdown_history_writer)."""
+    global _shared_writer
+    with _shared_writer_lock:
+        if _shared_writer is None:
+            _shared_writer = HistoryWriter()
+            atexit.register(shutdown_history_writer)
+        return _shared_writer
+
+def shutdown_history_writer(timeout: Optional[float] = 10.0) -> bool:
+    """Ghi hết hàng đợi và dừng writer dùng chung (gọi khi thoát ứng dụng; gọi nhiều lần không sao)."""
+    with _shared_writer_lock:
+        writer = _shared_writer
+    if writer is None:
+        return True
+    finished = writer.stop(timeout)
+    stats = writer.stats()
+    print(f"HistoryWriter stopped: {stats['written']} rows written in {stats['flushes']} flushes "
+          f"(avg {stats['avg_flush_ms']:.1f} ms, max {stats['max_flush_ms']:.1f} ms), "
+          f"{stats['dropped']} dropped, {stats['failed']} failed, {stats['queue_depth']} left.")
+    return finished
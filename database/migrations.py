@@ -0,0 +1,431 @@
+# database/migrations.py
+"""
+Migration schema có đánh số phiên bản, lưu trong PRAGMA user_version của file database.
+
+Các bước nhanh (tạo bảng, thêm cột) chạy ngay ở kết nối đầu tiên; các bước phải duyệt cả bảng
+history (điền timestamp_ms, tạo index, FTS, bảng thống kê) chạy ở thread nền, mỗi lô một transaction
+ngắn để GUI vẫn đọc/ghi được trong lúc nâng cấp database cũ.
+"""
+import time
+import sqlite3
+import atexit
+import threading
+from typing import Callable, Dict, NamedTuple, Optional
+
+from database.connection_manager import get_connection_manager
+
+# --- Cấu hình ---
+try:
+    import config
+    HISTORY_BACKFILL_BATCH_ROWS = config.HISTORY_BACKFILL_BATCH_ROWS
+    HISTORY_BACKFILL_PAUSE_MS = config.HISTORY_BACKFILL_PAUSE_MS
+except (ImportError, AttributeError):
+    HISTORY_BACKFILL_BATCH_ROWS = 5000
+    HISTORY_BACKFILL_PAUSE_MS = 20
+    print("Migrations WARNING: config backfill settings not found, using defaults.")
+
+# Epoch mili-giây từ cột timestamp 'YYYY-MM-DD HH:MM:SS' (giờ địa phương, do datetime.now() ghi).
+# Dùng chung cho INSERT, trigger và backfill để mọi dòng được tính cùng một cách.
+TIMESTAMP_MS_SQL = "CAST(strftime('%s', {0}, 'utc') AS INTEGER) * 1000"
+
+BASE_TABLE_STATEMENTS = (
+    """CREATE TABLE IF NOT EXISTS history (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           timestamp TEXT NOT NULL,
+           image_path TEXT NOT NULL,
+           predicted_class_id INTEGER NOT NULL,
+           predicted_class_name TEXT NOT NULL,
+           confidence REAL NOT NULL
+       )""",
+    """CREATE TABLE IF NOT EXISTS users (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           username TEXT UNIQUE NOT NULL,
+           password_hash TEXT NOT NULL,
+           role TEXT NOT NULL DEFAULT 'user',
+           created_at TEXT NOT NULL
+       )""",
+    # Ảnh chưa nhận diện được vì API không kết nối được; gui/offline_queue.py gửi lại khi API hoạt động.
+    """CREATE TABLE IF NOT EXISTS pending_recognitions (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           image_path TEXT NOT NULL UNIQUE,
+           queued_at TEXT NOT NULL,
+           upload_max_edge INTEGER NOT NULL DEFAULT 0,
+           attempts INTEGER NOT NULL DEFAULT 0,
+           last_error TEXT
+       )""",
+)
+# Dòng được thêm bởi phiên bản cũ của ứng dụng / công cụ khác (không ghi timestamp_ms) vẫn có giá trị.
+TIMESTAMP_MS_TRIGGER = f"""CREATE TRIGGER IF NOT EXISTS history_timestamp_ms_ai AFTER INSERT ON history
+                           WHEN new.timestamp_ms IS NULL BEGIN
+                               UPDATE history SET timestamp_ms = {TIMESTAMP_MS_SQL.format('new.timestamp')} WHERE id = new.id;
+                           END"""
+# Mỗi index kết thúc ngầm bằng rowid (id), nên khớp với keyset (cột, id) của fetch_history_page.
+HISTORY_INDEX_STATEMENTS = (
+    "CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history(timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_history_timestamp_ms ON history(timestamp_ms)",
+    "CREATE INDEX IF NOT EXISTS idx_history_class ON history(predicted_class_id)", # lọc lớp + sắp xếp theo id
+    "CREATE INDEX IF NOT EXISTS idx_history_class_timestamp ON history(predicted_class_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_history_class_timestamp_ms ON history(predicted_class_id, timestamp_ms)",
+    "CREATE INDEX IF NOT EXISTS idx_history_class_confidence ON history(predicted_class_id, confidence)",
+    "CREATE INDEX IF NOT EXISTS idx_history_class_name ON history(predicted_class_name)",
+    "CREATE INDEX IF NOT EXISTS idx_history_confidence ON history(confidence)",
+)
+# Bảng FTS5 external-content (không lưu lại đường dẫn), tokenizer trigram cho tìm chuỗi con bất kỳ.
+HISTORY_FTS_TABLE_STATEMENTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(image_path, content='history', content_rowid='id', tokenize='trigram')",
+    # Khoảng id (done_id, last_id] của các dòng có sẵn chưa được nạp vào history_fts (giống history_stats_backfill).
+    # Trigger bỏ qua các dòng trong khoảng này: 'delete' một dòng chưa có trong index external-content làm hỏng index.
+    """CREATE TABLE IF NOT EXISTS history_fts_backfill (
+           id INTEGER PRIMARY KEY CHECK (id = 1),
+           done_id INTEGER NOT NULL,
+           last_id INTEGER NOT NULL
+       )""",
+)
+_FTS_ROW_INDEXED = ("NOT ({0}.id > (SELECT done_id FROM history_fts_backfill) "
+                    "AND {0}.id <= (SELECT last_id FROM history_fts_backfill))")
+HISTORY_FTS_TRIGGER_NAMES = ("history_fts_ai", "history_fts_ad", "history_fts_au")
+HISTORY_FTS_TRIGGER_STATEMENTS = (
+    f"""CREATE TRIGGER IF NOT EXISTS history_fts_ai AFTER INSERT ON history
+        WHEN {_FTS_ROW_INDEXED.format('new')} BEGIN
+            INSERT INTO history_fts(rowid, image_path) VALUES (new.id, new.image_path);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS history_fts_ad AFTER DELETE ON history
+        WHEN {_FTS_ROW_INDEXED.format('old')} BEGIN
+            INSERT INTO history_fts(history_fts, rowid, image_path) VALUES ('delete', old.id, old.image_path);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS history_fts_au AFTER UPDATE OF image_path ON history
+        WHEN {_FTS_ROW_INDEXED.format('old')} BEGIN
+            INSERT INTO history_fts(history_fts, rowid, image_path) VALUES ('delete', old.id, old.image_path);
+            INSERT INTO history_fts(rowid, image_path) VALUES (new.id, new.image_path);
+        END""",
+)
+
+# --- Bảng thống kê (số lượng và tổng độ tin cậy theo lớp / theo ngày), cập nhật bởi trigger ---
+# Ngày là phần 'YYYY-MM-DD' của timestamp (giờ địa phương). Mọi đường ghi (writer, bulk, hàng đợi offline,
+# xóa) đi qua trigger nên bảng luôn khớp history mà không cần sửa từng hàm ghi.
+HISTORY_STATS_TABLE_STATEMENTS = (
+    """CREATE TABLE IF NOT EXISTS history_class_daily (
+           day TEXT NOT NULL,
+           predicted_class_id INTEGER NOT NULL,
+           predicted_class_name TEXT NOT NULL,
+           count INTEGER NOT NULL,
+           confidence_sum REAL NOT NULL,
+           PRIMARY KEY (day, predicted_class_id)
+       ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS history_class_totals (
+           predicted_class_id INTEGER PRIMARY KEY,
+           predicted_class_name TEXT NOT NULL,
+           count INTEGER NOT NULL,
+           confidence_sum REAL NOT NULL
+       )""",
+    # Khoảng id (done_id, last_id] của các dòng có sẵn chưa được backfill cộng vào thống kê.
+    # Trigger bỏ qua các dòng trong khoảng này (backfill sẽ đọc giá trị hiện tại của chúng).
+    """CREATE TABLE IF NOT EXISTS history_stats_backfill (
+           id INTEGER PRIMARY KEY CHECK (id = 1),
+           done_id INTEGER NOT NULL,
+           last_id INTEGER NOT NULL
+       )""",
+)
+_STATS_ROW_COUNTED = ("NOT ({0}.id > (SELECT done_id FROM history_stats_backfill) "
+                      "AND {0}.id <= (SELECT last_id FROM history_stats_backfill))")
+_STATS_ADD_SQL = """INSERT INTO history_class_daily(day, predicted_class_id, predicted_class_name, count, confidence_sum)
+                           VALUES (substr({0}.timestamp, 1, 10), {0}.predicted_class_id, {0}.predicted_class_name, 1, {0}.confidence)
+                           ON CONFLICT(day, predicted_class_id) DO UPDATE SET count = count + 1,
+                               confidence_sum = confidence_sum + excluded.confidence_sum, predicted_class_name = excluded.predicted_class_name;
+                       INSERT INTO history_class_totals(predicted_class_id, predicted_class_name, count, confidence_sum)
+                           VALUES ({0}.predicted_class_id, {0}.predicted_class_name, 1, {0}.confidence)
+                           ON CONFLICT(predicted_class_id) DO UPDATE SET count = count + 1,
+                               confidence_sum = confidence_sum + excluded.confidence_sum, predicted_class_name = excluded.predicted_class_name;"""
+_STATS_SUBTRACT_SQL = """UPDATE history_class_daily SET count = count - 1, confidence_sum = confidence_sum - {0}.confidence
+                           WHERE day = substr({0}.timestamp, 1, 10) AND predicted_class_id = {0}.predicted_class_id;
+                       UPDATE history_class_totals SET count = count - 1, confidence_sum = confidence_sum - {0}.confidence
+                           WHERE predicted_class_id = {0}.predicted_class_id;"""
+HISTORY_STATS_TRIGGER_STATEMENTS = (
+    f"""CREATE TRIGGER IF NOT EXISTS history_stats_ai AFTER INSERT ON history
+        WHEN {_STATS_ROW_COUNTED.format('new')} BEGIN
+            {_STATS_ADD_SQL.format('new')}
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS history_stats_ad AFTER DELETE ON history
+        WHEN {_STATS_ROW_COUNTED.format('old')} BEGIN
+            {_STATS_SUBTRACT_SQL.format('old')}
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS history_stats_au
+        AFTER UPDATE OF timestamp, predicted_class_id, predicted_class_name, confidence ON history
+        WHEN {_STATS_ROW_COUNTED.format('old')} BEGIN
+            {_STATS_SUBTRACT_SQL.format('old')}
+            {_STATS_ADD_SQL.format('new')}
+        END""",
+)
+_STATS_BACKFILL_STATEMENTS = tuple(
+    f"""INSERT INTO {table}({key_columns}, predicted_class_name, count, confidence_sum)
+        SELECT {key_select}, MAX(predicted_class_name), COUNT(*), SUM(confidence) FROM history
+        WHERE id > ? AND id <= ? GROUP BY {key_select}
+        ON CONFLICT({key_columns}) DO UPDATE SET count = count + excluded.count,
+            confidence_sum = confidence_sum + excluded.confidence_sum"""
+    for table, key_columns, key_select in (
+        ("history_class_daily", "day, predicted_class_id", "substr(timestamp, 1, 10), predicted_class_id"),
+        ("history_class_totals", "predicted_class_id", "predicted_class_id"),
+    )
+)
+
+
+# --- Các bước migration ---
+# apply(conn, stop_event) trả về False nếu bị dừng giữa chừng (chạy lại lần sau sẽ làm tiếp).
+# Bước không phải 'batched' chạy trong một transaction cùng với việc tăng user_version.
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection, Optional[threading.Event]], bool]
+    background: bool = False # Chạy ở thread nền (duyệt cả bảng history)
+    batched: bool = False    # Tự commit theo lô
+
+def _create_base_tables(conn, stop_event):
+    for statement in BASE_TABLE_STATEMENTS:
+        conn.execute(statement)
+    return True
+
+def _add_timestamp_ms_column(conn, stop_event):
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(history)")}
+    if "timestamp_ms" not in columns:
+        conn.execute("ALTER TABLE history ADD COLUMN timestamp_ms INTEGER") # O(1): dòng cũ có giá trị NULL
+    conn.execute(TIMESTAMP_MS_TRIGGER)
+    return True
+
+def _backfill_timestamp_ms(conn, stop_event):
+    """Điền timestamp_ms cho các dòng cũ theo từng khoảng id (mỗi khoảng một transaction ngắn)."""
+    update_sql = (f"UPDATE history SET timestamp_ms = {TIMESTAMP_MS_SQL.format('timestamp')} "
+                  "WHERE id > ? AND id <= ? AND timestamp_ms IS NULL")
+    last_id, updated = 0, 0
+    while True:
+        if stop_event is not None and stop_event.is_set():
+            print(f"Migrations: timestamp_ms backfill paused at id {last_id} ({updated} rows so far).")
+            return False
+        row = conn.execute("SELECT id FROM history WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?",
+                           (last_id, HISTORY_BACKFILL_BATCH_ROWS - 1)).fetchone()
+        upper = row[0] if row else conn.execute("SELECT MAX(id) FROM history").fetchone()[0]
+        if upper is None or upper <= last_id:
+            break
+        with conn:
+            updated += conn.execute(update_sql, (last_id, upper)).rowcount
+        last_id = upper
+        if row is None:
+            break
+        time.sleep(HISTORY_BACKFILL_PAUSE_MS / 1000.0) # Nhường khóa ghi cho các thread khác giữa hai lô
+    if updated:
+        print(f"Migrations: filled timestamp_ms for {updated} history rows.")
+    return True
+
+def _create_history_indexes(conn, stop_event):
+    """Mỗi index một transaction: bảng chỉ bị khóa ghi trong lúc tạo từng index, không phải cả lượt."""
+    for statement in HISTORY_INDEX_STATEMENTS:
+        if stop_event is not None and stop_event.is_set():
+            return False
+        with conn:
+            conn.execute(statement)
+        time.sleep(HISTORY_BACKFILL_PAUSE_MS / 1000.0)
+    # Thống kê cho query planner để chọn đúng index khi kết hợp lọc + sắp xếp (giới hạn số dòng lấy mẫu)
+    conn.execute("PRAGMA analysis_limit=1000")
+    conn.execute("ANALYZE history")
+    conn.commit()
+    return True
+
+def _history_fts_in_sync(conn) -> bool:
+    """
+    True nếu history_fts có sẵn (chưa có history_fts_backfill) đã khớp history: bảng do code cũ tạo cùng trigger
+    và 'rebuild' trong một transaction, trigger giữ đồng bộ từ đó. Đọc ngoài khóa ghi: trigger cập nhật hai bảng
+    trong cùng transaction nên hai số đếm luôn nhất quán. Bảng của một lần nạp bị dừng giữa chừng thì thiếu dòng.
+    """
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='history_fts'").fetchone() is None:
+        return False
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='history_fts_backfill'").fetchone() is not None:
+        return False # Đã có tiến độ: làm tiếp từ done_id
+    placeholders = ", ".join("?" * len(HISTORY_FTS_TRIGGER_NAMES))
+    triggers = conn.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type='trigger' AND name IN ({placeholders})",
+                            HISTORY_FTS_TRIGGER_NAMES).fetchone()[0]
+    if triggers != len(HISTORY_FTS_TRIGGER_NAMES):
+        return False
+    indexed = conn.execute("SELECT COUNT(*) FROM history_fts_docsize").fetchone()[0]
+    return indexed == conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+def _create_history_fts(conn, stop_event):
+    """
+    Tạo history_fts và trigger đồng bộ, rồi nạp các dòng cũ theo lô id. Tiến độ lưu trong history_fts_backfill
+    (cùng transaction với mỗi lô), nên bị dừng giữa chừng thì lần sau làm tiếp từ lô kế tiếp.
+    Bảng có sẵn đã khớp history (do code cũ tạo) thì không nạp lại; bảng thiếu dòng thì xóa index và nạp lại theo lô.
+    """
+    try:
+        in_sync = _history_fts_in_sync(conn)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            fts_exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='history_fts'").fetchone() is not None
+            for statement in HISTORY_FTS_TABLE_STATEMENTS:
+                conn.execute(statement)
+            if conn.execute("SELECT 1 FROM history_fts_backfill").fetchone() is None:
+                if in_sync:
+                    conn.execute("INSERT INTO history_fts_backfill(id, done_id, last_id) VALUES (1, 0, 0)")
+                else:
+                    if fts_exists: # Không biết đã nạp tới đâu: xóa index (không đọc lại history) rồi nạp theo lô
+                        conn.execute("INSERT INTO history_fts(history_fts) VALUES ('delete-all')")
+                    conn.execute("INSERT INTO history_fts_backfill(id, done_id, last_id) "
+                                 "SELECT 1, 0, COALESCE(MAX(id), 0) FROM history") # Dòng mới hơn do trigger nạp
+            for name in HISTORY_FTS_TRIGGER_NAMES: # Thay trigger cũ (không có điều kiện WHEN)
+                conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+            for statement in HISTORY_FTS_TRIGGER_STATEMENTS:
+                conn.execute(statement)
+    except sqlite3.OperationalError as e: # SQLite không có FTS5/trigram (< 3.34): tìm đường dẫn bằng LIKE
+        print(f"Migrations WARNING: FTS5 trigram search unavailable, path search will use LIKE: {e}")
+        return True
+    done_id, last_id = conn.execute("SELECT done_id, last_id FROM history_fts_backfill").fetchone()
+    while done_id < last_id:
+        if stop_event is not None and stop_event.is_set():
+            print(f"Migrations: history_fts load paused at id {done_id}.")
+            return False
+        upper = min(done_id + HISTORY_BACKFILL_BATCH_ROWS, last_id)
+        with conn:
+            conn.execute("INSERT INTO history_fts(rowid, image_path) SELECT id, image_path FROM history WHERE id > ? AND id <= ?",
+                         (done_id, upper))
+            conn.execute("UPDATE history_fts_backfill SET done_id = ?", (upper,))
+        done_id = upper
+        time.sleep(HISTORY_BACKFILL_PAUSE_MS / 1000.0)
+    return True
+
+def _create_history_stats(conn, stop_event):
+    """
+    Tạo bảng thống kê và trigger, rồi cộng các dòng có sẵn theo lô id. Tiến độ lưu trong history_stats_backfill
+    (cùng transaction với mỗi lô), nên bị dừng giữa chừng thì lần sau làm tiếp từ lô kế tiếp.
+    """
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for statement in HISTORY_STATS_TABLE_STATEMENTS:
+            conn.execute(statement)
+        conn.execute("INSERT OR IGNORE INTO history_stats_backfill(id, done_id, last_id) "
+                     "SELECT 1, 0, COALESCE(MAX(id), 0) FROM history")
+        for statement in HISTORY_STATS_TRIGGER_STATEMENTS:
+            conn.execute(statement)
+    done_id, last_id = conn.execute("SELECT done_id, last_id FROM history_stats_backfill").fetchone()
+    while done_id < last_id:
+        if stop_event is not None and stop_event.is_set():
+            print(f"Migrations: history stats backfill paused at id {done_id}.")
+            return False
+        upper = min(done_id + HISTORY_BACKFILL_BATCH_ROWS, last_id)
+        with conn:
+            for statement in _STATS_BACKFILL_STATEMENTS:
+                conn.execute(statement, (done_id, upper))
+            conn.execute("UPDATE history_stats_backfill SET done_id = ?", (upper,))
+        done_id = upper
+        time.sleep(HISTORY_BACKFILL_PAUSE_MS / 1000.0)
+    return True
+
+MIGRATIONS = (
+    Migration(1, "base tables (history, users, pending_recognitions)", _create_base_tables),
+    Migration(2, "history.timestamp_ms column + fill trigger", _add_timestamp_ms_column),
+    Migration(3, "backfill history.timestamp_ms", _backfill_timestamp_ms, background=True, batched=True),
+    Migration(4, "history indexes (timestamp, timestamp_ms, class, confidence)", _create_history_indexes, background=True, batched=True),
+    Migration(5, "history_fts path search", _create_history_fts, background=True, batched=True),
+    Migration(6, "per-class / per-day history stats tables", _create_history_stats, background=True, batched=True),
+)
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1].version
+HISTORY_FTS_SCHEMA_VERSION = 5
+HISTORY_STATS_SCHEMA_VERSION = 6
+
+
+# --- Chạy migration ---
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+def _apply_migration(conn: sqlite3.Connection, migration: Migration, stop_event: Optional[threading.Event]) -> bool:
+    if migration.batched:
+        if not migration.apply(conn, stop_event):
+            return False
+        conn.execute("BEGIN IMMEDIATE")
+    else:
+        conn.execute("BEGIN IMMEDIATE") # Giữ khóa ghi: tiến trình/thread khác không chạy cùng bước này
+        if get_schema_version(conn) >= migration.version:
+            conn.rollback(); return True
+        try:
+            migration.apply(conn, stop_event)
+        except Exception:
+            conn.rollback(); raise
+    conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+    conn.commit()
+    return True
+
+def migrate(conn: sqlite3.Connection, include_background: bool = True,
+            stop_event: Optional[threading.Event] = None) -> int:
+    """
+    Chạy lần lượt các migration chưa áp dụng (theo PRAGMA user_version) và trả về phiên bản schema mới.
+    include_background=False: dừng trước bước đầu tiên cần duyệt cả bảng (để chạy ở thread nền).
+    """
+    version = get_schema_version(conn)
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        if migration.background and not include_background:
+            break
+        t_start = time.perf_counter()
+        try:
+            if not _apply_migration(conn, migration, stop_event):
+                break
+        except sqlite3.Error as e:
+            if conn.in_transaction: conn.rollback()
+            print(f"Migrations Error: step {migration.version} ({migration.description}) failed: {e}")
+            break
+        version = migration.version
+        print(f"Migrations: schema v{version} ({migration.description}) in {(time.perf_counter() - t_start) * 1000:.0f} ms.")
+    return version
+
+
+# --- Tự nâng cấp database khi ứng dụng kết nối ---
+_known_versions: Dict[str, int] = {}
+_background_threads: Dict[str, threading.Thread] = {}
+_migrations_lock = threading.Lock()
+_stop_background = threading.Event()
+
+def ensure_schema(conn: sqlite3.Connection, db_path: str) -> int:
+    """
+    Gọi ở mỗi lần lấy kết nối (chỉ tra dict khi schema đã mới nhất). Lần đầu với mỗi database:
+    chạy ngay các bước nhanh, rồi giao các bước duyệt cả bảng cho thread nền. Trả về phiên bản hiện tại.
+    """
+    key = get_connection_manager(db_path).db_path
+    version = _known_versions.get(key)
+    if version == LATEST_SCHEMA_VERSION:
+        return version
+    with _migrations_lock:
+        if key not in _known_versions:
+            _known_versions[key] = migrate(conn, include_background=False)
+        version = _known_versions[key]
+        if version < LATEST_SCHEMA_VERSION and key not in _background_threads and not _stop_background.is_set():
+            thread = threading.Thread(target=_migrate_in_background, args=(key,), name="schema-migrations", daemon=True)
+            _background_threads[key] = thread
+            thread.start()
+    return version
+
+def _migrate_in_background(db_path: str):
+    manager = get_connection_manager(db_path)
+    conn = manager.get_connection()
+    if conn is None:
+        return
+    try:
+        version = migrate(conn, stop_event=_stop_background)
+        with _migrations_lock: _known_versions[db_path] = version
+    finally:
+        manager.close_thread_connection()
+
+def wait_for_migrations(timeout: Optional[float] = None) -> bool:
+    """Chờ các migration nền chạy xong (dùng cho script/test). True nếu không còn thread nào đang chạy."""
+    with _migrations_lock:
+        threads = list(_background_threads.values())
+    for thread in threads:
+        thread.join(timeout)
+    return not any(thread.is_alive() for thread in threads)
+
+def stop_background_migrations(timeout: Optional[float] = 5.0):
+    """Dừng migration nền sau lô hiện tại (khi thoát ứng dụng); lần chạy sau sẽ làm tiếp."""
+    _stop_background.set()
+    wait_for_migrations(timeout)
+
+def schema_version(db_path: str) -> Optional[int]:
+    """Phiên bản schema đã biết của database (None nếu chưa kết nối lần nào trong tiến trình này)."""
+    return _known_versions.get(get_connection_manager(db_path).db_path)
+
+atexit.register(stop_background_migrations)
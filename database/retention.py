@@ -0,0 +1,228 @@
+# database/retention.py
+"""
+Chính sách lưu giữ lịch sử: chuyển các dòng cũ hơn HISTORY_RETENTION_DAYS ngày sang file archive
+riêng (ATTACH, theo lô), rồi trả các trang trống về hệ điều hành bằng incremental vacuum để file
+history.db không lớn mãi.
+
+    python -m database.retention --days 90
+    python -m database.retention --enable-incremental-vacuum   # database tạo trước khi có auto_vacuum (VACUUM một lần, đóng ứng dụng trước)
+"""
+import os
+import sys
+import time
+import atexit
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+# --- Thêm thư mục gốc vào sys.path ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from database import database_manager
+from database.connection_manager import get_connection_manager, release_connection
+from database.migrations import TIMESTAMP_MS_SQL, HISTORY_BACKFILL_PAUSE_MS
+
+# --- Cấu hình ---
+try:
+    import config
+    HISTORY_RETENTION_DAYS = config.HISTORY_RETENTION_DAYS
+    HISTORY_ARCHIVE_PATH = config.HISTORY_ARCHIVE_PATH
+    HISTORY_VACUUM_STEP_PAGES = config.HISTORY_VACUUM_STEP_PAGES
+except (ImportError, AttributeError):
+    HISTORY_RETENTION_DAYS = 0
+    HISTORY_ARCHIVE_PATH = os.path.join(current_dir, 'history_archive.db')
+    HISTORY_VACUUM_STEP_PAGES = 1000
+    print("Retention WARNING: config retention settings not found, using defaults.")
+
+ARCHIVE_SCHEMA = "archive"
+ARCHIVE_TABLE_STATEMENTS = (
+    # id giữ nguyên như trong history (AUTOINCREMENT: không bao giờ bị dùng lại) nên chuyển lặp lại không tạo bản sao
+    f"""CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.history (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            image_path TEXT NOT NULL,
+            predicted_class_id INTEGER NOT NULL,
+            predicted_class_name TEXT NOT NULL,
+            confidence REAL NOT NULL,
+            timestamp_ms INTEGER,
+            archived_at TEXT NOT NULL
+        )""",
+    f"CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_archive_history_timestamp ON history(timestamp)",
+)
+# Hai bước, mỗi bước một transaction trên một file: với WAL, transaction ghi nhiều file đã ATTACH
+# không nguyên tử giữa các file. Bước 1 ghi vào archive; bước 2 chỉ xóa những dòng đã có trong archive,
+# nên nếu dừng giữa hai bước thì dòng nằm ở cả hai nơi và lần chạy sau xóa nốt (không mất dòng nào).
+_ARCHIVE_CHUNK_SQL = f"""INSERT OR IGNORE INTO {ARCHIVE_SCHEMA}.history(id, timestamp, image_path, predicted_class_id,
+                                                                         predicted_class_name, confidence, timestamp_ms, archived_at)
+                         SELECT id, timestamp, image_path, predicted_class_id, predicted_class_name, confidence,
+                                COALESCE(timestamp_ms, {TIMESTAMP_MS_SQL.format('timestamp')}), ?
+                         FROM main.history WHERE timestamp < ? ORDER BY timestamp, id LIMIT ?"""
+_DELETE_ARCHIVED_CHUNK_SQL = f"""DELETE FROM main.history WHERE id IN (
+                                     SELECT h.id FROM main.history h JOIN {ARCHIVE_SCHEMA}.history a ON a.id = h.id
+                                     WHERE h.timestamp < ? ORDER BY h.timestamp, h.id LIMIT ?)"""
+
+
+def archive_old_history(days: int, archive_path: str = HISTORY_ARCHIVE_PATH,
+                        chunk_rows: Optional[int] = None, stop_event: Optional[threading.Event] = None) -> int:
+    """
+    Chuyển các dòng history cũ hơn `days` ngày sang archive_path theo lô chunk_rows dòng (cũ nhất trước).
+    Bảng thống kê và history_fts được cập nhật bởi trigger như khi xóa bình thường.
+
+    Returns:
+        int: Số dòng đã chuyển khỏi history.
+    """
+    if days <= 0:
+        return 0
+    chunk_rows = max(1, int(chunk_rows or database_manager.HISTORY_DELETE_CHUNK_ROWS))
+    cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+    conn = database_manager.create_connection()
+    if conn is None:
+        print("Retention: Cannot connect to database to archive history.")
+        return 0
+    try:
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_path,))
+    except sqlite3.Error as e:
+        print(f"Retention Error opening archive {archive_path}: {e}")
+        return 0
+    moved = 0
+    try:
+        with conn:
+            for statement in ARCHIVE_TABLE_STATEMENTS:
+                conn.execute(statement)
+        while stop_event is None or not stop_event.is_set():
+            archived_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            with conn:
+                conn.execute(_ARCHIVE_CHUNK_SQL, (archived_at, cutoff, chunk_rows))
+            with conn:
+                deleted = conn.execute(_DELETE_ARCHIVED_CHUNK_SQL, (cutoff, chunk_rows)).rowcount
+            if deleted == 0:
+                break
+            moved += deleted
+            time.sleep(HISTORY_BACKFILL_PAUSE_MS / 1000.0) # Nhường khóa ghi giữa hai lô
+    except sqlite3.Error as e:
+        print(f"Retention Error archiving history: {e}")
+    finally:
+        release_connection(conn) # Rollback phần dở trước khi DETACH (kết nối được giữ lại cho thread này)
+        try: conn.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+        except sqlite3.Error as e: print(f"Retention Error detaching archive: {e}")
+    if moved:
+        print(f"Retention: moved {moved} history rows older than {cutoff} to {archive_path}.")
+    return moved
+
+
+def incremental_vacuum(step_pages: int = HISTORY_VACUUM_STEP_PAGES, stop_event: Optional[threading.Event] = None) -> int:
+    """
+    Trả các trang trống về hệ điều hành, mỗi bước step_pages trang (mỗi bước là một transaction ngắn).
+    Chỉ có tác dụng với database auto_vacuum=INCREMENTAL (database mới; database cũ xem enable_incremental_vacuum).
+
+    Returns:
+        int: Số trang đã giải phóng.
+    """
+    conn = database_manager.create_connection()
+    if conn is None:
+        return 0
+    freed = 0
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free_pages:
+                print(f"Retention: {free_pages} free pages kept in the file (auto_vacuum is off; "
+                      "run 'python -m database.retention --enable-incremental-vacuum' once with the app closed).")
+            return 0
+        while stop_event is None or not stop_event.is_set():
+            before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if before == 0:
+                break
+            # executescript chạy câu lệnh tới hết; execute() chỉ step một lần = giải phóng một trang
+            conn.executescript(f"PRAGMA incremental_vacuum({max(1, int(step_pages))});")
+            freed += before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+            time.sleep(HISTORY_BACKFILL_PAUSE_MS / 1000.0)
+        if freed:
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)") # File chỉ nhỏ lại sau khi các trang được checkpoint
+            print(f"Retention: incremental vacuum freed {freed} pages.")
+    except sqlite3.Error as e:
+        print(f"Retention Error during incremental vacuum: {e}")
+    finally:
+        release_connection(conn)
+    return freed
+
+
+def enable_incremental_vacuum(db_path: Optional[str] = None) -> bool:
+    """
+    Bật auto_vacuum=INCREMENTAL cho database tạo trước đây (cần VACUUM toàn bộ file một lần, chặn ghi trong lúc chạy:
+    chỉ chạy khi ứng dụng đã đóng). Database mới đã được tạo sẵn với chế độ này (connection_manager).
+    """
+    conn = sqlite3.connect(db_path or database_manager.DATABASE_PATH, timeout=30)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            print("Retention: auto_vacuum is already INCREMENTAL.")
+            return True
+        t_start = time.perf_counter()
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        enabled = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        print(f"Retention: VACUUM finished in {time.perf_counter() - t_start:.1f} s, auto_vacuum "
+              f"{'INCREMENTAL' if enabled else 'unchanged'}.")
+        return enabled
+    except sqlite3.Error as e:
+        print(f"Retention Error enabling incremental vacuum: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def apply_retention_policy(days: int = HISTORY_RETENTION_DAYS, archive_path: str = HISTORY_ARCHIVE_PATH,
+                           stop_event: Optional[threading.Event] = None) -> Dict:
+    """Chuyển dòng cũ sang archive rồi incremental vacuum. Trả về {archived, freed_pages, seconds}."""
+    t_start = time.perf_counter()
+    archived = archive_old_history(days, archive_path, stop_event=stop_event)
+    freed = incremental_vacuum(stop_event=stop_event)
+    return {"archived": archived, "freed_pages": freed, "seconds": time.perf_counter() - t_start}
+
+
+# --- Chạy ở thread nền khi ứng dụng mở ---
+_retention_thread: Optional[threading.Thread] = None
+_stop_retention = threading.Event()
+
+def start_retention_in_background() -> Optional[threading.Thread]:
+    """Chạy apply_retention_policy một lần ở thread nền (không làm gì nếu HISTORY_RETENTION_DAYS = 0)."""
+    global _retention_thread
+    if HISTORY_RETENTION_DAYS <= 0 or (_retention_thread is not None and _retention_thread.is_alive()):
+        return None
+    def run():
+        try:
+            apply_retention_policy(stop_event=_stop_retention)
+        finally:
+            get_connection_manager(database_manager.DATABASE_PATH).close_thread_connection()
+    _retention_thread = threading.Thread(target=run, name="history-retention", daemon=True)
+    _retention_thread.start()
+    return _retention_thread
+
+def stop_retention(timeout: Optional[float] = 5.0):
+    """Dừng sau lô hiện tại (khi thoát ứng dụng); lần chạy sau làm tiếp."""
+    _stop_retention.set()
+    if _retention_thread is not None:
+        _retention_thread.join(timeout)
+
+atexit.register(stop_retention)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old recognition history and reclaim free pages.")
+    parser.add_argument("--days", type=int, default=HISTORY_RETENTION_DAYS, help="Move rows older than this many days (0 = keep all).")
+    parser.add_argument("--archive", default=HISTORY_ARCHIVE_PATH, help="Archive database file.")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Convert an existing database to auto_vacuum=INCREMENTAL (full VACUUM, close the app first).")
+    args = parser.parse_args()
+
+    print("--- Running History Retention ---")
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum()
+    result = apply_retention_policy(args.days, args.archive)
+    print(f"Archived {result['archived']} rows, freed {result['freed_pages']} pages in {result['seconds']:.1f} s.")
+    print("--- Retention Finished ---")
@@ -0,0 +1,403 @@
+# gui/batch_recognition_window.py
+
+import sys
+import time
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Optional, Dict, List
+
+try:
+    from PyQt6.QtWidgets import (
+        QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
+        QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView, QProgressBar,
+        QFileDialog, QSpinBox
+    )
+    from PyQt6.QtGui import QFont
+    from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
+    PYQT6_AVAILABLE_BATCH = True
+except ImportError:
+    print("BatchRecognitionWindow FATAL ERROR: PyQt6 not found.")
+    PYQT6_AVAILABLE_BATCH = False
+
+logger_batch = logging.getLogger(__name__)
+
+# --- Add project root ---
+current_dir_batch = Path(__file__).resolve().parent
+project_root_batch = current_dir_batch.parent
+if str(project_root_batch) not in sys.path:
+    sys.path.insert(0, str(project_root_batch))
+
+# --- Import Dependencies ---
+try:
+    from utils.config_loader import load_settings, DEFAULT_SETTINGS
+    CONFIG_LOADER_AVAILABLE_BATCH = True
+except ImportError: CONFIG_LOADER_AVAILABLE_BATCH = False; DEFAULT_SETTINGS = {}; logger_batch.warning("config_loader not found.")
+
+try:
+    from database.history_writer import get_history_writer
+    DATABASE_AVAILABLE_BATCH = True
+except ImportError: DATABASE_AVAILABLE_BATCH = False; logger_batch.warning("database_manager not found.")
+
+try:
+    from .prediction_worker import (post_image_for_prediction, post_paths_for_prediction,
+                                    describe_request_error, BatchApiUnavailable)
+    PREDICTION_HELPERS_AVAILABLE_BATCH = True
+except ImportError: PREDICTION_HELPERS_AVAILABLE_BATCH = False; logger_batch.warning("prediction_worker not found.")
+
+try:
+    from .ui_helpers import show_error_message, show_warning_message
+except ImportError:
+    def show_error_message(p, t, m): print(f"Error: {t} - {m}")
+    def show_warning_message(p, t, m): print(f"Warning: {t} - {m}")
+
+# --- Constants ---
+VALID_IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.ppm'}
+BATCH_DEFAULT_CONCURRENCY = 4   # Số request đồng thời tối đa
+BATCH_PATHS_CHUNK_SIZE = 32     # Số đường dẫn mỗi request /predict_paths
+TOP_N_BATCH = 3
+
+
+def collect_image_files(paths: List[str]) -> List[str]:
+    """Gom file ảnh từ danh sách file/thư mục (thư mục được duyệt đệ quy), bỏ trùng, giữ thứ tự."""
+    collected, seen = [], set()
+    for raw_path in paths:
+        path = Path(raw_path)
+        if path.is_dir():
+            candidates = sorted(p for p in path.rglob('*') if p.is_file())
+        elif path.is_file():
+            candidates = [path]
+        else:
+            continue
+        for candidate in candidates:
+            key = str(candidate.resolve())
+            if candidate.suffix.lower() in VALID_IMAGE_EXTENSIONS and key not in seen:
+                seen.add(key); collected.append(str(candidate))
+    return collected
+
+
+if PYQT6_AVAILABLE_BATCH:
+
+    class BatchChunkSignals(QObject):
+        item_done = pyqtSignal(str, list, str)   # path, top_predictions (rỗng nếu lỗi), thông báo lỗi
+        chunk_done = pyqtSignal(int)             # chunk_id
+        batch_api_unusable = pyqtSignal()        # /predict_paths không dùng được -> các chunk sau gửi từng ảnh
+
+    class BatchChunkWorker(QRunnable):
+        """
+        Xử lý một nhóm ảnh trên QThreadPool: thử /predict_paths (một request cho cả nhóm) nếu được phép,
+        nếu không thì upload từng ảnh qua /predict. Ở chế độ cục bộ cả nhóm được dự đoán trong một lần gọi model.
+        Kiểm tra cờ hủy trước mỗi ảnh.
+        """
+        def __init__(self, chunk_id: int, image_paths: List[str], api_url: str, use_batch_api: bool,
+                     cancel_event: threading.Event, inference_mode: str = "api", upload_max_edge: int = 0):
+            super().__init__()
+            self.chunk_id = chunk_id
+            self.image_paths = image_paths
+            self.api_url = api_url
+            self.use_batch_api = use_batch_api
+            self.cancel_event = cancel_event
+            self.inference_mode = inference_mode
+            self.upload_max_edge = upload_max_edge
+            self.signals = BatchChunkSignals()
+
+        def run(self):
+            remaining = list(self.image_paths)
+            try:
+                if self.inference_mode == "local":
+                    self._run_local(remaining); return
+                if self.use_batch_api and len(remaining) > 1 and not self.cancel_event.is_set():
+                    remaining = self._run_batch_api(remaining)
+                for image_path in remaining:
+                    if self.cancel_event.is_set(): break
+                    try:
+                        top_predictions = post_image_for_prediction(image_path, self.api_url, TOP_N_BATCH, upload_max_edge=self.upload_max_edge)
+                        self.signals.item_done.emit(image_path, top_predictions, "")
+                    except Exception as e:
+                        self.signals.item_done.emit(image_path, [], describe_request_error(e, self.api_url).split('\n')[0])
+            finally:
+                self.signals.chunk_done.emit(self.chunk_id)
+
+        def _run_local(self, image_paths: List[str]):
+            """Dự đoán cả nhóm bằng model trong tiến trình GUI (utils.local_inference)."""
+            if self.cancel_event.is_set(): return
+            try:
+                from utils.local_inference import get_local_engine
+                outputs = get_local_engine().predict_files(image_paths, TOP_N_BATCH)
+            except Exception as e:
+                for image_path in image_paths:
+                    self.signals.item_done.emit(image_path, [], str(e))
+                return
+            for image_path, (error, top_predictions) in zip(image_paths, outputs):
+                self.signals.item_done.emit(image_path, top_predictions, error)
+
+        def _run_batch_api(self, image_paths: List[str]) -> List[str]:
+            """Gửi cả nhóm qua /predict_paths. Trả về các ảnh cần gửi lại bằng upload."""
+            try:
+                results = post_paths_for_prediction(image_paths, self.api_url, TOP_N_BATCH)
+            except BatchApiUnavailable as e:
+                logger_batch.info(f"Batch API unavailable ({e}), falling back to per-image uploads.")
+                self.signals.batch_api_unusable.emit()
+                return image_paths
+            except Exception as e:
+                logger_batch.warning(f"Batch API request failed ({e}), falling back to per-image uploads.")
+                return image_paths
+            retry = []
+            for image_path, result in zip(image_paths, results):
+                if result.get("top_predictions"):
+                    self.signals.item_done.emit(image_path, result["top_predictions"], "")
+                else:
+                    retry.append(image_path) # Server không đọc được file (khác máy / ngoài thư mục cho phép)
+            if len(retry) == len(image_paths):
+                self.signals.batch_api_unusable.emit()
+            return retry
+
+
+class BatchRecognitionWindow(QWidget):
+    """Nhận diện hàng loạt: chọn thư mục / nhiều file, gửi request song song có giới hạn, kết quả hiện dần."""
+    COLUMNS = ["Tệp", "Mã Lớp", "Tên Lớp", "Độ Tin Cậy", "Trạng Thái"]
+
+    def __init__(self, initial_paths: Optional[List[str]] = None, current_user: Optional[Dict] = None, parent=None):
+        super().__init__(parent)
+        if not PYQT6_AVAILABLE_BATCH:
+            raise ImportError("PyQt6 is required for BatchRecognitionWindow but not found.")
+        self.current_user = current_user if current_user else {}
+        self.image_paths: List[str] = []
+        self.thread_pool = QThreadPool(self)
+        self._queue: deque = deque()
+        self._in_flight = 0
+        self._chunk_counter = 0
+        self._cancel_event = threading.Event()
+        self._running = False
+        self._paused = False
+        self._use_batch_api = True
+        self._api_url = ""
+        self._inference_mode = "api"
+        self._upload_max_edge = 0
+        self._completed = 0
+        self._failed = 0
+        self._started_at = 0.0
+        self._paused_total = 0.0
+        self._paused_at = 0.0
+
+        self.setWindowTitle("Nhận Diện Hàng Loạt")
+        self.setGeometry(260, 260, 820, 560)
+        self.setAcceptDrops(True)
+        self.initUI()
+        if initial_paths:
+            self.set_input_paths(initial_paths)
+
+    def initUI(self):
+        main_layout = QVBoxLayout(self)
+        button_font = QFont(); button_font.setPointSize(10)
+
+        # --- Hàng chọn đầu vào ---
+        input_layout = QHBoxLayout()
+        self.folder_button = QPushButton("Chọn Thư Mục..."); self.folder_button.setFont(button_font); self.folder_button.clicked.connect(self.choose_folder)
+        self.files_button = QPushButton("Chọn Nhiều Ảnh..."); self.files_button.setFont(button_font); self.files_button.clicked.connect(self.choose_files)
+        self.input_label = QLabel("Kéo/Thả thư mục hoặc nhiều ảnh vào cửa sổ này")
+        input_layout.addWidget(self.folder_button); input_layout.addWidget(self.files_button); input_layout.addWidget(self.input_label, 1)
+        main_layout.addLayout(input_layout)
+
+        # --- Hàng điều khiển ---
+        control_layout = QHBoxLayout()
+        control_layout.addWidget(QLabel("Số request đồng thời:"))
+        self.concurrency_spin = QSpinBox(); self.concurrency_spin.setRange(1, 16); self.concurrency_spin.setValue(BATCH_DEFAULT_CONCURRENCY)
+        control_layout.addWidget(self.concurrency_spin)
+        control_layout.addStretch(1)
+        self.start_button = QPushButton("Bắt Đầu"); self.start_button.setFont(button_font); self.start_button.setEnabled(False); self.start_button.clicked.connect(self.start_batch)
+        self.pause_button = QPushButton("Tạm Dừng"); self.pause_button.setFont(button_font); self.pause_button.setEnabled(False); self.pause_button.clicked.connect(self.toggle_pause)
+        self.cancel_button = QPushButton("Hủy"); self.cancel_button.setFont(button_font); self.cancel_button.setEnabled(False); self.cancel_button.clicked.connect(self.cancel_batch)
+        control_layout.addWidget(self.start_button); control_layout.addWidget(self.pause_button); control_layout.addWidget(self.cancel_button)
+        main_layout.addLayout(control_layout)
+
+        # --- Tiến độ + tốc độ ---
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar(); self.progress_bar.setRange(0, 1); self.progress_bar.setValue(0)
+        self.throughput_label = QLabel("0 ảnh/s"); self.throughput_label.setMinimumWidth(220)
+        progress_layout.addWidget(self.progress_bar, 1); progress_layout.addWidget(self.throughput_label)
+        main_layout.addLayout(progress_layout)
+
+        # --- Bảng kết quả ---
+        self.results_table = QTableWidget(0, len(self.COLUMNS))
+        self.results_table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.results_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        header = self.results_table.horizontalHeader()
+        header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        main_layout.addWidget(self.results_table, 1)
+
+        self.close_button = QPushButton("Đóng"); self.close_button.clicked.connect(self.close)
+        main_layout.addWidget(self.close_button, 0, Qt.AlignmentFlag.AlignRight)
+
+    # --- Chọn đầu vào ---
+    def _last_dir(self) -> str:
+        if CONFIG_LOADER_AVAILABLE_BATCH:
+            try: return load_settings().get("last_image_dir", str(Path.home()))
+            except Exception: pass
+        return str(Path.home())
+
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Chọn Thư Mục Ảnh", self._last_dir())
+        if folder: self.set_input_paths([folder])
+
+    def choose_files(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "Chọn Ảnh Biển Báo", self._last_dir(), "Image Files (*.png *.jpg *.jpeg *.bmp *.ppm)")
+        if files: self.set_input_paths(files)
+
+    def set_input_paths(self, paths: List[str]):
+        if self._running:
+            show_warning_message(self, "Đang Xử Lý", "Vui lòng chờ hoặc hủy lượt nhận diện hiện tại.")
+            return
+        self.image_paths = collect_image_files(paths)
+        self.input_label.setText(f"{len(self.image_paths)} ảnh đã chọn")
+        self.start_button.setEnabled(bool(self.image_paths))
+        if not self.image_paths:
+            show_warning_message(self, "Không Có Ảnh", f"Không tìm thấy file ảnh hợp lệ ({', '.join(sorted(VALID_IMAGE_EXTENSIONS))}).")
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls(): event.acceptProposedAction()
+        else: event.ignore()
+
+    def dropEvent(self, event):
+        if event.mimeData().hasUrls():
+            self.set_input_paths([url.toLocalFile() for url in event.mimeData().urls()])
+            event.acceptProposedAction()
+        else: event.ignore()
+
+    # --- Điều phối ---
+    def start_batch(self):
+        if self._running or not self.image_paths: return
+        if not PREDICTION_HELPERS_AVAILABLE_BATCH:
+            show_error_message(self, "Lỗi Nhận Diện", "Module prediction_worker không khả dụng.")
+            return
+        current_settings = load_settings() if CONFIG_LOADER_AVAILABLE_BATCH else DEFAULT_SETTINGS
+        self._api_url = current_settings.get("api_url", DEFAULT_SETTINGS.get('api_url', 'http://127.0.0.1:8000/predict'))
+        self._inference_mode = current_settings.get("inference_mode", "api")
+        self._upload_max_edge = int(current_settings.get("upload_max_edge", 0) or 0)
+
+        self.results_table.setRowCount(0)
+        self._cancel_event = threading.Event()
+        self._use_batch_api = True
+        self._completed = self._failed = 0
+        self._paused = False
+        self._paused_total = 0.0
+        self._started_at = time.perf_counter()
+        self._queue = deque(self.image_paths)
+        self.thread_pool.setMaxThreadCount(self.concurrency_spin.value())
+        self.progress_bar.setRange(0, len(self.image_paths)); self.progress_bar.setValue(0)
+        self._set_running(True)
+        logger_batch.info(f"Batch recognition started: {len(self.image_paths)} images, concurrency {self.concurrency_spin.value()}")
+        self._dispatch()
+
+    def _dispatch(self):
+        """Khởi chạy thêm chunk cho tới khi đạt giới hạn đồng thời (chỉ gọi trên GUI thread)."""
+        max_in_flight = self.thread_pool.maxThreadCount()
+        while self._queue and self._in_flight < max_in_flight and not self._paused and not self._cancel_event.is_set():
+            chunk_size = BATCH_PATHS_CHUNK_SIZE if (self._use_batch_api or self._inference_mode == "local") else 1
+            chunk = [self._queue.popleft() for _ in range(min(chunk_size, len(self._queue)))]
+            self._chunk_counter += 1
+            worker = BatchChunkWorker(self._chunk_counter, chunk, self._api_url, self._use_batch_api, self._cancel_event,
+                                      self._inference_mode, self._upload_max_edge)
+            worker.signals.item_done.connect(self._on_item_done)
+            worker.signals.chunk_done.connect(self._on_chunk_done)
+            worker.signals.batch_api_unusable.connect(self._on_batch_api_unusable)
+            self._in_flight += 1
+            self.thread_pool.start(worker)
+        if self._in_flight == 0 and (not self._queue or self._cancel_event.is_set()):
+            self._finish_batch()
+
+    def _on_batch_api_unusable(self):
+        if self._use_batch_api:
+            logger_batch.info("Switching batch recognition to per-image uploads.")
+            self._use_batch_api = False
+
+    def _on_item_done(self, image_path: str, top_predictions: list, error: str):
+        row = self.results_table.rowCount()
+        self.results_table.insertRow(row)
+        self.results_table.setItem(row, 0, QTableWidgetItem(image_path))
+        if top_predictions:
+            top1 = top_predictions[0]
+            self.results_table.setItem(row, 1, QTableWidgetItem(str(top1['class_id'])))
+            self.results_table.setItem(row, 2, QTableWidgetItem(top1['class_name']))
+            self.results_table.setItem(row, 3, QTableWidgetItem(f"{top1['confidence']:.2%}"))
+            self.results_table.setItem(row, 4, QTableWidgetItem("OK"))
+            if DATABASE_AVAILABLE_BATCH and not get_history_writer().submit(image_path, top1['class_id'], top1['class_name'], top1['confidence']):
+                logger_batch.warning(f"History writer did not accept result for {image_path} (stopped or queue full).")
+        else:
+            self._failed += 1
+            self.results_table.setItem(row, 4, QTableWidgetItem(f"Lỗi: {error}"))
+        self._completed += 1
+        self.progress_bar.setValue(self._completed)
+        self._update_throughput()
+
+    def _on_chunk_done(self, chunk_id: int):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _update_throughput(self):
+        elapsed = time.perf_counter() - self._started_at - self._paused_total
+        rate = self._completed / elapsed if elapsed > 0 else 0.0
+        self.throughput_label.setText(f"{self._completed}/{len(self.image_paths)} ảnh, {rate:.1f} ảnh/s"
+                                      + (f", {self._failed} lỗi" if self._failed else ""))
+
+    def _flush_history(self):
+        """Yêu cầu history_writer ghi ngay phần kết quả còn chờ (không chặn GUI thread)."""
+        if DATABASE_AVAILABLE_BATCH: get_history_writer().flush(timeout=0)
+
+    # --- Tạm dừng / Hủy ---
+    def toggle_pause(self):
+        if not self._running: return
+        self._paused = not self._paused
+        if self._paused:
+            self._paused_at = time.perf_counter()
+            self.pause_button.setText("Tiếp Tục")
+        else:
+            self._paused_total += time.perf_counter() - self._paused_at
+            self.pause_button.setText("Tạm Dừng")
+            self._dispatch()
+
+    def cancel_batch(self):
+        if not self._running: return
+        logger_batch.info("Batch recognition cancelled by user.")
+        self._cancel_event.set()
+        self._queue.clear()
+        self.cancel_button.setEnabled(False); self.pause_button.setEnabled(False)
+        self._dispatch() # Kết thúc ngay nếu không còn chunk đang chạy
+
+    def _finish_batch(self):
+        if not self._running: return
+        if self._paused: self._paused_total += time.perf_counter() - self._paused_at
+        self._paused = False
+        self._flush_history()
+        self._set_running(False)
+        self._update_throughput()
+        status = "đã hủy" if self._cancel_event.is_set() else "hoàn tất"
+        logger_batch.info(f"Batch recognition {status}: {self._completed} images ({self._failed} errors). {self.throughput_label.text()}")
+
+    def _set_running(self, running: bool):
+        self._running = running
+        self.start_button.setEnabled(not running and bool(self.image_paths))
+        self.folder_button.setEnabled(not running); self.files_button.setEnabled(not running)
+        self.concurrency_spin.setEnabled(not running)
+        self.pause_button.setEnabled(running); self.pause_button.setText("Tạm Dừng")
+        self.cancel_button.setEnabled(running)
+
+    def closeEvent(self, event):
+        if self._running:
+            self._cancel_event.set(); self._queue.clear()
+            self.thread_pool.waitForDone(3000) # Ảnh đang gửi dở kết thúc rồi mới ghi lịch sử
+            QApplication.processEvents()       # Nhận các signal item_done còn trong hàng đợi
+            self._flush_history()
+            self._running = False
+        super().closeEvent(event)
+
+
+# --- Test Block ---
+if __name__ == '__main__':
+    app_test = QApplication(sys.argv)
+    batch_window = BatchRecognitionWindow(initial_paths=sys.argv[1:])
+    batch_window.show()
+    sys.exit(app_test.exec())
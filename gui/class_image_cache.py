@@ -0,0 +1,205 @@
+# gui/class_image_cache.py
+
+import os
+import json
+import hashlib
+import time
+import logging
+import threading
+from typing import Dict, Optional, Tuple, List
+
+from PyQt6.QtCore import QObject, Qt, QRect, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap, QPainter
+
+logger_class_img = logging.getLogger(__name__)
+
+try:
+    import config
+    CLASS_IMAGE_DISPLAY_SIZES = tuple(config.CLASS_IMAGE_DISPLAY_SIZES)
+    CLASS_ATLAS_DIR = config.CLASS_ATLAS_DIR
+    NUM_CLASSES_IMG = config.NUM_CLASSES
+except (ImportError, AttributeError):
+    CLASS_IMAGE_DISPLAY_SIZES = (180,)
+    CLASS_ATLAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'class_atlas')
+    NUM_CLASSES_IMG = 43
+    logger_class_img.warning("ClassImageCache: config settings not found, using defaults.")
+
+ATLAS_COLUMNS = 8
+
+
+def resolve_class_images_dir(class_images_dir: Optional[str] = None) -> str:
+    """Thư mục ảnh mẫu: tham số, rồi Settings; nếu không tồn tại thì dùng thư mục mặc định của dự án."""
+    candidates = [class_images_dir]
+    try:
+        from utils.config_loader import load_settings, DEFAULT_SETTINGS
+        candidates += [load_settings().get('class_images_dir'), DEFAULT_SETTINGS.get('class_images_dir')]
+    except ImportError:
+        pass
+    candidates.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gui', 'assets', 'class_images'))
+    for candidate in candidates:
+        if candidate and os.path.isdir(candidate):
+            return os.path.abspath(candidate)
+    return os.path.abspath(class_images_dir or candidates[-1])
+
+
+def class_image_path(class_images_dir: str, class_id: int) -> str:
+    return os.path.join(class_images_dir, f"{class_id}.png")
+
+
+def _directory_signature(class_images_dir: str) -> List[Tuple[int, int, int]]:
+    """(class_id, mtime_ns, size) của các ảnh mẫu hiện có; atlas cũ hết hiệu lực khi ảnh nào thay đổi."""
+    signature = []
+    for class_id in range(NUM_CLASSES_IMG):
+        try: stat = os.stat(class_image_path(class_images_dir, class_id))
+        except OSError: continue
+        signature.append((class_id, stat.st_mtime_ns, stat.st_size))
+    return signature
+
+
+def scale_to_cell(image: QImage, edge: int) -> QImage:
+    """Scale (phóng to hoặc thu nhỏ) vừa ô edge x edge, giữ tỷ lệ — giống scale_pixmap của ResultWindow."""
+    return image.scaled(edge, edge, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+
+
+def _atlas_paths(class_images_dir: str, edge: int) -> Tuple[str, str]:
+    name = f"atlas_{hashlib.sha1(class_images_dir.encode('utf-8')).hexdigest()[:12]}_{edge}"
+    return os.path.join(CLASS_ATLAS_DIR, f"{name}.png"), os.path.join(CLASS_ATLAS_DIR, f"{name}.json")
+
+
+def load_atlas(class_images_dir: str, edge: int, signature) -> Optional[Dict[int, QImage]]:
+    """Đọc atlas (một file PNG + chỉ mục JSON) nếu còn khớp với ảnh mẫu hiện tại."""
+    atlas_png, atlas_json = _atlas_paths(class_images_dir, edge)
+    try:
+        with open(atlas_json, 'r', encoding='utf-8') as f_json:
+            index = json.load(f_json)
+    except (OSError, ValueError):
+        return None
+    if index.get('directory') != class_images_dir or index.get('signature') != [list(item) for item in signature]:
+        return None
+    atlas = QImage(atlas_png)
+    if atlas.isNull():
+        return None
+    return {int(class_id): atlas.copy(QRect(*rect)) for class_id, rect in index.get('cells', {}).items()}
+
+
+def save_atlas(class_images_dir: str, edge: int, signature, images: Dict[int, QImage]):
+    """Ghép các ảnh đã scale vào một atlas ATLAS_COLUMNS cột để lần khởi động sau chỉ đọc một file."""
+    if not images:
+        return
+    rows = (max(images) // ATLAS_COLUMNS) + 1
+    atlas = QImage(ATLAS_COLUMNS * edge, rows * edge, QImage.Format.Format_ARGB32_Premultiplied)
+    atlas.fill(Qt.GlobalColor.transparent)
+    cells = {}
+    painter = QPainter(atlas)
+    for class_id, image in images.items():
+        x, y = (class_id % ATLAS_COLUMNS) * edge, (class_id // ATLAS_COLUMNS) * edge
+        painter.drawImage(x, y, image)
+        cells[str(class_id)] = [x, y, image.width(), image.height()]
+    painter.end()
+    atlas_png, atlas_json = _atlas_paths(class_images_dir, edge)
+    try:
+        os.makedirs(CLASS_ATLAS_DIR, exist_ok=True)
+        if not atlas.save(atlas_png, "PNG"):
+            return
+        with open(atlas_json, 'w', encoding='utf-8') as f_json:
+            json.dump({'directory': class_images_dir, 'edge': edge, 'signature': signature, 'cells': cells}, f_json)
+    except OSError as e:
+        logger_class_img.warning(f"Cannot write class image atlas: {e}")
+
+
+class ClassImageCache(QObject):
+    """
+    Ảnh mẫu của các lớp, tải một lần trên thread nền và scale sẵn theo các kích thước hiển thị
+    (CLASS_IMAGE_DISPLAY_SIZES). Sau khi preload xong, get() chỉ đọc từ RAM.
+    """
+    preloaded = pyqtSignal(str) # thư mục đã tải xong
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lock = threading.Lock()
+        self._images: Dict[Tuple[str, int], Dict[int, QImage]] = {} # (thư mục, cạnh) -> {class_id: QImage}
+        self._pixmaps: Dict[Tuple[str, int, int], QPixmap] = {}     # chỉ dùng trên GUI thread
+        self._loading = set()
+        self._resolved_dirs: Dict[Optional[str], str] = {} # Tránh đọc Settings / stat thư mục mỗi lần get()
+
+    def _directory(self, class_images_dir: Optional[str]) -> str:
+        directory = self._resolved_dirs.get(class_images_dir)
+        if directory is None:
+            directory = self._resolved_dirs[class_images_dir] = resolve_class_images_dir(class_images_dir)
+        return directory
+
+    def preload_async(self, class_images_dir: Optional[str] = None, sizes=CLASS_IMAGE_DISPLAY_SIZES):
+        """Bắt đầu tải ảnh mẫu trên thread nền (bỏ qua nếu đã tải / đang tải)."""
+        directory = self._directory(class_images_dir)
+        with self._lock:
+            if directory in self._loading or all((directory, edge) in self._images for edge in sizes):
+                return
+            self._loading.add(directory)
+        threading.Thread(target=self._preload, args=(directory, tuple(sizes)), name="class-image-preload", daemon=True).start()
+
+    def _preload(self, directory: str, sizes):
+        t_start = time.perf_counter()
+        try:
+            signature = _directory_signature(directory)
+            originals: Dict[int, QImage] = {}
+            for edge in sizes:
+                images = load_atlas(directory, edge, signature)
+                source = "atlas"
+                if images is None:
+                    source = "files"
+                    if not originals:
+                        for class_id, _, _ in signature:
+                            image = QImage(class_image_path(directory, class_id))
+                            if not image.isNull(): originals[class_id] = image
+                    images = {class_id: scale_to_cell(image, edge) for class_id, image in originals.items()}
+                    save_atlas(directory, edge, signature, images)
+                with self._lock:
+                    self._images[(directory, edge)] = images
+                logger_class_img.info(f"Loaded {len(images)} class images ({edge}px) from {source} in {(time.perf_counter() - t_start) * 1000:.1f} ms.")
+        except Exception as e:
+            logger_class_img.error(f"Class image preload failed for {directory}: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._loading.discard(directory)
+        try: self.preloaded.emit(directory)
+        except RuntimeError: pass # Ứng dụng đã thoát
+
+    def is_loaded(self, class_images_dir: Optional[str] = None, edge: int = CLASS_IMAGE_DISPLAY_SIZES[0]) -> bool:
+        directory = self._directory(class_images_dir)
+        with self._lock:
+            return (directory, edge) in self._images
+
+    def get(self, class_id: int, edge: int, class_images_dir: Optional[str] = None) -> Optional[QPixmap]:
+        """
+        QPixmap ảnh mẫu đã scale vừa edge x edge (chỉ gọi trên GUI thread). Nếu chưa preload xong,
+        đọc riêng ảnh đó từ đĩa (và bắt đầu preload). None nếu không có ảnh mẫu.
+        """
+        directory = self._directory(class_images_dir)
+        key = (directory, edge, int(class_id))
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            return pixmap
+        with self._lock:
+            images = self._images.get((directory, edge))
+        if images is not None:
+            image = images.get(int(class_id))
+        else:
+            self.preload_async(directory, tuple(sorted(set(CLASS_IMAGE_DISPLAY_SIZES) | {edge})))
+            image = QImage(class_image_path(directory, class_id))
+            image = scale_to_cell(image, edge) if not image.isNull() else None
+        if image is None:
+            return None
+        pixmap = QPixmap.fromImage(image)
+        self._pixmaps[key] = pixmap
+        return pixmap
+
+
+_shared_cache: Optional[ClassImageCache] = None
+
+
+def get_class_image_cache() -> ClassImageCache:
+    """Cache ảnh mẫu dùng chung (tạo lần đầu trên GUI thread)."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ClassImageCache()
+    return _shared_cache
@@ -4,10 +4,11 @@ import sys
 import os
 from pathlib import Path # Thêm Path
 from PyQt6.QtWidgets import (
-    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
-    QPushButton, QHeaderView, QMessageBox, QAbstractItemView, QSpacerItem, QSizePolicy
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTableView, QLabel,
+    QPushButton, QHeaderView, QMessageBox, QAbstractItemView, QSpacerItem, QSizePolicy,
+    QComboBox, QCheckBox, QDateEdit, QDoubleSpinBox, QLineEdit
 )
-from PyQt6.QtCore import Qt, QItemSelectionModel
+from PyQt6.QtCore import Qt, QItemSelectionModel, QDate, QTimer, QSize
 
 # --- Add project root ---
 current_dir_hist = Path(__file__).resolve().parent
@@ -17,10 +18,21 @@ if str(project_root_hist) not in sys.path:
 
 # --- Import Dependencies ---
 try:
-    from database.database_manager import get_all_history, delete_history_records
+    from database.database_manager import delete_history_records
     DATABASE_AVAILABLE_HIST = True
 except ImportError: DATABASE_AVAILABLE_HIST = False; print("HistoryMgtWindow: DB manager not found.")
 
+from .history_table_model import HistoryTableModel
+
+try: import config; HISTORY_THUMBNAIL_SIZE = config.HISTORY_THUMBNAIL_SIZE
+except (ImportError, AttributeError): HISTORY_THUMBNAIL_SIZE = 40
+
+try: from utils.inference_pipeline import CLASS_NAMES # Danh sách lớp cho bộ lọc (không cần quét bảng history)
+except ImportError: CLASS_NAMES = {}; print("HistoryMgtWindow: CLASS_NAMES not found, class filter disabled.")
+
+FILTER_DEBOUNCE_MS = 300 # Chờ người dùng gõ xong trước khi truy vấn lại
+PATH_SEARCH_MIN_CHARS = 3 # Chuỗi ngắn hơn không dùng được index trigram (phải quét toàn bảng)
+
 try: from .ui_helpers import show_error_message, show_info_message, ask_confirmation
 except ImportError: print("HistoryMgtWindow: ui_helpers not found."); # Thêm fallback nếu muốn
 
@@ -77,19 +89,68 @@ class HistoryManagementWindow(QWidget):
         # self.close_button = QPushButton('Đóng') # Bỏ đi
         # ... (code liên quan close_button bị bỏ) ...
 
-        # --- Bảng lịch sử ---
-        self.history_table = QTableWidget()
-        self.history_table.setColumnCount(5)
-        self.history_table.setHorizontalHeaderLabels(['ID', 'Thời gian', 'Ảnh', 'Kết quả', 'Tin cậy'])
-        header = self.history_table.horizontalHeader(); header.setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents); header.setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents); header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch); header.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents); header.setSectionResizeMode(4, QHeaderView.ResizeMode.ResizeToContents)
+        # --- Bộ lọc (chạy bằng SQL có index, kết quả vẫn được tải theo trang) ---
+        filter_layout = QHBoxLayout()
+        layout.addLayout(filter_layout)
+        self._filter_timer = QTimer(self); self._filter_timer.setSingleShot(True); self._filter_timer.setInterval(FILTER_DEBOUNCE_MS)
+        self._filter_timer.timeout.connect(self.applyFilters)
+
+        self.class_filter_combo = QComboBox()
+        self.class_filter_combo.addItem("Tất cả biển báo", None)
+        for class_id, class_name in sorted(CLASS_NAMES.items()): self.class_filter_combo.addItem(f"{class_id}: {class_name}", class_id)
+        self.class_filter_combo.setEnabled(bool(CLASS_NAMES))
+        self.class_filter_combo.currentIndexChanged.connect(self.scheduleFilterUpdate)
+        filter_layout.addWidget(self.class_filter_combo)
+
+        self.date_from_check = QCheckBox("Từ"); self.date_from_edit = QDateEdit(QDate.currentDate().addDays(-7))
+        self.date_to_check = QCheckBox("Đến"); self.date_to_edit = QDateEdit(QDate.currentDate())
+        for check, edit in ((self.date_from_check, self.date_from_edit), (self.date_to_check, self.date_to_edit)):
+            edit.setCalendarPopup(True); edit.setDisplayFormat("yyyy-MM-dd"); edit.setEnabled(False)
+            check.toggled.connect(edit.setEnabled); check.toggled.connect(self.scheduleFilterUpdate)
+            edit.dateChanged.connect(self.scheduleFilterUpdate)
+            filter_layout.addWidget(check); filter_layout.addWidget(edit)
+
+        filter_layout.addWidget(QLabel("Tin cậy (%):"))
+        self.min_conf_spin = QDoubleSpinBox(); self.max_conf_spin = QDoubleSpinBox()
+        for spin, value in ((self.min_conf_spin, 0.0), (self.max_conf_spin, 100.0)):
+            spin.setRange(0.0, 100.0); spin.setDecimals(1); spin.setSingleStep(5.0); spin.setValue(value)
+            spin.valueChanged.connect(self.scheduleFilterUpdate)
+        filter_layout.addWidget(self.min_conf_spin); filter_layout.addWidget(QLabel("-")); filter_layout.addWidget(self.max_conf_spin)
+
+        self.path_search_edit = QLineEdit()
+        self.path_search_edit.setPlaceholderText(f"Tìm theo đường dẫn ảnh (ít nhất {PATH_SEARCH_MIN_CHARS} ký tự)...")
+        self.path_search_edit.setClearButtonEnabled(True)
+        self.path_search_edit.textChanged.connect(self.scheduleFilterUpdate)
+        filter_layout.addWidget(self.path_search_edit, 1)
+
+        self.clear_filter_button = QPushButton("Xóa Lọc")
+        self.clear_filter_button.clicked.connect(self.clearFilters)
+        filter_layout.addWidget(self.clear_filter_button)
+
+        # --- Bảng lịch sử (QTableView + model ảo: chỉ tải các trang đã cuộn tới, sắp xếp bằng SQL) ---
+        self.history_model = HistoryTableModel(self)
+        self.history_model.enable_thumbnails(HISTORY_THUMBNAIL_SIZE) # Thumbnail tạo nền, lưu cache đĩa
+        self.history_table = QTableView()
+        self.history_table.setModel(self.history_model)
+        self.history_table.setIconSize(QSize(HISTORY_THUMBNAIL_SIZE, HISTORY_THUMBNAIL_SIZE))
+        self.history_table.verticalHeader().setVisible(False)
+        self.history_table.verticalHeader().setDefaultSectionSize(HISTORY_THUMBNAIL_SIZE + 4) # Chiều cao dòng cố định, không đo từng dòng
+        # ResizeToContents phải đo mọi dòng đã tải, nên dùng độ rộng cố định (Interactive) cho các cột nhỏ
+        header = self.history_table.horizontalHeader(); header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive); header.setSectionResizeMode(2, QHeaderView.ResizeMode.Stretch)
+        for column, width in ((0, 70), (1, 150), (3, 180), (4, 80)): self.history_table.setColumnWidth(column, width)
         self.history_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers); self.history_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows); self.history_table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection); self.history_table.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel); self.history_table.setHorizontalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
-        self.history_table.itemSelectionChanged.connect(self.updateDeleteButtonState)
+        self.history_table.selectionModel().selectionChanged.connect(self.updateDeleteButtonState)
+        self.history_model.rowsInserted.connect(self.updateStatusLabel)
+        self.history_model.modelReset.connect(self.updateDeleteButtonState)
         layout.addWidget(self.history_table)
 
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+
         if not DATABASE_AVAILABLE_HIST:
-            self.refresh_button.setEnabled(False); self.delete_button.setEnabled(False)
+            self.refresh_button.setEnabled(False); self.delete_button.setEnabled(False); self.clear_filter_button.setEnabled(False)
             show_error_message(self, "Lỗi Database", "Chức năng lịch sử không khả dụng.")
-            self.history_table.setRowCount(1); item = QTableWidgetItem("Không thể tải lịch sử."); item.setTextAlignment(Qt.AlignmentFlag.AlignCenter); self.history_table.setItem(0, 0, item); self.history_table.setSpan(0, 0, 1, self.history_table.columnCount())
+            self.status_label.setText("Không thể tải lịch sử.")
         else: self.updateDeleteButtonState()
 
     def updateDeleteButtonState(self):
@@ -97,56 +158,61 @@ class HistoryManagementWindow(QWidget):
         enable_delete = DATABASE_AVAILABLE_HIST and bool(self.history_table.selectionModel().selectedRows())
         self.delete_button.setEnabled(enable_delete)
 
-    def loadHistoryData(self):
-        """Lấy dữ liệu từ database và cập nhật bảng."""
+    def currentFilters(self) -> dict:
+        """Đọc bộ lọc từ các control (định dạng của database_manager.build_history_filter_sql)."""
+        min_conf, max_conf = self.min_conf_spin.value(), self.max_conf_spin.value()
+        path_query = self.path_search_edit.text().strip()
+        return {
+            "class_id": self.class_filter_combo.currentData(),
+            "date_from": self.date_from_edit.date().toPyDate() if self.date_from_check.isChecked() else None,
+            "date_to": self.date_to_edit.date().toPyDate() if self.date_to_check.isChecked() else None,
+            "min_confidence": min_conf / 100.0 if min_conf > 0.0 else None,
+            "max_confidence": max_conf / 100.0 if max_conf < 100.0 else None,
+            "path_query": path_query if len(path_query) >= PATH_SEARCH_MIN_CHARS else None,
+        }
+
+    def scheduleFilterUpdate(self, *_):
+        """Gom các thay đổi liên tiếp (gõ phím, kéo spinbox) thành một truy vấn."""
+        if DATABASE_AVAILABLE_HIST: self._filter_timer.start()
+
+    def applyFilters(self):
+        """Áp dụng bộ lọc hiện tại và tải lại trang đầu."""
         if not DATABASE_AVAILABLE_HIST: return
-        # Ngắt kết nối signal tạm thời
-        try: self.history_table.itemSelectionChanged.disconnect(self.updateDeleteButtonState)
-        except TypeError: pass # Bỏ qua nếu chưa kết nối
+        self._filter_timer.stop()
+        self.history_model.set_filters(self.currentFilters())
+        self.history_table.scrollToTop()
+        self.updateStatusLabel(); self.updateDeleteButtonState()
+
+    def clearFilters(self):
+        """Đưa các control lọc về mặc định (một lần truy vấn)."""
+        for widget in (self.class_filter_combo, self.date_from_check, self.date_to_check, self.min_conf_spin, self.max_conf_spin, self.path_search_edit):
+            widget.blockSignals(True)
+        self.class_filter_combo.setCurrentIndex(0); self.date_from_check.setChecked(False); self.date_to_check.setChecked(False)
+        self.date_from_edit.setEnabled(False); self.date_to_edit.setEnabled(False)
+        self.min_conf_spin.setValue(0.0); self.max_conf_spin.setValue(100.0); self.path_search_edit.clear()
+        for widget in (self.class_filter_combo, self.date_from_check, self.date_to_check, self.min_conf_spin, self.max_conf_spin, self.path_search_edit):
+            widget.blockSignals(False)
+        self.applyFilters()
+
+    def updateStatusLabel(self):
+        """Hiển thị số dòng đã tải / tổng số bản ghi."""
+        loaded = self.history_model.rowCount(); total = self.history_model.total_count or 0
+        filtered = bool(self.history_model.filters)
+        if total == 0: self.status_label.setText("Không có bản ghi khớp bộ lọc." if filtered else "Không có dữ liệu lịch sử.")
+        else: self.status_label.setText(f"Đang hiển thị {loaded} / {total} bản ghi{' (đã lọc)' if filtered else ''} (trang cuối: {self.history_model.last_page_ms:.1f} ms)")
 
+    def loadHistoryData(self):
+        """Tải lại trang đầu tiên của lịch sử (các trang sau được tải khi cuộn)."""
+        if not DATABASE_AVAILABLE_HIST: return
         print("HistoryMgtWindow: Loading history data...")
-        try: history_records = get_all_history()
-        except Exception as e: print(f"HistoryMgtWindow: Error get_all_history: {e}"); show_error_message(self, "Lỗi DB", f"Lỗi lấy lịch sử:\n{e}"); history_records = []
-
-        self.history_table.setRowCount(0) # Xóa bảng cũ
-        if not history_records:
-            print("HistoryMgtWindow: No history records found."); self.history_table.setRowCount(1); item = QTableWidgetItem("Không có dữ liệu lịch sử."); item.setTextAlignment(Qt.AlignmentFlag.AlignCenter); self.history_table.setItem(0, 0, item); self.history_table.setSpan(0, 0, 1, self.history_table.columnCount())
+        if self.history_table.isSortingEnabled():
+            self.history_model.refresh() # Giữ cột/chiều sắp xếp hiện tại
         else:
-            self.history_table.setRowCount(len(history_records))
-            for row_index, record in enumerate(history_records):
-                # Lấy dữ liệu an toàn với .get()
-                rec_id = record.get('id', '')
-                rec_time = record.get('timestamp', 'N/A')
-                rec_path = record.get('image_path', 'N/A')
-                rec_class = record.get('predicted_class_name', 'N/A')
-                rec_conf = record.get('confidence', 'N/A')
-
-                item_id = QTableWidgetItem(str(rec_id))
-                item_timestamp = QTableWidgetItem(rec_time)
-                item_path = QTableWidgetItem(rec_path)
-                item_class = QTableWidgetItem(rec_class)
-                item_confidence = QTableWidgetItem(rec_conf)
-
-                # Căn chỉnh
-                item_id.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                item_confidence.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-                item_timestamp.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-
-                # Lưu ID vào dữ liệu của item để dễ lấy khi xóa
-                item_id.setData(Qt.ItemDataRole.UserRole, rec_id)
-
-                # Đặt item vào bảng
-                self.history_table.setItem(row_index, 0, item_id)
-                self.history_table.setItem(row_index, 1, item_timestamp)
-                self.history_table.setItem(row_index, 2, item_path)
-                self.history_table.setItem(row_index, 3, item_class)
-                self.history_table.setItem(row_index, 4, item_confidence)
-
-            print(f"HistoryMgtWindow: Loaded {len(history_records)} records.")
-            self.history_table.scrollToTop() # Cuộn lên đầu bảng
-
-        # Kết nối lại signal và cập nhật nút
-        self.updateDeleteButtonState(); self.history_table.itemSelectionChanged.connect(self.updateDeleteButtonState)
+            self.history_table.setSortingEnabled(True) # Lần đầu: gọi model.sort() -> tải trang đầu, mới nhất trước
+            self.history_table.sortByColumn(0, Qt.SortOrder.DescendingOrder)
+        print(f"HistoryMgtWindow: Loaded {self.history_model.rowCount()} of {self.history_model.total_count} records.")
+        self.history_table.scrollToTop() # Cuộn lên đầu bảng
+        self.updateStatusLabel(); self.updateDeleteButtonState()
 
     def deleteSelectedHistory(self):
         """Xóa các dòng được chọn trong bảng khỏi database."""
@@ -157,21 +223,17 @@ class HistoryManagementWindow(QWidget):
 
         ids_to_delete = []
         for model_index in selected_rows_indices:
-            row = model_index.row(); id_item = self.history_table.item(row, 0) # Lấy item ở cột ID (cột 0)
-            if id_item:
-                # Lấy ID đã lưu trong data của item
-                record_id = id_item.data(Qt.ItemDataRole.UserRole)
-                if record_id is not None:
-                    try: ids_to_delete.append(int(record_id)) # Chuyển sang int
-                    except ValueError: print(f"Warning: Invalid non-integer ID found in row {row}: {record_id}")
-                else: print(f"Warning: Could not retrieve record ID from item data in row {row}")
-            else: print(f"Warning: Could not get item for ID column in selected row {row}")
+            row = model_index.row(); record_id = self.history_model.record_id(row) # ID lấy từ model, không phụ thuộc text hiển thị
+            if record_id is not None:
+                try: ids_to_delete.append(int(record_id)) # Chuyển sang int
+                except ValueError: print(f"Warning: Invalid non-integer ID found in row {row}: {record_id}")
+            else: print(f"Warning: Could not retrieve record ID for selected row {row}")
 
         if not ids_to_delete: show_error_message(self, "Lỗi", "Không thể lấy được ID của các mục đã chọn."); return
 
         num_selected = len(ids_to_delete)
         if ask_confirmation(self, "Xác nhận Xóa", f"Bạn có chắc chắn muốn xóa {num_selected} mục đã chọn khỏi lịch sử không?\nHành động này không thể hoàn tác."):
-            print(f"Attempting to delete history records with IDs: {ids_to_delete}")
+            print(f"Attempting to delete {num_selected} history records.")
             success, message = delete_history_records(ids_to_delete) # Gọi hàm từ DB manager
             if success: show_info_message(self, "Thành công", message); self.loadHistoryData() # Tải lại bảng
             else: show_error_message(self, "Xóa Thất Bại", message)
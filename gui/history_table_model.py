@@ -0,0 +1,160 @@
+# gui/history_table_model.py
+
+import os
+import time
+import logging
+from typing import Optional, List, Dict
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+logger_hist_model = logging.getLogger(__name__)
+
+try:
+    from database.database_manager import get_history_page, count_history
+    DATABASE_AVAILABLE_HIST_MODEL = True
+except ImportError:
+    DATABASE_AVAILABLE_HIST_MODEL = False
+    logger_hist_model.warning("HistoryTableModel: database_manager not found.")
+
+try:
+    from .thumbnail_cache import get_thumbnail_cache
+    THUMBNAIL_CACHE_AVAILABLE_HIST_MODEL = True
+except ImportError:
+    THUMBNAIL_CACHE_AVAILABLE_HIST_MODEL = False
+    logger_hist_model.warning("HistoryTableModel: thumbnail_cache not found, thumbnails disabled.")
+
+
+class HistoryTableModel(QAbstractTableModel):
+    """
+    Model ảo cho bảng lịch sử: chỉ giữ các dòng đã cuộn tới, lấy thêm từng trang từ SQLite
+    (keyset theo cột sắp xếp + id) khi QTableView gọi fetchMore. Sắp xếp và lọc được thực hiện bởi SQL.
+    """
+    HEADERS = ['ID', 'Thời gian', 'Ảnh', 'Kết quả', 'Tin cậy']
+    COLUMN_KEYS = ['id', 'timestamp', 'image_path', 'predicted_class_name', 'confidence']
+    PAGE_SIZE = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[tuple] = []   # (id, timestamp, image_path, class_id, class_name, confidence)
+        self._has_more = DATABASE_AVAILABLE_HIST_MODEL
+        self._next_cursor = None # Con trỏ keyset của trang kế tiếp (get_history_page)
+        self._sort_column = 'id'
+        self._descending = True
+        self._filters: Dict = {}
+        self.total_count: Optional[int] = None
+        self.last_page_ms = 0.0
+        # Thumbnail ở cột 'Ảnh' (tắt mặc định, bật bằng enable_thumbnails)
+        self._thumbnail_edge = 0
+        self._thumbnails: Dict[int, object] = {}           # dòng -> QPixmap đã có (không stat file lại khi vẽ lại)
+        self._rows_by_path: Dict[str, List[int]] = {}      # đường dẫn tuyệt đối -> các dòng dùng ảnh đó
+
+    # --- Kích thước ---
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    # --- Dữ liệu (định dạng khi hiển thị, không tạo trước item cho mọi dòng) ---
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        record = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0: return str(record[0])
+            if column == 1: return record[1]
+            if column == 2: return record[2]
+            if column == 3: return record[4]
+            if column == 4: return f"{record[5]:.2%}" if isinstance(record[5], (float, int)) else "N/A"
+        elif role == Qt.ItemDataRole.DecorationRole and column == 2 and self._thumbnail_edge:
+            return self._thumbnail_for_row(index.row())
+        elif role == Qt.ItemDataRole.TextAlignmentRole and column in (0, 1, 4):
+            return Qt.AlignmentFlag.AlignCenter
+        elif role == Qt.ItemDataRole.UserRole:
+            return record[0]
+        return None
+
+    # --- Thumbnail (tạo trên thread nền bởi ThumbnailCache, chỉ cho các dòng được vẽ) ---
+    def enable_thumbnails(self, edge: int):
+        if not THUMBNAIL_CACHE_AVAILABLE_HIST_MODEL or self._thumbnail_edge:
+            return
+        self._thumbnail_edge = int(edge)
+        get_thumbnail_cache().thumbnail_ready.connect(self._on_thumbnail_ready)
+
+    def _thumbnail_for_row(self, row: int):
+        pixmap = self._thumbnails.get(row)
+        if pixmap is None:
+            pixmap = get_thumbnail_cache().get(self._rows[row][2], self._thumbnail_edge)
+            if pixmap is not None: self._thumbnails[row] = pixmap
+        return pixmap
+
+    def _on_thumbnail_ready(self, image_path: str, edge: int):
+        if edge != self._thumbnail_edge:
+            return
+        for row in self._rows_by_path.get(image_path, ()):
+            index = self.index(row, 2)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    def record_id(self, row: int) -> Optional[int]:
+        return self._rows[row][0] if 0 <= row < len(self._rows) else None
+
+    # --- Tải dần ---
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and self._has_more
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or not self._has_more:
+            return
+        t_start = time.perf_counter()
+        page, self._next_cursor = self._fetch_page(self._next_cursor)
+        self.last_page_ms = (time.perf_counter() - t_start) * 1000.0
+        self._has_more = self._next_cursor is not None
+        if not page:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+        first_row = len(self._rows)
+        self._rows.extend(tuple(row) for row in page)
+        for row in range(first_row, len(self._rows)):
+            self._rows_by_path.setdefault(os.path.abspath(self._rows[row][2]), []).append(row)
+        self.endInsertRows()
+        logger_hist_model.debug(f"Fetched {len(page)} history rows in {self.last_page_ms:.1f} ms (total loaded {len(self._rows)}).")
+
+    def _fetch_page(self, after_cursor):
+        order = ('-' if self._descending else '') + self._sort_column
+        return get_history_page(after_cursor, self.PAGE_SIZE, self._filters, order)
+
+    # --- Sắp xếp phía SQL ---
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if not 0 <= column < len(self.COLUMN_KEYS):
+            return
+        self._sort_column = self.COLUMN_KEYS[column]
+        self._descending = order == Qt.SortOrder.DescendingOrder
+        self.refresh()
+
+    # --- Lọc phía SQL ---
+    def set_filters(self, filters: Optional[Dict]):
+        """Đặt bộ lọc (xem database_manager.build_history_filter_sql) và tải lại từ trang đầu."""
+        self._filters = {key: value for key, value in (filters or {}).items() if value not in (None, "")}
+        self.refresh()
+
+    @property
+    def filters(self) -> Dict:
+        return dict(self._filters)
+
+    def refresh(self):
+        """Xóa các dòng đã tải và lấy lại trang đầu (ví dụ sau khi xóa hoặc đổi sắp xếp)."""
+        self.beginResetModel()
+        self._rows = []
+        self._thumbnails = {}
+        self._rows_by_path = {}
+        self._has_more = DATABASE_AVAILABLE_HIST_MODEL
+        self._next_cursor = None
+        self.endResetModel()
+        self.total_count = count_history(self._filters) if DATABASE_AVAILABLE_HIST_MODEL else 0
+        self.fetchMore()
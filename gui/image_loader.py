@@ -0,0 +1,99 @@
+# gui/image_loader.py
+
+import time
+import logging
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader, QImageIOHandler
+
+logger_loader = logging.getLogger(__name__)
+
+IMAGE_LOADER_THREADS = 2
+
+
+def read_scaled_image(image_path: str, max_size: QSize, upscale: bool = False) -> QImage:
+    """
+    Đọc ảnh vừa khung max_size (giữ tỷ lệ). Kích thước đích được đặt qua QImageReader.setScaledSize
+    trước khi đọc, nên bộ giải mã JPEG thu nhỏ ngay trong lúc giải mã (DCT scaling) thay vì giải mã
+    toàn bộ ảnh rồi mới scale. Dùng QImage nên gọi được trên thread nền. Trả về QImage rỗng nếu lỗi.
+
+    upscale=False: ảnh nhỏ hơn khung được giữ nguyên kích thước.
+    """
+    t_start = time.perf_counter()
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True) # Xoay theo EXIF
+    source_size = reader.size()
+    # scaledSize áp dụng trước khi xoay theo EXIF: ảnh xoay 90° thì so với khung đã đổi chiều
+    rotated = bool(reader.transformation() & QImageIOHandler.Transformation.TransformationRotate90)
+    bounds = max_size.transposed() if rotated else max_size
+    target_size = None
+    if source_size.isValid() and (upscale or source_size.width() > bounds.width() or source_size.height() > bounds.height()):
+        target_size = source_size.scaled(bounds, Qt.AspectRatioMode.KeepAspectRatio)
+        reader.setScaledSize(target_size)
+    image = reader.read()
+    if image.isNull():
+        logger_loader.warning(f"Cannot read image {image_path}: {reader.errorString()}")
+        return image
+    if target_size is not None and (image.width() > max_size.width() or image.height() > max_size.height()):
+        # Định dạng không hỗ trợ scaled size: scale sau khi giải mã
+        image = image.scaled(max_size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+    logger_loader.debug(f"Decoded {image_path} ({source_size.width()}x{source_size.height()} -> {image.width()}x{image.height()}) "
+                        f"in {(time.perf_counter() - t_start) * 1000:.1f} ms")
+    return image
+
+
+class _ImageLoadSignals(QObject):
+    loaded = pyqtSignal(int, str, QImage, float) # request_id, đường dẫn, ảnh (rỗng nếu lỗi), thời gian giải mã (ms)
+
+
+class _ImageLoadJob(QRunnable):
+    def __init__(self, request_id: int, image_path: str, max_size: QSize, upscale: bool, signals: _ImageLoadSignals):
+        super().__init__()
+        self.request_id, self.image_path, self.max_size, self.upscale, self.signals = request_id, image_path, max_size, upscale, signals
+        self.setAutoDelete(True)
+
+    def run(self):
+        t_start = time.perf_counter()
+        try:
+            image = read_scaled_image(self.image_path, self.max_size, self.upscale)
+        except Exception as e:
+            logger_loader.error(f"Image load failed for {self.image_path}: {e}", exc_info=True)
+            image = QImage()
+        try: self.signals.loaded.emit(self.request_id, self.image_path, image, (time.perf_counter() - t_start) * 1000.0)
+        except RuntimeError: pass # Cửa sổ đã đóng
+
+
+class ScaledImageLoader(QObject):
+    """
+    Giải mã ảnh xem trước ở kích thước hiển thị trên thread nền.
+    Mỗi lần load() trả về request_id; kết quả của các request cũ hơn request mới nhất bị bỏ qua,
+    nên chọn ảnh liên tiếp không làm ảnh cũ đè lên ảnh mới.
+    """
+    loaded = pyqtSignal(str, QImage, float) # đường dẫn, ảnh (rỗng nếu lỗi), thời gian giải mã (ms)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(IMAGE_LOADER_THREADS)
+        self._signals = _ImageLoadSignals()
+        self._signals.loaded.connect(self._on_loaded)
+        self._latest_request = 0 # Chỉ đọc/ghi trên GUI thread
+
+    def load(self, image_path: str, max_size: QSize, upscale: bool = False) -> int:
+        self._latest_request += 1
+        request_id = self._latest_request
+        self._pool.clear() # Bỏ các request chưa bắt đầu (đã lỗi thời)
+        self._pool.start(_ImageLoadJob(request_id, image_path, QSize(max_size), upscale, self._signals))
+        return request_id
+
+    def cancel(self):
+        self._latest_request += 1
+        self._pool.clear()
+
+    def _on_loaded(self, request_id: int, image_path: str, image: QImage, elapsed_ms: float):
+        if request_id != self._latest_request:
+            return
+        self.loaded.emit(image_path, image, elapsed_ms)
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
@@ -1,12 +1,13 @@
 # gui/login_window.py
 import sys
 import os
+import threading
 from PyQt6.QtWidgets import (
     QApplication, QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
     QPushButton, QMessageBox, QDialogButtonBox, QSpacerItem, QSizePolicy
 )
 from PyQt6.QtGui import QFont
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, pyqtSignal
 from typing import Optional, Dict
 
 # --- Thêm thư mục gốc ---
@@ -15,13 +16,25 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
-# --- Import auth_manager từ utils ---
-try:
-    from utils import auth_manager # <<< Đã sửa đường dẫn import
-    AUTH_MANAGER_AVAILABLE = True
-except ImportError:
-    print("LoginWindow FATAL ERROR: utils.auth_manager not found or error importing.")
-    AUTH_MANAGER_AVAILABLE = False
+# --- Import auth_manager từ utils (passlib + database) ---
+# Không import ngay khi nạp module để dialog đăng nhập hiện nhanh hơn: LoginWindow import trên thread nền
+# trong lúc người dùng nhập mật khẩu.
+_auth_manager = None
+_auth_import_failed = False
+_auth_import_lock = threading.Lock()
+
+def load_auth_manager():
+    """Import utils.auth_manager (một lần). Trả về module, hoặc None nếu import lỗi."""
+    global _auth_manager, _auth_import_failed
+    with _auth_import_lock:
+        if _auth_manager is None and not _auth_import_failed:
+            try:
+                from utils import auth_manager # <<< Đã sửa đường dẫn import
+                _auth_manager = auth_manager
+            except ImportError:
+                print("LoginWindow FATAL ERROR: utils.auth_manager not found or error importing.")
+                _auth_import_failed = True
+        return _auth_manager
 
 # --- Import ui_helpers ---
 try:
@@ -33,6 +46,8 @@ except ImportError:
 
 class LoginWindow(QDialog):
     """Dialog đăng nhập."""
+    auth_manager_loaded = pyqtSignal(bool) # Phát từ thread nền khi import auth_manager xong
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Đăng Nhập Hệ Thống")
@@ -40,8 +55,16 @@ class LoginWindow(QDialog):
         self.setMinimumWidth(350)
         self.logged_in_user_info: Optional[Dict] = None
         self.initUI()
+        self.auth_manager_loaded.connect(self._on_auth_manager_loaded)
+        threading.Thread(target=self._load_auth_manager_in_background, name="auth-manager-import", daemon=True).start()
+
+    def _load_auth_manager_in_background(self):
+        available = load_auth_manager() is not None
+        try: self.auth_manager_loaded.emit(available)
+        except RuntimeError: pass # Dialog đã bị hủy
 
-        if not AUTH_MANAGER_AVAILABLE:
+    def _on_auth_manager_loaded(self, available: bool):
+        if not available:
              show_error_message(self, "Lỗi Hệ Thống", "Không thể tải module xác thực người dùng.\nChức năng đăng nhập không khả dụng.")
              try: # Vô hiệu hóa input nếu lỗi
                  self.username_input.setEnabled(False)
@@ -87,7 +110,8 @@ class LoginWindow(QDialog):
 
     def attempt_login(self):
         """Kiểm tra thông tin đăng nhập bằng auth_manager."""
-        if not AUTH_MANAGER_AVAILABLE:
+        auth_manager = load_auth_manager() # Thường đã import xong trên thread nền
+        if auth_manager is None:
             show_error_message(self, "Lỗi", "Module xác thực không khả dụng.")
             return
 
@@ -134,7 +158,7 @@ class LoginWindow(QDialog):
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     # Kiểm tra auth_manager trước khi chạy
-    if not AUTH_MANAGER_AVAILABLE:
+    if load_auth_manager() is None:
         QMessageBox.critical(None,"Lỗi Hệ Thống","Không thể import utils.auth_manager. Không thể chạy LoginWindow.")
         sys.exit(1)
 
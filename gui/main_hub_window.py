@@ -2,7 +2,10 @@
 
 import sys
 import os
+import time
 import logging
+import importlib
+import importlib.util
 from pathlib import Path
 from typing import Optional, Dict
 
@@ -12,7 +15,7 @@ try:
         QSpacerItem, QSizePolicy, QGridLayout, QFrame, QMessageBox # Thêm QMessageBox
     )
     from PyQt6.QtGui import QFont, QIcon # Thêm QIcon nếu muốn dùng icon
-    from PyQt6.QtCore import Qt, QSize, pyqtSignal # Thêm pyqtSignal nếu cần signal từ Settings
+    from PyQt6.QtCore import Qt, QSize, QTimer, pyqtSignal # Thêm pyqtSignal nếu cần signal từ Settings
     PYQT6_AVAILABLE_HUB = True
 except ImportError:
     print("MainHubWindow FATAL ERROR: PyQt6 not found.")
@@ -28,26 +31,47 @@ if str(project_root_hub) not in sys.path:
     sys.path.insert(0, str(project_root_hub))
     logger_hub.info(f"MainHubWindow added project root: {project_root_hub}")
 
-# --- Import các cửa sổ chức năng và kiểm tra ---
-# Đặt biến cờ mặc định là False
-RECOG_WIN_OK = False
-USER_MGMT_WIN_OK = False
-HIST_MGMT_WIN_OK = False
-SETTINGS_WIN_OK = False
+# --- Các cửa sổ chức năng: import khi mở lần đầu ---
+# Mỗi module kéo theo requests/numpy/cv2/passlib/database; import sẵn ở đây làm Hub (và trước đây là
+# dialog đăng nhập) hiện chậm. Lúc khởi động chỉ kiểm tra module có tồn tại (find_spec, không import).
+# tên module -> (tên class, cờ khả dụng trong module hoặc None)
+WINDOW_MODULES = {
+    'recognition_window': ('RecognitionWindow', None),
+    'user_management_window': ('UserManagementWindow', 'AUTH_MANAGER_AVAILABLE_UM'),
+    'history_management_window': ('HistoryManagementWindow', 'DATABASE_AVAILABLE_HIST'),
+    'settings_window': ('SettingsWindow', 'CONFIG_LOADER_AVAILABLE'),
+}
+_window_classes: Dict[str, Optional[type]] = {}
+
+def window_module_exists(module_name: str) -> bool:
+    try: return importlib.util.find_spec(f"{__package__}.{module_name}") is not None
+    except (ImportError, ValueError): return False
+
+def load_window_class(module_name: str) -> Optional[type]:
+    """Import module cửa sổ (một lần) và trả về class; None nếu import lỗi hoặc thiếu thành phần cần thiết."""
+    if module_name not in _window_classes:
+        class_name, flag_name = WINDOW_MODULES[module_name]
+        t_start = time.perf_counter()
+        try:
+            module = importlib.import_module(f".{module_name}", __package__)
+            window_class = getattr(module, class_name)
+            if flag_name and not getattr(module, flag_name, False):
+                logger_hub.error(f"{class_name} unavailable: {flag_name} is False.")
+                window_class = None
+        except (ImportError, AttributeError) as e:
+            logger_hub.error(f"Failed to import {class_name}: {e}")
+            window_class = None
+        _window_classes[module_name] = window_class
+        logger_hub.info(f"Imported {module_name} in {(time.perf_counter() - t_start) * 1000:.0f} ms.")
+    return _window_classes[module_name]
+
+RECOG_WIN_OK = window_module_exists('recognition_window')
+USER_MGMT_WIN_OK = window_module_exists('user_management_window')
+HIST_MGMT_WIN_OK = window_module_exists('history_management_window')
+SETTINGS_WIN_OK = window_module_exists('settings_window')
+CLASS_IMAGE_CACHE_OK = window_module_exists('class_image_cache')
 UI_HELPERS_OK = False
 
-try: from .recognition_window import RecognitionWindow; RECOG_WIN_OK = True
-except ImportError as e: logger_hub.error(f"Failed to import RecognitionWindow: {e}")
-
-try: from .user_management_window import UserManagementWindow, AUTH_MANAGER_AVAILABLE_UM; USER_MGMT_WIN_OK = AUTH_MANAGER_AVAILABLE_UM
-except ImportError as e: logger_hub.error(f"Failed to import UserManagementWindow or its auth_manager: {e}")
-
-try: from .history_management_window import HistoryManagementWindow, DATABASE_AVAILABLE_HIST; HIST_MGMT_WIN_OK = DATABASE_AVAILABLE_HIST
-except ImportError as e: logger_hub.error(f"Failed to import HistoryManagementWindow or its DB access: {e}")
-
-try: from .settings_window import SettingsWindow, CONFIG_LOADER_AVAILABLE; SETTINGS_WIN_OK = CONFIG_LOADER_AVAILABLE
-except ImportError as e: logger_hub.error(f"Failed to import SettingsWindow or its config_loader: {e}")
-
 try: from .ui_helpers import show_info_message, show_error_message; UI_HELPERS_OK = True
 except ImportError: logger_hub.warning("MainHubWindow: ui_helpers not found."); # Thêm fallback nếu muốn
 
@@ -77,13 +101,20 @@ class MainHubWindow(QWidget):
             sys.exit("PyQt6 not found, cannot start Main Hub.")
 
         self.current_user = current_user if current_user else {}
-        self.recognition_window_instance: Optional[RecognitionWindow] = None
-        self.user_mgmt_window_instance: Optional[UserManagementWindow] = None
-        self.history_mgmt_window_instance: Optional[HistoryManagementWindow] = None
-        self.settings_window_instance: Optional[SettingsWindow] = None
+        self.recognition_window_instance: Optional[QWidget] = None
+        self.user_mgmt_window_instance: Optional[QWidget] = None
+        self.history_mgmt_window_instance: Optional[QWidget] = None
+        self.settings_window_instance: Optional[QWidget] = None
 
         self.initUI()
         self.update_window_title() # Đặt tiêu đề sau khi initUI
+        # Tải sẵn ảnh mẫu các lớp trên thread nền sau khi cửa sổ hiện lên (ResultWindow không phải đọc đĩa)
+        if CLASS_IMAGE_CACHE_OK: QTimer.singleShot(0, self._preload_class_images)
+
+    def _preload_class_images(self):
+        try: from .class_image_cache import get_class_image_cache
+        except ImportError as e: logger_hub.warning(f"class_image_cache not available: {e}"); return
+        get_class_image_cache().preload_async()
 
     def update_window_title(self):
         window_title = "Hệ Thống Quản Lý & Nhận Diện Biển Báo GTSRB"
@@ -198,26 +229,30 @@ class MainHubWindow(QWidget):
 
 
     def open_recognition_window(self):
-        if not RECOG_WIN_OK:
+        RecognitionWindow = load_window_class('recognition_window') if RECOG_WIN_OK else None
+        if RecognitionWindow is None:
             show_error_message(self,"Lỗi", "Không thể mở chức năng Nhận diện do lỗi import.")
             return
         # Truyền user vào nếu RecognitionWindow cần
         self.open_window('recognition_window_instance', RecognitionWindow, current_user=self.current_user)
 
     def open_user_management_window(self):
-        if not self.user_mgmt_button.isEnabled(): # Kiểm tra lại quyền và khả năng import
+        UserManagementWindow = load_window_class('user_management_window') if self.user_mgmt_button.isEnabled() else None
+        if UserManagementWindow is None: # Kiểm tra lại quyền và khả năng import
             show_error_message(self,"Lỗi", "Không thể mở chức năng Quản lý Người dùng (thiếu quyền hoặc lỗi import).")
             return
         self.open_window('user_mgmt_window_instance', UserManagementWindow)
 
     def open_history_management_window(self):
-        if not HIST_MGMT_WIN_OK:
+        HistoryManagementWindow = load_window_class('history_management_window') if HIST_MGMT_WIN_OK else None
+        if HistoryManagementWindow is None:
             show_error_message(self,"Lỗi", "Không thể mở chức năng Quản lý Lịch sử do lỗi import hoặc DB.")
             return
         self.open_window('history_mgmt_window_instance', HistoryManagementWindow)
 
     def open_settings_window(self):
-        if not SETTINGS_WIN_OK:
+        SettingsWindow = load_window_class('settings_window') if SETTINGS_WIN_OK else None
+        if SettingsWindow is None:
             show_error_message(self,"Lỗi", "Không thể mở chức năng Cài đặt do lỗi import hoặc config.")
             return
         self.open_window('settings_window_instance', SettingsWindow)
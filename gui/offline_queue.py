@@ -0,0 +1,205 @@
+# gui/offline_queue.py
+
+import time
+import logging
+import threading
+from typing import Optional, List, Dict, Tuple
+
+import requests
+from PyQt6.QtCore import QObject, QCoreApplication, pyqtSignal
+
+from database.database_manager import (
+    enqueue_pending_recognition, fetch_pending_recognitions, count_pending_recognitions, complete_pending_recognitions
+)
+from .prediction_worker import (
+    get_http_session, api_endpoint_url, post_paths_for_prediction, post_image_for_prediction,
+    parse_top_predictions, is_offline_error, describe_request_error, BatchApiUnavailable, ApiResponseFormatError,
+    CONNECT_TIMEOUT_SECONDS
+)
+
+logger_offline = logging.getLogger(__name__)
+
+try:
+    import config
+    OFFLINE_PROBE_INITIAL_SECONDS = config.OFFLINE_PROBE_INITIAL_SECONDS
+    OFFLINE_PROBE_MAX_SECONDS = config.OFFLINE_PROBE_MAX_SECONDS
+    OFFLINE_REPLAY_BATCH_SIZE = config.OFFLINE_REPLAY_BATCH_SIZE
+    OFFLINE_MAX_ATTEMPTS = config.OFFLINE_MAX_ATTEMPTS
+except (ImportError, AttributeError):
+    OFFLINE_PROBE_INITIAL_SECONDS, OFFLINE_PROBE_MAX_SECONDS = 2.0, 60.0
+    OFFLINE_REPLAY_BATCH_SIZE, OFFLINE_MAX_ATTEMPTS = 32, 5
+    logger_offline.warning("OfflineQueue: config offline settings not found, using defaults.")
+
+try: from utils.config_loader import load_settings, DEFAULT_SETTINGS; CONFIG_LOADER_AVAILABLE_OFFLINE = True
+except ImportError: CONFIG_LOADER_AVAILABLE_OFFLINE = False; DEFAULT_SETTINGS = {}
+
+TOP_N_OFFLINE = 3
+HEALTH_READ_TIMEOUT_SECONDS = 5
+
+
+class _ApiOffline(Exception):
+    """API mất kết nối giữa chừng khi đang gửi lại: dừng lượt này, quay lại chờ /health."""
+
+
+def probe_api_health(api_url: str) -> bool:
+    """True nếu /health trả lời và model trên server đã sẵn sàng."""
+    try:
+        response = get_http_session().get(api_endpoint_url(api_url, "health"),
+                                           timeout=(CONNECT_TIMEOUT_SECONDS, HEALTH_READ_TIMEOUT_SECONDS))
+        return response.status_code == 200 and response.json().get("model_status") == "loaded"
+    except (requests.exceptions.RequestException, ValueError):
+        return False
+
+
+def replay_batch(items: List[Dict], api_url: str) -> Tuple[List[Tuple], List[Tuple[int, str]]]:
+    """
+    Nhận diện lại một lượt ảnh trong hàng đợi: ưu tiên /predict_paths (một request cho cả lượt),
+    nếu server không hỗ trợ hoặc không đọc được file nào đó (khác máy / ngoài thư mục cho phép) thì upload
+    các ảnh đó. Chỉ upload lỗi mới tính là một lần thử. Raise _ApiOffline nếu API lại mất kết nối.
+
+    Returns:
+        (results, failures) theo định dạng của complete_pending_recognitions.
+    """
+    results, failures = [], []
+    remaining = list(items)
+
+    def record(item, top_predictions):
+        top1 = top_predictions[0]
+        results.append((item['id'], item['image_path'], top1['class_id'], top1['class_name'], top1['confidence'], item['queued_at']))
+
+    if len(remaining) > 1:
+        try:
+            outputs = post_paths_for_prediction([item['image_path'] for item in remaining], api_url, TOP_N_OFFLINE)
+        except BatchApiUnavailable:
+            outputs = None # Upload từng ảnh bên dưới
+        except Exception as e:
+            if is_offline_error(e): raise _ApiOffline(str(e))
+            logger_offline.warning(f"Batch replay via /predict_paths failed, falling back to uploads: {e}")
+            outputs = None
+        if outputs is not None:
+            retry = []
+            for index, item in enumerate(remaining):
+                try: record(item, parse_top_predictions(outputs[index] if index < len(outputs) else None))
+                except ApiResponseFormatError: retry.append(item) # Server không đọc được file (khác máy / ngoài thư mục cho phép)
+            remaining = retry
+    for item in remaining:
+        try:
+            record(item, post_image_for_prediction(item['image_path'], api_url, TOP_N_OFFLINE,
+                                                   upload_max_edge=int(item.get('upload_max_edge') or 0)))
+        except Exception as e:
+            if is_offline_error(e):
+                if results or failures: break # Giữ phần đã xong, phần còn lại chờ lượt sau
+                raise _ApiOffline(str(e))
+            failures.append((item['id'], describe_request_error(e, api_url).split('\n')[0]))
+    return results, failures
+
+
+class OfflineQueue(QObject):
+    """
+    Hàng đợi nhận diện offline, lưu bền vững trong bảng pending_recognitions (SQLite).
+    Một thread nền gọi /health với backoff tăng dần khi còn ảnh chờ; khi API hoạt động lại thì
+    gửi lại từng lượt OFFLINE_REPLAY_BATCH_SIZE ảnh và ghi kết quả vào lịch sử trong một transaction.
+    """
+    pending_changed = pyqtSignal(int)      # số ảnh còn chờ gửi lại
+    replayed = pyqtSignal(int, int)        # số ảnh nhận diện xong, số ảnh lỗi trong lượt vừa gửi
+    api_state_changed = pyqtSignal(bool)   # True: API hoạt động trở lại, False: mất kết nối
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._api_online: Optional[bool] = None
+        app = QCoreApplication.instance()
+        if app is not None: app.aboutToQuit.connect(self.stop)
+
+    # --- API cho GUI thread ---
+    def start(self):
+        """Chạy thread gửi lại (gọi lần đầu khi mở cửa sổ nhận diện: ảnh còn chờ từ phiên trước cũng được gửi)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="offline-queue-replay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        self._stop_event.set(); self._wake_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def enqueue(self, image_path: str, upload_max_edge: int = 0, error: str = "") -> bool:
+        """Lưu ảnh vào hàng đợi và đánh thức thread gửi lại."""
+        queued = enqueue_pending_recognition(image_path, upload_max_edge, error)
+        if queued:
+            logger_offline.info(f"Queued recognition for replay: {image_path}")
+            self._emit(self.pending_changed, self.pending_count())
+            self.start(); self._wake_event.set()
+        return queued
+
+    def pending_count(self) -> int:
+        return count_pending_recognitions(OFFLINE_MAX_ATTEMPTS)
+
+    def retry_now(self):
+        """Bỏ qua thời gian chờ backoff hiện tại."""
+        self._wake_event.set()
+
+    # --- Thread nền ---
+    def _emit(self, signal, *args):
+        try: signal.emit(*args)
+        except RuntimeError: pass # Ứng dụng đã thoát
+
+    def _set_api_online(self, online: bool):
+        if online != self._api_online:
+            self._api_online = online
+            logger_offline.info(f"Offline queue: API {'reachable' if online else 'unreachable'}.")
+            self._emit(self.api_state_changed, online)
+
+    def _wait(self, seconds: Optional[float]):
+        self._wake_event.wait(seconds)
+        self._wake_event.clear()
+
+    def _run(self):
+        delay = OFFLINE_PROBE_INITIAL_SECONDS
+        while not self._stop_event.is_set():
+            items = fetch_pending_recognitions(OFFLINE_REPLAY_BATCH_SIZE, OFFLINE_MAX_ATTEMPTS)
+            if not items:
+                self._wait(None) # Ngủ tới khi có ảnh mới được đưa vào hàng đợi
+                continue
+            settings = load_settings() if CONFIG_LOADER_AVAILABLE_OFFLINE else DEFAULT_SETTINGS
+            api_url = settings.get("api_url", "http://127.0.0.1:8000/predict")
+            if not probe_api_health(api_url):
+                self._set_api_online(False)
+                self._wait(delay)
+                delay = min(delay * 2, OFFLINE_PROBE_MAX_SECONDS)
+                continue
+            self._set_api_online(True)
+            delay = OFFLINE_PROBE_INITIAL_SECONDS
+            t_start = time.perf_counter()
+            try:
+                results, failures = replay_batch(items, api_url)
+            except _ApiOffline as e:
+                logger_offline.info(f"Offline queue: API went away during replay ({e}).")
+                self._set_api_online(False)
+                continue
+            except Exception as e:
+                logger_offline.error(f"Offline queue replay failed: {e}", exc_info=True)
+                results, failures = [], [(item['id'], str(e)) for item in items]
+            if not complete_pending_recognitions(results, failures):
+                self._wait(delay); continue # Lỗi database: thử lại sau, không mất ảnh trong hàng đợi
+            if failures and not results:
+                self._wait(delay) # Cả lượt đều lỗi (vd. server lỗi 500): không gửi lại liên tục
+            logger_offline.info(f"Offline queue replayed {len(results)} ok / {len(failures)} failed "
+                                f"in {(time.perf_counter() - t_start) * 1000:.0f} ms.")
+            self._emit(self.replayed, len(results), len(failures))
+            self._emit(self.pending_changed, self.pending_count())
+
+
+_shared_queue: Optional[OfflineQueue] = None
+
+
+def get_offline_queue() -> OfflineQueue:
+    """Hàng đợi dùng chung (tạo lần đầu trên GUI thread)."""
+    global _shared_queue
+    if _shared_queue is None:
+        _shared_queue = OfflineQueue()
+    return _shared_queue
@@ -0,0 +1,233 @@
+# gui/prediction_worker.py
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Optional, List, Dict
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.image_header import guess_mime_type
+
+try:
+    from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+    PYQT6_AVAILABLE_WORKER = True
+except ImportError:
+    print("PredictionWorker ERROR: PyQt6 not found.")
+    PYQT6_AVAILABLE_WORKER = False
+
+logger_worker = logging.getLogger(__name__)
+
+# --- HTTP Session dùng chung (keep-alive) ---
+# Tái sử dụng kết nối TCP giữa các lần nhận diện thay vì mở kết nối mới mỗi request.
+_session_lock = threading.Lock()
+_http_session: Optional[requests.Session] = None
+HTTP_POOL_SIZE = 16
+CONNECT_TIMEOUT_SECONDS = 5
+READ_TIMEOUT_SECONDS = 30
+
+
+def get_http_session() -> requests.Session:
+    """Trả về requests.Session dùng chung cho toàn bộ GUI (tạo lần đầu khi cần)."""
+    global _http_session
+    with _session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _http_session = session
+        return _http_session
+
+
+def close_http_session():
+    """Đóng session dùng chung (gọi khi thoát ứng dụng)."""
+    global _http_session
+    with _session_lock:
+        if _http_session is not None:
+            _http_session.close()
+            _http_session = None
+
+
+def api_endpoint_url(api_url: str, endpoint: str) -> str:
+    """Đổi endpoint cuối của URL trong Settings, ví dụ '.../predict' -> '.../predict_paths'."""
+    parts = urlsplit(api_url)
+    base_path = parts.path.rsplit('/', 1)[0] if '/' in parts.path else ''
+    return urlunsplit((parts.scheme, parts.netloc, f"{base_path}/{endpoint}", '', ''))
+
+
+class BatchApiUnavailable(Exception):
+    """Server không có hoặc đã tắt /predict_paths (404/405/403)."""
+
+
+class ApiResponseFormatError(Exception):
+    """Response của API không có danh sách 'top_predictions' hợp lệ."""
+
+
+def describe_request_error(exc: Exception, api_url: str) -> str:
+    """Chuyển exception khi gọi API thành thông báo lỗi hiển thị cho người dùng."""
+    if isinstance(exc, ApiResponseFormatError):
+        return str(exc)
+    if isinstance(exc, FileNotFoundError):
+        return f"Error: Image file not found at:\n{exc.filename}"
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        return (f"API Connection Error:\nCould not connect to {api_url}\n"
+                f"Please check if the API server is running and the URL in Settings is correct.")
+    if isinstance(exc, requests.exceptions.Timeout):
+        return f"API Timeout Error:\nRequest to {api_url} timed out."
+    if isinstance(exc, requests.exceptions.RequestException):
+        status_code = 'N/A'
+        api_error = str(exc)
+        if getattr(exc, 'response', None) is not None:
+            status_code = exc.response.status_code
+            try: api_error = exc.response.json().get('detail', exc.response.text)
+            except ValueError: api_error = exc.response.text
+        return f"API Request Error: {exc}\n\nAPI Error Details (Status: {status_code}):\n{api_error}"
+    if isinstance(exc, ValueError): # Sau RequestException: lỗi parse JSON của requests cũng là ValueError
+        return f"Error reading image file: {exc}"
+    return f"An unexpected error occurred during prediction:\n{exc}"
+
+
+OFFLINE_STATUS_CODES = (502, 503, 504) # Server/proxy tạm thời không phục vụ được (vd. model chưa tải)
+
+
+def is_offline_error(exc: Exception) -> bool:
+    """True nếu lỗi do API không kết nối / tạm thời không phục vụ được: ảnh nên được đưa vào hàng đợi gửi lại."""
+    if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(exc, 'response', None)
+    return isinstance(exc, requests.exceptions.HTTPError) and response is not None and response.status_code in OFFLINE_STATUS_CODES
+
+
+def parse_top_predictions(result) -> List[Dict]:
+    """Kiểm tra định dạng 'top_predictions' trong response. Raise ApiResponseFormatError nếu sai định dạng."""
+    top_predictions_list = result.get("top_predictions") if isinstance(result, dict) else None
+    if not isinstance(top_predictions_list, list) or not top_predictions_list:
+        raise ApiResponseFormatError(f"API did not return valid 'top_predictions' list. Response: {result}")
+    if not all(key in top_predictions_list[0] for key in ["class_id", "class_name", "confidence"]):
+        raise ApiResponseFormatError(f"API response format error (missing keys): {top_predictions_list}")
+    return top_predictions_list
+
+
+def post_image_for_prediction(image_path: str, api_url: str, top_n: int = 3,
+                              timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS),
+                              upload_max_edge: int = 0) -> List[Dict]:
+    """
+    Đọc file ảnh và gửi tới API /predict qua session dùng chung (chạy được trên bất kỳ thread nào).
+    upload_max_edge > 0: thu nhỏ ảnh lớn về cạnh đó và gửi PNG lossless thay cho file gốc.
+
+    Returns:
+        List[Dict]: Danh sách top_predictions đã kiểm tra định dạng.
+    """
+    with open(image_path, 'rb') as f_read:
+        image_bytes_content = f_read.read()
+    if not image_bytes_content:
+        raise ValueError("Image file empty.")
+    upload_name = Path(image_path).name
+    if upload_max_edge > 0:
+        from utils.inference_pipeline import downscale_for_upload # Kéo theo OpenCV: chỉ import khi bật thu nhỏ
+        upload_bytes, mime_type = downscale_for_upload(image_bytes_content, upload_max_edge)
+        if upload_bytes is not image_bytes_content:
+            upload_name = Path(upload_name).with_suffix('.png').name
+    else:
+        upload_bytes, mime_type = image_bytes_content, guess_mime_type(image_bytes_content)
+    files = {'file': (upload_name, upload_bytes, mime_type)}
+    response = get_http_session().post(api_url, files=files, params={'top_n': top_n}, timeout=timeout)
+    response.raise_for_status()
+    result = response.json()
+    logger_worker.debug(f"API Response JSON: {result}")
+    return parse_top_predictions(result)
+
+
+def predict_image_file(image_path: str, api_url: str, top_n: int = 3, inference_mode: str = "api",
+                       upload_max_edge: int = 0) -> List[Dict]:
+    """Dự đoán một file ảnh theo chế độ trong Settings: qua API HTTP hoặc bằng model cục bộ."""
+    if inference_mode == "local":
+        from utils.local_inference import get_local_engine # Tránh import khi chỉ dùng API
+        return get_local_engine().predict_file(image_path, top_n)
+    return post_image_for_prediction(image_path, api_url, top_n, upload_max_edge=upload_max_edge)
+
+
+def post_paths_for_prediction(image_paths: List[str], api_url: str, top_n: int = 3,
+                              timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS * 4)) -> List[Dict]:
+    """
+    Gửi danh sách đường dẫn tuyệt đối tới /predict_paths (server đọc file trực tiếp, không upload bytes).
+
+    Returns:
+        List[Dict]: Mỗi phần tử có 'path' và 'top_predictions' hoặc 'error', cùng thứ tự với đầu vào.
+
+    Raises:
+        BatchApiUnavailable: nếu server không hỗ trợ / đã tắt endpoint.
+    """
+    url = api_endpoint_url(api_url, "predict_paths")
+    response = get_http_session().post(url, json={"paths": [str(Path(p).resolve()) for p in image_paths], "top_n": top_n},
+                                       timeout=timeout)
+    if response.status_code in (403, 404, 405):
+        raise BatchApiUnavailable(f"{url} returned {response.status_code}")
+    response.raise_for_status()
+    results = response.json().get("results")
+    if not isinstance(results, list) or len(results) != len(image_paths):
+        raise ApiResponseFormatError(f"API did not return valid 'results' list for {url}.")
+    return results
+
+
+
+if PYQT6_AVAILABLE_WORKER:
+
+    class PredictionWorkerSignals(QObject):
+        """Signals của PredictionWorker (QRunnable không phải QObject nên cần lớp riêng)."""
+        finished = pyqtSignal(int, list, float)   # request_id, top_predictions, thời gian (giây)
+        failed = pyqtSignal(int, str, bool)       # request_id, thông báo lỗi, lỗi do API offline (có thể gửi lại)
+        cancelled = pyqtSignal(int)               # request_id
+
+    class PredictionWorker(QRunnable):
+        """
+        Gửi một ảnh tới API trên thread của QThreadPool; kết quả trả về GUI thread qua signals.
+        requests không hỗ trợ hủy request đang chạy, nên cancel() đánh dấu để kết quả bị bỏ qua
+        và cửa sổ không phải chờ.
+        """
+        def __init__(self, request_id: int, image_path: str, api_url: str, top_n: int = 3, inference_mode: str = "api",
+                     upload_max_edge: int = 0):
+            super().__init__()
+            self.request_id = request_id
+            self.image_path = image_path
+            self.api_url = api_url
+            self.top_n = top_n
+            self.inference_mode = inference_mode
+            self.upload_max_edge = upload_max_edge
+            self.signals = PredictionWorkerSignals()
+            self._cancel_event = threading.Event()
+            self.setAutoDelete(True)
+
+        def cancel(self):
+            self._cancel_event.set()
+
+        def is_cancelled(self) -> bool:
+            return self._cancel_event.is_set()
+
+        def run(self):
+            if self.is_cancelled():
+                self.signals.cancelled.emit(self.request_id); return
+            t_start = time.perf_counter()
+            try:
+                if self.inference_mode == "local": logger_worker.info(f"Running local prediction with top_n={self.top_n}")
+                else: logger_worker.info(f"Sending prediction request to API: {self.api_url} with top_n={self.top_n}")
+                top_predictions_list = predict_image_file(self.image_path, self.api_url, self.top_n, self.inference_mode,
+                                                          self.upload_max_edge)
+            except Exception as e:
+                if self.is_cancelled():
+                    self.signals.cancelled.emit(self.request_id); return
+                error_detail = describe_request_error(e, self.api_url)
+                logger_worker.error(error_detail, exc_info=not isinstance(e, (OSError, ValueError)))
+                self.signals.failed.emit(self.request_id, error_detail, self.inference_mode != "local" and is_offline_error(e))
+                return
+            elapsed = time.perf_counter() - t_start
+            if self.is_cancelled():
+                logger_worker.info(f"Prediction {self.request_id} finished after cancel, result discarded.")
+                self.signals.cancelled.emit(self.request_id)
+                return
+            logger_worker.info(f"Prediction successful: Received {len(top_predictions_list)} Top-N results in {elapsed:.2f}s.")
+            self.signals.finished.emit(self.request_id, top_predictions_list, elapsed)
@@ -3,18 +3,18 @@
 import sys
 import os
 import logging
+import time
 from pathlib import Path
 import traceback
-import requests
 from typing import Optional, Dict
 
 try:
     from PyQt6.QtWidgets import (
         QApplication, QWidget, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
-        QSizePolicy, QDialog, QFileDialog, QMessageBox, QSpacerItem
+        QSizePolicy, QDialog, QFileDialog, QMessageBox, QSpacerItem, QProgressBar, QStatusBar
     )
-    from PyQt6.QtGui import QPixmap, QFont
-    from PyQt6.QtCore import Qt, QSize
+    from PyQt6.QtGui import QPixmap, QFont, QImageReader
+    from PyQt6.QtCore import Qt, QSize, QThreadPool, QTimer
     PYQT6_AVAILABLE_REC = True
 except ImportError:
     print("RecognitionWindow FATAL ERROR: PyQt6 not found.")
@@ -37,7 +37,7 @@ try:
 except ImportError: CONFIG_LOADER_AVAILABLE_REC = False; logger_rec.warning("config_loader not found.")
 
 try:
-    from database.database_manager import add_prediction_to_history
+    from database.history_writer import get_history_writer
     DATABASE_AVAILABLE_REC = True
 except ImportError: DATABASE_AVAILABLE_REC = False; logger_rec.warning("database_manager not found.")
 
@@ -47,6 +47,29 @@ except ImportError: UPLOAD_WINDOW_AVAILABLE_REC = False; logger_rec.warning("upl
 try: from .result_window import ResultWindow; RESULT_WINDOW_AVAILABLE_REC = True
 except ImportError: RESULT_WINDOW_AVAILABLE_REC = False; logger_rec.warning("result_window not found.")
 
+try:
+    from .prediction_worker import PredictionWorker
+    PREDICTION_WORKER_AVAILABLE_REC = True
+except ImportError: PREDICTION_WORKER_AVAILABLE_REC = False; logger_rec.warning("prediction_worker not found.")
+
+try:
+    from utils.local_inference import get_local_engine
+    LOCAL_INFERENCE_AVAILABLE_REC = True
+except ImportError: LOCAL_INFERENCE_AVAILABLE_REC = False; logger_rec.warning("local_inference not found.")
+
+try: from .image_loader import ScaledImageLoader; IMAGE_LOADER_AVAILABLE_REC = True
+except ImportError: IMAGE_LOADER_AVAILABLE_REC = False; logger_rec.warning("image_loader not found.")
+
+try: from .class_image_cache import get_class_image_cache; CLASS_IMAGE_CACHE_AVAILABLE_REC = True
+except ImportError: CLASS_IMAGE_CACHE_AVAILABLE_REC = False; logger_rec.warning("class_image_cache not found.")
+
+try: from .batch_recognition_window import BatchRecognitionWindow; BATCH_WINDOW_AVAILABLE_REC = True
+except ImportError: BATCH_WINDOW_AVAILABLE_REC = False; logger_rec.warning("batch_recognition_window not found.")
+try: from .video_recognition_window import VideoRecognitionWindow, VIDEO_PIPELINE_AVAILABLE as VIDEO_WINDOW_AVAILABLE_REC
+except ImportError: VIDEO_WINDOW_AVAILABLE_REC = False; logger_rec.warning("video_recognition_window not found.")
+try: from .offline_queue import get_offline_queue; OFFLINE_QUEUE_AVAILABLE_REC = True
+except ImportError: OFFLINE_QUEUE_AVAILABLE_REC = False; logger_rec.warning("offline_queue not found.")
+
 try:
     from .ui_helpers import show_error_message, show_warning_message, show_info_message, scale_pixmap
     UI_HELPERS_AVAILABLE_REC = True
@@ -100,9 +123,25 @@ class RecognitionWindow(QWidget):
 
         self.current_image_path: Optional[str] = None
         self.current_user = current_user if current_user else {}
+        # Trạng thái request nhận diện đang chạy nền
+        self._active_worker = None
+        self._request_counter = 0
+        self._pending_image_path: Optional[str] = None
+        self._pending_class_images_dir: Optional[Path] = None
+        self.batch_window_instance = None
+        self.video_window_instance = None
+        self._dispatched_at = 0.0
+        self._pending_mode = "api"
+        self._pending_upload_max_edge = 0
+        self.preview_loader = None # Giải mã ảnh xem trước ở kích thước label trên thread nền
+        if IMAGE_LOADER_AVAILABLE_REC:
+            self.preview_loader = ScaledImageLoader(self); self.preview_loader.loaded.connect(self._on_preview_loaded)
         self.setWindowTitle("Chức Năng Nhận Diện Biển Báo")
         self.setGeometry(250, 250, 650, 480) # Điều chỉnh kích thước nếu cần
         self.initUI()
+        self._preload_local_model_if_needed()
+        if CLASS_IMAGE_CACHE_AVAILABLE_REC: get_class_image_cache().preload_async(str(CLASS_IMAGES_DIR_REC)) # Không làm gì nếu đã tải
+        if OFFLINE_QUEUE_AVAILABLE_REC: self._init_offline_queue()
 
     def initUI(self):
         main_layout = QVBoxLayout()
@@ -132,6 +171,13 @@ class RecognitionWindow(QWidget):
         self.load_button = QPushButton(' Tải Ảnh Lên'); self.load_button.setFont(button_font); self.load_button.setToolTip("Chọn ảnh từ máy tính"); self.load_button.clicked.connect(self.load_image); action_layout.addWidget(self.load_button)
         self.predict_button = QPushButton(' Bắt đầu Nhận Diện'); self.predict_button.setFont(button_font); self.predict_button.setEnabled(False); self.predict_button.setToolTip("Gửi ảnh để nhận diện biển báo"); self.predict_button.clicked.connect(self.predict_image); action_layout.addWidget(self.predict_button)
 
+        # Chỉ báo đang xử lý (busy, không chặn event loop) + nút hủy
+        self.progress_bar = QProgressBar(); self.progress_bar.setRange(0, 0); self.progress_bar.setTextVisible(False); self.progress_bar.setMaximumHeight(8); self.progress_bar.setVisible(False); action_layout.addWidget(self.progress_bar)
+        self.cancel_button = QPushButton(' Hủy Nhận Diện'); self.cancel_button.setFont(button_font); self.cancel_button.setToolTip("Hủy request đang gửi tới API"); self.cancel_button.setVisible(False); self.cancel_button.clicked.connect(self.cancel_prediction); action_layout.addWidget(self.cancel_button)
+
+        self.batch_button = QPushButton(' Nhận Diện Hàng Loạt...'); self.batch_button.setFont(button_font); self.batch_button.setToolTip("Nhận diện cả thư mục hoặc nhiều ảnh cùng lúc"); self.batch_button.setEnabled(BATCH_WINDOW_AVAILABLE_REC); self.batch_button.clicked.connect(lambda: self.open_batch_window()); action_layout.addWidget(self.batch_button)
+        self.video_button = QPushButton(' Nhận Diện Video/Camera...'); self.video_button.setFont(button_font); self.video_button.setToolTip("Nhận diện trực tiếp từ camera hoặc file video (model cục bộ)"); self.video_button.setEnabled(VIDEO_WINDOW_AVAILABLE_REC); self.video_button.clicked.connect(self.open_video_window); action_layout.addWidget(self.video_button)
+
         action_layout.addStretch(1) # Đẩy nút đóng xuống dưới
 
         self.close_button = QPushButton("Đóng Chức Năng Này")
@@ -139,6 +185,12 @@ class RecognitionWindow(QWidget):
         self.close_button.clicked.connect(self.close) # Đóng chỉ cửa sổ này
         action_layout.addWidget(self.close_button)
 
+        # Thanh trạng thái: chế độ suy luận + độ trễ end-to-end của lần nhận diện gần nhất
+        self.status_bar = QStatusBar(); self.status_bar.setSizeGripEnabled(False)
+        self.offline_label = QLabel(""); self.offline_label.setVisible(False) # Số ảnh đang chờ gửi lại khi API hoạt động
+        self.status_bar.addPermanentWidget(self.offline_label)
+        main_layout.addWidget(self.status_bar)
+
     # --- Copy các hàm xử lý từ main_window.py cũ ---
     # dragEnterEvent, dragMoveEvent, dropEvent
     # set_image_path, clear_image, load_image, _fallback_load_image
@@ -166,6 +218,11 @@ class RecognitionWindow(QWidget):
     def dropEvent(self, event):
         if event.mimeData().hasUrls():
             urls = event.mimeData().urls()
+            # Thả thư mục hoặc nhiều file -> chuyển sang chế độ hàng loạt
+            if urls and BATCH_WINDOW_AVAILABLE_REC and (len(urls) > 1 or Path(urls[0].toLocalFile()).is_dir()):
+                self.open_batch_window([url.toLocalFile() for url in urls])
+                event.acceptProposedAction()
+                return
             if urls:
                 file_path = urls[0].toLocalFile()
                 valid_extensions = ['.png', '.jpg', '.jpeg', '.bmp', '.ppm']
@@ -179,6 +236,25 @@ class RecognitionWindow(QWidget):
             else: event.ignore()
         else: event.ignore()
 
+    # --- Batch Mode ---
+    def open_batch_window(self, paths: Optional[list] = None):
+        """Mở (hoặc đưa lên trước) cửa sổ nhận diện hàng loạt, nạp sẵn các đường dẫn nếu có."""
+        if not BATCH_WINDOW_AVAILABLE_REC: return
+        if self.batch_window_instance is None or not self.batch_window_instance.isVisible():
+            self.batch_window_instance = BatchRecognitionWindow(initial_paths=paths, current_user=self.current_user)
+            self.batch_window_instance.show()
+        elif paths:
+            self.batch_window_instance.set_input_paths(paths)
+        self.batch_window_instance.activateWindow(); self.batch_window_instance.raise_()
+
+    def open_video_window(self):
+        """Mở (hoặc đưa lên trước) cửa sổ nhận diện camera/video."""
+        if not VIDEO_WINDOW_AVAILABLE_REC: return
+        if self.video_window_instance is None or not self.video_window_instance.isVisible():
+            self.video_window_instance = VideoRecognitionWindow()
+            self.video_window_instance.show()
+        self.video_window_instance.activateWindow(); self.video_window_instance.raise_()
+
     # --- Image Handling ---
     def set_image_path(self, file_path: Optional[str]):
         if file_path and Path(file_path).is_file():
@@ -189,6 +265,16 @@ class RecognitionWindow(QWidget):
                     settings_data = load_settings(); settings_data['last_image_dir'] = str(Path(file_path).parent); save_settings(settings_data)
                 except Exception as e: logger_rec.warning(f"Không thể lưu thư mục ảnh cuối: {e}")
 
+            if self.preview_loader is not None:
+                # Chỉ đọc header để kiểm tra; ảnh được giải mã thẳng ở kích thước label (theo devicePixelRatio) trên thread nền
+                if not QImageReader(self.current_image_path).canRead():
+                    show_error_message(self, "Lỗi Ảnh", f"Không thể đọc hoặc hiển thị file ảnh:\n{file_path}")
+                    self.clear_image(); return
+                self.image_label.clear(); self.image_label.setText("Đang tải ảnh...")
+                self.image_label.setStyleSheet("border: 1px solid green;")
+                self.set_buttons_enabled(True)
+                self.preview_loader.load(self.current_image_path, self.image_label.size() * self.image_label.devicePixelRatioF())
+                return
             pixmap_orig = QPixmap(self.current_image_path)
             if not pixmap_orig.isNull():
                 # Sử dụng hàm scale đã được gán (hoặc fallback)
@@ -204,8 +290,24 @@ class RecognitionWindow(QWidget):
             show_error_message(self, "Lỗi Đường Dẫn", f"Đường dẫn file không hợp lệ hoặc không tồn tại:\n{file_path}")
             self.clear_image()
 
+    def _on_preview_loaded(self, image_path: str, image, elapsed_ms: float):
+        """Ảnh xem trước đã giải mã xong trên thread nền (chỉ nhận kết quả của lần chọn ảnh mới nhất)."""
+        if image_path != self.current_image_path: return
+        if image.isNull():
+            show_error_message(self, "Lỗi Ảnh", f"Không thể đọc hoặc hiển thị file ảnh:\n{image_path}")
+            self.clear_image(); return
+        logger_rec.info(f"Preview decoded in {elapsed_ms:.1f} ms ({image.width()}x{image.height()}): {Path(image_path).name}")
+        dpr = self.image_label.devicePixelRatioF()
+        target_size = self.image_label.size() * dpr # Pixel thiết bị, cùng kích thước đã yêu cầu giải mã
+        pixmap_preview = QPixmap.fromImage(image)
+        if image.width() < target_size.width() and image.height() < target_size.height():
+            pixmap_preview = scale_pixmap_func_rec(pixmap_preview, target_size) # Ảnh nhỏ: phóng to như trước
+        pixmap_preview.setDevicePixelRatio(dpr) # Đặt sau khi scale: cả ảnh phóng to cũng giữ DPR của màn hình
+        self.image_label.setPixmap(pixmap_preview); self.image_label.setText("")
+
     def clear_image(self):
         self.current_image_path = None
+        if self.preview_loader is not None: self.preview_loader.cancel()
         self.image_label.clear(); self.image_label.setText("Kéo/Thả ảnh hoặc nhấn 'Tải Ảnh Lên'")
         self.image_label.setStyleSheet("QLabel { border: 2px dashed #aaa; background-color: #f8f8f8; color: #555; font-size: 11pt; }")
         self.set_buttons_enabled(True) # Cho phép tải ảnh mới
@@ -233,98 +335,162 @@ class RecognitionWindow(QWidget):
          if file_path_fb: self.set_image_path(file_path_fb)
          else: logger_rec.info("Việc chọn ảnh đã bị hủy (QFileDialog).")
 
-    # --- Prediction ---
+    # --- Prediction (chạy trên QThreadPool, kết quả trả về qua signals) ---
     def predict_image(self):
         if not self.current_image_path:
             show_warning_message(self, "Chưa chọn ảnh", "Vui lòng tải hoặc kéo thả ảnh vào trước khi nhận diện.")
             return
+        if self._active_worker is not None:
+            return # Đang có request chạy
 
         # Lấy lại settings mới nhất phòng trường hợp đã thay đổi
         current_settings = load_settings() if CONFIG_LOADER_AVAILABLE_REC else DEFAULT_SETTINGS
         api_url = current_settings.get("api_url", API_URL_REC) # Dùng biến toàn cục của module làm fallback
-        class_images_dir = Path(current_settings.get("class_images_dir", CLASS_IMAGES_DIR_REC))
+        self._pending_class_images_dir = Path(current_settings.get("class_images_dir", CLASS_IMAGES_DIR_REC))
+        self._pending_image_path = self.current_image_path
+        self._pending_mode = current_settings.get("inference_mode", "api")
+        upload_max_edge = self._pending_upload_max_edge = int(current_settings.get("upload_max_edge", 0) or 0)
         top_n_results = 3
 
-        self.set_buttons_enabled(False); QApplication.processEvents()
-
-        top_predictions_list = []; error_detail = None; image_bytes_content = None
-        try:
-            logger_rec.info(f"Reading image file: {self.current_image_path}")
-            with open(self.current_image_path, 'rb') as f_read: image_bytes_content = f_read.read()
-            if not image_bytes_content: raise ValueError("Image file empty.")
-
-            files = {'file': (Path(self.current_image_path).name, image_bytes_content, 'image/jpeg')} # Giả định mime type
-            params = {'top_n': top_n_results}
-            logger_rec.info(f"Sending prediction request to API: {api_url} with top_n={top_n_results}")
-            response = requests.post(api_url, files=files, params=params, timeout=30)
-            response.raise_for_status()
-            result = response.json()
-            logger_rec.debug(f"API Response JSON: {result}")
-
-            if "top_predictions" in result and isinstance(result["top_predictions"], list) and result["top_predictions"]:
-                top_predictions_list = result["top_predictions"]
-                first_pred = top_predictions_list[0]
-                # Kiểm tra key cần thiết
-                if not all(key in first_pred for key in ["class_id", "class_name", "confidence"]):
-                    error_detail = f"API response format error (missing keys): {top_predictions_list}"; logger_rec.error(error_detail); top_predictions_list = []
-                else: logger_rec.info(f"Prediction successful: Received {len(top_predictions_list)} Top-N results.")
-            else: error_detail = f"API did not return valid 'top_predictions' list. Response: {result}"; logger_rec.error(error_detail)
-
-        except FileNotFoundError: error_detail = f"Error: Image file not found at:\n{self.current_image_path}"; logger_rec.error(error_detail)
-        except ValueError as ve: error_detail = f"Error reading image file: {ve}"; logger_rec.error(error_detail)
-        except requests.exceptions.ConnectionError: error_detail = f"API Connection Error:\nCould not connect to {api_url}\nPlease check if the API server is running and the URL in Settings is correct."; logger_rec.error(error_detail)
-        except requests.exceptions.Timeout: error_detail = f"API Timeout Error:\nRequest to {api_url} timed out."; logger_rec.error(error_detail)
-        except requests.exceptions.RequestException as e: # Lỗi request chung
-            error_detail = f"API Request Error: {e}"
-            status_code = 'N/A'
-            api_error = str(e)
-            if hasattr(e, 'response') and e.response is not None:
-                status_code = e.response.status_code
-                try: api_error = e.response.json().get('detail', e.response.text)
-                except ValueError: api_error = e.response.text
-            error_detail += f"\n\nAPI Error Details (Status: {status_code}):\n{api_error}"
-            logger_rec.error(error_detail, exc_info=True) # Log traceback
-        except Exception as e: # Lỗi không mong muốn khác
-            error_detail = f"An unexpected error occurred during prediction:\n{e}"; logger_rec.error(error_detail, exc_info=True)
-
-        finally:
-            self.set_buttons_enabled(True); QApplication.processEvents() # Kích hoạt lại nút
-            # Xử lý hiển thị kết quả hoặc lỗi
-            if top_predictions_list:
-                top1_pred = top_predictions_list[0]
-                # Ưu tiên hiển thị ResultWindow nếu có
-                if RESULT_WINDOW_AVAILABLE_REC:
-                    try:
-                        result_dialog = ResultWindow(
-                            top_predictions=top_predictions_list,
-                            input_image_path=self.current_image_path,
-                            class_images_dir=str(class_images_dir), # Cần chuyển Path thành str
-                            parent=self )
-                        result_dialog.exec() # Hiển thị dialog modal
-                    except Exception as e_res: # Nếu lỗi mở cửa sổ chi tiết
-                        show_error_message(self,"Lỗi Hiển Thị Kết Quả", f"Lỗi mở cửa sổ kết quả chi tiết:\n{e_res}")
-                        logger_rec.error("Error opening ResultWindow", exc_info=True)
-                        # Hiển thị fallback đơn giản
-                        show_info_message(self, "Kết Quả (Top 1)", f"Dự đoán: {top1_pred['class_name']}\nĐộ tin cậy: {top1_pred['confidence']:.2%}")
-                else: # Nếu ResultWindow không có
-                    show_info_message(self, "Kết Quả (Top 1)", f"Dự đoán: {top1_pred['class_name']}\nĐộ tin cậy: {top1_pred['confidence']:.2%}")
-
-                # Lưu vào lịch sử database
-                if DATABASE_AVAILABLE_REC:
-                    try:
-                        success_db = add_prediction_to_history(
-                            image_path=self.current_image_path,
-                            predicted_class_id=top1_pred['class_id'],
-                            predicted_class_name=top1_pred['class_name'],
-                            confidence=top1_pred['confidence'] )
-                        if not success_db: logger_rec.warning("Failed to add prediction to history database (returned False).")
-                    except Exception as db_err:
-                        show_error_message(self, "Lỗi Cơ Sở Dữ Liệu", f"Không thể lưu kết quả vào lịch sử:\n{db_err}")
-                        logger_rec.error("Error saving prediction to DB", exc_info=True)
-
-            elif error_detail: # Nếu có lỗi xảy ra trong quá trình gọi API
-                show_error_message(self, "Lỗi Nhận Diện", error_detail)
-            # Không làm gì nếu không có lỗi và cũng không có kết quả (trường hợp hiếm)
+        if not PREDICTION_WORKER_AVAILABLE_REC:
+            show_error_message(self, "Lỗi Nhận Diện", "Module prediction_worker không khả dụng.")
+            return
+
+        self._request_counter += 1
+        worker = PredictionWorker(self._request_counter, self.current_image_path, api_url, top_n_results, self._pending_mode,
+                                  upload_max_edge)
+        worker.signals.finished.connect(self._on_prediction_finished)
+        worker.signals.failed.connect(self._on_prediction_failed)
+        worker.signals.cancelled.connect(self._on_prediction_cancelled)
+        self._active_worker = worker
+        self._set_busy(True)
+        self._dispatched_at = time.perf_counter()
+        if self._pending_mode == "local" and LOCAL_INFERENCE_AVAILABLE_REC and not get_local_engine().is_ready:
+            self.status_bar.showMessage("Đang tải model cục bộ (lần đầu)...")
+        QThreadPool.globalInstance().start(worker)
+
+    def cancel_prediction(self):
+        """Hủy request đang chạy: giao diện mở lại ngay, kết quả đến sau sẽ bị bỏ qua."""
+        if self._active_worker is None: return
+        logger_rec.info(f"Prediction {self._active_worker.request_id} cancelled by user.")
+        self._active_worker.cancel()
+        self._active_worker = None
+        self._set_busy(False)
+
+    def _set_busy(self, busy: bool):
+        self.set_buttons_enabled(not busy)
+        self.progress_bar.setVisible(busy)
+        self.cancel_button.setVisible(busy)
+        self.cancel_button.setEnabled(busy)
+        self.predict_button.setText(' Đang nhận diện...' if busy else ' Bắt đầu Nhận Diện')
+
+    def _is_current_request(self, request_id: int) -> bool:
+        return self._active_worker is not None and self._active_worker.request_id == request_id
+
+    def _on_prediction_cancelled(self, request_id: int):
+        if self._is_current_request(request_id):
+            self._active_worker = None
+            self._set_busy(False)
+
+    def _on_prediction_failed(self, request_id: int, error_detail: str, api_offline: bool = False):
+        if not self._is_current_request(request_id): return # Request đã bị hủy / cũ
+        self._active_worker = None
+        self._set_busy(False)
+        self.status_bar.showMessage(f"Nhận diện thất bại sau {(time.perf_counter() - self._dispatched_at) * 1000:.0f} ms")
+        if api_offline and OFFLINE_QUEUE_AVAILABLE_REC and get_offline_queue().enqueue(
+                self._pending_image_path, self._pending_upload_max_edge, error_detail.split('\n')[0]):
+            show_warning_message(self, "API Không Khả Dụng",
+                                 "Không kết nối được tới API nhận diện.\n\nẢnh đã được lưu vào hàng đợi và sẽ tự động "
+                                 "được nhận diện khi API hoạt động trở lại; kết quả sẽ có trong Lịch sử.")
+            return
+        show_error_message(self, "Lỗi Nhận Diện", error_detail)
+
+    # --- Hàng đợi offline ---
+    def _init_offline_queue(self):
+        """Hiển thị số ảnh đang chờ và chạy thread gửi lại (ảnh còn chờ từ phiên trước cũng được gửi)."""
+        offline_queue = get_offline_queue()
+        offline_queue.pending_changed.connect(self._on_offline_pending_changed)
+        offline_queue.replayed.connect(self._on_offline_replayed)
+        offline_queue.start()
+        QTimer.singleShot(0, lambda: self._on_offline_pending_changed(offline_queue.pending_count()))
+
+    def _on_offline_pending_changed(self, pending: int):
+        self.offline_label.setText(f"Chờ gửi lại: {pending} ảnh")
+        self.offline_label.setVisible(pending > 0)
+
+    def _on_offline_replayed(self, done: int, failed: int):
+        if done: self.status_bar.showMessage(f"Đã nhận diện {done} ảnh trong hàng đợi offline (lưu vào Lịch sử)", 8000)
+        if failed: logger_rec.warning(f"{failed} queued image(s) could not be recognized on replay.")
+
+    def _on_prediction_finished(self, request_id: int, top_predictions_list: list, elapsed: float):
+        if not self._is_current_request(request_id): return # Request đã bị hủy / cũ
+        self._active_worker = None
+        self._set_busy(False)
+        latency_ms = (time.perf_counter() - self._dispatched_at) * 1000
+        mode_text = "cục bộ" if self._pending_mode == "local" else "API"
+        self.status_bar.showMessage(f"Nhận diện xong ({mode_text}): {latency_ms:.0f} ms end-to-end, suy luận {elapsed * 1000:.0f} ms")
+        logger_rec.info(f"Prediction {request_id} completed in {elapsed:.2f}s ({mode_text}, end-to-end {latency_ms:.0f} ms).")
+        self._show_prediction_result(top_predictions_list, self._pending_image_path, self._pending_class_images_dir)
+
+    def _show_prediction_result(self, top_predictions_list: list, image_path: str, class_images_dir: Path):
+        top1_pred = top_predictions_list[0]
+        # Ưu tiên hiển thị ResultWindow nếu có
+        if RESULT_WINDOW_AVAILABLE_REC:
+            try:
+                result_dialog = ResultWindow(
+                    top_predictions=top_predictions_list,
+                    input_image_path=image_path,
+                    class_images_dir=str(class_images_dir), # Cần chuyển Path thành str
+                    parent=self )
+                result_dialog.exec() # Hiển thị dialog modal
+            except Exception as e_res: # Nếu lỗi mở cửa sổ chi tiết
+                show_error_message(self,"Lỗi Hiển Thị Kết Quả", f"Lỗi mở cửa sổ kết quả chi tiết:\n{e_res}")
+                logger_rec.error("Error opening ResultWindow", exc_info=True)
+                # Hiển thị fallback đơn giản
+                show_info_message(self, "Kết Quả (Top 1)", f"Dự đoán: {top1_pred['class_name']}\nĐộ tin cậy: {top1_pred['confidence']:.2%}")
+        else: # Nếu ResultWindow không có
+            show_info_message(self, "Kết Quả (Top 1)", f"Dự đoán: {top1_pred['class_name']}\nĐộ tin cậy: {top1_pred['confidence']:.2%}")
+
+        # Lưu vào lịch sử database (ghi ở thread nền, không chờ commit trên GUI thread)
+        if DATABASE_AVAILABLE_REC:
+            try:
+                success_db = get_history_writer().submit(
+                    image_path=image_path,
+                    predicted_class_id=top1_pred['class_id'],
+                    predicted_class_name=top1_pred['class_name'],
+                    confidence=top1_pred['confidence'] )
+                if not success_db: logger_rec.warning("Failed to queue prediction for the history database (writer stopped or queue full).")
+            except Exception as db_err:
+                show_error_message(self, "Lỗi Cơ Sở Dữ Liệu", f"Không thể lưu kết quả vào lịch sử:\n{db_err}")
+                logger_rec.error("Error saving prediction to DB", exc_info=True)
+
+    # --- Chế độ suy luận cục bộ ---
+    def _preload_local_model_if_needed(self):
+        """Nếu Settings chọn chế độ cục bộ, bắt đầu tải model trên thread nền ngay khi mở cửa sổ."""
+        current_settings = load_settings() if CONFIG_LOADER_AVAILABLE_REC else DEFAULT_SETTINGS
+        if current_settings.get("inference_mode", "api") != "local":
+            self.status_bar.showMessage("Chế độ: API HTTP")
+            return
+        if not LOCAL_INFERENCE_AVAILABLE_REC:
+            self.status_bar.showMessage("Chế độ cục bộ không khả dụng (thiếu utils.local_inference)")
+            return
+        engine = get_local_engine()
+        engine.ensure_loaded_async()
+        self.status_bar.showMessage("Chế độ: cục bộ - đang tải model ở chế độ nền...")
+        self._poll_local_model()
+
+    def _poll_local_model(self):
+        engine = get_local_engine()
+        if engine.is_ready:
+            if self._active_worker is None: self.status_bar.showMessage(f"Chế độ: cục bộ - model sẵn sàng (tải trong {engine.load_seconds:.1f}s)")
+        elif engine.load_error:
+            self.status_bar.showMessage(f"Chế độ: cục bộ - lỗi tải model: {engine.load_error}")
+        else:
+            QTimer.singleShot(250, self._poll_local_model)
+
+    def closeEvent(self, event):
+        self.cancel_prediction() # Không để worker gửi kết quả về cửa sổ đã đóng
+        super().closeEvent(event)
 
 
 # --- Test Block ---
@@ -20,6 +20,12 @@ except ImportError: UI_HELPERS_AVAILABLE_RESULT = False; print("Warning: ui_help
 def scale_pixmap_fallback(pixmap, target_size): return pixmap.scaled(target_size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation) if not pixmap.isNull() else pixmap
 scale_pixmap_func = scale_pixmap if UI_HELPERS_AVAILABLE_RESULT else scale_pixmap_fallback
 
+try: from .thumbnail_cache import get_thumbnail_cache; THUMBNAIL_CACHE_AVAILABLE_RESULT = True
+except ImportError: THUMBNAIL_CACHE_AVAILABLE_RESULT = False; print("Warning: thumbnail_cache not found.")
+
+try: from .class_image_cache import get_class_image_cache, CLASS_IMAGE_DISPLAY_SIZES; CLASS_IMAGE_CACHE_AVAILABLE_RESULT = True
+except ImportError: CLASS_IMAGE_CACHE_AVAILABLE_RESULT = False; CLASS_IMAGE_DISPLAY_SIZES = (180,); print("Warning: class_image_cache not found.")
+
 
 class ResultWindow(QDialog):
     """Dialog hiển thị kết quả nhận diện (bao gồm Top-N)."""
@@ -55,23 +61,25 @@ class ResultWindow(QDialog):
             main_layout.addWidget(self.confidence_label)
 
             image_layout = QHBoxLayout(); image_layout.setContentsMargins(10, 5, 10, 5); main_layout.addLayout(image_layout)
-            fixed_image_size = QSize(180, 180)
+            fixed_image_size = QSize(CLASS_IMAGE_DISPLAY_SIZES[0], CLASS_IMAGE_DISPLAY_SIZES[0])
 
             input_group_layout = QVBoxLayout(); input_title = QLabel("Ảnh Đầu Vào:"); input_title.setAlignment(Qt.AlignmentFlag.AlignCenter)
             self.input_image_display = QLabel("..."); self.input_image_display.setAlignment(Qt.AlignmentFlag.AlignCenter); self.input_image_display.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
             self.input_image_display.setFixedSize(fixed_image_size); self.input_image_display.setStyleSheet("border: 1px solid #ccc; background-color: #eee;")
-            pixmap_input = QPixmap(self.input_image_path);
-            if not pixmap_input.isNull(): self.input_image_display.setPixmap(scale_pixmap_func(pixmap_input, fixed_image_size)); self.input_image_display.setText("")
-            else: self.input_image_display.setText("Lỗi tải ảnh\nđầu vào"); print(f"ResultWindow - Failed load input: {self.input_image_path}")
+            self._thumbnail_targets = {} # đường dẫn tuyệt đối -> (QLabel, thông báo lỗi); ảnh được nạp qua cache thumbnail
+            self._set_image_from_cache(self.input_image_display, self.input_image_path, "Lỗi tải ảnh\nđầu vào")
             input_group_layout.addWidget(input_title); input_group_layout.addWidget(self.input_image_display); input_group_layout.addStretch(); image_layout.addLayout(input_group_layout)
 
             sample_group_layout = QVBoxLayout(); sample_title = QLabel("Ảnh Mẫu (Dự đoán Top 1):"); sample_title.setAlignment(Qt.AlignmentFlag.AlignCenter)
             self.sample_image_display = QLabel("..."); self.sample_image_display.setAlignment(Qt.AlignmentFlag.AlignCenter); self.sample_image_display.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
             self.sample_image_display.setFixedSize(fixed_image_size); self.sample_image_display.setStyleSheet("border: 1px solid green; background-color: #eee;")
             sample_image_path = os.path.join(self.class_images_dir, f"{top_class_id}.png")
-            pixmap_sample = QPixmap(sample_image_path)
-            if not pixmap_sample.isNull(): self.sample_image_display.setPixmap(scale_pixmap_func(pixmap_sample, fixed_image_size)); self.sample_image_display.setText("")
-            else: self.sample_image_display.setText("Không tìm thấy\nảnh mẫu"); self.sample_image_display.setStyleSheet("border: 1px dashed red;"); print(f"ResultWindow - Failed load sample: {sample_image_path}")
+            if CLASS_IMAGE_CACHE_AVAILABLE_RESULT: # Ảnh mẫu đã tải và scale sẵn trong RAM
+                pixmap_sample = get_class_image_cache().get(top_class_id, fixed_image_size.width(), self.class_images_dir)
+                if pixmap_sample is not None: self.sample_image_display.setPixmap(pixmap_sample); self.sample_image_display.setText("")
+                else: self.sample_image_display.setText("Không tìm thấy\nảnh mẫu"); self.sample_image_display.setStyleSheet("border: 1px dashed red;"); print(f"ResultWindow - Failed load sample: {sample_image_path}")
+            elif not self._set_image_from_cache(self.sample_image_display, sample_image_path, "Không tìm thấy\nảnh mẫu"):
+                self.sample_image_display.setStyleSheet("border: 1px dashed red;")
             sample_group_layout.addWidget(sample_title); sample_group_layout.addWidget(self.sample_image_display); sample_group_layout.addStretch(); image_layout.addLayout(sample_group_layout)
         else:
             error_label = QLabel("Không nhận được kết quả dự đoán hợp lệ."); error_label.setAlignment(Qt.AlignmentFlag.AlignCenter); main_layout.addWidget(error_label)
@@ -87,6 +95,35 @@ class ResultWindow(QDialog):
 
         button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok); button_box.accepted.connect(self.accept); main_layout.addWidget(button_box)
 
+    def _set_image_from_cache(self, label: QLabel, image_path: str, error_text: str) -> bool:
+        """Hiển thị thumbnail nếu đã có; nếu chưa, label giữ '...' và được cập nhật khi thumbnail tạo xong. False nếu lỗi."""
+        if not THUMBNAIL_CACHE_AVAILABLE_RESULT: # Không có cache: đọc trực tiếp như trước
+            pixmap = QPixmap(image_path)
+            if pixmap.isNull(): label.setText(error_text); print(f"ResultWindow - Failed load: {image_path}"); return False
+            label.setPixmap(scale_pixmap_func(pixmap, label.size())); label.setText(""); return True
+        cache = get_thumbnail_cache(); edge = max(label.width(), label.height())
+        pixmap = cache.get(image_path, edge)
+        if pixmap is not None:
+            label.setPixmap(scale_pixmap_func(pixmap, label.size())); label.setText(""); return True
+        if cache.has_failed(image_path, edge):
+            label.setText(error_text); print(f"ResultWindow - Failed load: {image_path}"); return False
+        if not self._thumbnail_targets: cache.thumbnail_ready.connect(self._on_thumbnail_ready)
+        self._thumbnail_targets[os.path.abspath(image_path)] = (label, error_text)
+        return True
+
+    def _on_thumbnail_ready(self, image_path: str, edge: int):
+        target = self._thumbnail_targets.pop(image_path, None)
+        if target is None: return
+        label, error_text = target
+        pixmap = get_thumbnail_cache().get(image_path, edge)
+        if pixmap is not None: label.setPixmap(scale_pixmap_func(pixmap, label.size())); label.setText("")
+        else:
+            label.setText(error_text); print(f"ResultWindow - Failed load: {image_path}")
+            if label is getattr(self, 'sample_image_display', None): label.setStyleSheet("border: 1px dashed red;")
+        if not self._thumbnail_targets:
+            try: get_thumbnail_cache().thumbnail_ready.disconnect(self._on_thumbnail_ready)
+            except TypeError: pass
+
 # --- Chạy thử dialog ---
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -4,7 +4,8 @@ import sys
 import os
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
-    QPushButton, QMessageBox, QFileDialog, QGroupBox # Thêm QGroupBox
+    QPushButton, QMessageBox, QFileDialog, QGroupBox, # Thêm QGroupBox
+    QComboBox
 )
 from PyQt6.QtCore import Qt
 
@@ -16,7 +17,8 @@ if project_root not in sys.path:
 
 # --- Import trình quản lý cấu hình ---
 try:
-    from utils.config_loader import load_settings, save_settings, DEFAULT_SETTINGS
+    from utils.config_loader import (load_settings, save_settings, DEFAULT_SETTINGS,
+                                     INFERENCE_MODE_API, INFERENCE_MODE_LOCAL, UPLOAD_MAX_EDGE_CHOICES)
     CONFIG_LOADER_AVAILABLE = True
 except ImportError as e:
     print(f"SettingsWindow Error: Could not import config_loader. Settings cannot be managed. Error: {e}")
@@ -24,6 +26,10 @@ except ImportError as e:
 except Exception as e:
     print(f"SettingsWindow Error: Unexpected error importing config_loader. Error: {e}")
     CONFIG_LOADER_AVAILABLE = False
+if not CONFIG_LOADER_AVAILABLE:
+    # Giá trị dự phòng để dựng giao diện (bị vô hiệu hóa) mà không lỗi NameError trong slot
+    INFERENCE_MODE_API, INFERENCE_MODE_LOCAL = "api", "local"
+    UPLOAD_MAX_EDGE_CHOICES = (0,)
 
 
 class SettingsWindow(QWidget):
@@ -55,6 +61,27 @@ class SettingsWindow(QWidget):
         api_url_layout.addWidget(self.api_url_input)
         api_layout.addLayout(api_url_layout)
 
+        # Chế độ suy luận: qua API HTTP hoặc chạy model ngay trong ứng dụng (máy đơn, không cần chạy API)
+        mode_layout = QHBoxLayout()
+        mode_label = QLabel("Chế độ Nhận Diện:")
+        self.inference_mode_combo = QComboBox()
+        self.inference_mode_combo.addItem("Qua API (HTTP)", INFERENCE_MODE_API)
+        self.inference_mode_combo.addItem("Cục bộ (chạy model trong ứng dụng)", INFERENCE_MODE_LOCAL)
+        self.inference_mode_combo.currentIndexChanged.connect(self._on_inference_mode_changed)
+        mode_layout.addWidget(mode_label)
+        mode_layout.addWidget(self.inference_mode_combo)
+        api_layout.addLayout(mode_layout)
+
+        # Thu nhỏ ảnh trước khi gửi: model chỉ cần 32x32, gửi ảnh gốc nhiều MB tốn băng thông và thời gian giải mã
+        upload_layout = QHBoxLayout()
+        upload_label = QLabel("Thu nhỏ ảnh trước khi gửi:")
+        self.upload_size_combo = QComboBox()
+        for edge in UPLOAD_MAX_EDGE_CHOICES:
+            self.upload_size_combo.addItem("Không (gửi ảnh gốc)" if edge == 0 else f"{edge}x{edge} (PNG lossless)", edge)
+        upload_layout.addWidget(upload_label)
+        upload_layout.addWidget(self.upload_size_combo)
+        api_layout.addLayout(upload_layout)
+
         # --- Nhóm Cài đặt Giao diện ---
         ui_groupbox = QGroupBox("Cài đặt Giao diện")
         ui_layout = QVBoxLayout()
@@ -110,8 +137,24 @@ class SettingsWindow(QWidget):
         settings = load_settings()
         self.api_url_input.setText(settings.get('api_url', ''))
         self.img_dir_input.setText(settings.get('class_images_dir', ''))
+        self._set_inference_mode(settings.get('inference_mode', INFERENCE_MODE_API))
+        self._set_upload_max_edge(settings.get('upload_max_edge', 0))
         # self.db_path_input.setText(settings.get('database_path', '')) # Nếu có ô nhập DB path
 
+    def _set_inference_mode(self, mode: str):
+        index = self.inference_mode_combo.findData(mode)
+        self.inference_mode_combo.setCurrentIndex(index if index >= 0 else 0)
+
+    def _set_upload_max_edge(self, edge):
+        index = self.upload_size_combo.findData(edge)
+        self.upload_size_combo.setCurrentIndex(index if index >= 0 else 0)
+
+    def _on_inference_mode_changed(self):
+        # URL API và thu nhỏ ảnh upload không dùng tới ở chế độ cục bộ
+        is_api = self.inference_mode_combo.currentData() != INFERENCE_MODE_LOCAL
+        self.api_url_input.setEnabled(is_api)
+        self.upload_size_combo.setEnabled(is_api)
+
     def browseImageDirectory(self):
         """Mở hộp thoại chọn thư mục cho ảnh mẫu."""
         current_dir = self.img_dir_input.text() # Lấy đường dẫn hiện tại làm điểm bắt đầu
@@ -127,11 +170,15 @@ class SettingsWindow(QWidget):
         """Lấy giá trị từ input và lưu vào file settings.json."""
         if not CONFIG_LOADER_AVAILABLE: return
 
-        new_settings = {
+        # Giữ lại các key khác trong file (ví dụ last_image_dir) thay vì ghi đè toàn bộ
+        new_settings = load_settings()
+        new_settings.update({
             "api_url": self.api_url_input.text().strip(), # Lấy text và xóa khoảng trắng thừa
             "class_images_dir": self.img_dir_input.text().strip(),
+            "inference_mode": self.inference_mode_combo.currentData(),
+            "upload_max_edge": self.upload_size_combo.currentData(),
             # "database_path": self.db_path_input.text().strip(), # Nếu có
-        }
+        })
 
         # (Tùy chọn) Validate dữ liệu nhập vào (ví dụ: URL có hợp lệ không?)
 
@@ -154,6 +201,8 @@ class SettingsWindow(QWidget):
         if reply == QMessageBox.StandardButton.Yes:
             self.api_url_input.setText(DEFAULT_SETTINGS.get('api_url', ''))
             self.img_dir_input.setText(DEFAULT_SETTINGS.get('class_images_dir', ''))
+            self._set_inference_mode(DEFAULT_SETTINGS.get('inference_mode', INFERENCE_MODE_API))
+            self._set_upload_max_edge(DEFAULT_SETTINGS.get('upload_max_edge', 0))
             # self.db_path_input.setText(DEFAULT_SETTINGS.get('database_path', ''))
             # Có thể lưu luôn cài đặt mặc định vào file ở đây nếu muốn
             # save_settings(DEFAULT_SETTINGS)
@@ -0,0 +1,180 @@
+# gui/thumbnail_cache.py
+
+import os
+import hashlib
+import logging
+import threading
+from typing import Optional, Tuple
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, QCoreApplication, QSize, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap, QPixmapCache
+
+from .image_loader import read_scaled_image
+
+logger_thumb = logging.getLogger(__name__)
+
+try:
+    import config
+    THUMBNAIL_CACHE_DIR = config.THUMBNAIL_CACHE_DIR
+    THUMBNAIL_CACHE_MAX_MB = config.THUMBNAIL_CACHE_MAX_MB
+    THUMBNAIL_WORKERS = config.THUMBNAIL_WORKERS
+except (ImportError, AttributeError):
+    THUMBNAIL_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'thumbnails')
+    THUMBNAIL_CACHE_MAX_MB = 256
+    THUMBNAIL_WORKERS = 2
+    logger_thumb.warning("ThumbnailCache: config thumbnail settings not found, using defaults.")
+
+PIXMAP_CACHE_LIMIT_KB = 64 * 1024 # QPixmapCache mặc định chỉ 10 MB
+THUMBNAIL_JPEG_QUALITY = 90
+
+
+def file_signature(image_path: str) -> Optional[Tuple[str, int, int]]:
+    """(đường dẫn tuyệt đối, mtime_ns, kích thước file) hoặc None nếu không đọc được file."""
+    try:
+        stat = os.stat(image_path)
+    except OSError:
+        return None
+    return os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size
+
+
+def thumbnail_cache_key(signature: Tuple[str, int, int], edge: int) -> str:
+    """Khóa cache: file đổi nội dung (mtime/kích thước) sẽ có khóa mới, thumbnail cũ tự hết hiệu lực."""
+    path, mtime_ns, size = signature
+    return hashlib.sha1(f"{path}|{mtime_ns}|{size}|{edge}".encode('utf-8')).hexdigest()
+
+
+def thumbnail_disk_path(key: str) -> str:
+    return os.path.join(THUMBNAIL_CACHE_DIR, key[:2], f"{key}.jpg")
+
+
+def load_or_create_thumbnail(signature: Tuple[str, int, int], edge: int) -> QImage:
+    """Đọc thumbnail từ cache đĩa; nếu chưa có thì tạo từ ảnh gốc và ghi lại (ghi file tạm rồi đổi tên)."""
+    disk_path = thumbnail_disk_path(thumbnail_cache_key(signature, edge))
+    if os.path.exists(disk_path):
+        image = QImage(disk_path)
+        if not image.isNull():
+            return image
+    image = read_scaled_image(signature[0], QSize(edge, edge))
+    if image.isNull():
+        return image
+    try:
+        os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+        temp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+        stored = image.convertToFormat(QImage.Format.Format_RGB888) if image.hasAlphaChannel() else image
+        if stored.save(temp_path, "JPG", THUMBNAIL_JPEG_QUALITY):
+            os.replace(temp_path, disk_path)
+    except OSError as e:
+        logger_thumb.warning(f"Cannot write thumbnail cache {disk_path}: {e}")
+    return image
+
+
+def prune_thumbnail_cache(max_bytes: int = THUMBNAIL_CACHE_MAX_MB * 1024 * 1024):
+    """Xóa thumbnail ít dùng nhất (theo mtime file cache) khi thư mục cache vượt max_bytes."""
+    entries, total = [], 0
+    for root, _, files in os.walk(THUMBNAIL_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try: stat = os.stat(path)
+            except OSError: continue
+            entries.append((stat.st_mtime, stat.st_size, path)); total += stat.st_size
+    if total <= max_bytes:
+        return
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes * 0.8: break
+        try: os.remove(path); total -= size
+        except OSError: pass
+    logger_thumb.info(f"Thumbnail cache pruned to {total / (1024 * 1024):.1f} MB.")
+
+
+class _ThumbnailJobSignals(QObject):
+    done = pyqtSignal(str, int, str, QImage) # memory key, edge, đường dẫn ảnh, thumbnail (rỗng nếu lỗi)
+
+
+class _ThumbnailJob(QRunnable):
+    def __init__(self, memory_key: str, signature: Tuple[str, int, int], edge: int, signals: _ThumbnailJobSignals):
+        super().__init__()
+        self.memory_key, self.signature, self.edge, self.signals = memory_key, signature, edge, signals
+        self.setAutoDelete(True)
+
+    def run(self):
+        try:
+            image = load_or_create_thumbnail(self.signature, self.edge)
+        except Exception as e:
+            logger_thumb.error(f"Thumbnail generation failed for {self.signature[0]}: {e}", exc_info=True)
+            image = QImage()
+        try: self.signals.done.emit(self.memory_key, self.edge, self.signature[0], image)
+        except RuntimeError: pass # Ứng dụng đã thoát, signals đã bị hủy
+
+
+class ThumbnailCache(QObject):
+    """
+    Cache thumbnail hai tầng: QPixmapCache trong RAM (chỉ truy cập trên GUI thread) và file JPEG
+    trên đĩa theo khóa (đường dẫn, mtime, kích thước, cạnh). Thumbnail chưa có được tạo trên
+    QThreadPool riêng; yêu cầu mới nhất được ưu tiên để các dòng đang hiển thị có ảnh trước.
+    """
+    thumbnail_ready = pyqtSignal(str, int) # đường dẫn tuyệt đối, cạnh
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), PIXMAP_CACHE_LIMIT_KB))
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(1, THUMBNAIL_WORKERS))
+        self._pending = set()
+        self._failed = set()
+        self._priority = 0
+        self._signals = _ThumbnailJobSignals()
+        self._signals.done.connect(self._on_job_done)
+        app = QCoreApplication.instance()
+        if app is not None: app.aboutToQuit.connect(self.shutdown)
+        threading.Thread(target=prune_thumbnail_cache, name="thumbnail-cache-prune", daemon=True).start()
+
+    def get(self, image_path: str, edge: int) -> Optional[QPixmap]:
+        """
+        Trả về thumbnail nếu đã có trong RAM; nếu chưa, xếp lịch tạo trên thread nền và trả về None
+        (thumbnail_ready được phát khi xong). Chỉ gọi từ GUI thread.
+        """
+        signature = file_signature(image_path)
+        if signature is None:
+            return None
+        memory_key = f"thumb:{edge}:{thumbnail_cache_key(signature, edge)}"
+        pixmap = QPixmapCache.find(memory_key)
+        if pixmap is not None and not pixmap.isNull():
+            return pixmap
+        if memory_key not in self._pending and memory_key not in self._failed:
+            self._pending.add(memory_key)
+            self._priority += 1 # QThreadPool chạy job có priority cao hơn trước
+            self._pool.start(_ThumbnailJob(memory_key, signature, edge, self._signals), min(self._priority, 2**31 - 1))
+        return None
+
+    def has_failed(self, image_path: str, edge: int) -> bool:
+        """True nếu ảnh (phiên bản hiện tại) không đọc được ở lần tạo thumbnail trước."""
+        signature = file_signature(image_path)
+        return signature is None or f"thumb:{edge}:{thumbnail_cache_key(signature, edge)}" in self._failed
+
+    def _on_job_done(self, memory_key: str, edge: int, image_path: str, image: QImage):
+        self._pending.discard(memory_key)
+        if image.isNull():
+            self._failed.add(memory_key)
+        else:
+            QPixmapCache.insert(memory_key, QPixmap.fromImage(image))
+        self.thumbnail_ready.emit(image_path, edge)
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._pool.waitForDone(msecs)
+
+    def shutdown(self):
+        """Bỏ các job chưa chạy và chờ job đang chạy (gọi khi thoát ứng dụng)."""
+        self._pool.clear()
+        self._pool.waitForDone(2000)
+
+
+_shared_cache: Optional[ThumbnailCache] = None
+
+
+def get_thumbnail_cache() -> ThumbnailCache:
+    """Cache dùng chung cho mọi cửa sổ (tạo lần đầu trên GUI thread)."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ThumbnailCache()
+    return _shared_cache
@@ -2,12 +2,13 @@
 
 import sys
 import os
+import threading
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
     QPushButton, QHeaderView, QMessageBox, QDialog, QLabel, QLineEdit, QComboBox,
-    QDialogButtonBox, QAbstractItemView, QSpacerItem, QSizePolicy
+    QDialogButtonBox, QAbstractItemView, QSpacerItem, QSizePolicy, QFileDialog, QProgressDialog
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
 
 # --- Thêm thư mục gốc ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,12 +24,55 @@ except ImportError:
     AUTH_MANAGER_AVAILABLE_UM = False
 
 try:
-    from .ui_helpers import show_error_message, show_info_message, ask_confirmation
+    from .ui_helpers import show_error_message, show_info_message, show_warning_message, ask_confirmation
 except ImportError:
     def show_error_message(parent, title, message): QMessageBox.critical(parent, title, message)
     def show_info_message(parent, title, message): QMessageBox.information(parent, title, message)
+    def show_warning_message(parent, title, message): QMessageBox.warning(parent, title, message)
     def ask_confirmation(parent, title, question): return QMessageBox.question(parent, title, question, QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No, QMessageBox.StandardButton.No) == QMessageBox.StandardButton.Yes
 
+MAX_IMPORT_ERRORS_SHOWN = 200 # Số dòng lỗi tối đa hiển thị trong chi tiết kết quả nhập CSV
+
+# ==============================================================
+# == Nhập người dùng hàng loạt từ CSV (chạy trên QThreadPool) ==
+# ==============================================================
+class BulkImportSignals(QObject):
+    """Signals của BulkImportWorker."""
+    progress = pyqtSignal(int, int)          # số mật khẩu đã băm, tổng số cần băm
+    row_failed = pyqtSignal(int, str, str)   # số dòng trong file, username, thông báo lỗi
+    finished = pyqtSignal(int, int, bool)    # số người dùng đã thêm, số dòng lỗi, đã bị hủy
+    failed = pyqtSignal(str)                 # lỗi đọc file / lỗi không mong muốn
+
+class BulkImportWorker(QRunnable):
+    """Đọc CSV và gọi auth_manager.bulk_add_users ngoài GUI thread (băm mật khẩu mất vài phút với hàng nghìn dòng)."""
+    def __init__(self, csv_path: str):
+        super().__init__()
+        self.csv_path = csv_path
+        self.signals = BulkImportSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def _emit(self, signal, *args):
+        try: signal.emit(*args)
+        except RuntimeError: pass # Cửa sổ đã đóng
+
+    def run(self):
+        try:
+            rows = auth_manager.read_users_csv(self.csv_path)
+            added, errors = auth_manager.bulk_add_users(
+                rows, progress_callback=lambda done, total: self._emit(self.signals.progress, done, total),
+                cancel_check=self._cancel_event.is_set)
+        except (OSError, ValueError, UnicodeDecodeError) as e:
+            self._emit(self.signals.failed, f"Không thể đọc file CSV:\n{e}"); return
+        except Exception as e:
+            print(f"Unexpected error during bulk user import: {e}")
+            self._emit(self.signals.failed, f"Lỗi không mong muốn khi nhập người dùng:\n{e}"); return
+        for row_no, username, message in errors:
+            self._emit(self.signals.row_failed, row_no, username, message)
+        self._emit(self.signals.finished, added, len(errors), self._cancel_event.is_set())
+
 # ==============================================================
 # == Dialog Thêm/Sửa Người Dùng (Inner Class hoặc file riêng) ==
 # ==============================================================
@@ -107,6 +151,11 @@ class UserManagementWindow(QWidget):
         super().__init__(parent)
         self.setWindowTitle('Quản Lý Người Dùng')
         self.setGeometry(250, 250, 650, 400)
+        self.import_pool = QThreadPool(self)
+        self.import_pool.setMaxThreadCount(1)
+        self.import_worker = None
+        self.import_progress = None
+        self.import_errors = []
         self.initUI()
         self.loadUsers()
 
@@ -132,6 +181,11 @@ class UserManagementWindow(QWidget):
         self.delete_button.setEnabled(False) # Kích hoạt khi chọn dòng
         top_button_layout.addWidget(self.delete_button)
 
+        self.import_button = QPushButton("Nhập từ CSV...")
+        self.import_button.setToolTip("Thêm nhiều người dùng từ file CSV có các cột: username,password,role")
+        self.import_button.clicked.connect(self.importUsersFromCsv)
+        top_button_layout.addWidget(self.import_button)
+
         top_button_layout.addSpacerItem(QSpacerItem(40, 20, QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Minimum))
 
         self.refresh_button = QPushButton("Làm Mới Danh Sách")
@@ -167,6 +221,7 @@ class UserManagementWindow(QWidget):
             self.add_button.setEnabled(False)
             self.edit_button.setEnabled(False)
             self.delete_button.setEnabled(False)
+            self.import_button.setEnabled(False)
             self.refresh_button.setEnabled(False)
             self.user_table.setEnabled(False)
             show_error_message(self, "Lỗi Hệ Thống", "Không thể tải auth_manager.\nChức năng quản lý người dùng không khả dụng.")
@@ -284,6 +339,65 @@ class UserManagementWindow(QWidget):
             else:
                 show_error_message(self, "Sửa Thất Bại", "\n".join(messages))
 
+    def importUsersFromCsv(self):
+        """Chọn file CSV và nhập người dùng hàng loạt ở thread nền, hiển thị tiến độ."""
+        if self.import_worker is not None: return
+        csv_path, _ = QFileDialog.getOpenFileName(self, "Chọn File CSV Người Dùng", "", "CSV Files (*.csv);;All Files (*)")
+        if not csv_path: return
+
+        self.import_errors = []
+        self.import_worker = BulkImportWorker(csv_path)
+        self.import_worker.signals.progress.connect(self._on_import_progress)
+        self.import_worker.signals.row_failed.connect(lambda row_no, username, message: self.import_errors.append((row_no, username, message)))
+        self.import_worker.signals.finished.connect(self._on_import_finished)
+        self.import_worker.signals.failed.connect(self._on_import_failed)
+
+        self.import_progress = QProgressDialog("Đang kiểm tra và băm mật khẩu...", "Hủy", 0, 0, self)
+        self.import_progress.setWindowTitle("Nhập Người Dùng")
+        self.import_progress.setWindowModality(Qt.WindowModality.WindowModal)
+        self.import_progress.setMinimumDuration(0)
+        self.import_progress.canceled.connect(self.import_worker.cancel)
+        self.import_button.setEnabled(False)
+        print(f"Starting bulk user import from: {csv_path}")
+        self.import_pool.start(self.import_worker)
+
+    def _on_import_progress(self, done: int, total: int):
+        if self.import_progress is None: return
+        self.import_progress.setMaximum(total)
+        self.import_progress.setValue(done)
+        self.import_progress.setLabelText(f"Đang băm mật khẩu: {done}/{total}")
+
+    def _finish_import(self):
+        if self.import_progress is not None:
+            self.import_progress.canceled.disconnect()
+            self.import_progress.close()
+            self.import_progress = None
+        self.import_worker = None
+        self.import_button.setEnabled(AUTH_MANAGER_AVAILABLE_UM)
+
+    def _on_import_failed(self, message: str):
+        self._finish_import()
+        show_error_message(self, "Nhập Thất Bại", message)
+
+    def _on_import_finished(self, added: int, error_count: int, cancelled: bool):
+        self._finish_import()
+        if added: self.loadUsers()
+        summary = "Đã hủy nhập người dùng, không có người dùng nào được thêm." if cancelled and not added else f"Đã thêm {added} người dùng."
+        if error_count:
+            summary += f"\n{error_count} dòng bị bỏ qua do lỗi."
+        box = QMessageBox(QMessageBox.Icon.Warning if error_count or (cancelled and not added) else QMessageBox.Icon.Information,
+                          "Kết Quả Nhập Người Dùng", summary, QMessageBox.StandardButton.Ok, self)
+        if self.import_errors:
+            lines = [f"Dòng {row_no} ({username or '-'}): {message}" for row_no, username, message in self.import_errors[:MAX_IMPORT_ERRORS_SHOWN]]
+            if len(self.import_errors) > MAX_IMPORT_ERRORS_SHOWN:
+                lines.append(f"... và {len(self.import_errors) - MAX_IMPORT_ERRORS_SHOWN} lỗi khác.")
+            box.setDetailedText("\n".join(lines))
+        box.exec()
+
+    def closeEvent(self, event):
+        if self.import_worker is not None: self.import_worker.cancel() # Dừng băm; phần đang chạy dở kết thúc trong nền
+        super().closeEvent(event)
+
     def deleteUser(self):
         """Xóa người dùng đã chọn."""
         selected_rows = self.user_table.selectionModel().selectedRows()
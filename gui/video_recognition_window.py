@@ -0,0 +1,243 @@
+# gui/video_recognition_window.py
+
+import sys
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict
+
+from PyQt6.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QComboBox,
+    QFileDialog, QCheckBox, QSizePolicy, QSpinBox
+)
+from PyQt6.QtGui import QImage, QPainter, QPen, QColor, QFont
+from PyQt6.QtCore import Qt, QObject, QRectF, QTimer, pyqtSignal
+
+logger_video = logging.getLogger(__name__)
+
+# --- Add project root ---
+project_root_video = Path(__file__).resolve().parent.parent
+if str(project_root_video) not in sys.path:
+    sys.path.insert(0, str(project_root_video))
+
+try:
+    import cv2
+    from utils.video_pipeline import VideoPipeline
+    from utils.local_inference import get_local_engine
+    VIDEO_PIPELINE_AVAILABLE = True
+except ImportError as e:
+    VIDEO_PIPELINE_AVAILABLE = False
+    logger_video.warning(f"VideoRecognitionWindow: video pipeline not available: {e}")
+
+try: from .ui_helpers import show_error_message
+except ImportError:
+    def show_error_message(p, t, m): print(f"Fallback Error Msg: {t} - {m}")
+
+STATS_REFRESH_MS = 500
+VIDEO_FILE_FILTER = "Video (*.mp4 *.avi *.mov *.mkv *.webm);;Tất cả (*)"
+
+
+class _PipelineBridge(QObject):
+    """Chuyển callback từ các thread của pipeline về GUI thread (queued signals)."""
+    frame_ready = pyqtSignal(int, QImage)
+    result_ready = pyqtSignal(dict)
+    finished = pyqtSignal(str)
+
+
+class VideoCanvas(QWidget):
+    """Vẽ frame mới nhất cùng các box/nhãn của kết quả suy luận mới nhất. Chỉ vẽ, không xử lý ảnh."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumSize(480, 360)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self.frame_image: Optional[QImage] = None
+        self.result: Optional[Dict] = None
+        self.stats_text = ""
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), QColor(20, 20, 20))
+        if self.frame_image is None or self.frame_image.isNull():
+            painter.setPen(QColor(200, 200, 200))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "Chọn camera hoặc file video rồi nhấn 'Bắt Đầu'")
+            return
+        # Khung hiển thị giữ tỷ lệ frame
+        image_w, image_h = self.frame_image.width(), self.frame_image.height()
+        scale = min(self.width() / image_w, self.height() / image_h)
+        target = QRectF((self.width() - image_w * scale) / 2, (self.height() - image_h * scale) / 2, image_w * scale, image_h * scale)
+        painter.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        painter.drawImage(target, self.frame_image)
+
+        label_font = QFont(); label_font.setPointSize(10); label_font.setBold(True); painter.setFont(label_font)
+        for detection in (self.result or {}).get('detections', []):
+            x, y, w, h = detection['box']
+            color = QColor(40, 200, 40) if detection['confident'] else QColor(230, 160, 0)
+            label = f"{detection['class_name']} ({detection['confidence']:.0%})"
+            if detection['fallback']: # Không thấy vùng biển báo: kết quả cho vùng giữa khung hình
+                if not detection['confident']: continue
+                painter.setPen(QPen(color, 1, Qt.PenStyle.DashLine))
+            else:
+                painter.setPen(QPen(color, 2))
+            box = QRectF(target.x() + x * scale, target.y() + y * scale, w * scale, h * scale)
+            painter.drawRect(box)
+            text_rect = painter.fontMetrics().boundingRect(label)
+            background = QRectF(box.x(), max(target.y(), box.y() - text_rect.height() - 4), text_rect.width() + 8, text_rect.height() + 4)
+            painter.fillRect(background, QColor(0, 0, 0, 170))
+            painter.setPen(color)
+            painter.drawText(background, Qt.AlignmentFlag.AlignCenter, label)
+
+        if self.stats_text:
+            painter.setFont(QFont(self.font().family(), 9))
+            stats_rect = painter.fontMetrics().boundingRect(0, 0, 400, 100, 0, self.stats_text)
+            background = QRectF(target.x() + 6, target.y() + 6, stats_rect.width() + 12, stats_rect.height() + 8)
+            painter.fillRect(background, QColor(0, 0, 0, 170))
+            painter.setPen(QColor(255, 255, 255))
+            painter.drawText(background, Qt.AlignmentFlag.AlignCenter, self.stats_text)
+
+
+class VideoRecognitionWindow(QWidget):
+    """
+    Nhận diện biển báo trên camera hoặc file video. Đọc frame, tiền xử lý và suy luận chạy trên
+    các thread riêng của VideoPipeline (model cục bộ); GUI thread chỉ nhận frame/kết quả mới nhất và vẽ.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Nhận Diện Biển Báo Qua Camera / Video")
+        self.resize(820, 620)
+        self.pipeline = None
+        self._video_path: Optional[str] = None
+        self._frame_pending = threading.Event() # Frame đang chờ GUI vẽ: frame mới hơn sẽ bị bỏ thay vì xếp hàng
+        self.display_dropped = 0
+        self._bridge = _PipelineBridge()
+        self._bridge.frame_ready.connect(self._on_frame_ready)
+        self._bridge.result_ready.connect(self._on_result_ready)
+        self._bridge.finished.connect(self._on_pipeline_finished)
+        self._stats_timer = QTimer(self); self._stats_timer.setInterval(STATS_REFRESH_MS); self._stats_timer.timeout.connect(self._refresh_stats)
+        self.initUI()
+
+    def initUI(self):
+        layout = QVBoxLayout(self)
+        controls = QHBoxLayout(); layout.addLayout(controls)
+
+        self.source_combo = QComboBox()
+        self.source_combo.addItem("Camera", "camera"); self.source_combo.addItem("File video", "file")
+        self.source_combo.currentIndexChanged.connect(self._update_source_controls)
+        controls.addWidget(self.source_combo)
+        self.camera_index_spin = QSpinBox(); self.camera_index_spin.setRange(0, 9); self.camera_index_spin.setPrefix("Thiết bị ")
+        controls.addWidget(self.camera_index_spin)
+        self.choose_file_button = QPushButton("Chọn File..."); self.choose_file_button.clicked.connect(self.choose_video_file)
+        controls.addWidget(self.choose_file_button)
+        self.file_label = QLabel(""); self.file_label.setMinimumWidth(160)
+        controls.addWidget(self.file_label, 1)
+        self.pace_check = QCheckBox("Phát đúng tốc độ video"); self.pace_check.setChecked(True)
+        controls.addWidget(self.pace_check)
+        self.detect_check = QCheckBox("Tìm vùng biển báo"); self.detect_check.setChecked(True)
+        self.detect_check.setToolTip("Tắt: chỉ phân loại vùng giữa khung hình")
+        controls.addWidget(self.detect_check)
+        self.start_button = QPushButton("Bắt Đầu"); self.start_button.clicked.connect(self.start_pipeline)
+        controls.addWidget(self.start_button)
+        self.stop_button = QPushButton("Dừng"); self.stop_button.setEnabled(False); self.stop_button.clicked.connect(self.stop_pipeline)
+        controls.addWidget(self.stop_button)
+
+        self.canvas = VideoCanvas(); layout.addWidget(self.canvas, 1)
+        self.status_label = QLabel("Sẵn sàng." if VIDEO_PIPELINE_AVAILABLE else "Không khả dụng: thiếu OpenCV hoặc TensorFlow.")
+        layout.addWidget(self.status_label)
+        self.start_button.setEnabled(VIDEO_PIPELINE_AVAILABLE)
+        self._update_source_controls()
+
+    def _update_source_controls(self):
+        is_camera = self.source_combo.currentData() == "camera"
+        self.camera_index_spin.setVisible(is_camera)
+        self.choose_file_button.setVisible(not is_camera); self.file_label.setVisible(not is_camera); self.pace_check.setVisible(not is_camera)
+
+    def choose_video_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Chọn File Video", str(Path.home()), VIDEO_FILE_FILTER)
+        if file_path: self.set_video_file(file_path)
+
+    def set_video_file(self, file_path: str):
+        self._video_path = file_path
+        self.file_label.setText(Path(file_path).name)
+        self.source_combo.setCurrentIndex(self.source_combo.findData("file"))
+
+    # --- Điều khiển pipeline ---
+    def start_pipeline(self):
+        if not VIDEO_PIPELINE_AVAILABLE or self.pipeline is not None: return
+        if self.source_combo.currentData() == "file":
+            if not self._video_path: show_error_message(self, "Thiếu File", "Vui lòng chọn file video."); return
+            source = self._video_path
+        else:
+            source = self.camera_index_spin.value()
+        engine = get_local_engine()
+        engine.ensure_loaded_async() # Thread suy luận chờ model nếu chưa tải xong
+        self.display_dropped = 0; self._frame_pending.clear()
+        self.canvas.result = None
+        self.pipeline = VideoPipeline(source, engine, on_frame=self._publish_frame, on_result=self._bridge.result_ready.emit,
+                                      on_finished=self._bridge.finished.emit, pace_to_source_fps=self.pace_check.isChecked(),
+                                      detect_regions=self.detect_check.isChecked())
+        self.pipeline.start()
+        self.start_button.setEnabled(False); self.stop_button.setEnabled(True); self.source_combo.setEnabled(False)
+        self.status_label.setText("Đang chạy..." if engine.is_ready else "Đang tải model...")
+        self._stats_timer.start()
+        logger_video.info(f"Video pipeline started for source {source!r}.")
+
+    def stop_pipeline(self):
+        """Chỉ báo dừng (không join trên GUI thread); giao diện được đặt lại trong _on_pipeline_finished."""
+        if self.pipeline is None: return
+        self.pipeline.stop(wait=False)
+        self.stop_button.setEnabled(False); self.status_label.setText("Đang dừng...")
+
+    def _publish_frame(self, frame_id: int, captured_at: float, frame_bgr):
+        """Chạy trên thread đọc frame: chuyển sang QImage tại đây để GUI thread chỉ việc vẽ."""
+        if self._frame_pending.is_set():
+            self.display_dropped += 1; return
+        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+        height, width = frame_rgb.shape[:2]
+        image = QImage(frame_rgb.data, width, height, 3 * width, QImage.Format.Format_RGB888).copy()
+        self._frame_pending.set()
+        try: self._bridge.frame_ready.emit(frame_id, image)
+        except RuntimeError: pass # Cửa sổ đã đóng
+
+    # --- Slots (GUI thread) ---
+    def _on_frame_ready(self, frame_id: int, image: QImage):
+        self.canvas.frame_image = image
+        self._frame_pending.clear()
+        self.canvas.update()
+
+    def _on_result_ready(self, result: dict):
+        self.canvas.result = result
+        self.canvas.update()
+
+    def _refresh_stats(self):
+        if self.pipeline is None: return
+        stats = self.pipeline.stats()
+        self.canvas.stats_text = (f"Capture: {stats['capture_fps']:.1f} FPS | Infer: {stats['infer_fps']:.1f} FPS\n"
+                                  f"Độ trễ: {stats['latency_ms']:.0f} ms | Bỏ qua: {stats['dropped_frames']} (hiển thị: {self.display_dropped})")
+        if get_local_engine().is_ready: self.status_label.setText("Đang chạy...")
+        self.canvas.update()
+
+    def _on_pipeline_finished(self, error: str):
+        if self.pipeline is not None: self._refresh_stats()
+        self._stats_timer.stop()
+        self.pipeline = None
+        self.start_button.setEnabled(True); self.stop_button.setEnabled(False); self.source_combo.setEnabled(True)
+        if error:
+            self.status_label.setText(f"Lỗi: {error}")
+            show_error_message(self, "Lỗi Video", error)
+        else:
+            self.status_label.setText("Đã dừng.")
+        logger_video.info(f"Video pipeline finished. {error}")
+
+    def closeEvent(self, event):
+        if self.pipeline is not None:
+            self.pipeline.on_frame = None # Không gửi frame về widget sắp bị hủy
+            self.pipeline.stop(wait=False)
+        super().closeEvent(event)
+
+
+# --- Chạy thử độc lập ---
+if __name__ == '__main__':
+    app = QApplication(sys.argv)
+    window = VideoRecognitionWindow()
+    if len(sys.argv) > 1: window.set_video_file(sys.argv[1])
+    window.show()
+    sys.exit(app.exec())
@@ -1,9 +1,12 @@
 # main.py
+import time
+_startup_t0 = time.perf_counter() # Mốc bắt đầu đo thời gian khởi động (trước mọi import)
 import sys
 import os
 import logging # Thêm logging
 from pathlib import Path # Dùng pathlib cho đường dẫn
 from PyQt6.QtWidgets import QApplication, QDialog, QMessageBox # Thêm QMessageBox
+from PyQt6.QtCore import QTimer
 
 # --- Setup Logging cơ bản ---
 log_dir = Path(__file__).parent / 'logs'
@@ -20,6 +23,24 @@ logging.basicConfig(
 )
 logger_main = logging.getLogger("MainApp") # Đặt tên logger chính
 
+# --- Đo thời gian khởi động ---
+_startup_marks = [] # (tên bước, thời điểm kết thúc)
+
+def mark_startup(step: str):
+    """Ghi mốc kết thúc của một bước khởi động."""
+    _startup_marks.append((step, time.perf_counter()))
+
+def log_startup_timing(title: str, since: float = _startup_t0):
+    """Ghi vào log thời gian từng bước (tính từ mốc trước) và tổng thời gian từ since (mặc định: lúc chạy main.py)."""
+    previous, parts = since, []
+    for step, at in _startup_marks:
+        parts.append(f"{step} {(at - previous) * 1000:.0f} ms")
+        previous = at
+    logger_main.info(f"{title}: {' | '.join(parts)} | total {(previous - since) * 1000:.0f} ms")
+    _startup_marks.clear()
+
+mark_startup("python+Qt imports")
+
 # --- Add project root ---
 project_root = Path(__file__).resolve().parent
 if str(project_root) not in sys.path:
@@ -27,13 +48,12 @@ if str(project_root) not in sys.path:
     logger_main.info(f"Added project root to sys.path: {project_root}")
 
 # --- Import UI Windows ---
+# Chỉ LoginWindow cần có ngay; MainHubWindow (và các cửa sổ chức năng cùng requests/numpy/cv2/database)
+# được import sau khi đăng nhập thành công.
 try:
-    # <<< THAY ĐỔI: Import MainHubWindow thay vì MainWindow >>>
-    from gui.main_hub_window import MainHubWindow
-    from gui.login_window import LoginWindow, AUTH_MANAGER_AVAILABLE as LOGIN_AUTH_OK
-    logger_main.info("UI Windows imported successfully.")
-    if not LOGIN_AUTH_OK:
-         logger_main.warning("Auth Manager not available for LoginWindow. Login might fail.")
+    from gui.login_window import LoginWindow
+    logger_main.info("LoginWindow imported successfully.")
+    mark_startup("LoginWindow import")
 except ImportError as e:
     logger_main.critical(f"FATAL ERROR: Could not import UI windows.", exc_info=True)
     # Hiển thị lỗi cho người dùng cuối nếu có thể
@@ -52,11 +72,45 @@ except Exception as e:
          print(f"Could not show error message box: {e_msg}")
     sys.exit(1)
 
+def close_database_connections():
+    """Ghi nốt lịch sử còn trong hàng đợi, rồi đóng các kết nối SQLite được giữ mở theo thread (checkpoint WAL)."""
+    try:
+        if 'database.history_writer' in sys.modules: # Chỉ khi đã có kết quả được gửi tới writer
+            sys.modules['database.history_writer'].shutdown_history_writer()
+        if 'database.migrations' in sys.modules: # Migration nền dừng sau lô hiện tại, lần chạy sau làm tiếp
+            sys.modules['database.migrations'].stop_background_migrations()
+        if 'database.retention' in sys.modules: # Tương tự với việc chuyển lịch sử cũ sang archive
+            sys.modules['database.retention'].stop_retention()
+        from database.connection_manager import close_all_connections
+        close_all_connections()
+    except Exception as e:
+        logger_main.warning(f"Could not close database connections cleanly: {e}")
+
+def schedule_history_retention():
+    """Hẹn giờ chạy chính sách lưu giữ lịch sử sau khi cửa sổ chính đã mở (không làm chậm lúc khởi động)."""
+    try:
+        import config
+        delay_ms = config.HISTORY_RETENTION_START_DELAY_MS
+    except (ImportError, AttributeError):
+        delay_ms = 30000
+    QTimer.singleShot(delay_ms, start_history_retention)
+
+def start_history_retention():
+    """Chuyển lịch sử cũ sang archive ở thread nền (chỉ khi config.HISTORY_RETENTION_DAYS > 0)."""
+    try:
+        from database.retention import start_retention_in_background
+        if start_retention_in_background() is not None:
+            logger_main.info("History retention started in background.")
+    except Exception as e:
+        logger_main.warning(f"Could not start history retention: {e}")
+
 def main():
     logger_main.info("=======================================")
     logger_main.info("=== Starting GTSRB Application ===")
     logger_main.info("=======================================")
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(close_database_connections)
+    mark_startup("QApplication")
 
     logger_main.info("Showing LoginWindow...")
     try:
@@ -65,6 +119,9 @@ def main():
         logger_main.critical("Failed to create LoginWindow.", exc_info=True)
         QMessageBox.critical(None, "Lỗi Khởi Động", f"Không thể tạo cửa sổ đăng nhập.\n\nLỗi: {e}")
         sys.exit(1)
+    mark_startup("LoginWindow create")
+    # Chạy ở lượt đầu tiên của event loop của dialog, tức là khi dialog đã hiện
+    QTimer.singleShot(0, lambda: (mark_startup("show login dialog"), log_startup_timing("Startup timing (to login dialog)")))
 
     # Hiển thị dialog đăng nhập và chờ kết quả
     if login_dialog.exec() == QDialog.DialogCode.Accepted:
@@ -74,9 +131,15 @@ def main():
             role = logged_in_user.get('role', 'N/A')
             logger_main.info(f"Login successful for user '{username}' (Role: {role}). Creating MainHubWindow...")
             try:
+                login_done_at = time.perf_counter()
+                from gui.main_hub_window import MainHubWindow # Import sau khi đăng nhập (xem phần Import UI Windows)
+                mark_startup("MainHubWindow import")
                 # <<< THAY ĐỔI: Tạo MainHubWindow và truyền user vào >>>
                 main_hub = MainHubWindow(current_user=logged_in_user)
                 main_hub.show() # Hiển thị cửa sổ Hub
+                mark_startup("MainHubWindow create+show")
+                log_startup_timing("Startup timing (after login)", since=login_done_at)
+                schedule_history_retention()
                 logger_main.info("Starting application event loop...")
                 exit_code = app.exec() # Chạy vòng lặp sự kiện
                 logger_main.info(f"Application event loop finished with exit code: {exit_code}")
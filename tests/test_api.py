@@ -117,12 +117,12 @@ class TestAPI(unittest.TestCase):
         print("\nTesting POST /predict endpoint (invalid file content)...")
         files = {'file': ('invalid.txt', self.invalid_file_content, 'text/plain')}
         response = self.client.post("/predict", files=files)
-        # Mong đợi lỗi 400 Bad Request vì tiền xử lý ảnh sẽ thất bại
-        self.assertEqual(response.status_code, 400)
+        # Mong đợi lỗi 415 vì header không phải định dạng ảnh được hỗ trợ (bị chặn trước khi giải mã)
+        self.assertEqual(response.status_code, 415)
         result = response.json()
         self.assertIn("detail", result)
-        self.assertTrue("preprocess" in result["detail"].lower()) # Kiểm tra thông báo lỗi
-        print("POST /predict endpoint (invalid file content) OK - returned 400.")
+        self.assertTrue("unsupported" in result["detail"].lower()) # Kiểm tra thông báo lỗi
+        print("POST /predict endpoint (invalid file content) OK - returned 415.")
 
     # --- Test Endpoint Predict khi model không được load (khó thực hiện trực tiếp) ---
     # Để test trường hợp này, bạn cần đảm bảo predict.model là None khi chạy test.
@@ -139,6 +139,144 @@ class TestAPI(unittest.TestCase):
         self.assertTrue("model is not loaded" in result["detail"].lower())
         print("POST /predict endpoint (model not loaded) OK - returned 500.")
 
+    # --- Test Endpoint Detect ---
+    @unittest.skipIf(MODEL_LOADED_SUCCESSFULLY, "Model loaded successfully, cannot test 503 error directly.")
+    def test_detect_model_not_loaded(self):
+        """Kiểm tra POST /detect khi model không load được (trả về 503)."""
+        files = {'file': ('scene.png', self.dummy_image_bytes.getvalue(), 'image/png')}
+        response = self.client.post("/detect", files=files)
+        self.assertEqual(response.status_code, 503)
+
+    # --- Test Endpoint Predict Paths ---
+    def test_predict_paths_rejects_outside_root(self):
+        """Đường dẫn ngoài thư mục cho phép không được đọc; endpoint tắt khi chưa cấu hình."""
+        from api.routes.predict_paths import resolve_allowed_path
+        root = os.path.join(project_root, 'tests')
+        self.assertIsNotNone(resolve_allowed_path(os.path.join(root, 'test_api.py'), root))
+        self.assertIsNone(resolve_allowed_path(os.path.join(root, '..', 'config.py'), root))
+        self.assertIsNone(resolve_allowed_path('test_api.py', root))
+        if not config.PREDICT_PATHS_ALLOWED_ROOT:
+            response = self.client.post("/predict_paths", json={"paths": [os.path.join(root, 'test_api.py')]})
+            self.assertEqual(response.status_code, 403)
+
+    def test_predict_paths_batches_in_input_order(self):
+        """Kết quả theo đúng thứ tự đầu vào, lỗi từng đường dẫn không làm hỏng cả lượt, model chạy theo batch INFERENCE_BATCH_SIZE."""
+        import tempfile
+        import numpy as np
+        from unittest import mock
+        from api.routes import predict
+
+        def png_bytes(gray: int) -> bytes:
+            buffer = io.BytesIO()
+            Image.new('RGB', (32, 32), color=(gray, gray, gray)).save(buffer, format='PNG')
+            return buffer.getvalue()
+
+        def fake_predict(images, **kwargs): # Lớp = độ xám của ảnh / 20: kiểm tra được ảnh nào ra kết quả nào
+            class_ids = np.rint(images.mean(axis=(1, 2, 3)) * 255 / 20).astype(int)
+            return np.eye(config.NUM_CLASSES, dtype=np.float32)[class_ids]
+
+        with tempfile.TemporaryDirectory() as root, tempfile.TemporaryDirectory() as outside:
+            def write(name: str, data: bytes) -> str:
+                path = os.path.join(root, name)
+                with open(path, 'wb') as f:
+                    f.write(data)
+                return path
+            valid = [write(f"sign_{class_id}.png", png_bytes(class_id * 20)) for class_id in (1, 2, 3, 4, 5)]
+            outside_path = os.path.join(outside, 'sign.png')
+            with open(outside_path, 'wb') as f:
+                f.write(png_bytes(20))
+            corrupt = png_bytes(20)
+            corrupt = write('corrupt.png', corrupt[:33] + b'\x00' * (len(corrupt) - 33)) # Header PNG hợp lệ, dữ liệu ảnh hỏng
+            paths = [valid[0], outside_path, valid[1], os.path.join(root, 'missing.png'), valid[2],
+                     corrupt, write('notes.txt', self.invalid_file_content), valid[3], 'sign_5.png', valid[4]]
+            model = mock.Mock()
+            model.predict.side_effect = fake_predict
+            with mock.patch.object(config, 'PREDICT_PATHS_ALLOWED_ROOT', root), \
+                 mock.patch.object(config, 'INFERENCE_BATCH_SIZE', 2), \
+                 mock.patch.object(predict, 'model', model):
+                response = self.client.post("/predict_paths", json={"paths": paths, "top_n": 1})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([result["path"] for result in results], paths)
+        self.assertEqual([result["top_predictions"][0]["class_id"] if "top_predictions" in result else None for result in results],
+                         [1, None, 2, None, 3, None, None, 4, None, 5])
+        for index in (1, 8): # Ngoài thư mục cho phép / không phải đường dẫn tuyệt đối
+            self.assertIn("outside the allowed root", results[index]["error"])
+        self.assertIn("Cannot read file", results[3]["error"])
+        self.assertIn("Could not preprocess image", results[5]["error"])
+        self.assertIn("error", results[6])
+        batch_sizes = [len(call.args[0]) for call in model.predict.call_args_list]
+        self.assertTrue(all(size <= 2 for size in batch_sizes), batch_sizes)
+        self.assertEqual(sum(batch_sizes), 5)
+
+    # --- Test Kiểm tra Header Upload ---
+    def test_upload_header_rejects_oversized_dimensions(self):
+        """Ảnh khai báo kích thước quá lớn trong header bị từ chối mà không cần giải mã."""
+        import struct
+        from api.upload_validation import check_image_header, UploadRejected
+        fmt, size = check_image_header(self.dummy_image_bytes.getvalue(), complete=True)
+        self.assertEqual((fmt, size), ('png', (10, 10)))
+        huge_header = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', 20000, 10000)
+        with self.assertRaises(UploadRejected) as ctx:
+            check_image_header(huge_header, complete=True)
+        self.assertEqual(ctx.exception.status_code, 413)
+        with self.assertRaises(UploadRejected) as ctx:
+            check_image_header(self.invalid_file_content, complete=True)
+        self.assertEqual(ctx.exception.status_code, 415)
+
+    def test_propose_regions_finds_red_sign(self):
+        """Vùng đỏ hình tròn trên nền xám phải được đề xuất làm ứng viên."""
+        import numpy as np
+        import cv2
+        from utils.sign_detector import propose_regions, crop_regions_batch
+        scene = np.full((240, 320, 3), 128, dtype=np.uint8)
+        cv2.circle(scene, (200, 100), 25, (0, 0, 255), thickness=-1) # BGR: đỏ
+        regions = propose_regions(scene)
+        self.assertEqual(len(regions), 1)
+        self.assertEqual(regions[0]['color'], 'red')
+        x, y, w, h = regions[0]['box']
+        self.assertTrue(x <= 175 and y <= 75 and x + w >= 225 and y + h >= 125)
+        batch = crop_regions_batch(scene, regions, config.IMG_HEIGHT, config.IMG_WIDTH)
+        self.assertEqual(batch.shape, (1, config.IMG_HEIGHT, config.IMG_WIDTH, 3))
+        self.assertLessEqual(float(batch.max()), 1.0)
+
+    def test_embedding_index_search(self):
+        """Chỉ mục embedding tìm đúng láng giềng gần nhất, kể cả khi giới hạn theo lớp và chia chunk."""
+        import tempfile
+        import numpy as np
+        from utils.embedding_index import write_embedding_index, EmbeddingIndex
+        rng = np.random.default_rng(0)
+        features = rng.normal(size=(100, 16)).astype(np.float32)
+        labels = rng.integers(0, 4, size=100)
+        with tempfile.TemporaryDirectory() as tmp:
+            matrix_path, meta_path = os.path.join(tmp, 'emb.npy'), os.path.join(tmp, 'meta.npz')
+            batches = ((s, features[s:s + 30]) for s in range(0, 100, 30))
+            write_embedding_index(matrix_path, meta_path, batches, labels, num_classes=4, dimension=16)
+            index = EmbeddingIndex(matrix_path, meta_path)
+            self.assertEqual(index.embeddings.dtype, np.float16)
+            top = index.search(features[42] * 3.0, k=3, chunk_rows=7)
+            self.assertEqual(top[0]['source_index'], 42)
+            self.assertEqual(top[0]['class_id'], int(labels[42]))
+            self.assertGreaterEqual(top[0]['score'], top[1]['score'])
+            other_class = (int(labels[42]) + 1) % 4
+            restricted = index.search(features[42], k=5, class_id=other_class, chunk_rows=7)
+            self.assertTrue(restricted and all(item['class_id'] == other_class for item in restricted))
+            del index
+
+    def test_gradcam_batch_and_overlay(self):
+        """Grad-CAM tính cho cả batch trong một lần, heatmap nằm trong [0, 1] và overlay là PNG."""
+        import numpy as np
+        from models.model_cnn import build_improved_cnn
+        from utils.gradcam import build_gradcam_model, compute_gradcam_batch, render_overlay_png
+        gradcam_model = build_gradcam_model(build_improved_cnn(), 'conv3')
+        images = np.random.default_rng(0).random((3, config.IMG_HEIGHT, config.IMG_WIDTH, 3)).astype(np.float32)
+        heatmaps, class_ids, _ = compute_gradcam_batch(gradcam_model, images, [None, 5, None])
+        self.assertEqual(heatmaps.shape[0], 3)
+        self.assertEqual(int(class_ids[1]), 5)
+        self.assertTrue(0.0 <= float(heatmaps.min()) and float(heatmaps.max()) <= 1.0)
+        png = render_overlay_png(images[0], heatmaps[0], size=48)
+        self.assertTrue(png.startswith(b'\x89PNG'))
+
 
 # --- Chạy Test ---
 if __name__ == '__main__':
@@ -0,0 +1,555 @@
+# tests/test_database.py
+
+import unittest
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+# --- Thêm thư mục gốc vào sys.path ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# --- Import các thành phần cần test ---
+try:
+    from database import database_manager, migrations
+    from database.connection_manager import get_connection_manager, release_connection
+    DATABASE_AVAILABLE = True
+except ImportError as e:
+    print(f"WARNING: database modules failed to import ({e}). Skipping database tests.")
+    DATABASE_AVAILABLE = False
+
+try:
+    from api.routes import stats as stats_routes
+    from fastapi import HTTPException
+    STATS_ROUTES_AVAILABLE = True
+except ImportError:
+    STATS_ROUTES_AVAILABLE = False
+
+# Schema history trước khi có migration (như database tạo bởi các phiên bản cũ của ứng dụng)
+OLD_HISTORY_SCHEMA = ("CREATE TABLE history (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT NOT NULL, image_path TEXT NOT NULL, "
+                      "predicted_class_id INTEGER NOT NULL, predicted_class_name TEXT NOT NULL, confidence REAL NOT NULL)")
+INSERT_HISTORY_SQL = ("INSERT INTO history(timestamp, image_path, predicted_class_id, predicted_class_name, confidence) "
+                      "VALUES (?,?,?,?,?)")
+
+
+def fts5_trigram_available() -> bool:
+    """
+    Kiểm tra lúc chạy test, không lúc import: thư viện khác (vd. TensorFlow) có thể nạp một bản SQLite
+    không có FTS5 vào cùng tiến trình. Khi đó migration dùng LIKE cho tìm đường dẫn.
+    """
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE VIRTUAL TABLE t USING fts5(a, tokenize='trigram')")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+@unittest.skipUnless(DATABASE_AVAILABLE, "database modules not available")
+class DatabaseTestCase(unittest.TestCase):
+    """
+    Mỗi test dùng một file database riêng trong thư mục tạm: database_manager và auth_manager trỏ tới file đó,
+    migration nền chạy không nghỉ giữa các lô, và mọi kết nối được đóng trước khi xóa thư mục.
+    """
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = self._tmp.name
+        self.db_path = os.path.join(self.tmp_dir, 'history.db')
+        self._patches = [
+            mock.patch.object(database_manager, 'DATABASE_PATH', self.db_path),
+            mock.patch.object(migrations, 'HISTORY_BACKFILL_PAUSE_MS', 0),
+        ]
+        try:
+            from utils import auth_manager
+            self._patches.append(mock.patch.object(auth_manager, 'AUTH_DB_PATH', self.db_path))
+        except ImportError:
+            pass # passlib không có: các test người dùng tự bỏ qua
+        for patcher in self._patches:
+            patcher.start()
+
+    def tearDown(self):
+        migrations.wait_for_migrations(30) # Migration nền của database tạm xong trước khi xóa thư mục
+        get_connection_manager(self.db_path).close_all()
+        for patcher in reversed(self._patches):
+            patcher.stop()
+        self._tmp.cleanup()
+
+    def connect(self, old_schema: bool = False, rows=None, migrate: bool = True) -> sqlite3.Connection:
+        """Kết nối sqlite3 riêng của test tới database tạm (tự đóng khi test kết thúc)."""
+        conn = sqlite3.connect(self.db_path)
+        self.addCleanup(conn.close)
+        if old_schema:
+            conn.execute(OLD_HISTORY_SCHEMA)
+        elif migrate:
+            migrations.migrate(conn)
+        if rows:
+            conn.executemany(INSERT_HISTORY_SQL, rows)
+        conn.commit()
+        return conn
+
+    def require_fts5(self):
+        if not fts5_trigram_available():
+            self.skipTest("SQLite in this process has no FTS5 trigram tokenizer")
+
+
+class TestHistoryDatabase(DatabaseTestCase):
+
+    def test_history_writer_batches_rows(self):
+        """HistoryWriter gom bản ghi thành lô, flush() chờ ghi xong, stop() ghi nốt hàng đợi."""
+        from database.history_writer import HistoryWriter
+        self.connect(old_schema=True).close()
+        writer = HistoryWriter(flush_rows=50, flush_interval_ms=10000, max_queue=1000)
+        for i in range(120):
+            self.assertTrue(writer.submit(f"/img/{i}.png", i % 43, "Class", 0.9, timestamp="2024-01-01 00:00:00"))
+        self.assertTrue(writer.flush(10))
+        stats = writer.stats()
+        self.assertEqual((stats['written'], stats['queue_depth']), (120, 0))
+        self.assertGreaterEqual(stats['flushes'], 3) # Lô 50 + 50 + phần còn lại khi flush()
+        writer.submit("/img/last.png", 1, "Class", 0.5)
+        self.assertTrue(writer.stop(10))
+        self.assertFalse(writer.submit("/img/after_stop.png", 1, "Class", 0.5))
+        self.assertTrue(migrations.wait_for_migrations(30))
+        conn = self.connect(migrate=False)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM history").fetchone()[0], 121)
+
+    def test_history_migrations(self):
+        """Database cũ được nâng lên phiên bản mới nhất: có timestamp_ms cho mọi dòng, index, chạy lại không đổi gì."""
+        conn = self.connect(old_schema=True, rows=[("2024-03-01 12:30:00", f"/img/{i}.png", i % 43, "Class", 0.5) for i in range(25)])
+        with mock.patch.object(migrations, 'HISTORY_BACKFILL_BATCH_ROWS', 10):
+            self.assertEqual(migrations.migrate(conn, include_background=False), 2)
+            self.assertEqual(migrations.migrate(conn), migrations.LATEST_SCHEMA_VERSION)
+        self.assertEqual(migrations.get_schema_version(conn), migrations.LATEST_SCHEMA_VERSION)
+        expected_ms = int(datetime(2024, 3, 1, 12, 30).timestamp() * 1000)
+        self.assertEqual(conn.execute("SELECT MIN(timestamp_ms), MAX(timestamp_ms) FROM history").fetchone(), (expected_ms, expected_ms))
+        conn.execute(INSERT_HISTORY_SQL, ("2024-03-01 12:30:00", "/img/old_client.png", 1, "Class", 0.5)) # Không ghi timestamp_ms: trigger điền
+        conn.commit()
+        self.assertEqual(conn.execute("SELECT timestamp_ms FROM history WHERE image_path = '/img/old_client.png'").fetchone()[0], expected_ms)
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+        self.assertTrue({'idx_history_timestamp_ms', 'idx_history_class_timestamp_ms'} <= indexes)
+        self.assertEqual(migrations.migrate(conn), migrations.LATEST_SCHEMA_VERSION)
+
+    def fts_paths(self, conn, query: str):
+        return [row[0] for row in conn.execute("SELECT image_path FROM history WHERE id IN "
+                                               "(SELECT rowid FROM history_fts WHERE history_fts MATCH ?) ORDER BY id", (query,))]
+
+    def like_paths(self, conn, query: str):
+        return [row[0] for row in conn.execute("SELECT image_path FROM history WHERE image_path LIKE ? ORDER BY id",
+                                               (f"%{query}%",))]
+
+    def assert_fts_matches_history(self, conn):
+        """history_fts khớp bảng history: index không hỏng và kết quả tìm giống LIKE ("img" khớp mọi dòng)."""
+        conn.execute("INSERT INTO history_fts(history_fts) VALUES ('integrity-check')")
+        for query in ("img", "cam_1", "moved", "new"):
+            self.assertEqual(self.fts_paths(conn, f'"{query}"'), self.like_paths(conn, query), query)
+
+    def test_history_fts_load_resumes(self):
+        """Nạp history_fts bị dừng giữa chừng thì lần sau làm tiếp từ done_id; trigger bỏ qua các dòng chưa nạp."""
+        self.require_fts5()
+        conn = self.connect(old_schema=True, rows=[("2024-03-01 08:00:00", f"/img/cam_{i % 3}/{i}.png", 1, "Class", 0.5)
+                                                   for i in range(25)])
+        with mock.patch.object(migrations, 'MIGRATIONS', migrations.MIGRATIONS[:4]):
+            self.assertEqual(migrations.migrate(conn), 4)
+        stop_event = mock.Mock()
+        stop_event.is_set.side_effect = [False, True] # Dừng sau lô đầu tiên
+        with mock.patch.object(migrations, 'HISTORY_BACKFILL_BATCH_ROWS', 10):
+            self.assertFalse(migrations._create_history_fts(conn, stop_event))
+        self.assertEqual(conn.execute("SELECT done_id, last_id FROM history_fts_backfill").fetchone(), (10, 25))
+        conn.execute("DELETE FROM history WHERE id IN (5, 15)") # Một dòng đã nạp, một dòng chưa
+        conn.execute("UPDATE history SET image_path = '/img/moved/' || id || '.png' WHERE id IN (6, 20)")
+        conn.execute(INSERT_HISTORY_SQL, ("2024-03-01 09:00:00", "/img/new.png", 1, "Class", 0.5))
+        conn.commit()
+        with mock.patch.object(migrations, 'HISTORY_BACKFILL_BATCH_ROWS', 10):
+            self.assertEqual(migrations.migrate(conn), migrations.LATEST_SCHEMA_VERSION)
+        self.assertEqual(conn.execute("SELECT done_id, last_id FROM history_fts_backfill").fetchone(), (25, 25))
+        self.assert_fts_matches_history(conn)
+        self.assertEqual(self.fts_paths(conn, '"moved"'), ["/img/moved/6.png", "/img/moved/20.png"])
+
+    def migrate_existing_fts(self, fully_loaded: bool) -> sqlite3.Connection:
+        """Database v4 đã có history_fts và trigger không điều kiện (như code cũ tạo), rồi nâng lên bản mới nhất."""
+        self.require_fts5()
+        old_triggers = (
+            """CREATE TRIGGER history_fts_ai AFTER INSERT ON history BEGIN
+                   INSERT INTO history_fts(rowid, image_path) VALUES (new.id, new.image_path); END""",
+            """CREATE TRIGGER history_fts_ad AFTER DELETE ON history BEGIN
+                   INSERT INTO history_fts(history_fts, rowid, image_path) VALUES ('delete', old.id, old.image_path); END""",
+            """CREATE TRIGGER history_fts_au AFTER UPDATE OF image_path ON history BEGIN
+                   INSERT INTO history_fts(history_fts, rowid, image_path) VALUES ('delete', old.id, old.image_path);
+                   INSERT INTO history_fts(rowid, image_path) VALUES (new.id, new.image_path); END""",
+        )
+        conn = self.connect(old_schema=True, rows=[("2024-03-01 08:00:00", f"/img/cam_{i % 3}/{i}.png", 1, "Class", 0.5)
+                                                   for i in range(25)])
+        with mock.patch.object(migrations, 'MIGRATIONS', migrations.MIGRATIONS[:4]):
+            self.assertEqual(migrations.migrate(conn), 4)
+        conn.execute(migrations.HISTORY_FTS_TABLE_STATEMENTS[0])
+        for statement in old_triggers:
+            conn.execute(statement)
+        if fully_loaded: # Như code cũ: tạo bảng, trigger và 'rebuild' trong một transaction
+            conn.execute("INSERT INTO history_fts(history_fts) VALUES ('rebuild')")
+        else: # Lần nạp theo lô trước đó bị dừng sau 10 dòng
+            conn.execute("INSERT INTO history_fts(rowid, image_path) SELECT id, image_path FROM history WHERE id <= 10")
+        conn.commit()
+        with mock.patch.object(migrations, 'HISTORY_BACKFILL_BATCH_ROWS', 10):
+            self.assertEqual(migrations.migrate(conn), migrations.LATEST_SCHEMA_VERSION)
+        trigger_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'history_fts_ad'").fetchone()[0]
+        self.assertIn("history_fts_backfill", trigger_sql) # Trigger cũ được thay bằng trigger có WHEN
+        conn.execute("UPDATE history SET image_path = '/img/moved/3.png' WHERE id = 3")
+        conn.execute("DELETE FROM history WHERE id = 4")
+        conn.commit()
+        self.assert_fts_matches_history(conn)
+        return conn
+
+    def test_history_fts_kept_when_in_sync(self):
+        """history_fts do code cũ tạo (trigger + 'rebuild') đã khớp history: giữ nguyên, không nạp lại."""
+        conn = self.migrate_existing_fts(fully_loaded=True)
+        self.assertEqual(conn.execute("SELECT done_id, last_id FROM history_fts_backfill").fetchone(), (0, 0))
+
+    def test_history_fts_reloaded_when_partial(self):
+        """Bảng nạp dở không có tiến độ: xóa index rồi nạp lại theo lô."""
+        conn = self.migrate_existing_fts(fully_loaded=False)
+        self.assertEqual(conn.execute("SELECT done_id, last_id FROM history_fts_backfill").fetchone(), (25, 25))
+
+    def test_history_summary_tables(self):
+        """Bảng thống kê theo lớp / ngày khớp với GROUP BY trên history sau khi thêm, sửa, xóa; endpoint đọc từ đó."""
+        conn = sqlite3.connect(self.db_path)
+        self.addCleanup(conn.close)
+        migrations.migrate(conn, include_background=False)
+        conn.executemany(INSERT_HISTORY_SQL, [(f"2024-03-0{1 + i % 3} 08:00:00", f"/img/{i}.png", i % 4, f"Class {i % 4}", 0.5)
+                                              for i in range(30)])
+        conn.commit()
+        with mock.patch.object(migrations, 'HISTORY_BACKFILL_BATCH_ROWS', 7):
+            self.assertEqual(migrations.migrate(conn), migrations.LATEST_SCHEMA_VERSION)
+        conn.execute(INSERT_HISTORY_SQL, ("2024-03-04 09:00:00", "/img/new.png", 14, "Dừng lại", 0.9))
+        conn.execute("UPDATE history SET predicted_class_id = 14, predicted_class_name = 'Dừng lại', confidence = 0.7 WHERE id = 2")
+        conn.execute("DELETE FROM history WHERE id IN (3, 4)")
+        conn.commit()
+        expected = conn.execute("SELECT substr(timestamp, 1, 10), predicted_class_id, COUNT(*), SUM(confidence) FROM history "
+                                "GROUP BY 1, 2 ORDER BY 1, 2").fetchall()
+        summary = conn.execute("SELECT day, predicted_class_id, count, confidence_sum FROM history_class_daily "
+                               "WHERE count > 0 ORDER BY 1, 2").fetchall()
+        self.assertEqual([row[:3] for row in summary], [row[:3] for row in expected])
+        for got, want in zip(summary, expected):
+            self.assertAlmostEqual(got[3], want[3])
+
+        self.assertTrue(database_manager.history_stats_ready())
+        stop_signs = [c for c in database_manager.get_class_stats() if c['class_id'] == 14][0]
+        self.assertEqual(stop_signs['count'], 2)
+        self.assertAlmostEqual(stop_signs['avg_confidence'], 0.8)
+        march_4 = database_manager.get_daily_stats(date(2024, 3, 4), date(2024, 3, 4), class_id=14)
+        self.assertEqual([(d['day'], d['count']) for d in march_4], [("2024-03-04", 1)])
+        if STATS_ROUTES_AVAILABLE:
+            self.assertEqual(stats_routes.history_class_stats(date(2024, 3, 1), date(2024, 3, 3))["total"], 28)
+            with self.assertRaises(HTTPException) as ctx:
+                stats_routes.history_daily_stats(date(2024, 3, 5), date(2024, 3, 1))
+            self.assertEqual(ctx.exception.status_code, 400)
+
+    def test_history_keyset_pages(self):
+        """Đọc hết lịch sử theo next_cursor trả về đúng thứ tự ORDER BY, không trùng / sót dòng, confidence là số thực."""
+        conn = self.connect(rows=[(f"2024-03-01 08:00:{i % 7:02d}", f"/img/{i}.png", i % 3, f"Class {i % 3}", (i % 5) / 5)
+                                  for i in range(53)])
+        for order, filters, sql in (("-id", None, "ORDER BY id DESC"),
+                                    ("confidence", {"class_id": 1}, "WHERE predicted_class_id = 1 ORDER BY confidence, id"),
+                                    ("-timestamp", None, "ORDER BY timestamp DESC, id DESC")):
+            expected = [row[0] for row in conn.execute(f"SELECT id FROM history {sql}")]
+            ids, cursor, pages = [], None, 0
+            while True:
+                page = database_manager.get_history_page(cursor, 10, filters, order)
+                self.assertLessEqual(len(page.rows), 10)
+                ids.extend(row["id"] for row in page.rows)
+                pages += 1
+                cursor = page.next_cursor
+                if cursor is None:
+                    break
+            self.assertEqual(ids, expected)
+            self.assertEqual(pages, max(1, -(-len(expected) // 10)))
+        self.assertIsInstance(page.rows[0]["confidence"], float)
+        with self.assertRaises(ValueError):
+            database_manager.get_history_page(order="-image_path; DROP TABLE history")
+
+    def test_fetch_history_page_boundaries(self):
+        """Trang cuối đầy đúng limit không để lại trang rỗng; after_key của dòng cuối trả về danh sách rỗng."""
+        self.connect(rows=[(f"2024-03-01 08:00:{i:02d}", f"/img/{i}.png", i % 2, f"Class {i % 2}", 0.5) for i in range(20)])
+        first = database_manager.fetch_history_page("id", True, None, 10)
+        self.assertEqual([row["id"] for row in first], list(range(20, 10, -1)))
+        second = database_manager.get_history_page((first[-1]["id"], first[-1]["id"]), 10)
+        self.assertEqual([row["id"] for row in second.rows], list(range(10, 0, -1)))
+        self.assertIsNone(second.next_cursor) # Đúng 20 dòng: không có trang thứ ba
+        self.assertEqual(database_manager.fetch_history_page("id", True, (1, 1), 10), [])
+        ascending = database_manager.fetch_history_page("timestamp", False, ("2024-03-01 08:00:18", 19), 10)
+        self.assertEqual([row["id"] for row in ascending], [20])
+        self.assertEqual(len(database_manager.fetch_history_page(limit=database_manager.HISTORY_PAGE_MAX_LIMIT)), 20)
+        for bad_limit in (0, database_manager.HISTORY_PAGE_MAX_LIMIT + 1):
+            with self.assertRaises(ValueError):
+                database_manager.fetch_history_page(limit=bad_limit)
+
+    def test_count_history_with_filters(self):
+        """count_history dùng cùng bộ lọc với các trang: tổng số dòng các trang bằng số đếm."""
+        self.connect(rows=[(f"2024-03-0{1 + i % 3} 08:00:00", f"/data/{'cam' if i % 2 else 'upload'}/{i}.png",
+                            i % 4, f"Class {i % 4}", i / 40) for i in range(40)])
+        self.assertEqual(database_manager.count_history(), 40)
+        for filters in ({"class_id": 2}, {"date_from": date(2024, 3, 2), "date_to": date(2024, 3, 2)},
+                        {"min_confidence": 0.25, "max_confidence": 0.5, "class_ids": [1, 3]},
+                        {"path_query": "cam"}, {"class_id": 2, "path_query": "cam"}):
+            counted = database_manager.count_history(filters)
+            paged = database_manager.fetch_history_page("confidence", False, None, 100, filters)
+            self.assertEqual(counted, len(paged), filters)
+        self.assertEqual(database_manager.count_history({"class_id": 2}), 10)
+        self.assertEqual(database_manager.count_history({"path_query": "cam"}), 20)
+
+    def test_history_empty_results(self):
+        """Database trống hoặc bộ lọc không khớp: trang rỗng, không có con trỏ, số đếm bằng 0."""
+        self.connect()
+        self.assertEqual(database_manager.count_history(), 0)
+        self.assertEqual(database_manager.get_history_page(), database_manager.HistoryPage([], None))
+        self.connect(migrate=False, rows=[("2024-03-01 08:00:00", "/img/a.png", 1, "Class 1", 0.9)])
+        self.assertEqual(database_manager.count_history({"class_id": 5}), 0)
+        self.assertEqual(database_manager.fetch_history_page(filters={"class_id": 5}), [])
+        self.assertEqual(database_manager.fetch_history_page(filters={"date_from": date(2030, 1, 1)}), [])
+
+    def test_streaming_history_export(self):
+        """Xuất CSV theo khối nhỏ: đủ dòng khớp bộ lọc ngày + lớp, confidence là số thô, không để lại file tạm."""
+        import csv
+        from database import data_exporter
+        self.connect(rows=[(f"2024-03-0{1 + i % 4} 08:00:00", f"/img/{i}.png", i % 5, f"Class {i % 5}", 0.25) for i in range(100)])
+        out_path = os.path.join(self.tmp_dir, 'out.csv')
+        progress = []
+        result = data_exporter.export_history(out_path, 'csv',
+                                              {"date_from": date(2024, 3, 2), "date_to": date(2024, 3, 3), "class_ids": [1, 2]},
+                                              chunk_rows=7, progress_callback=lambda rows, rate: progress.append(rows))
+        with open(out_path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        expected = [i + 1 for i in range(100) if i % 4 in (1, 2) and i % 5 in (1, 2)]
+        self.assertEqual([int(row['id']) for row in rows], expected)
+        self.assertEqual(result['rows'], len(expected))
+        self.assertEqual(progress[-1], len(expected))
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(float(rows[0]['confidence']), 0.25)
+        self.assertFalse(os.path.exists(out_path + '.part'))
+        self.assertIsNone(data_exporter.export_history(os.path.join(self.tmp_dir, 'none.csv'), 'csv', {"class_ids": [42]}))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp_dir, 'none.csv')))
+
+    def test_bulk_delete_and_retention(self):
+        """Xóa theo bảng tạm (nhiều khối), chuyển dòng cũ sang archive không mất / trùng dòng, database mới có incremental vacuum."""
+        from database import retention
+        archive_path = os.path.join(self.tmp_dir, 'archive.db')
+        open(self.db_path, 'w').close() # File rỗng như database_setup / lần chạy đầu
+        with mock.patch.object(retention, 'HISTORY_BACKFILL_PAUSE_MS', 0):
+            conn = database_manager.create_connection()
+            self.assertTrue(migrations.wait_for_migrations(30))
+            self.assertEqual(conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2) # INCREMENTAL
+            now = datetime.now()
+            rows = [((now - timedelta(days=i % 60)).strftime("%Y-%m-%d %H:%M:%S"), f"/img/{i}.png", i % 4, f"Class {i % 4}", 0.5)
+                    for i in range(120)]
+            self.assertEqual(database_manager.add_history_rows(rows), 120)
+            self.assertEqual(database_manager.delete_history_ids(conn, list(range(1, 41)) + [10, 999999], chunk_rows=7), 40)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM history WHERE id <= 40").fetchone()[0], 0)
+
+            expected_old = conn.execute("SELECT id FROM history WHERE timestamp < ? ORDER BY id",
+                                        ((now - timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S"),)).fetchall()
+            moved = retention.archive_old_history(30, archive_path, chunk_rows=4)
+            self.assertEqual(moved, len(expected_old))
+            archive = sqlite3.connect(archive_path)
+            self.assertEqual(archive.execute("SELECT id FROM history ORDER BY id").fetchall(), [tuple(row) for row in expected_old])
+            archive.close()
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM history").fetchone()[0], 80 - moved)
+            self.assertEqual(conn.execute("SELECT SUM(count) FROM history_class_totals").fetchone()[0], 80 - moved)
+            self.assertEqual(retention.archive_old_history(30, archive_path), 0) # Chạy lại: không còn gì để chuyển
+            retention.incremental_vacuum()
+            self.assertEqual(conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+
+
+@unittest.skipUnless(DATABASE_AVAILABLE, "database modules not available")
+class TestHistoryFilterSql(unittest.TestCase):
+    """build_history_filter_sql: chỉ sinh điều kiện có tham số, giá trị người dùng không bao giờ nằm trong chuỗi SQL."""
+
+    def build(self, filters, sort_column=None, fts=False):
+        return database_manager.build_history_filter_sql(filters, sort_column, use_fts=fts)
+
+    def test_empty_filters(self):
+        for filters in (None, {}, {"class_id": None, "class_ids": [], "path_query": "   "}):
+            self.assertEqual(self.build(filters), ([], []))
+
+    def test_each_filter(self):
+        self.assertEqual(self.build({"class_id": "14"}), (["predicted_class_id = ?"], [14]))
+        self.assertEqual(self.build({"class_ids": [1, "2", 3]}), (["predicted_class_id IN (?, ?, ?)"], [1, 2, 3]))
+        self.assertEqual(self.build({"min_confidence": "0.5"}), (["confidence >= ?"], [0.5]))
+        self.assertEqual(self.build({"max_confidence": 0.9}), (["confidence <= ?"], [0.9]))
+        with self.assertRaises(ValueError):
+            self.build({"class_id": "1; DROP TABLE history"})
+
+    def test_date_range(self):
+        """date_to tính cả ngày đó: cận trên là đầu ngày hôm sau (kể cả qua tháng / năm)."""
+        clauses, params = self.build({"date_from": date(2024, 2, 28), "date_to": date(2024, 2, 29)})
+        self.assertEqual((clauses, params), (["timestamp >= ?", "timestamp < ?"], ["2024-02-28", "2024-03-01"]))
+        self.assertEqual(self.build({"date_to": date(2024, 12, 31)}), (["timestamp < ?"], ["2025-01-01"]))
+
+    def test_combined_filters_and_sort_hint(self):
+        filters = {"class_id": 3, "date_from": date(2024, 3, 1), "min_confidence": 0.2, "max_confidence": 0.8, "path_query": "cam"}
+        clauses, params = self.build(filters, "timestamp")
+        self.assertEqual(clauses, ["predicted_class_id = ?", "timestamp >= ?", "+confidence >= ?", "+confidence <= ?",
+                                   "image_path LIKE ? ESCAPE '\\'"])
+        self.assertEqual(params, [3, "2024-03-01", 0.2, 0.8, "%cam%"])
+        self.assertEqual(self.build(filters, "confidence")[0][2:4], ["confidence >= ?", "confidence <= ?"])
+        self.assertEqual(self.build(filters)[0][2:4], ["confidence >= ?", "confidence <= ?"])
+
+    def test_fts_path_query(self):
+        clauses, params = self.build({"path_query": ' my "sign" dir '}, fts=True)
+        self.assertEqual(clauses, ["id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)"])
+        self.assertEqual(params, ['"my ""sign"" dir"']) # Cụm từ: dấu nháy kép được nhân đôi
+        # Ngắn hơn một trigram: FTS không tìm được, dùng LIKE
+        self.assertEqual(self.build({"path_query": "ab"}, fts=True), (["image_path LIKE ? ESCAPE '\\'"], ["%ab%"]))
+
+    def test_like_fallback_escapes_wildcards(self):
+        clauses, params = self.build({"path_query": "50%_off\\x'y"})
+        self.assertEqual(clauses, ["image_path LIKE ? ESCAPE '\\'"])
+        self.assertEqual(params, ["%50\\%\\_off\\\\x'y%"])
+
+
+class TestHistoryPathSearch(DatabaseTestCase):
+    """Tìm đường dẫn trên database thật: FTS5 và LIKE cho cùng kết quả khớp chuỗi con theo nghĩa đen."""
+    PATHS = ["/img/50%_off.png", "/img/50x_off.png", "/img/a_b.png", "/img/axb.png", "/img/it's.png",
+             '/img/say "stop".png', "/img/back\\slash.png", "/img/plain.png"]
+    QUERIES = ["50%_", "%", "_", "a_b", "it's", '"stop"', "back\\sl", "plain", "PLAIN", "missing", "' OR 1=1 --"]
+
+    def setUp(self):
+        super().setUp()
+        self.connect(rows=[("2024-03-01 08:00:00", path, 1, "Class 1", 0.5) for path in self.PATHS])
+
+    def expected_ids(self, query):
+        return [i + 1 for i, path in enumerate(self.PATHS) if query.lower() in path.lower()]
+
+    def search(self, query):
+        rows = database_manager.fetch_history_page("id", False, None, 100, {"path_query": query})
+        return [row["id"] for row in rows]
+
+    def fts_ready(self) -> bool:
+        conn = database_manager.create_connection()
+        try:
+            return database_manager.history_fts_ready(conn)
+        finally:
+            release_connection(conn)
+
+    def test_fts_availability_per_database(self):
+        """Kết quả kiểm tra history_fts được nhớ theo từng file database, không dùng chung khi DATABASE_PATH đổi."""
+        self.require_fts5()
+        other_path = os.path.join(self.tmp_dir, 'no_fts.db')
+        other = sqlite3.connect(other_path)
+        self.addCleanup(other.close)
+        migrations.migrate(other)
+        other.execute("DROP TABLE history_fts") # Như SQLite không có FTS5: tìm đường dẫn bằng LIKE
+        other.commit()
+        self.addCleanup(get_connection_manager(other_path).close_all)
+        self.assertTrue(self.fts_ready())
+        with mock.patch.object(database_manager, 'DATABASE_PATH', other_path):
+            self.assertFalse(self.fts_ready())
+            self.assertEqual(database_manager.count_history({"path_query": "plain"}), 0)
+        self.assertTrue(self.fts_ready())
+
+    def test_fts_search(self):
+        self.require_fts5()
+        self.assertEqual(database_manager.count_history({"path_query": "plain"}), 1)
+        self.assertTrue(self.fts_ready()) # Database đã migrate xong: có history_fts
+        for query in self.QUERIES:
+            self.assertEqual(self.search(query), self.expected_ids(query), query)
+
+    def test_like_fallback_search(self):
+        with mock.patch.object(database_manager, 'history_fts_ready', return_value=False):
+            for query in self.QUERIES:
+                self.assertEqual(self.search(query), self.expected_ids(query), query)
+            self.assertEqual(database_manager.count_history({"path_query": "_"}), 3) # '_' là ký tự thường, không phải wildcard
+
+
+class TestConnectionManager(DatabaseTestCase):
+
+    def connect_in_thread(self):
+        """Lấy kết nối trong một thread riêng (thread kết thúc ngay sau đó)."""
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(database_manager.create_connection()))
+        thread.start()
+        thread.join()
+        return connections[0]
+
+    def test_connection_per_thread(self):
+        """Mỗi thread giữ một kết nối WAL mở lâu dài; kết nối của thread đã kết thúc được đóng khi thread khác kết nối."""
+        self.connect()
+        manager = get_connection_manager(self.db_path)
+        conn = database_manager.create_connection()
+        self.assertIs(database_manager.create_connection(), conn)
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0].lower(), "wal")
+        first = self.connect_in_thread()
+        self.assertIsNot(first, conn)
+        self.assertEqual(manager.connection_count(), 2)
+        self.connect_in_thread()
+        self.assertEqual(manager.connection_count(), 2) # Kết nối của thread đầu đã bị đóng
+        with self.assertRaises(sqlite3.ProgrammingError):
+            first.execute("SELECT 1")
+        manager.close_all()
+        self.assertEqual(manager.connection_count(), 0)
+        self.assertIsNot(database_manager.create_connection(), conn)
+
+    def test_release_connection_rolls_back(self):
+        """release_connection giữ kết nối mở nhưng rollback transaction còn dở để không giữ khóa ghi."""
+        self.connect()
+        conn = database_manager.create_connection()
+        conn.execute(INSERT_HISTORY_SQL, ("2024-03-01 08:00:00", "/img/a.png", 1, "Class", 0.5))
+        self.assertTrue(conn.in_transaction)
+        release_connection(conn)
+        self.assertFalse(conn.in_transaction)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM history").fetchone()[0], 0)
+        self.assertIsNone(get_connection_manager(os.path.join(self.tmp_dir, 'missing.db')).get_connection())
+
+
+class TestUserDatabase(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        try:
+            from utils import auth_manager
+        except ImportError:
+            self.skipTest("passlib not available")
+        self.auth_manager = auth_manager
+        self.connect(migrate=True) # Bảng users do migration v1 tạo
+
+    def test_bulk_add_users(self):
+        """Nhập người dùng hàng loạt: dòng hợp lệ được thêm trong một transaction, dòng lỗi báo theo số dòng."""
+        auth_manager = self.auth_manager
+        csv_path = os.path.join(self.tmp_dir, 'users.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f_csv:
+            f_csv.write("username,password,role\nop1,pw1,user\nop2,pw2,admin\nop1,pw3,user\nop4,pw4,root\n")
+        rows = auth_manager.read_users_csv(csv_path)
+        progress = []
+        added, errors = auth_manager.bulk_add_users(rows, max_workers=1, progress_callback=lambda done, total: progress.append((done, total)))
+        self.assertEqual(added, 2)
+        self.assertEqual([(row_no, username) for row_no, username, _ in errors], [(4, 'op1'), (5, 'op4')])
+        self.assertEqual(progress[-1], (2, 2))
+        self.assertTrue(auth_manager.verify_password('pw2', auth_manager.get_user_by_username('op2')['password_hash']))
+        added, errors = auth_manager.bulk_add_users(rows[:1], max_workers=1)
+        self.assertEqual((added, len(errors)), (0, 1)) # Đã tồn tại
+
+    def test_hash_passwords_in_process_pool(self):
+        """Băm song song trên process 'spawn': mỗi hash khớp đúng mật khẩu cùng vị trí, tiến độ đủ tổng số."""
+        auth_manager = self.auth_manager
+        passwords = [f"pw-{i}-{'x' * i}" for i in range(5)]
+        progress = []
+        with mock.patch.object(auth_manager, 'BULK_HASH_CHUNK_SIZE', 2): # 3 nhóm cho 2 process
+            hashes = auth_manager.hash_passwords(passwords, max_workers=2, progress_callback=lambda done, total: progress.append((done, total)))
+        self.assertEqual(len(hashes), len(passwords))
+        for i, (password, password_hash) in enumerate(zip(passwords, hashes)):
+            self.assertTrue(auth_manager.verify_password(password, password_hash), i)
+            self.assertFalse(auth_manager.verify_password(passwords[(i + 1) % len(passwords)], password_hash), i)
+        self.assertEqual(progress[-1], (5, 5))
+        self.assertEqual(len(progress), 3)
+        self.assertIsNone(auth_manager.hash_passwords(passwords, max_workers=2, cancel_check=lambda: True))
+
+
+if __name__ == '__main__':
+    print("Running Database Unit Tests...")
+    unittest.main()
@@ -13,6 +13,7 @@ if project_root not in sys.path:
 # --- Import thư viện GUI và các cửa sổ ---
 try:
     from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import Qt
     # Import các cửa sổ cần test (nếu có thể test đơn lẻ)
     # from gui.main_window import MainWindow
     # from gui.history_window import HistoryWindow
@@ -24,6 +25,8 @@ except ImportError:
     GUI_AVAILABLE = False
     print("WARNING: PyQt6 not found or GUI modules failed to import. Skipping GUI tests.")
 
+from tests.test_database import DatabaseTestCase # Database tạm cho các model đọc lịch sử
+
 
 @unittest.skipUnless(GUI_AVAILABLE, "PyQt6 not available or GUI modules failed import.")
 class TestGUI(unittest.TestCase):
@@ -63,6 +66,41 @@ class TestGUI(unittest.TestCase):
     # chuyên dụng hơn như pytest-qt hoặc mô phỏng sự kiện phức tạp hơn.
 
 
+@unittest.skipUnless(GUI_AVAILABLE, "PyQt6 not available or GUI modules failed import.")
+class TestHistoryTableModel(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from gui.history_table_model import HistoryTableModel
+        self.model = HistoryTableModel()
+        self.model.PAGE_SIZE = 10
+
+    def test_model_fetches_pages_lazily(self):
+        """Model chỉ tải trang đầu, fetchMore thêm từng trang tới khi hết; lọc và sắp xếp tải lại từ đầu."""
+        self.connect(rows=[("2024-03-01 08:00:00", f"/img/{i}.png", i % 3, f"Class {i % 3}", 0.5) for i in range(25)])
+        self.model.refresh()
+        self.assertEqual((self.model.rowCount(), self.model.total_count), (10, 25))
+        self.assertEqual(self.model.record_id(0), 25)
+        while self.model.canFetchMore():
+            self.model.fetchMore()
+        self.assertEqual(self.model.rowCount(), 25)
+        self.assertEqual([self.model.record_id(row) for row in range(25)], list(range(25, 0, -1)))
+        self.model.set_filters({"class_id": 1, "path_query": ""})
+        self.assertEqual(self.model.filters, {"class_id": 1})
+        self.assertEqual((self.model.rowCount(), self.model.total_count), (8, 8))
+        self.assertFalse(self.model.canFetchMore())
+        self.model.sort(0, Qt.SortOrder.AscendingOrder)
+        self.assertEqual(self.model.record_id(0), 2)
+
+    def test_model_empty_results(self):
+        """Không có dòng khớp: bảng rỗng, không gọi thêm trang."""
+        self.connect()
+        self.model.set_filters({"class_id": 7})
+        self.assertEqual((self.model.rowCount(), self.model.total_count), (0, 0))
+        self.assertFalse(self.model.canFetchMore())
+        self.assertIsNone(self.model.record_id(0))
+
+
 if __name__ == '__main__':
     print("Running GUI Unit Tests (Basic)...")
     # Lưu ý: Chạy test GUI có thể mở và đóng nhanh các cửa sổ
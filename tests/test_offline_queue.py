@@ -0,0 +1,145 @@
+# tests/test_offline_queue.py
+
+import unittest
+import sys
+import os
+from datetime import date, datetime
+from unittest import mock
+
+# --- Thêm thư mục gốc vào sys.path ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# --- Import các thành phần cần test ---
+try:
+    import requests
+    from gui import offline_queue
+    from gui.prediction_worker import is_offline_error, BatchApiUnavailable
+    OFFLINE_QUEUE_AVAILABLE = True
+except ImportError as e:
+    print(f"WARNING: requests / PyQt6 / offline queue failed to import ({e}). Skipping offline queue tests.")
+    OFFLINE_QUEUE_AVAILABLE = False
+
+from tests.test_database import DatabaseTestCase
+from database import database_manager
+
+API_URL = "http://127.0.0.1:8000/predict"
+MAX_ATTEMPTS = 3
+
+
+def http_error(status_code: int):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(f"{status_code} error", response=response)
+
+
+def top_predictions(class_id: int, confidence: float = 0.9):
+    return [{"class_id": class_id, "class_name": f"Class {class_id}", "confidence": confidence}]
+
+
+@unittest.skipUnless(OFFLINE_QUEUE_AVAILABLE, "offline queue dependencies not available")
+class TestOfflineErrorClassification(unittest.TestCase):
+
+    def test_offline_errors(self):
+        """Không kết nối được, hết thời gian chờ, 502/503/504: ảnh được đưa vào hàng đợi."""
+        for error in (requests.exceptions.ConnectionError("refused"), requests.exceptions.ConnectTimeout("connect"),
+                      requests.exceptions.ReadTimeout("read"), http_error(502), http_error(503), http_error(504)):
+            self.assertTrue(is_offline_error(error), error)
+
+    def test_other_errors_are_not_offline(self):
+        """Lỗi 4xx, 500 và lỗi không phải HTTP báo ngay cho người dùng, không xếp hàng gửi lại."""
+        for error in (http_error(400), http_error(404), http_error(413), http_error(422), http_error(500),
+                      requests.exceptions.HTTPError("no response"), ValueError("bad json"), OSError("missing file")):
+            self.assertFalse(is_offline_error(error), error)
+
+
+@unittest.skipUnless(OFFLINE_QUEUE_AVAILABLE, "offline queue dependencies not available")
+class TestOfflineQueueReplay(DatabaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.conn = self.connect()
+        for name in ("a", "b", "c"):
+            self.assertTrue(database_manager.enqueue_pending_recognition(f"/img/{name}.png", 64, "API offline"))
+
+    def pending(self):
+        return database_manager.fetch_pending_recognitions(10, MAX_ATTEMPTS)
+
+    def history_paths(self):
+        return [row["image_path"] for row in database_manager.fetch_history_page("id", False, None, 100)]
+
+    def test_enqueue_replay_complete(self):
+        """
+        Cả lượt gửi qua /predict_paths, kết quả vào lịch sử và hàng đợi trống trong cùng một transaction.
+        Dòng lịch sử mang thời điểm ảnh được đưa vào hàng đợi, không phải lúc gửi lại.
+        """
+        queued_at = "2024-03-01 08:00:00"
+        self.conn.execute("UPDATE pending_recognitions SET queued_at = ?", (queued_at,))
+        self.conn.commit()
+        items = self.pending()
+        self.assertEqual([item["image_path"] for item in items], ["/img/a.png", "/img/b.png", "/img/c.png"])
+        self.assertTrue(database_manager.enqueue_pending_recognition("/img/a.png")) # Đã có: không thêm bản sao
+        self.assertEqual(database_manager.count_pending_recognitions(), 3)
+        outputs = [{"top_predictions": top_predictions(i)} for i in range(3)]
+        with mock.patch.object(offline_queue, 'post_paths_for_prediction', return_value=outputs) as post_paths:
+            results, failures = offline_queue.replay_batch(items, API_URL)
+        post_paths.assert_called_once()
+        self.assertEqual(failures, [])
+        self.assertEqual([(path, class_id, queued) for _, path, class_id, _, _, queued in results],
+                         [("/img/a.png", 0, queued_at), ("/img/b.png", 1, queued_at), ("/img/c.png", 2, queued_at)])
+        self.assertTrue(database_manager.complete_pending_recognitions(results, failures))
+        self.assertEqual(database_manager.count_pending_recognitions(), 0)
+        self.assertEqual(self.history_paths(), ["/img/a.png", "/img/b.png", "/img/c.png"])
+        expected_ms = int(datetime(2024, 3, 1, 8, 0).timestamp() * 1000)
+        self.assertEqual(self.conn.execute("SELECT DISTINCT timestamp, timestamp_ms FROM history").fetchall(), [(queued_at, expected_ms)])
+        self.assertEqual(database_manager.count_history({"date_from": date(2024, 3, 1), "date_to": date(2024, 3, 1)}), 3)
+
+    def test_upload_fallback_keeps_partial_results(self):
+        """Server không có /predict_paths: upload từng ảnh; API mất giữa chừng thì phần còn lại vẫn nằm trong hàng đợi."""
+        upload = mock.Mock(side_effect=[top_predictions(5), requests.exceptions.ConnectionError("refused")])
+        with mock.patch.object(offline_queue, 'post_paths_for_prediction', side_effect=BatchApiUnavailable("404")), \
+             mock.patch.object(offline_queue, 'post_image_for_prediction', upload):
+            results, failures = offline_queue.replay_batch(self.pending(), API_URL)
+        self.assertEqual(upload.call_args_list[0].kwargs["upload_max_edge"], 64)
+        self.assertEqual(([r[1] for r in results], failures), (["/img/a.png"], []))
+        self.assertTrue(database_manager.complete_pending_recognitions(results, failures))
+        self.assertEqual([item["image_path"] for item in self.pending()], ["/img/b.png", "/img/c.png"])
+        self.assertEqual([item["attempts"] for item in self.pending()], [0, 0])
+
+    def test_replay_failure_leaves_rows_queued(self):
+        """API vẫn offline: replay_batch báo _ApiOffline, không dòng nào bị xóa hay tính là một lần thử."""
+        with mock.patch.object(offline_queue, 'post_paths_for_prediction', side_effect=requests.exceptions.ConnectTimeout("timeout")):
+            with self.assertRaises(offline_queue._ApiOffline):
+                offline_queue.replay_batch(self.pending(), API_URL)
+        self.assertEqual(database_manager.count_pending_recognitions(MAX_ATTEMPTS), 3)
+        self.assertEqual(self.history_paths(), [])
+
+    def test_failed_items_are_retried_then_skipped(self):
+        """
+        /predict_paths không đọc được file (server khác máy / ngoài thư mục cho phép): ảnh đó được upload.
+        Chỉ upload lỗi (vd. 422) mới tăng số lần thử; quá MAX_ATTEMPTS thì không gửi lại nữa, thêm lại thì thử lại từ đầu.
+        """
+        outputs = [{"top_predictions": top_predictions(1)},
+                   {"error": "Path is not absolute or is outside the allowed root."},
+                   {"error": "Cannot read file: No such file or directory"}]
+        upload = mock.Mock(side_effect=[top_predictions(7)] + [http_error(422)] * MAX_ATTEMPTS)
+        with mock.patch.object(offline_queue, 'post_image_for_prediction', upload):
+            for attempt in range(MAX_ATTEMPTS):
+                items = self.pending()
+                with mock.patch.object(offline_queue, 'post_paths_for_prediction', return_value=outputs[-len(items):]):
+                    results, failures = offline_queue.replay_batch(items, API_URL)
+                self.assertEqual([failed_id for failed_id, _ in failures], [3])
+                self.assertTrue(database_manager.complete_pending_recognitions(results, failures))
+        self.assertEqual([call.args[0] for call in upload.call_args_list], ["/img/b.png"] + ["/img/c.png"] * MAX_ATTEMPTS)
+        self.assertEqual(self.pending(), [])
+        self.assertEqual(database_manager.count_pending_recognitions(), 1) # Vẫn lưu trong bảng, chỉ không gửi lại
+        self.assertEqual(self.history_paths(), ["/img/a.png", "/img/b.png"])
+        self.assertTrue(database_manager.enqueue_pending_recognition("/img/c.png"))
+        self.assertEqual([(item["image_path"], item["attempts"]) for item in self.pending()], [("/img/c.png", 0)])
+
+
+if __name__ == '__main__':
+    print("Running Offline Queue Unit Tests...")
+    unittest.main()
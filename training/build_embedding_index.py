@@ -0,0 +1,91 @@
+# training/build_embedding_index.py
+import time
+import argparse
+import numpy as np
+import tensorflow as tf
+
+# Import các thành phần từ dự án
+import config
+from utils.data_loader import load_data_npy
+from utils.model_utils import load_keras_model, build_feature_extractor
+from utils.embedding_index import write_embedding_index, EmbeddingIndex
+
+
+def main(save_images=True):
+    print("--- Building Training-Set Embedding Index ---")
+
+    # 1. Load Train Data
+    print(f"\n[Step 1/4] Loading training data from: {config.TRAIN_NPY_PATH}...")
+    train_data = load_data_npy(config.TRAIN_NPY_PATH)
+    if train_data is None: return
+    train_images, train_labels_one_hot = train_data
+    if not np.issubdtype(train_images.dtype, np.floating): train_images = train_images.astype(np.float32)
+    train_labels = np.argmax(train_labels_one_hot, axis=1).astype(np.int32)
+    print(f"  Train data shapes: Images {train_images.shape}, Labels {train_labels.shape}")
+
+    # 2. Load Model + tạo feature extractor
+    print(f"\n[Step 2/4] Loading trained model from: {config.MODEL_SAVE_PATH}...")
+    model = load_keras_model(config.MODEL_SAVE_PATH)
+    if model is None:
+        print("Exiting due to model loading failure.")
+        return
+    extractor = build_feature_extractor(model, config.EMBEDDING_LAYER_NAME)
+    if extractor is None:
+        print("Exiting: could not build feature extractor.")
+        return
+    dimension = int(extractor.output_shape[-1])
+    print(f"  Extracting layer '{config.EMBEDDING_LAYER_NAME}' ({dimension} dims).")
+
+    # 3. Trích xuất feature theo batch và ghi thẳng vào memmap (không giữ toàn bộ float32 trong RAM)
+    print(f"\n[Step 3/4] Extracting embeddings and writing index to: {config.EMBEDDING_INDEX_DIR}...")
+    batch_size = config.INFERENCE_BATCH_SIZE * 4
+    t_start = time.perf_counter()
+
+    def feature_batches():
+        for start in range(0, train_images.shape[0], batch_size):
+            batch = train_images[start:start + batch_size]
+            yield start, extractor.predict_on_batch(batch)
+            done = min(start + batch_size, train_images.shape[0])
+            if (start // batch_size) % 50 == 0 or done == train_images.shape[0]:
+                print(f"  {done}/{train_images.shape[0]} images processed")
+
+    num_rows = write_embedding_index(
+        config.EMBEDDING_MATRIX_PATH, config.EMBEDDING_METADATA_PATH, feature_batches(), train_labels,
+        num_classes=config.NUM_CLASSES, dimension=dimension,
+        images=train_images if save_images else None,
+        images_path=config.EMBEDDING_IMAGES_PATH if save_images else None)
+    elapsed = time.perf_counter() - t_start
+    print(f"  Wrote {num_rows} rows in {elapsed:.1f} s ({num_rows / max(elapsed, 1e-9):.0f} images/s)")
+
+    # 4. Kiểm tra nhanh: mỗi ảnh train phải tìm lại chính nó ở vị trí đầu
+    print("\n[Step 4/4] Sanity check on a few samples...")
+    index = EmbeddingIndex(config.EMBEDDING_MATRIX_PATH, config.EMBEDDING_METADATA_PATH)
+    sample_ids = np.linspace(0, num_rows - 1, num=min(5, num_rows), dtype=int)
+    sample_features = extractor.predict_on_batch(train_images[sample_ids])
+    for source_idx, query in zip(sample_ids, sample_features):
+        t_query = time.perf_counter()
+        neighbours = index.search(query, k=1, chunk_rows=config.EMBEDDING_SEARCH_CHUNK_ROWS)
+        query_ms = (time.perf_counter() - t_query) * 1000.0
+        found = neighbours[0]['source_index'] if neighbours else None
+        print(f"  sample {source_idx}: nearest={found} score={neighbours[0]['score']:.4f} ({query_ms:.1f} ms)")
+
+    print("\n--- Embedding Index Finished ---")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the float16 embedding index of the training set.")
+    parser.add_argument("--no-images", action="store_true", help="Do not store uint8 copies of the training images.")
+    args = parser.parse_args()
+
+    gpus = tf.config.experimental.list_physical_devices('GPU')
+    if gpus:
+        try:
+            for gpu in gpus:
+                tf.config.experimental.set_memory_growth(gpu, True)
+            print(f"Found {len(gpus)} GPU(s), memory growth enabled.")
+        except RuntimeError as e:
+            print(f"Error setting memory growth: {e}")
+    else:
+        print("No GPU found, running on CPU.")
+
+    main(save_images=not args.no_images)
@@ -0,0 +1,95 @@
+# training/verify_upload_downscale.py
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+
+# Import các thành phần từ dự án
+import config
+from utils.model_utils import load_keras_model
+from utils.inference_pipeline import preprocess_single_image, downscale_for_upload
+
+
+def read_test_files(test_dir, csv_path, limit=None):
+    """Đọc (đường dẫn, nhãn) của tập test GTSRB theo file CSV (giống load_test_data, nhưng giữ file gốc)."""
+    test_df = pd.read_csv(csv_path, delimiter=';')
+    files = [(os.path.join(test_dir, name), int(label))
+             for name, label in zip(test_df.iloc[:, 0].values, test_df.iloc[:, -1].values)]
+    files = [(path, label) for path, label in files if os.path.isfile(path)]
+    return files[:limit] if limit else files
+
+
+def predict_tensors(model, tensors, batch_size):
+    probs = [model.predict_on_batch(np.concatenate(tensors[start:start + batch_size], axis=0))
+             for start in range(0, len(tensors), batch_size)]
+    return np.concatenate(probs, axis=0)
+
+
+def main(edges, limit=None):
+    print("--- Verifying Client-Side Upload Downscaling ---")
+
+    # 1. Load test files
+    print(f"\n[Step 1/3] Reading test set from: {config.TEST_DATA_DIR}...")
+    if not os.path.isfile(config.TEST_CSV_PATH) or not os.path.isdir(config.TEST_DATA_DIR):
+        print("ERROR: Test directory or CSV file not found.")
+        return
+    test_files = read_test_files(config.TEST_DATA_DIR, config.TEST_CSV_PATH, limit)
+    labels = np.array([label for _, label in test_files], dtype=np.int32)
+    raw_bytes = []
+    for path, _ in test_files:
+        with open(path, 'rb') as f_read:
+            raw_bytes.append(f_read.read())
+    print(f"  {len(raw_bytes)} images, {sum(map(len, raw_bytes)) / 1024:.0f} KB total")
+
+    # 2. Load model
+    print(f"\n[Step 2/3] Loading trained model from: {config.MODEL_SAVE_PATH}...")
+    model = load_keras_model(config.MODEL_SAVE_PATH)
+    if model is None:
+        print("Exiting due to model loading failure.")
+        return
+
+    # 3. So sánh đường gửi ảnh gốc với đường thu nhỏ trước khi gửi (cùng preprocess_single_image của API)
+    print("\n[Step 3/3] Comparing predictions...")
+    batch_size = config.INFERENCE_BATCH_SIZE
+    full_tensors = [preprocess_single_image(data, config.IMG_HEIGHT, config.IMG_WIDTH) for data in raw_bytes]
+    full_probs = predict_tensors(model, full_tensors, batch_size)
+    full_pred = np.argmax(full_probs, axis=1)
+    print(f"  full-size : accuracy {np.mean(full_pred == labels):.4%}")
+    for edge in edges:
+        t_start = time.perf_counter()
+        uploads = [downscale_for_upload(data, edge)[0] for data in raw_bytes]
+        encode_ms = (time.perf_counter() - t_start) * 1000.0 / max(len(uploads), 1)
+        resized = sum(upload is not data for upload, data in zip(uploads, raw_bytes))
+        small_tensors = [preprocess_single_image(data, config.IMG_HEIGHT, config.IMG_WIDTH) for data in uploads]
+        small_probs = predict_tensors(model, small_tensors, batch_size)
+        small_pred = np.argmax(small_probs, axis=1)
+        pixel_diff = np.mean([np.abs(a - b).mean() for a, b in zip(full_tensors, small_tensors)]) * 255.0
+        disagree = np.flatnonzero(small_pred != full_pred)
+        print(f"  {edge}x{edge}   : accuracy {np.mean(small_pred == labels):.4%}, "
+              f"top-1 agreement {1 - len(disagree) / len(labels):.4%} ({len(disagree)} differ), "
+              f"max |Δp| {np.abs(small_probs - full_probs).max():.4f}, mean |Δpixel| {pixel_diff:.3f}/255")
+        print(f"              {resized} images resized, upload {sum(map(len, raw_bytes)) / 1024:.0f} KB -> "
+              f"{sum(map(len, uploads)) / 1024:.0f} KB, {encode_ms:.2f} ms/image to encode")
+        for idx in disagree[:5]:
+            print(f"              differs: {test_files[idx][0]} full={full_pred[idx]} small={small_pred[idx]}")
+
+    print("\n--- Verification Finished ---")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare predictions for full-size uploads vs client-side downscaled PNG uploads.")
+    parser.add_argument("--edges", type=int, nargs="+", default=[64, 128], help="Downscale sizes to check (pixels).")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N test images.")
+    args = parser.parse_args()
+
+    gpus = tf.config.experimental.list_physical_devices('GPU')
+    if gpus:
+        try:
+            for gpu in gpus:
+                tf.config.experimental.set_memory_growth(gpu, True)
+        except RuntimeError as e:
+            print(f"Error setting memory growth: {e}")
+
+    main(args.edges, args.limit)
@@ -1,9 +1,13 @@
 # utils/auth_manager.py
 import sqlite3
 import os
+import csv
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from passlib.context import CryptContext
-from typing import Tuple, List, Dict, Optional # <<< Đã import các kiểu cần thiết
+from typing import Tuple, List, Dict, Optional, Callable # <<< Đã import các kiểu cần thiết
+from database.connection_manager import get_connection_manager, release_connection
 
 # --- Cấu hình ---
 # Lấy đường dẫn DB từ config nếu được import bởi module khác
@@ -35,21 +39,12 @@ except ImportError:
     raise
 
 VALID_ROLES = ['user', 'admin'] # Các vai trò hợp lệ
+BULK_HASH_CHUNK_SIZE = 8        # Số mật khẩu mỗi tác vụ gửi sang process con (càng nhỏ tiến độ càng mịn)
+BULK_HASH_MIN_PARALLEL = 4      # Ít hơn số này thì băm ngay trên thread hiện tại (khởi động process tốn ~1 giây)
 
 def _create_connection():
-    """ Tạo kết nối đến database """
-    conn = None
-    if not os.path.exists(AUTH_DB_PATH):
-        print(f"AuthManager DB Error: Database file not found at {AUTH_DB_PATH}")
-        return None
-    try:
-        # isolation_level=None để tự động commit (hoặc nhớ commit thủ công)
-        conn = sqlite3.connect(AUTH_DB_PATH)
-        conn.row_factory = sqlite3.Row # Trả về kết quả dạng dictionary-like
-        return conn
-    except sqlite3.Error as e:
-        print(f"AuthManager DB Error: {e}")
-    return conn
+    """ Kết nối của thread hiện tại tới database (dùng chung với database_manager, xem connection_manager) """
+    return get_connection_manager(AUTH_DB_PATH).get_connection()
 
 # --- Hashing ---
 def hash_password(password: str) -> str:
@@ -68,6 +63,144 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         print(f"Error verifying password (potentially invalid hash?): {e}")
         return False
 
+def _hash_password_chunk(passwords: List[str]) -> List[str]:
+    """Chạy trong process con của hash_passwords (phải ở cấp module để pickle được)."""
+    return [hash_password(password) for password in passwords]
+
+def hash_passwords(passwords: List[str], max_workers: Optional[int] = None,
+                   progress_callback: Optional[Callable[[int, int], None]] = None,
+                   cancel_check: Optional[Callable[[], bool]] = None) -> Optional[List[str]]:
+    """
+    Băm nhiều mật khẩu song song trên nhiều process (bcrypt tốn CPU và giữ GIL, thread không giúp được).
+    Dùng context 'spawn' để an toàn khi gọi từ ứng dụng Qt đang chạy nhiều thread.
+
+    Returns:
+        Danh sách hash cùng thứ tự với đầu vào, hoặc None nếu cancel_check() trả về True giữa chừng.
+    """
+    total = len(passwords)
+    hashes: List[Optional[str]] = [None] * total
+    done = 0
+    if total < BULK_HASH_MIN_PARALLEL or max_workers == 1:
+        for idx, password in enumerate(passwords):
+            if cancel_check and cancel_check(): return None
+            hashes[idx] = hash_password(password)
+            if progress_callback: progress_callback(idx + 1, total)
+        return hashes
+
+    workers = max_workers or max(1, min(os.cpu_count() or 1, (total + BULK_HASH_CHUNK_SIZE - 1) // BULK_HASH_CHUNK_SIZE))
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(_hash_password_chunk, passwords[start:start + BULK_HASH_CHUNK_SIZE]): start
+                   for start in range(0, total, BULK_HASH_CHUNK_SIZE)}
+        for future in as_completed(futures):
+            if cancel_check and cancel_check():
+                executor.shutdown(wait=False, cancel_futures=True) # Chỉ chờ các nhóm đang chạy dở
+                return None
+            start = futures[future]
+            chunk_hashes = future.result()
+            hashes[start:start + len(chunk_hashes)] = chunk_hashes
+            done += len(chunk_hashes)
+            if progress_callback: progress_callback(done, total)
+    return hashes
+
+def read_users_csv(csv_path: str) -> List[Dict]:
+    """
+    Đọc file CSV người dùng với header: username,password[,role] (role mặc định 'user').
+    Không kiểm tra nội dung (bulk_add_users làm việc đó và báo lỗi theo số dòng).
+
+    Returns:
+        List[Dict]: mỗi dòng có 'row' (số dòng trong file), 'username', 'password', 'role'.
+    """
+    rows = []
+    with open(csv_path, newline='', encoding='utf-8-sig') as f_csv:
+        reader = csv.DictReader(f_csv)
+        fieldnames = [name.strip().lower() for name in (reader.fieldnames or [])]
+        if 'username' not in fieldnames or 'password' not in fieldnames:
+            raise ValueError("File CSV phải có header gồm cột 'username' và 'password' (cột 'role' không bắt buộc).")
+        reader.fieldnames = fieldnames
+        for record in reader:
+            username = (record.get('username') or '').strip()
+            password = record.get('password') or ''
+            role = (record.get('role') or 'user').strip().lower()
+            if not username and not password: continue # Bỏ qua dòng trống
+            rows.append({'row': reader.line_num, 'username': username, 'password': password, 'role': role})
+    return rows
+
+def bulk_add_users(users: List[Dict], max_workers: Optional[int] = None,
+                   progress_callback: Optional[Callable[[int, int], None]] = None,
+                   cancel_check: Optional[Callable[[], bool]] = None) -> Tuple[int, List[Tuple[int, str, str]]]:
+    """
+    Thêm nhiều người dùng: kiểm tra từng dòng, băm mật khẩu song song (hash_passwords),
+    rồi INSERT tất cả bằng executemany trong một transaction.
+
+    Args:
+        users: dict có 'username', 'password', 'role' (tùy chọn) và 'row' (tùy chọn, dùng trong thông báo lỗi).
+
+    Returns:
+        (số người dùng đã thêm, danh sách lỗi (số dòng, username, thông báo)). Các dòng lỗi bị bỏ qua,
+        các dòng hợp lệ vẫn được thêm.
+    """
+    errors: List[Tuple[int, str, str]] = []
+    valid: List[Dict] = []
+    seen = set()
+    for idx, user in enumerate(users, start=1):
+        row_no = user.get('row', idx)
+        username = (user.get('username') or '').strip()
+        password = user.get('password') or ''
+        role = user.get('role') or 'user'
+        if not username or not password:
+            errors.append((row_no, username, "Tên đăng nhập và mật khẩu không được để trống."))
+        elif role not in VALID_ROLES:
+            errors.append((row_no, username, f"Vai trò không hợp lệ: {role}. Chỉ chấp nhận: {VALID_ROLES}"))
+        elif username in seen:
+            errors.append((row_no, username, f"Tên đăng nhập '{username}' bị trùng trong danh sách nhập."))
+        else:
+            seen.add(username)
+            valid.append({'row': row_no, 'username': username, 'password': password, 'role': role})
+
+    conn = _create_connection()
+    if not conn:
+        return 0, errors + [(user['row'], user['username'], "Không thể kết nối database.") for user in valid]
+    try:
+        # Loại tên đã có trước khi băm để không tốn CPU cho các dòng chắc chắn lỗi
+        existing = _existing_usernames(conn, [user['username'] for user in valid])
+        errors.extend((user['row'], user['username'], f"Tên đăng nhập '{user['username']}' đã tồn tại.")
+                      for user in valid if user['username'] in existing)
+        valid = [user for user in valid if user['username'] not in existing]
+        if not valid:
+            return 0, errors
+
+        hashes = hash_passwords([user['password'] for user in valid], max_workers, progress_callback, cancel_check)
+        if hashes is None:
+            print("Bulk user import cancelled before inserting.")
+            return 0, errors
+
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute("BEGIN IMMEDIATE") # Khóa ghi rồi kiểm tra lại: có thể có người dùng được thêm trong lúc băm
+        existing = _existing_usernames(conn, [user['username'] for user in valid])
+        errors.extend((user['row'], user['username'], f"Tên đăng nhập '{user['username']}' đã tồn tại.")
+                      for user in valid if user['username'] in existing)
+        params = [(user['username'], hashed_pw, user['role'], now)
+                  for user, hashed_pw in zip(valid, hashes) if user['username'] not in existing]
+        conn.executemany("INSERT INTO users (username, password_hash, role, created_at) VALUES (?, ?, ?, ?)", params)
+        conn.commit()
+        print(f"Bulk user import: {len(params)} added, {len(errors)} rows skipped.")
+        return len(params), sorted(errors)
+    except sqlite3.Error as e:
+        if conn.in_transaction: conn.rollback()
+        print(f"Database error during bulk user import: {e}")
+        return 0, sorted(errors + [(user['row'], user['username'], f"Lỗi database khi thêm người dùng: {e}") for user in valid])
+    finally:
+        release_connection(conn)
+
+def _existing_usernames(conn: sqlite3.Connection, usernames: List[str]) -> set:
+    """Các username trong danh sách đã có trong bảng users (truy vấn theo từng nhóm, dưới giới hạn biến của SQLite)."""
+    existing = set()
+    for start in range(0, len(usernames), 500):
+        chunk = usernames[start:start + 500]
+        placeholders = ','.join('?' * len(chunk))
+        existing.update(row[0] for row in conn.execute(f"SELECT username FROM users WHERE username IN ({placeholders})", chunk))
+    return existing
+
 # --- CRUD Operations ---
 # <<< Đã sửa kiểu trả về -> Tuple[bool, str] >>>
 def add_user(username: str, password: str, role: str = 'user') -> Tuple[bool, str]:
@@ -96,7 +229,7 @@ def add_user(username: str, password: str, role: str = 'user') -> Tuple[bool, st
         print(f"Database error adding user '{username}': {e}")
         return False, f"Lỗi database khi thêm người dùng: {e}"
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
 
 # <<< Đã sửa kiểu trả về -> Optional[Dict] >>>
 def get_user_by_username(username: str) -> Optional[Dict]:
@@ -114,7 +247,7 @@ def get_user_by_username(username: str) -> Optional[Dict]:
         print(f"Database error getting user '{username}': {e}")
         return None
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
 
 # <<< Đã sửa kiểu trả về -> Optional[Dict] >>>
 def get_user_by_id(user_id: int) -> Optional[Dict]:
@@ -131,7 +264,7 @@ def get_user_by_id(user_id: int) -> Optional[Dict]:
         print(f"Database error getting user ID {user_id}: {e}")
         return None
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
 
 # <<< Đã sửa kiểu trả về -> List[Dict] >>>
 def list_users() -> List[Dict]:
@@ -149,7 +282,7 @@ def list_users() -> List[Dict]:
         print(f"Database error listing users: {e}")
         return []
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
 
 # <<< Đã sửa kiểu trả về -> Tuple[bool, str] >>>
 def update_user_role(user_id: int, new_role: str) -> Tuple[bool, str]:
@@ -172,7 +305,7 @@ def update_user_role(user_id: int, new_role: str) -> Tuple[bool, str]:
         print(f"Database error updating role for user ID {user_id}: {e}")
         return False, f"Lỗi database khi cập nhật vai trò: {e}"
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
 
 # <<< Đã sửa kiểu trả về -> Tuple[bool, str] >>>
 def update_user_password(user_id: int, new_password: str) -> Tuple[bool, str]:
@@ -196,7 +329,7 @@ def update_user_password(user_id: int, new_password: str) -> Tuple[bool, str]:
         print(f"Database error updating password for user ID {user_id}: {e}")
         return False, f"Lỗi database khi cập nhật mật khẩu: {e}"
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
 
 # <<< Đã sửa kiểu trả về -> Tuple[bool, str] >>>
 def delete_user(user_id: int) -> Tuple[bool, str]:
@@ -223,7 +356,7 @@ def delete_user(user_id: int) -> Tuple[bool, str]:
         print(f"Database error deleting user ID {user_id}: {e}")
         return False, f"Lỗi database khi xóa người dùng: {e}"
     finally:
-        if conn: conn.close()
+        if conn: release_connection(conn)
 
 # --- Test block (chỉ chạy khi thực thi trực tiếp) ---
 if __name__ == '__main__':
@@ -7,11 +7,21 @@ import os
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SETTINGS_FILE = os.path.join(BASE_DIR, 'settings.json')
 
+# Chế độ suy luận của GUI: gửi ảnh tới API HTTP, hoặc chạy model ngay trong tiến trình GUI
+INFERENCE_MODE_API = "api"
+INFERENCE_MODE_LOCAL = "local"
+VALID_INFERENCE_MODES = (INFERENCE_MODE_API, INFERENCE_MODE_LOCAL)
+
+# Thu nhỏ ảnh trước khi gửi tới API (cạnh, pixel); 0 = gửi nguyên file gốc
+UPLOAD_MAX_EDGE_CHOICES = (0, 64, 128)
+
 # Cài đặt mặc định
 DEFAULT_SETTINGS = {
     "api_url": "http://127.0.0.1:8000/predict",
     "class_images_dir": os.path.join(BASE_DIR, 'gui', 'assets', 'class_images'),
-    "database_path": os.path.join(BASE_DIR, 'database', 'history.db')
+    "database_path": os.path.join(BASE_DIR, 'database', 'history.db'),
+    "inference_mode": INFERENCE_MODE_API,
+    "upload_max_edge": 0
 }
 
 def load_settings():
@@ -0,0 +1,144 @@
+# utils/embedding_index.py
+
+import os
+import numpy as np
+from typing import List, Dict, Optional
+
+
+def l2_normalize(vectors: np.ndarray, eps: float = 1e-12) -> np.ndarray:
+    """Chuẩn hóa L2 theo từng hàng (float32)."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, eps)
+
+
+def _merge_top_k(best_scores: np.ndarray, best_rows: np.ndarray,
+                 scores: np.ndarray, rows: np.ndarray, k: int):
+    """Gộp kết quả top-k hiện tại với một chunk mới (không sắp xếp toàn bộ)."""
+    all_scores = np.concatenate([best_scores, scores])
+    all_rows = np.concatenate([best_rows, rows])
+    if all_scores.shape[0] > k:
+        keep = np.argpartition(-all_scores, k - 1)[:k]
+        all_scores, all_rows = all_scores[keep], all_rows[keep]
+    return all_scores, all_rows
+
+
+class EmbeddingIndex:
+    """
+    Chỉ mục embedding của tập train được lưu dưới dạng ma trận float16 memory-mapped
+    (mỗi hàng đã chuẩn hóa L2), sắp xếp theo lớp để tìm kiếm trong một lớp là một lát cắt liên tục.
+
+    File metadata (.npz) gồm:
+        labels (N,)            : class_id của từng hàng
+        source_indices (N,)    : vị trí tương ứng trong file train gốc
+        class_offsets (C + 1,) : hàng [class_offsets[c], class_offsets[c+1]) thuộc lớp c
+    """
+    def __init__(self, embeddings_path: str, metadata_path: str, images_path: Optional[str] = None):
+        self.embeddings = np.load(embeddings_path, mmap_mode='r')
+        with np.load(metadata_path) as meta:
+            self.labels = meta['labels']
+            self.source_indices = meta['source_indices']
+            self.class_offsets = meta['class_offsets']
+        self.images = np.load(images_path, mmap_mode='r') if images_path and os.path.exists(images_path) else None
+        if self.embeddings.shape[0] != self.labels.shape[0]:
+            raise ValueError("Embedding matrix and metadata have different row counts.")
+
+    @property
+    def dimension(self) -> int:
+        return int(self.embeddings.shape[1])
+
+    def __len__(self) -> int:
+        return int(self.embeddings.shape[0])
+
+    def search(self, query: np.ndarray, k: int = 5, class_id: Optional[int] = None,
+               chunk_rows: int = 32768) -> List[Dict]:
+        """
+        Tìm k hàng gần nhất (cosine similarity) với vector truy vấn.
+        Tích vô hướng được tính theo từng chunk để bộ nhớ không phụ thuộc kích thước chỉ mục.
+
+        Args:
+            query (np.ndarray): Vector embedding (D,) chưa cần chuẩn hóa.
+            k (int): Số kết quả.
+            class_id (int, optional): Chỉ tìm trong lớp này.
+            chunk_rows (int): Số hàng đọc từ memmap mỗi lần.
+
+        Returns:
+            List[Dict]: Sắp xếp giảm dần theo 'score', gồm 'row', 'source_index', 'class_id', 'score'.
+        """
+        query = l2_normalize(np.asarray(query).reshape(-1))
+        if query.shape[0] != self.dimension:
+            raise ValueError(f"Query dimension {query.shape[0]} != index dimension {self.dimension}.")
+
+        if class_id is None:
+            start, stop = 0, len(self)
+        else:
+            if not 0 <= class_id < len(self.class_offsets) - 1:
+                return []
+            start, stop = int(self.class_offsets[class_id]), int(self.class_offsets[class_id + 1])
+        k = max(0, min(k, stop - start))
+        if k == 0:
+            return []
+
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for chunk_start in range(start, stop, chunk_rows):
+            chunk_stop = min(chunk_start + chunk_rows, stop)
+            scores = np.asarray(self.embeddings[chunk_start:chunk_stop], dtype=np.float32) @ query
+            if scores.shape[0] > k:
+                part = np.argpartition(-scores, k - 1)[:k]
+            else:
+                part = np.arange(scores.shape[0])
+            best_scores, best_rows = _merge_top_k(best_scores, best_rows, scores[part],
+                                                  part.astype(np.int64) + chunk_start, k)
+
+        order = np.argsort(-best_scores)
+        return [{
+            "row": int(best_rows[i]),
+            "source_index": int(self.source_indices[best_rows[i]]),
+            "class_id": int(self.labels[best_rows[i]]),
+            "score": float(best_scores[i]),
+        } for i in order]
+
+
+def write_embedding_index(embeddings_path: str, metadata_path: str, features_iter, labels: np.ndarray,
+                          num_classes: int, dimension: int, images: Optional[np.ndarray] = None,
+                          images_path: Optional[str] = None) -> int:
+    """
+    Ghi chỉ mục từ các batch feature (theo thứ tự gốc) vào memmap float16 đã sắp xếp theo lớp.
+
+    Args:
+        features_iter: iterable các tuple (start_index, features_batch) theo thứ tự gốc.
+        labels (np.ndarray): class_id theo thứ tự gốc (N,).
+        images (np.ndarray, optional): ảnh train (N, H, W, 3) float [0,1] hoặc uint8 để lưu kèm.
+
+    Returns:
+        int: Số hàng đã ghi.
+    """
+    labels = np.asarray(labels).astype(np.int32)
+    num_rows = labels.shape[0]
+    order = np.argsort(labels, kind='stable')          # hàng mới -> vị trí gốc
+    destination = np.empty(num_rows, dtype=np.int64)   # vị trí gốc -> hàng mới
+    destination[order] = np.arange(num_rows)
+
+    os.makedirs(os.path.dirname(embeddings_path), exist_ok=True)
+    matrix = np.lib.format.open_memmap(embeddings_path, mode='w+', dtype=np.float16, shape=(num_rows, dimension))
+    for start, batch in features_iter:
+        rows = destination[start:start + batch.shape[0]]
+        matrix[rows] = l2_normalize(batch).astype(np.float16)
+    matrix.flush()
+    del matrix
+
+    if images is not None and images_path:
+        stored = np.lib.format.open_memmap(images_path, mode='w+', dtype=np.uint8, shape=images.shape)
+        for start in range(0, num_rows, 4096):
+            chunk = images[order[start:start + 4096]]
+            if np.issubdtype(chunk.dtype, np.floating):
+                chunk = np.clip(chunk * 255.0 + 0.5, 0, 255)
+            stored[start:start + chunk.shape[0]] = chunk.astype(np.uint8)
+        stored.flush()
+        del stored
+
+    sorted_labels = labels[order]
+    class_offsets = np.searchsorted(sorted_labels, np.arange(num_classes + 1), side='left').astype(np.int64)
+    np.savez(metadata_path, labels=sorted_labels, source_indices=order.astype(np.int64), class_offsets=class_offsets)
+    return num_rows
@@ -0,0 +1,74 @@
+# utils/gradcam.py
+
+import numpy as np
+import cv2
+import tensorflow as tf
+from tensorflow import keras
+from typing import Optional, Sequence
+
+
+def build_gradcam_model(model, layer_name: str = 'conv3'):
+    """
+    Tạo model trả về đồng thời (activation của layer conv, xác suất đầu ra)
+    để tính Grad-CAM trong một lần forward. Trả về None nếu không có layer.
+    """
+    if model is None:
+        return None
+    try:
+        conv_layer = model.get_layer(layer_name)
+    except ValueError:
+        print(f"Error: Layer '{layer_name}' not found in model.")
+        return None
+    # Dùng output của layer cuối thay cho model.output (Sequential chưa được gọi không có model.output)
+    return keras.Model(inputs=model.inputs, outputs=[conv_layer.output, model.layers[-1].output],
+                       name=f"{model.name}_{layer_name}_gradcam")
+
+
+def compute_gradcam_batch(gradcam_model, images: np.ndarray, class_ids: Optional[Sequence[Optional[int]]] = None):
+    """
+    Tính heatmap Grad-CAM cho cả batch trong một lần GradientTape.
+
+    Args:
+        gradcam_model: Model từ build_gradcam_model.
+        images (np.ndarray): (N, H, W, 3) float32 đã tiền xử lý.
+        class_ids: Lớp cần giải thích cho từng ảnh; None = lớp dự đoán cao nhất.
+
+    Returns:
+        (heatmaps, class_ids, probabilities): heatmaps (N, h, w) trong [0, 1] theo độ phân giải của layer conv.
+    """
+    images = tf.convert_to_tensor(images, dtype=tf.float32)
+    with tf.GradientTape() as tape:
+        conv_outputs, predictions = gradcam_model(images, training=False)
+        predicted = tf.argmax(predictions, axis=1, output_type=tf.int32).numpy()
+        if class_ids is None:
+            chosen = predicted
+        else:
+            chosen = np.array([predicted[i] if c is None else int(c) for i, c in enumerate(class_ids)], dtype=np.int32)
+        # Tổng điểm của lớp được chọn trên toàn batch: gradient của mỗi ảnh chỉ phụ thuộc vào điểm của chính nó
+        target = tf.reduce_sum(tf.gather(predictions, chosen, axis=1, batch_dims=1))
+    grads = tape.gradient(target, conv_outputs)
+
+    weights = tf.reduce_mean(grads, axis=(1, 2), keepdims=True)         # (N, 1, 1, C)
+    cams = tf.nn.relu(tf.reduce_sum(weights * conv_outputs, axis=-1)).numpy()  # (N, h, w)
+    maxima = cams.reshape(cams.shape[0], -1).max(axis=1).reshape(-1, 1, 1)
+    cams = cams / np.maximum(maxima, 1e-8)
+    probabilities = predictions.numpy()[np.arange(len(chosen)), chosen]
+    return cams.astype(np.float32), chosen, probabilities
+
+
+def render_overlay_png(image_rgb: np.ndarray, heatmap: np.ndarray, size: int = 96, alpha: float = 0.45) -> bytes:
+    """
+    Phủ heatmap (colormap JET) lên ảnh RGB [0, 1] và mã hóa thành PNG nhỏ.
+
+    Returns:
+        bytes: Dữ liệu PNG.
+    """
+    base_bgr = cv2.cvtColor(np.clip(image_rgb * 255.0, 0, 255).astype(np.uint8), cv2.COLOR_RGB2BGR)
+    base_bgr = cv2.resize(base_bgr, (size, size), interpolation=cv2.INTER_LINEAR)
+    heat = cv2.resize(np.uint8(255 * np.clip(heatmap, 0.0, 1.0)), (size, size), interpolation=cv2.INTER_LINEAR)
+    heat_bgr = cv2.applyColorMap(heat, cv2.COLORMAP_JET)
+    overlay = cv2.addWeighted(heat_bgr, alpha, base_bgr, 1.0 - alpha, 0)
+    ok, encoded = cv2.imencode('.png', overlay, [cv2.IMWRITE_PNG_COMPRESSION, 6])
+    if not ok:
+        raise ValueError("Could not encode Grad-CAM overlay.")
+    return encoded.tobytes()
@@ -0,0 +1,137 @@
+# utils/image_header.py
+
+import struct
+from typing import Optional, Tuple
+
+# Đọc header đủ để lấy kích thước với hầu hết ảnh (JPEG có EXIF lớn có thể cần nhiều hơn)
+HEADER_PROBE_BYTES = 64 * 1024
+
+IMAGE_MIME_TYPES = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'bmp': 'image/bmp',
+    'pnm': 'image/x-portable-anymap',
+    'webp': 'image/webp',
+}
+
+
+def _png_size(data: bytes) -> Optional[Tuple[int, int]]:
+    # Signature (8 byte) + chunk IHDR: length(4) 'IHDR'(4) width(4) height(4)
+    if len(data) < 24 or data[12:16] != b'IHDR':
+        return None
+    width, height = struct.unpack('>II', data[16:24])
+    return width, height
+
+
+def _jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    # Duyệt các segment marker đến khi gặp SOFn (chứa height/width)
+    pos = 2
+    length = len(data)
+    while pos + 4 <= length:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF: # Byte đệm
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7: # Marker không có payload
+            pos += 2
+            continue
+        seg_len = struct.unpack('>H', data[pos + 2:pos + 4])[0]
+        if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+            if pos + 9 > length:
+                return None
+            height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+            return width, height
+        if marker == 0xDA: # Start of scan mà chưa thấy SOF -> file lỗi
+            return None
+        pos += 2 + seg_len
+    return None
+
+
+def _bmp_size(data: bytes) -> Optional[Tuple[int, int]]:
+    if len(data) < 26:
+        return None
+    header_size = struct.unpack('<I', data[14:18])[0]
+    if header_size == 12: # BITMAPCOREHEADER
+        width, height = struct.unpack('<HH', data[18:22])
+    else:
+        width, height = struct.unpack('<ii', data[18:26])
+    return abs(width), abs(height)
+
+
+def _pnm_size(data: bytes) -> Optional[Tuple[int, int]]:
+    # Header dạng text: magic, width, height (có thể có comment '#')
+    tokens = []
+    for line in data[:1024].split(b'\n'):
+        line = line.split(b'#', 1)[0]
+        tokens.extend(line.split())
+        if len(tokens) >= 3:
+            break
+    try:
+        return int(tokens[1]), int(tokens[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _webp_size(data: bytes) -> Optional[Tuple[int, int]]:
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        width, height = struct.unpack('<HH', data[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        bits = struct.unpack('<I', data[21:25])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        width = int.from_bytes(data[24:27], 'little') + 1
+        height = int.from_bytes(data[27:30], 'little') + 1
+        return width, height
+    return None
+
+
+def sniff_format(data: bytes) -> Optional[str]:
+    """Nhận dạng định dạng ảnh từ magic bytes. Trả về None nếu không hỗ trợ."""
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if data.startswith(b'\xff\xd8'):
+        return 'jpeg'
+    if data.startswith(b'BM'):
+        return 'bmp'
+    if data[:2] in (b'P1', b'P2', b'P3', b'P4', b'P5', b'P6'):
+        return 'pnm'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+_SIZE_READERS = {
+    'png': _png_size,
+    'jpeg': _jpeg_size,
+    'bmp': _bmp_size,
+    'pnm': _pnm_size,
+    'webp': _webp_size,
+}
+
+
+def guess_mime_type(data: bytes) -> str:
+    """MIME type theo magic bytes (application/octet-stream nếu không nhận dạng được)."""
+    return IMAGE_MIME_TYPES.get(sniff_format(data), 'application/octet-stream')
+
+
+def read_image_header(data: bytes) -> Tuple[Optional[str], Optional[Tuple[int, int]]]:
+    """
+    Đọc định dạng và kích thước (width, height) chỉ từ phần đầu file, không giải mã ảnh.
+
+    Returns:
+        (format, (width, height)): format là None nếu không nhận dạng được;
+        kích thước là None nếu header chưa đủ dữ liệu hoặc bị hỏng.
+    """
+    fmt = sniff_format(data)
+    if fmt is None:
+        return None, None
+    try:
+        return fmt, _SIZE_READERS[fmt](data)
+    except struct.error:
+        return fmt, None
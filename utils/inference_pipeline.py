@@ -0,0 +1,149 @@
+# utils/inference_pipeline.py
+
+import logging
+from typing import Tuple
+
+import numpy as np
+import cv2
+
+from utils.image_header import read_image_header, guess_mime_type
+
+# Pipeline dùng chung giữa API (api/routes/predict.py) và chế độ suy luận cục bộ của GUI,
+# để hai đường chạy cho ra cùng một tensor đầu vào và cùng một định dạng kết quả.
+logger = logging.getLogger("inference_pipeline")
+
+# --- Class Names ---
+CLASS_NAMES = {
+    0: 'Giới hạn tốc độ (20km/h)', 1: 'Giới hạn tốc độ (30km/h)', 2: 'Giới hạn tốc độ (50km/h)',
+    3: 'Giới hạn tốc độ (60km/h)', 4: 'Giới hạn tốc độ (70km/h)', 5: 'Giới hạn tốc độ (80km/h)',
+    6: 'Hết giới hạn tốc độ (80km/h)', 7: 'Giới hạn tốc độ (100km/h)', 8: 'Giới hạn tốc độ (120km/h)',
+    9: 'Cấm vượt (xe con)', 10: 'Cấm vượt (xe tải > 3.5 tấn)', 11: 'Giao nhau với đường không ưu tiên',
+    12: 'Đường ưu tiên', 13: 'Nhường đường', 14: 'Dừng lại', 15: 'Cấm xe',
+    16: 'Cấm xe tải > 3.5 tấn', 17: 'Cấm đi ngược chiều', 18: 'Nguy hiểm khác',
+    19: 'Chỗ ngoặt nguy hiểm (trái)', 20: 'Chỗ ngoặt nguy hiểm (phải)', 21: 'Nhiều chỗ ngoặt nguy hiểm liên tiếp',
+    22: 'Đường không bằng phẳng', 23: 'Đường trơn trượt', 24: 'Đường bị thu hẹp (phải)',
+    25: 'Công trường', 26: 'Tín hiệu đèn giao thông', 27: 'Đường người đi bộ',
+    28: 'Trẻ em qua đường', 29: 'Đường xe đạp', 30: 'Cẩn thận băng tuyết',
+    31: 'Động vật hoang dã qua đường', 32: 'Hết mọi lệnh cấm', 33: 'Hướng đi phải rẽ phải',
+    34: 'Hướng đi phải rẽ trái', 35: 'Hướng đi thẳng', 36: 'Hướng đi thẳng hoặc rẽ phải',
+    37: 'Hướng đi thẳng hoặc rẽ trái', 38: 'Hướng phải đi vòng chướng ngại vật (bên phải)',
+    39: 'Hướng phải đi vòng chướng ngại vật (bên trái)', 40: 'Bùng binh/Nơi giao nhau chạy theo vòng xuyến',
+    41: 'Hết cấm vượt (xe con)', 42: 'Hết cấm vượt (xe tải > 3.5 tấn)'
+}
+
+# --- Hàm Tiền xử lý Ảnh Đầu vào ---
+def preprocess_single_image(image_bytes: bytes, target_height: int, target_width: int):
+    """Tiền xử lý một ảnh đầu vào (bytes) để đưa vào mô hình."""
+    try:
+        nparr = np.frombuffer(image_bytes, np.uint8)
+        img_bgr = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if img_bgr is None: raise ValueError("Could not decode image.")
+
+        # === (TÙY CHỌN) TIỀN XỬ LÝ NÂNG CAO (Commented out) ===
+        # img_gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+        # clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
+        # img_clahe = clahe.apply(img_gray)
+        # img_bgr_processed = cv2.cvtColor(img_clahe, cv2.COLOR_GRAY2BGR)
+        # img_to_blur = img_bgr_processed
+        # img_blurred = cv2.GaussianBlur(img_to_blur, (3, 3), 0)
+        # img_to_resize = img_blurred
+        img_to_resize = img_bgr # Dùng ảnh gốc nếu không xử lý thêm
+
+        # Resize ảnh
+        img_resized_bgr = cv2.resize(img_to_resize, (target_width, target_height), interpolation=cv2.INTER_AREA)
+        # Chuyển đổi sang RGB
+        img_rgb = cv2.cvtColor(img_resized_bgr, cv2.COLOR_BGR2RGB)
+        # Chuẩn hóa về [0, 1]
+        img_normalized = img_rgb.astype(np.float32) / 255.0
+        # Mở rộng chiều batch
+        img_batch = np.expand_dims(img_normalized, axis=0)
+
+        logger.debug(f"Preprocessed image shape: {img_batch.shape}, dtype: {img_batch.dtype}, Min: {img_batch.min():.2f}, Max: {img_batch.max():.2f}")
+        return img_batch
+    except Exception as e:
+        logger.error(f"Error during image preprocessing: {e}", exc_info=True)
+        return None
+
+# --- Thu nhỏ ảnh phía client trước khi upload ---
+UPLOAD_PNG_COMPRESSION = 3 # PNG luôn lossless; mức nén chỉ đổi tốc độ/kích thước
+
+def downscale_for_upload(image_bytes: bytes, max_edge: int) -> Tuple[bytes, str]:
+    """
+    Thu nhỏ ảnh về max_edge x max_edge (INTER_AREA) và mã hóa PNG (lossless) trước khi gửi tới /predict.
+    preprocess_single_image cũng ép ảnh về hình vuông IMG_WIDTH x IMG_HEIGHT (không giữ tỷ lệ), nên thu nhỏ
+    trước về hình vuông bội số của kích thước đó cho ra tensor gần như trùng với khi gửi ảnh gốc.
+
+    Returns:
+        (bytes, mime_type): ảnh gốc kèm MIME đúng nếu max_edge <= 0, ảnh đã đủ nhỏ hoặc không giải mã được
+        (để server trả lỗi như bình thường); ngược lại là PNG đã thu nhỏ.
+    """
+    original = (image_bytes, guess_mime_type(image_bytes))
+    if max_edge <= 0:
+        return original
+    _, size = read_image_header(image_bytes[:64 * 1024])
+    if size is not None and max(size) <= max_edge:
+        return original # Không cần giải mã ảnh đã đủ nhỏ
+    img_bgr = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img_bgr is None or max(img_bgr.shape[:2]) <= max_edge:
+        return original
+    img_small = cv2.resize(img_bgr, (max_edge, max_edge), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode('.png', img_small, [cv2.IMWRITE_PNG_COMPRESSION, UPLOAD_PNG_COMPRESSION])
+    if not ok:
+        return original
+    logger.debug(f"Downscaled upload {img_bgr.shape[1]}x{img_bgr.shape[0]} -> {max_edge}x{max_edge}: "
+                 f"{len(image_bytes)} -> {encoded.nbytes} bytes")
+    return encoded.tobytes(), 'image/png'
+
+# --- Ngưỡng độ tin cậy tối thiểu cho kết quả trả về ---
+MIN_CONFIDENCE_THRESHOLD = 0.75 # <<< ĐẶT NGƯỠNG TẠI ĐÂY (ví dụ: 75%) >>>
+
+def format_top_predictions(predictions_prob: np.ndarray, top_n: int, source_name: str = "image"):
+    """
+    Lấy top N kết quả từ vector xác suất và lọc theo ngưỡng độ tin cậy.
+    Nếu không có kết quả nào vượt ngưỡng, trả về kết quả Top 1 với cảnh báo.
+    """
+    # --- Lấy top N kết quả ---
+    top_n_indices = np.argsort(predictions_prob)[-top_n:][::-1]
+    top_results = []
+    for idx in top_n_indices:
+        class_id = int(idx)
+        confidence = float(predictions_prob[idx])
+        class_name = CLASS_NAMES.get(class_id, f"Unknown Class ID: {class_id}")
+        top_results.append({
+            "class_id": class_id,
+            "class_name": class_name,
+            "confidence": confidence
+        })
+
+    # --- LỌC KẾT QUẢ THEO NGƯỠNG ĐỘ TIN CẬY ---
+    filtered_results = [res for res in top_results if res['confidence'] >= MIN_CONFIDENCE_THRESHOLD]
+
+    # <<< THAY ĐỔI: Xử lý khi không có kết quả nào vượt ngưỡng >>>
+    if not filtered_results:
+        # Kiểm tra xem có dự đoán nào không (dù thấp)
+        if top_results:
+            # Lấy kết quả có độ tin cậy cao nhất
+            top_pred_low_conf = top_results[0]
+            top_conf = top_pred_low_conf['confidence']
+            top_id = top_pred_low_conf['class_id']
+            top_name_orig = top_pred_low_conf['class_name']
+
+            # Tạo tên lớp mới với cảnh báo
+            warning_name = f"{top_name_orig} (Độ tin cậy thấp: {top_conf:.1%})"
+
+            # Tạo kết quả cuối cùng chỉ chứa dự đoán này
+            final_results = [{"class_id": top_id,
+                              "class_name": warning_name,
+                              "confidence": top_conf}]
+            logger.warning(f"No prediction passed threshold {MIN_CONFIDENCE_THRESHOLD:.2f}. Returning top result (Class {top_id}) with low confidence warning.")
+        else:
+            # Trường hợp rất hiếm: không có dự đoán nào từ model
+            final_results = [{"class_id": -1,
+                              "class_name": "Không thể xác định",
+                              "confidence": 0.0}]
+            logger.error(f"Model did not produce any predictions for {source_name}.")
+    else:
+         # Sử dụng kết quả đã lọc nếu có dự đoán vượt ngưỡng
+         final_results = filtered_results
+         logger.info(f"Found {len(final_results)} predictions above threshold {MIN_CONFIDENCE_THRESHOLD:.2f}. Top result: Class {final_results[0]['class_id']} ({final_results[0]['confidence']:.2%})")
+    return final_results
@@ -0,0 +1,134 @@
+# utils/local_inference.py
+
+import os
+import time
+import logging
+import threading
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+import config
+from utils.inference_pipeline import preprocess_single_image, format_top_predictions
+
+logger = logging.getLogger("local_inference")
+
+
+class LocalInferenceEngine:
+    """
+    Chạy model ngay trong tiến trình GUI (không qua HTTP API).
+    TensorFlow và model chỉ được import/tải trên thread nền ở lần dùng đầu tiên,
+    nên mở GUI không bị chậm và các thread gọi predict() chỉ chờ khi model chưa sẵn sàng.
+    """
+    def __init__(self, model_path: Optional[str] = None):
+        self.model_path = model_path or config.MODEL_SAVE_PATH
+        self._model = None
+        self._load_error: Optional[str] = None
+        self._load_started = False
+        self._loaded_event = threading.Event()
+        self._state_lock = threading.Lock()
+        self._predict_lock = threading.Lock() # Một lượt suy luận tại một thời điểm (model không chia sẻ giữa thread)
+        self.load_seconds: Optional[float] = None
+
+    # --- Tải model ---
+    def ensure_loaded_async(self):
+        """Bắt đầu tải model trên thread nền (gọi nhiều lần không sao)."""
+        with self._state_lock:
+            if self._load_started:
+                return
+            self._load_started = True
+        threading.Thread(target=self._load_model, name="local-model-loader", daemon=True).start()
+
+    def _load_model(self):
+        t_start = time.perf_counter()
+        try:
+            if not os.path.exists(self.model_path):
+                raise FileNotFoundError(f"Model file not found at {self.model_path}")
+            from utils.model_utils import load_keras_model # Import TensorFlow tại đây, không phải lúc mở GUI
+            model = load_keras_model(self.model_path)
+            if model is None:
+                raise RuntimeError(f"Could not load model from {self.model_path}")
+            # Chạy thử một lần để TensorFlow build graph trước request đầu tiên
+            model(np.zeros((1, config.IMG_HEIGHT, config.IMG_WIDTH, 3), dtype=np.float32), training=False)
+            self._model = model
+            self.load_seconds = time.perf_counter() - t_start
+            logger.info(f"Local model loaded in {self.load_seconds:.2f}s from {self.model_path}")
+        except Exception as e:
+            self._load_error = str(e)
+            logger.error(f"Failed to load local model: {e}", exc_info=True)
+        finally:
+            self._loaded_event.set()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._model is not None
+
+    @property
+    def load_error(self) -> Optional[str]:
+        return self._load_error
+
+    def wait_until_loaded(self, timeout: Optional[float] = None):
+        """Chờ model tải xong. Raise RuntimeError nếu tải lỗi hoặc quá thời gian."""
+        self.ensure_loaded_async()
+        if not self._loaded_event.wait(timeout):
+            raise RuntimeError("Timed out waiting for the local model to load.")
+        if self._model is None:
+            raise RuntimeError(f"Local model is not available: {self._load_error}")
+
+    # --- Suy luận ---
+    def predict_batch(self, images: np.ndarray) -> np.ndarray:
+        """Trả về xác suất (N, NUM_CLASSES) cho batch ảnh đã tiền xử lý."""
+        self.wait_until_loaded()
+        with self._predict_lock:
+            return np.asarray(self._model(images, training=False))
+
+    def predict_file(self, image_path: str, top_n: int = 3) -> List[Dict]:
+        """Đọc, tiền xử lý và dự đoán một file ảnh; trả về top_predictions giống API /predict."""
+        with open(image_path, 'rb') as f_read: # FileNotFoundError được raise cho nơi gọi
+            image_bytes = f_read.read()
+        if not image_bytes:
+            raise ValueError("Image file empty.")
+        image = preprocess_single_image(image_bytes, config.IMG_HEIGHT, config.IMG_WIDTH)
+        if image is None:
+            raise ValueError("Could not preprocess image. Check image format or content.")
+        probs = self.predict_batch(image)[0]
+        return format_top_predictions(probs, top_n, source_name=os.path.basename(image_path))
+
+    def predict_files(self, image_paths: List[str], top_n: int = 3) -> List[Tuple[str, List[Dict]]]:
+        """
+        Dự đoán nhiều file trong một lượt gọi model.
+
+        Returns:
+            List[(lỗi, top_predictions)] theo thứ tự đầu vào; lỗi là chuỗi rỗng nếu thành công.
+        """
+        outputs: List[Tuple[str, List[Dict]]] = [("", [])] * len(image_paths)
+        images, indices = [], []
+        for idx, image_path in enumerate(image_paths):
+            try:
+                with open(image_path, 'rb') as f_read:
+                    image_bytes = f_read.read()
+            except OSError as e:
+                outputs[idx] = (f"Cannot read file: {e.strerror or e}", []); continue
+            image = preprocess_single_image(image_bytes, config.IMG_HEIGHT, config.IMG_WIDTH) if image_bytes else None
+            if image is None:
+                outputs[idx] = ("Could not preprocess image. Check image format or content.", []); continue
+            images.append(image[0]); indices.append(idx)
+        if images:
+            predictions_prob = self.predict_batch(np.stack(images))
+            for idx, probs in zip(indices, predictions_prob):
+                outputs[idx] = ("", format_top_predictions(probs, top_n, source_name=os.path.basename(image_paths[idx])))
+        return outputs
+
+
+# --- Engine dùng chung cho toàn bộ GUI ---
+_engine_lock = threading.Lock()
+_shared_engine: Optional[LocalInferenceEngine] = None
+
+
+def get_local_engine() -> LocalInferenceEngine:
+    """Trả về engine dùng chung (tạo lần đầu, chưa tải model cho tới khi được dùng)."""
+    global _shared_engine
+    with _engine_lock:
+        if _shared_engine is None:
+            _shared_engine = LocalInferenceEngine()
+        return _shared_engine
@@ -96,6 +96,20 @@ def get_model_summary_text(model):
     model.summary(print_fn=lambda x: stringlist.append(x))
     return "\n".join(stringlist)
 
+def build_feature_extractor(model, layer_name='dense1'):
+    """
+    Tạo model con trả về activation của một layer (mặc định 'dense1', 512 chiều)
+    thay vì xác suất softmax. Dùng cho chỉ mục embedding / tìm ảnh train gần nhất.
+    """
+    if model is None:
+        return None
+    try:
+        layer = model.get_layer(layer_name)
+    except ValueError:
+        print(f"Error: Layer '{layer_name}' not found in model.")
+        return None
+    return keras.Model(inputs=model.inputs, outputs=layer.output, name=f"{model.name}_{layer_name}_features")
+
 
 # --- Chạy thử (khi chạy file này trực tiếp) ---
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+# utils/sign_detector.py
+
+import cv2
+import numpy as np
+from typing import List, Dict, Tuple
+
+# --- Ngưỡng HSV cho các màu biển báo (OpenCV: H trong [0, 180]) ---
+# Màu đỏ nằm ở hai đầu của vòng Hue nên cần 2 khoảng
+HSV_COLOR_RANGES = {
+    'red': [((0, 70, 50), (10, 255, 255)), ((170, 70, 50), (180, 255, 255))],
+    'blue': [((100, 120, 50), (130, 255, 255))],
+    'yellow': [((15, 100, 100), (35, 255, 255))],
+}
+
+# --- Tham số lọc contour mặc định ---
+MIN_REGION_SIDE = 12          # Cạnh nhỏ nhất (pixel) của vùng ứng viên
+MIN_REGION_AREA_RATIO = 0.0002 # Diện tích tối thiểu so với toàn ảnh
+MAX_REGION_AREA_RATIO = 0.5    # Diện tích tối đa so với toàn ảnh
+MIN_ASPECT_RATIO = 0.5         # width / height
+MAX_ASPECT_RATIO = 2.0
+MIN_FILL_RATIO = 0.3           # Diện tích contour / diện tích bounding box
+BOX_PADDING_RATIO = 0.1        # Nới rộng box để không cắt mất viền biển báo
+NMS_IOU_THRESHOLD = 0.3
+MAX_CANDIDATES = 32
+
+
+def _box_iou(box_a: Tuple[int, int, int, int], box_b: Tuple[int, int, int, int]) -> float:
+    """Tính IoU của hai box dạng (x, y, w, h)."""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    inter_w = min(ax + aw, bx + bw) - max(ax, bx)
+    inter_h = min(ay + ah, by + bh) - max(ay, by)
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def color_mask(img_hsv: np.ndarray, color: str) -> np.ndarray:
+    """Tạo mask nhị phân cho một màu (đã làm sạch nhiễu bằng morphology)."""
+    mask = None
+    for lower, upper in HSV_COLOR_RANGES[color]:
+        part = cv2.inRange(img_hsv, np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+        mask = part if mask is None else cv2.bitwise_or(mask, part)
+    kernel = np.ones((3, 3), np.uint8)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+    return mask
+
+
+def propose_regions(img_bgr: np.ndarray, max_candidates: int = MAX_CANDIDATES) -> List[Dict]:
+    """
+    Sinh các vùng ứng viên chứa biển báo từ mask màu đỏ/xanh/vàng.
+
+    Args:
+        img_bgr (np.ndarray): Ảnh cảnh đầy đủ (BGR, uint8).
+        max_candidates (int): Số vùng tối đa trả về (ưu tiên vùng lớn).
+
+    Returns:
+        List[Dict]: Mỗi phần tử gồm 'box' (x, y, w, h) và 'color'.
+    """
+    img_h, img_w = img_bgr.shape[:2]
+    img_area = float(img_h * img_w)
+    img_hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV)
+
+    candidates = []
+    for color in HSV_COLOR_RANGES:
+        mask = color_mask(img_hsv, color)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w < MIN_REGION_SIDE or h < MIN_REGION_SIDE:
+                continue
+            box_area = float(w * h)
+            if not (MIN_REGION_AREA_RATIO * img_area <= box_area <= MAX_REGION_AREA_RATIO * img_area):
+                continue
+            if not (MIN_ASPECT_RATIO <= w / float(h) <= MAX_ASPECT_RATIO):
+                continue
+            if cv2.contourArea(contour) / box_area < MIN_FILL_RATIO:
+                continue
+
+            # Nới rộng box và cắt theo biên ảnh
+            pad_x = int(w * BOX_PADDING_RATIO); pad_y = int(h * BOX_PADDING_RATIO)
+            x0 = max(0, x - pad_x); y0 = max(0, y - pad_y)
+            x1 = min(img_w, x + w + pad_x); y1 = min(img_h, y + h + pad_y)
+            candidates.append({'box': (x0, y0, x1 - x0, y1 - y0), 'color': color})
+
+    # Non-maximum suppression đơn giản: giữ box lớn hơn khi trùng lặp (giữa các mask màu)
+    candidates.sort(key=lambda c: c['box'][2] * c['box'][3], reverse=True)
+    kept = []
+    for cand in candidates:
+        if all(_box_iou(cand['box'], k['box']) < NMS_IOU_THRESHOLD for k in kept):
+            kept.append(cand)
+            if len(kept) >= max_candidates:
+                break
+    return kept
+
+
+def crop_regions_batch(img_bgr: np.ndarray, regions: List[Dict], target_height: int, target_width: int) -> np.ndarray:
+    """
+    Cắt và resize tất cả vùng ứng viên thành một batch duy nhất cho classifier.
+    Tiền xử lý giống preprocess_single_image: resize INTER_AREA, BGR->RGB, chuẩn hóa [0, 1].
+
+    Returns:
+        np.ndarray: Mảng float32 shape (N, target_height, target_width, 3).
+    """
+    batch = np.empty((len(regions), target_height, target_width, 3), dtype=np.float32)
+    for i, region in enumerate(regions):
+        x, y, w, h = region['box']
+        crop = img_bgr[y:y + h, x:x + w]
+        crop_resized = cv2.resize(crop, (target_width, target_height), interpolation=cv2.INTER_AREA)
+        batch[i] = cv2.cvtColor(crop_resized, cv2.COLOR_BGR2RGB)
+    batch /= 255.0
+    return batch
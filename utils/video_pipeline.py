@@ -0,0 +1,229 @@
+# utils/video_pipeline.py
+
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Union
+
+import cv2
+import numpy as np
+
+import config
+from utils.sign_detector import propose_regions, crop_regions_batch
+from utils.inference_pipeline import CLASS_NAMES, MIN_CONFIDENCE_THRESHOLD
+
+logger = logging.getLogger("video_pipeline")
+
+# Hàng đợi giữa các bước chỉ giữ vài frame mới nhất: bước sau chậm thì frame cũ bị bỏ, không dồn độ trễ
+PIPELINE_QUEUE_SIZE = 2
+QUEUE_POLL_SECONDS = 0.1
+CENTER_CROP_RATIO = 0.6 # Không tìm thấy vùng ứng viên: phân loại vùng vuông giữa khung hình
+
+
+def put_latest(target_queue: queue.Queue, item) -> bool:
+    """Đưa item vào hàng đợi có giới hạn; nếu đầy thì bỏ phần tử cũ nhất. Trả về True nếu đã bỏ frame."""
+    dropped = False
+    while True:
+        try:
+            target_queue.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                target_queue.get_nowait()
+                dropped = True
+            except queue.Empty:
+                pass
+
+
+class RateMeter:
+    """Đo tần suất sự kiện (lần/giây) trong cửa sổ thời gian trượt."""
+    def __init__(self, window_seconds: float = 2.0):
+        self.window_seconds = window_seconds
+        self._timestamps = deque()
+        self._lock = threading.Lock()
+
+    def tick(self, now: Optional[float] = None):
+        now = time.perf_counter() if now is None else now
+        with self._lock:
+            self._timestamps.append(now)
+            while self._timestamps and now - self._timestamps[0] > self.window_seconds:
+                self._timestamps.popleft()
+
+    def rate(self) -> float:
+        with self._lock:
+            if len(self._timestamps) < 2:
+                return 0.0
+            span = self._timestamps[-1] - self._timestamps[0]
+            return (len(self._timestamps) - 1) / span if span > 0 else 0.0
+
+
+def center_region(frame_shape) -> Dict:
+    """Vùng vuông giữa khung hình (dạng giống propose_regions)."""
+    frame_h, frame_w = frame_shape[:2]
+    side = max(1, int(min(frame_h, frame_w) * CENTER_CROP_RATIO))
+    return {'box': ((frame_w - side) // 2, (frame_h - side) // 2, side, side), 'color': None, 'fallback': True}
+
+
+class VideoPipeline:
+    """
+    Nhận diện trên luồng video với ba thread: đọc frame -> tiền xử lý (tìm vùng + cắt batch) -> suy luận.
+    Các bước nối với nhau bằng hàng đợi giới hạn và luôn ưu tiên frame mới nhất.
+
+    Callbacks (được gọi trên thread của pipeline, nơi nhận phải tự chuyển về GUI thread):
+        on_frame(frame_id, captured_at, frame_bgr): mỗi frame đọc được (để hiển thị).
+        on_result(result): kết quả suy luận dạng dict gồm frame_id, captured_at, detections,
+            latency_ms (từ lúc đọc frame tới lúc có kết quả), infer_ms.
+        on_finished(error): pipeline dừng (error rỗng nếu hết video hoặc do stop()).
+    """
+    def __init__(self, source: Union[int, str], engine, on_frame: Optional[Callable] = None,
+                 on_result: Optional[Callable] = None, on_finished: Optional[Callable] = None,
+                 pace_to_source_fps: bool = True, detect_regions: bool = True):
+        self.source = source
+        self.engine = engine
+        self.on_frame, self.on_result, self.on_finished = on_frame, on_result, on_finished
+        self.pace_to_source_fps = pace_to_source_fps
+        self.detect_regions = detect_regions
+        self._preprocess_queue: queue.Queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        self._infer_queue: queue.Queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        self._stop_event = threading.Event()
+        self._capture_done = threading.Event()
+        self._preprocess_done = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._latencies = deque(maxlen=30)
+        self._stats_lock = threading.Lock()
+        self.capture_meter, self.infer_meter = RateMeter(), RateMeter()
+        # Mỗi bộ đếm chỉ do một thread ghi (không cần khóa); dropped_frames là tổng
+        self.capture_dropped = 0
+        self.preprocess_dropped = 0
+        self.source_fps = 0.0
+        self.error: str = ""
+
+    # --- Điều khiển ---
+    def start(self):
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="video-capture", daemon=True),
+            threading.Thread(target=self._preprocess_loop, name="video-preprocess", daemon=True),
+            threading.Thread(target=self._infer_loop, name="video-infer", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 2.0, wait: bool = True):
+        """
+        Dừng pipeline. wait=False chỉ báo dừng và trả về ngay (dùng trên GUI thread);
+        on_finished được gọi khi thread suy luận kết thúc.
+        """
+        self._stop_event.set()
+        if not wait:
+            return
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    @property
+    def dropped_frames(self) -> int:
+        return self.capture_dropped + self.preprocess_dropped
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            latency = float(np.mean(self._latencies)) if self._latencies else 0.0
+        return {'capture_fps': self.capture_meter.rate(), 'infer_fps': self.infer_meter.rate(),
+                'latency_ms': latency, 'dropped_frames': self.dropped_frames, 'source_fps': self.source_fps}
+
+    # --- Thread đọc frame ---
+    def _capture_loop(self):
+        capture = cv2.VideoCapture(self.source)
+        try:
+            if not capture.isOpened():
+                self.error = f"Cannot open video source: {self.source}"
+                logger.error(self.error)
+                return
+            self.source_fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+            is_file = isinstance(self.source, str)
+            frame_interval = 1.0 / self.source_fps if (is_file and self.pace_to_source_fps and self.source_fps > 0) else 0.0
+            next_frame_at = time.perf_counter()
+            frame_id = 0
+            while not self._stop_event.is_set():
+                ok, frame_bgr = capture.read()
+                if not ok:
+                    if not is_file: self.error = "Camera stopped delivering frames."
+                    break
+                captured_at = time.perf_counter()
+                frame_id += 1
+                self.capture_meter.tick(captured_at)
+                if self.on_frame is not None:
+                    self.on_frame(frame_id, captured_at, frame_bgr)
+                if put_latest(self._preprocess_queue, (frame_id, captured_at, frame_bgr)):
+                    self.capture_dropped += 1
+                if frame_interval: # Video file: phát theo tốc độ gốc thay vì đọc nhanh nhất có thể
+                    next_frame_at += frame_interval
+                    delay = next_frame_at - time.perf_counter()
+                    if delay > 0: self._stop_event.wait(delay)
+                    else: next_frame_at = time.perf_counter()
+        except Exception as e:
+            self.error = f"Capture error: {e}"
+            logger.error(self.error, exc_info=True)
+        finally:
+            capture.release()
+            self._capture_done.set()
+
+    # --- Thread tiền xử lý ---
+    def _preprocess_loop(self):
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    frame_id, captured_at, frame_bgr = self._preprocess_queue.get(timeout=QUEUE_POLL_SECONDS)
+                except queue.Empty:
+                    if self._capture_done.is_set(): break
+                    continue
+                regions = propose_regions(frame_bgr) if self.detect_regions else []
+                if not regions:
+                    regions = [center_region(frame_bgr.shape)]
+                batch = crop_regions_batch(frame_bgr, regions, config.IMG_HEIGHT, config.IMG_WIDTH)
+                if put_latest(self._infer_queue, (frame_id, captured_at, regions, batch)):
+                    self.preprocess_dropped += 1
+        except Exception as e:
+            self.error = f"Preprocess error: {e}"
+            logger.error(self.error, exc_info=True)
+        finally:
+            self._preprocess_done.set()
+
+    # --- Thread suy luận ---
+    def _infer_loop(self):
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    frame_id, captured_at, regions, batch = self._infer_queue.get(timeout=QUEUE_POLL_SECONDS)
+                except queue.Empty:
+                    if self._preprocess_done.is_set(): break
+                    continue
+                t_infer = time.perf_counter()
+                predictions_prob = self.engine.predict_batch(batch)
+                done_at = time.perf_counter()
+                detections = []
+                for region, probs in zip(regions, predictions_prob):
+                    class_id = int(np.argmax(probs)); confidence = float(probs[class_id])
+                    detections.append({'box': tuple(int(v) for v in region['box']), 'class_id': class_id,
+                                       'class_name': CLASS_NAMES.get(class_id, f"Unknown Class ID: {class_id}"),
+                                       'confidence': confidence, 'confident': confidence >= MIN_CONFIDENCE_THRESHOLD,
+                                       'fallback': bool(region.get('fallback'))})
+                latency_ms = (done_at - captured_at) * 1000.0
+                self.infer_meter.tick(done_at)
+                with self._stats_lock:
+                    self._latencies.append(latency_ms)
+                if self.on_result is not None:
+                    self.on_result({'frame_id': frame_id, 'captured_at': captured_at, 'detections': detections,
+                                    'latency_ms': latency_ms, 'infer_ms': (done_at - t_infer) * 1000.0})
+        except Exception as e:
+            self.error = f"Inference error: {e}"
+            logger.error(self.error, exc_info=True)
+        finally:
+            self._stop_event.set() # Suy luận dừng thì các bước khác cũng dừng
+            if self.on_finished is not None:
+                self.on_finished(self.error)